@@ -0,0 +1,219 @@
+"""
+被试者答题接口的异步实现
+
+考试开始时大量被试者同时登录、拉取试卷、提交答案。同步接口每个请求占用线程池中的一个线程
+（默认 40 个），等待数据库期间线程空闲阻塞，bcrypt 校验密码也在同一个线程池中执行，
+并发稍高请求就开始排队。这里的接口与同步接口路径、参数和返回完全一致，改用 SQLAlchemy
+异步引擎（aiomysql / aiosqlite），等待数据库时不占用线程：
+- 查询直接使用 AsyncSession；提交答案等复用同步服务的逻辑通过 AsyncSession.run_sync 执行，
+  仍然走异步驱动
+- bcrypt 校验是 CPU 密集的，显式放到独立的线程限额中执行（不超过 CPU 核数），不阻塞事件循环，
+  也不挤占其他接口的线程池
+- 试卷快照优先读缓存；未命中时在线程池中用同步会话构建（构建过程持有线程锁，不能在事件循环中执行）
+
+设置环境变量 ASYNC_PARTICIPANT_API=true 后在 main.py 中注册，先于同步接口匹配。
+压测对比见 scripts/load_test_participants.py。
+"""
+import os
+from datetime import datetime
+from typing import Optional
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.concurrency import run_in_threadpool
+
+from app.database import get_async_db, session_scope
+from app.services import assessment_service
+from app.services.auth_service import Principal, decode_token, oauth2_scheme, principal_cache
+from app.services.paper_snapshot import get_paper_snapshot, paper_snapshot_cache
+from app.services.shuffle_service import build_layout
+
+router = APIRouter(tags=["被试者答题（异步）"])
+
+# bcrypt 校验的并发上限，默认与 CPU 核数相同
+_password_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_password_limiter() -> anyio.CapacityLimiter:
+    global _password_limiter
+    if _password_limiter is None:
+        try:
+            tokens = int(os.getenv("PASSWORD_HASH_WORKERS", 0))
+        except ValueError:
+            tokens = 0
+        _password_limiter = anyio.CapacityLimiter(tokens or os.cpu_count() or 1)
+    return _password_limiter
+
+
+class SubmitAssessmentRequest(BaseModel):
+    answers: dict
+
+
+async def _current_user(db: AsyncSession, token: str) -> Principal:
+    """当前登录用户（与同步接口共用用户信息缓存）"""
+    from app.main import User
+    username = decode_token(token)["sub"]
+    principal, stamp = principal_cache.lookup(username)
+    if principal is None:
+        user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+        if user is None:
+            raise HTTPException(status_code=404, detail="用户不存在")
+        principal = Principal.from_user(user)
+        principal_cache.store(username, principal, stamp)
+    return principal
+
+
+async def _user_assignment(db: AsyncSession, assignment_id: int, user_id: int):
+    from app.main import PaperAssignment
+    assignment = (await db.execute(select(PaperAssignment).where(
+        PaperAssignment.id == assignment_id,
+        PaperAssignment.user_id == user_id
+    ))).scalars().first()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="试卷分配不存在")
+    return assignment
+
+
+def _load_paper_snapshot(paper_id: int):
+    with session_scope("试卷快照") as db:
+        return get_paper_snapshot(db, paper_id)
+
+
+async def _paper_snapshot(paper_id: int):
+    """读取试卷快照，缓存未命中时在线程池中构建"""
+    snapshot = paper_snapshot_cache.peek(paper_id)
+    if snapshot is None:
+        snapshot = await run_in_threadpool(_load_paper_snapshot, paper_id)
+    return snapshot
+
+
+async def _shuffle_layout(db: AsyncSession, paper, user_id: int, assignment_id: Optional[int]):
+    """与 assessment_service.get_shuffle_layout 相同：按页面所选且属于当前用户的分配推导顺序"""
+    if assignment_id is not None:
+        assignment = await _user_assignment(db, assignment_id, user_id)
+        if assignment.paper_id != paper.paper_id:
+            raise HTTPException(status_code=404, detail="试卷分配不存在")
+    return build_layout(paper, assignment_id)
+
+
+@router.post("/login", summary="用户登录，返回JWT Token")
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    from app.main import User, create_access_token, verify_password
+    user = (await db.execute(select(User).where(User.username == form_data.username))).scalars().first()
+    if not user or not await anyio.to_thread.run_sync(
+        verify_password, form_data.password, str(user.password_hash), limiter=_get_password_limiter()
+    ):
+        raise HTTPException(status_code=401, detail="用户名或密码错误")
+    if not bool(user.is_active):
+        raise HTTPException(status_code=403, detail="账号未激活")
+    access_token = create_access_token(data={"sub": user.username, "role": user.role})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.get("/my-assignments", summary="获取当前用户的试卷分配")
+@router.get("/my-assignments/", summary="获取当前用户的试卷分配")
+async def get_my_assignments(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    from app.main import PaperAssignment
+    user = await _current_user(db, token)
+    assignments = (await db.execute(
+        select(PaperAssignment).options(selectinload(PaperAssignment.paper))
+        .where(PaperAssignment.user_id == user.id)
+        .order_by(PaperAssignment.assigned_at.desc())
+    )).scalars().all()
+    return [assessment_service.assignment_item(assignment) for assignment in assignments]
+
+
+@router.post("/start-assessment/{assignment_id}", summary="开始测试")
+async def start_assessment(assignment_id: int, token: str = Depends(oauth2_scheme),
+                           db: AsyncSession = Depends(get_async_db)):
+    user = await _current_user(db, token)
+    assignment = await _user_assignment(db, assignment_id, user.id)
+    if assignment.status == "assigned":
+        assignment.status = "started"
+        assignment.started_at = datetime.utcnow()
+        await db.commit()
+    paper = await _paper_snapshot(assignment.paper_id)
+    if paper is None:
+        raise HTTPException(status_code=404, detail="试卷不存在")
+    return assessment_service.start_payload(assignment, paper)
+
+
+@router.post("/submit-assessment/{assignment_id}", summary="提交测试答案")
+@router.post("/submit-assessment/{assignment_id}/", summary="提交测试答案")
+async def submit_assessment(assignment_id: int, request: SubmitAssessmentRequest,
+                            token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    user = await _current_user(db, token)
+    assignment = await _user_assignment(db, assignment_id, user.id)
+    if assignment.status != "started":
+        raise HTTPException(status_code=400, detail="试卷未开始或已完成")
+
+    paper = await _paper_snapshot(assignment.paper_id)
+    now = datetime.utcnow()
+    try:
+        total_score = await db.run_sync(
+            lambda session: assessment_service.submit_answers(session, assignment, paper, user.id, request.answers, now)
+        )
+        await db.commit()
+    except ValueError as e:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        print(f"提交试卷失败: assignment_id={assignment_id}, 错误: {e}")
+        raise HTTPException(status_code=500, detail="提交失败，请重试")
+
+    assessment_service.record_submitted(total_score)
+    return {"msg": "测试提交成功", "completed_at": now.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+@router.get("/papers/{paper_id}/questions", summary="获取试卷题目（支持乱序）")
+async def get_paper_questions_with_shuffle(paper_id: int, assignment_id: Optional[int] = None,
+                                           token: str = Depends(oauth2_scheme),
+                                           db: AsyncSession = Depends(get_async_db)):
+    """获取试卷题目，支持乱序功能"""
+    user = await _current_user(db, token)
+    try:
+        paper = await _paper_snapshot(paper_id)
+        if paper is None:
+            raise HTTPException(status_code=404, detail="试卷不存在")
+        if not paper.questions:
+            return {"questions": []}
+        layout = await _shuffle_layout(db, paper, user.id, assignment_id)
+        return {
+            "paper_id": paper_id,
+            "is_shuffled": paper.is_shuffled,
+            "questions": assessment_service.paper_questions(paper, layout)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取试卷题目失败: {str(e)}")
+
+
+@router.get("/papers/{paper_id}/questions-with-options", summary="获取试卷题目（支持选项乱序）")
+async def get_paper_questions_with_option_shuffle(paper_id: int, assignment_id: Optional[int] = None,
+                                                  token: str = Depends(oauth2_scheme),
+                                                  db: AsyncSession = Depends(get_async_db)):
+    """获取试卷题目，支持选项乱序功能"""
+    user = await _current_user(db, token)
+    try:
+        paper = await _paper_snapshot(paper_id)
+        if paper is None:
+            raise HTTPException(status_code=404, detail="试卷不存在")
+        if not paper.questions:
+            return {"questions": []}
+        layout = await _shuffle_layout(db, paper, user.id, assignment_id)
+        return {
+            "paper_id": paper_id,
+            "is_shuffled": paper.is_shuffled,
+            "questions": assessment_service.paper_questions_with_options(paper, layout)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取试卷题目失败: {str(e)}")
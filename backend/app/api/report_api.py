@@ -1,92 +1,180 @@
 import os
-import threading
+import queue
 import time
 import uuid
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Depends, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-# 从main中只导入SessionLocal
-from app.main import SessionLocal
-from app.api.report_generator import generate_report_task
+from app.database import SessionLocal, get_db
+from app.services.auth_service import Principal, get_current_user
+from app.services.report_engine import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, get_report_engine, shutdown_report_engine
+)
+from app.services.report_events import batch_event_stream, get_report_event_bus
+from app.services.report_task_store import get_report_task_store
 
 router = APIRouter(prefix="/reports", tags=["报告生成"])
 
-report_tasks: Dict[str, dict] = {}
-
 class BatchGenerateRequest(BaseModel):
     paper_id: int
     user_ids: List[int]
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+class GenerateRequest(BaseModel):
+    paper_id: int
+    user_id: int
+
+class TaskStatusRequest(BaseModel):
+    task_ids: List[str]
 
 @router.post("/batch-generate")
 def batch_generate_reports(req: BatchGenerateRequest):
-    print(f"[DEBUG] 批量生成报告请求: paper_id={req.paper_id}, user_ids={req.user_ids}")
+    print(f"[DEBUG] 批量生成报告请求: paper_id={req.paper_id}, 用户数={len(req.user_ids)}")
+    engine = get_report_engine()
+    # 批量任务只能占用队列的一部分，超出时整批拒绝（剩余容量留给单份生成），由前端稍后重试
+    if not engine.admit_batch(len(req.user_ids)):
+        raise HTTPException(
+            status_code=503,
+            detail=f"报告生成队列繁忙（排队中 {engine.pending()} 个任务），请稍后重试",
+            headers={"Retry-After": "30"}
+        )
+
+    task_store = get_report_task_store()
+    batch_id = uuid.uuid4().hex
+    tasks = [
+        {"task_id": f"{user_id}_{req.paper_id}_{uuid.uuid4().hex[:8]}", "user_id": user_id,
+         "paper_id": req.paper_id, "batch_id": batch_id}
+        for user_id in req.user_ids
+    ]
+    # 一次性写入整个批次的任务记录
+    task_store.create_many(tasks)
+
     task_ids = []
-    for user_id in req.user_ids:
-        task_id = f"{user_id}_{req.paper_id}_{uuid.uuid4().hex[:8]}"
-        print(f"[DEBUG] 创建任务: task_id={task_id}, user_id={user_id}, paper_id={req.paper_id}")
-        report_tasks[task_id] = {
-            "status": "pending",
-            "progress": 0,
-            "file_path": None,
-            "error_message": None,
-            "user_id": user_id,
-            "paper_id": req.paper_id
-        }
+    for task in tasks:
+        task_id = task["task_id"]
         try:
-            print(f"[DEBUG] 启动线程生成报告: task_id={task_id}")
-            thread = threading.Thread(
-                target=generate_report_task, 
-                args=(task_id, user_id, req.paper_id, report_tasks, SessionLocal), 
-                daemon=True
-            )
-            thread.start()
-            print(f"[DEBUG] 线程已启动: {thread.name}, 是否活跃: {thread.is_alive()}")
+            engine.submit(task_id, task["user_id"], req.paper_id, task_store, SessionLocal,
+                          priority=PRIORITY_BATCH, batch_id=batch_id)
+        except queue.Full:
+            task_store.update(task_id, status="failed", progress=100, error_message="报告生成队列已满，请稍后重试")
         except Exception as e:
-            print(f"[ERROR] 启动线程失败: {str(e)}")
-            import traceback
-            print(f"[ERROR] 详细错误: {traceback.format_exc()}")
-            report_tasks[task_id]["status"] = "failed"
-            report_tasks[task_id]["error_message"] = f"启动任务失败: {str(e)}"
+            print(f"[ERROR] 提交报告任务失败: {str(e)}")
+            task_store.update(task_id, status="failed", progress=100, error_message=f"启动任务失败: {str(e)}")
         task_ids.append(task_id)
-    print(f"[DEBUG] 返回任务ID: {task_ids}")
-    return {"success": True, "task_ids": task_ids}
+    print(f"[DEBUG] 已提交任务数: {len(task_ids)}")
+    return {"success": True, "batch_id": batch_id, "task_ids": task_ids}
 
-@router.get("/status")
-async def get_report_status(task_ids: List[str] = Query(None, alias="task_ids[]")):
+@router.post("/generate")
+def generate_report(req: GenerateRequest):
+    """生成单份报告（结果页使用），优先于排队中的批量任务执行"""
+    engine = get_report_engine()
+    task_store = get_report_task_store()
+    task_id = f"{req.user_id}_{req.paper_id}_{uuid.uuid4().hex[:8]}"
+    task_store.create_many([{"task_id": task_id, "user_id": req.user_id, "paper_id": req.paper_id}])
+    try:
+        engine.submit(task_id, req.user_id, req.paper_id, task_store, SessionLocal, priority=PRIORITY_INTERACTIVE)
+    except queue.Full:
+        task_store.update(task_id, status="failed", progress=100, error_message="报告生成队列已满，请稍后重试")
+        raise HTTPException(status_code=503, detail="报告生成队列已满，请稍后重试", headers={"Retry-After": "10"})
+    return {"success": True, "task_id": task_id}
+
+@router.post("/batches/{batch_id}/cancel")
+def cancel_report_batch(batch_id: str):
+    """取消批次中尚未开始生成的报告，已在生成中的任务会继续完成"""
+    cancelled = get_report_engine().cancel_batch(batch_id, get_report_task_store())
+    return {"success": True, "cancelled": len(cancelled), "task_ids": cancelled}
+
+@router.get("/batches/{batch_id}/events")
+async def stream_batch_events(batch_id: str, request: Request,
+                              last_event_id: Optional[int] = Query(None, description="不支持自定义请求头的客户端使用")):
+    """
+    以SSE推送批次进度（task / batch / snapshot / done 事件），替代轮询 /reports/status
+
+    断线重连时浏览器自动带上 Last-Event-ID 请求头，从该事件之后继续推送。
+    """
+    task_store = get_report_task_store()
+    if not get_report_event_bus().has_batch(batch_id):
+        exists = await run_in_threadpool(task_store.find, limit=1, batch_id=batch_id)
+        if not exists:
+            raise HTTPException(status_code=404, detail="批次不存在或已过期")
+
+    header = request.headers.get("last-event-id")
+    if header is not None:
+        try:
+            last_event_id = int(header)
+        except ValueError:
+            last_event_id = None
+    return StreamingResponse(
+        batch_event_stream(batch_id, last_event_id, task_store, request.is_disconnected),
+        media_type="text/event-stream",
+        # 禁止代理缓冲和缓存，事件立即送达
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.on_event("shutdown")
+def stop_report_engine():
+    shutdown_report_engine()
+
+def _build_status_result(task_ids: List[str]) -> dict:
+    tasks = get_report_task_store().get_many(task_ids)
     result = {}
-    if task_ids:
-        for tid in task_ids:
-            if tid in report_tasks:
-                result[tid] = {
-                    "status": report_tasks[tid]["status"],
-                    "progress": report_tasks[tid]["progress"],
-                    "file_path": report_tasks[tid]["file_path"],
-                    "error_message": report_tasks[tid]["error_message"]
-                }
-            else:
-                result[tid] = {"status": "not_found", "progress": 0}
+    for tid in task_ids:
+        task = tasks.get(tid)
+        if task:
+            result[tid] = {
+                "status": task["status"],
+                "progress": task["progress"],
+                "file_path": task["file_path"],
+                "error_message": task["error_message"]
+            }
+        else:
+            result[tid] = {"status": "not_found", "progress": 0}
     return result
 
+@router.get("/status")
+def get_report_status(task_ids: List[str] = Query(None, alias="task_ids[]")):
+    if not task_ids:
+        return {}
+    return _build_status_result(task_ids)
+
+@router.post("/status")
+def query_report_status(req: TaskStatusRequest):
+    """批量查询任务状态（任务较多时避免过长的查询字符串）"""
+    return _build_status_result(req.task_ids)
+
+@router.get("/tasks")
+def list_report_tasks(paper_id: Optional[int] = None, user_id: Optional[int] = None,
+                      limit: int = Query(200, ge=1, le=1000)):
+    """按试卷/用户查询最近的报告任务"""
+    return {"tasks": get_report_task_store().find(paper_id=paper_id, user_id=user_id, limit=limit)}
+
 @router.get("/download/{task_id}")
-def download_report(task_id: str):
-    task = report_tasks.get(task_id)
+def download_report(task_id: str, db: Session = Depends(get_db)):
+    task = get_report_task_store().get(task_id)
     if not task or task["status"] != "completed" or not task["file_path"]:
         raise HTTPException(status_code=404, detail="报告未生成或不存在")
-    return FileResponse(task["file_path"], filename=os.path.basename(task["file_path"]))
+    # file_path 是按内容哈希命名的共享产物，下载文件名使用报告记录中的文件名
+    from app.main import Report
+    file_name = None
+    if task["report_id"] is not None:
+        file_name = db.query(Report.file_name).filter(Report.id == task["report_id"]).scalar()
+    return FileResponse(task["file_path"], filename=file_name or os.path.basename(task["file_path"]))
+
+def report_archive_url(report_ids: List[int], username: str) -> str:
+    """报告打包下载地址，附带只能下载这些报告的短期Token"""
+    from urllib.parse import urlencode
+    from app.services.auth_service import create_download_token
+    return "/reports/batch/archive?" + urlencode({
+        "ids": ",".join(str(report_id) for report_id in sorted(set(report_ids))),
+        "token": create_download_token(username, report_ids),
+    })
 
 @router.post("/batch/download")
-def batch_download_reports(report_ids: List[int]):
+def batch_download_reports(report_ids: List[int], user: Principal = Depends(get_current_user)):
     """批量下载报告，返回下载链接"""
     download_links = []
     for report_id in report_ids:
@@ -94,4 +182,9 @@ def batch_download_reports(report_ids: List[int]):
             "report_id": report_id,
             "download_url": f"/reports/{report_id}/download"
         })
-    return {"success": True, "download_links": download_links} 
\ No newline at end of file
+    return {
+        "success": True,
+        "download_links": download_links,
+        # 一次请求下载全部报告的ZIP包（流式打包，支持断点续传）
+        "archive_url": report_archive_url(report_ids, user.username)
+    } 
\ No newline at end of file
@@ -3,9 +3,18 @@ import time
 from sqlalchemy import text
 
 # 将生成报告的逻辑分离到单独的文件中以避免循环引用
-def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal):
+def generate_report_task(task_id, user_id, paper_id, task_store, SessionLocal, render_func=None,
+                         raise_errors=False):
     """
     生成报告的后台任务
+
+    task_store: 任务状态存储（见 app.services.report_task_store）
+
+    render_func: 实际生成PDF的函数，签名为 (paper_id, report_data, output_path)。
+    由报告引擎调度时传入渲染进程池的入口；未传入时在当前进程内直接生成。
+
+    raise_errors: 为 True 时出错直接抛出异常（事务已回滚），不把任务标记为失败，
+    由报告引擎决定重试还是标记失败。
     """
     # 确保os模块在函数开始时就可用
     import os
@@ -15,7 +24,7 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
     print(f"[DEBUG] 进入报告生成任务: task_id={task_id}, user_id={user_id}, paper_id={paper_id}")
     
     try:
-        from app.main import User, Paper, PaperQuestion, Dimension, Report
+        from app.main import User, Paper, PaperQuestion, Report
         print(f"[DEBUG] 成功导入数据库模型")
         
         import sys
@@ -24,28 +33,29 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
         print(f"[DEBUG] 添加路径到sys.path: {generators_path}")
         sys.path.append(generators_path)
         
-        try:
-            from reports.generators.report_core import generate_single_report
-            print(f"[DEBUG] 成功导入report_core.generate_single_report")
-        except ImportError as e:
-            print(f"[ERROR] 导入report_core失败: {str(e)}")
-            import traceback
-            print(f"[ERROR] 导入错误详情: {traceback.format_exc()}")
-            raise
+        if render_func is None:
+            try:
+                from reports.generators.report_core import generate_single_report
+                render_func = generate_single_report
+                print(f"[DEBUG] 成功导入report_core.generate_single_report")
+            except ImportError as e:
+                print(f"[ERROR] 导入report_core失败: {str(e)}")
+                import traceback
+                print(f"[ERROR] 导入错误详情: {traceback.format_exc()}")
+                raise
     except Exception as e:
         print(f"[ERROR] 初始化报告生成任务失败: {str(e)}")
         import traceback
         print(f"[ERROR] 初始化错误详情: {traceback.format_exc()}")
-        report_tasks[task_id]["status"] = "failed"
-        report_tasks[task_id]["error_message"] = f"初始化失败: {str(e)}"
-        report_tasks[task_id]["progress"] = 100
+        if raise_errors:
+            raise
+        task_store.update(task_id, status="failed", error_message=f"初始化失败: {str(e)}", progress=100)
         return
     
     db = SessionLocal()
     try:
         print(f"[DEBUG] 开始生成报告: task_id={task_id}, user_id={user_id}, paper_id={paper_id}")
-        report_tasks[task_id]["status"] = "generating"
-        report_tasks[task_id]["progress"] = 10
+        task_store.update(task_id, status="generating", progress=10)
         # 1. 获取用户信息
         try:
             user = db.query(User).filter(User.id == user_id).first()
@@ -95,88 +105,39 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
             print(f"[ERROR] 获取题目-维度映射错误详情: {traceback.format_exc()}")
             raise Exception(f"获取题目-维度映射失败: {str(e)}")
         
-        # 5. 组装 report_data
-        # 计算总分和维度分数
-        total_score = 0
-        dimension_scores = {}
-        
-        # 根据实际答题记录计算分数
-        # 获取维度信息
+        # 5. 读取物化得分（与结果页使用同一份分数）
         try:
-            dimensions = db.query(Dimension).filter(Dimension.paper_id == paper_id).all()
-            print(f"[DEBUG] 获取到维度数量: {len(dimensions)}")
-            if len(dimensions) == 0:
-                print(f"[WARNING] 试卷 {paper_id} 没有维度定义!")
-            dimension_map = {dim.id: dim.name for dim in dimensions}
+            from app.main import PaperAssignment
+            from app.services.assignment_score_service import load_assignment_scores
+            from app.services.score_service import calculate_paper_scores
+
+            assignment = db.query(PaperAssignment).filter(
+                PaperAssignment.paper_id == paper_id,
+                PaperAssignment.user_id == user_id,
+                PaperAssignment.status == "completed"
+            ).order_by(PaperAssignment.completed_at.desc()).first()
+            if assignment:
+                score_info = load_assignment_scores(db, [assignment.id])[assignment.id]
+            else:
+                print(f"[WARNING] 用户 {user_id} 没有已完成的试卷 {paper_id} 分配，按答题记录计算分数")
+                score_info = calculate_paper_scores(db, paper_id, [user_id])[user_id]
         except Exception as e:
-            print(f"[ERROR] 获取维度信息失败: {str(e)}")
+            print(f"[ERROR] 获取得分失败: {str(e)}")
             import traceback
-            print(f"[ERROR] 获取维度信息错误详情: {traceback.format_exc()}")
-            raise Exception(f"获取维度信息失败: {str(e)}")
-        
-        # 构建维度层级结构
-        big_dimensions = {}
-        for dim in dimensions:
-            if dim.parent_id is None:  # 大维度
-                big_dimensions[dim.id] = {
-                    "name": dim.name,
-                    "score": 0,
-                    "subs": {}
-                }
-        
-        # 初始化所有子维度为0分
-        for dim in dimensions:
-            if dim.parent_id is not None:  # 子维度
-                parent_dim = big_dimensions.get(dim.parent_id)
-                if parent_dim:
-                    parent_dim["subs"][dim.name] = 0
-        
-        # 按维度分组计算分数
-        dimension_question_scores = {}
-        for question_id, answer, score in answers:
-            if question_id in question_dim_map:
-                dim_id = question_dim_map[question_id]
-                if dim_id in dimension_map:
-                    dim_name = dimension_map[dim_id]
-                    if dim_name not in dimension_question_scores:
-                        dimension_question_scores[dim_name] = []
-                    dimension_question_scores[dim_name].append(score)
-        
-        # 计算每个维度的平均分并组织层级结构
-        for dim_name, scores in dimension_question_scores.items():
-            if scores:
-                avg_score = sum(scores) / len(scores)
-                
-                # 找到对应的维度对象
-                dim_obj = next((dim for dim in dimensions if dim.name == dim_name), None)
-                if dim_obj:
-                    if dim_obj.parent_id is None:  # 大维度
-                        big_dimensions[dim_obj.id]["score"] = avg_score
-                    else:  # 子维度
-                        parent_dim = big_dimensions.get(dim_obj.parent_id)
-                        if parent_dim:
-                            parent_dim["subs"][dim_name] = avg_score
-        
-        # 计算大维度的平均分（基于子维度）
-        for big_dim in big_dimensions.values():
-            if big_dim["subs"]:
-                big_dim["score"] = sum(big_dim["subs"].values()) / len(big_dim["subs"])
-        
-        # 转换为最终格式
+            print(f"[ERROR] 获取得分错误详情: {traceback.format_exc()}")
+            raise Exception(f"获取得分失败: {str(e)}")
+
+        # 转换为报告使用的格式 {大维度: {"score": 分数, "subs": {小维度: 分数}}}
         dimension_scores = {}
-        for big_dim in big_dimensions.values():
+        for big_dim in score_info["big_dimensions"]:
             dimension_scores[big_dim["name"]] = {
                 "score": big_dim["score"],
-                "subs": big_dim["subs"]
+                "subs": {sub["name"]: sub["score"] for sub in big_dim["sub_dimensions"]}
             }
-        
-        # 计算总分（所有大维度的平均分）
-        total_score = 0
-        if dimension_scores:
-            total_score = sum(dim["score"] for dim in dimension_scores.values()) / len(dimension_scores)
+        total_score = score_info["total_score"]
 
-        print(f"[DEBUG] 计算得到的维度分数: {dimension_scores}")
-        print(f"[DEBUG] 计算得到的总分: {total_score}")
+        print(f"[DEBUG] 维度分数: {dimension_scores}")
+        print(f"[DEBUG] 总分: {total_score}")
         
         report_data = {
             "user_info": {
@@ -196,18 +157,28 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
         }
         
         print(f"[DEBUG] 报告数据组装完成，开始生成PDF...")
+        task_store.update(task_id, progress=40)
         
-        # 6. 生成PDF
+        # 6. 按报告输入的内容哈希查找，输入未变化时直接复用已有报告
+        from app.services.report_artifact_store import (
+            acquire_artifact, commit_artifact, compute_report_key, find_report, new_render_path
+        )
+        content_hash = compute_report_key(paper_id, report_data)
+        existing = find_report(db, user_id, paper_id, content_hash)
+        if existing is not None:
+            print(f"[DEBUG] 报告输入未变化，复用已有报告: report_id={existing.id}")
+            task_store.update(task_id, status="completed", progress=100,
+                              file_path=existing.file_path, report_id=existing.id)
+            return
+
+        # 7. 生成PDF（相同输入的PDF已存在时只增加引用）
         try:
             from pathlib import Path
-            output_dir = Path(__file__).parent.parent.parent / "reports" / "generators" / "output"
-            print(f"[DEBUG] 输出目录: {output_dir}")
-            output_dir.mkdir(parents=True, exist_ok=True)
             safe_name = (user.real_name or user.username or "user")
             output_filename = f"{safe_name}_报告_{paper_id}_{user_id}_{int(time.time())}.pdf"
-            output_path = str(output_dir / output_filename)
-            
-            print(f"[DEBUG] PDF输出路径: {output_path}")
+            output_path = acquire_artifact(db, content_hash)
+            if output_path:
+                print(f"[DEBUG] 复用已生成的PDF: {output_path}")
             
             # 检查配置文件是否存在
             config_path = Path(__file__).parent.parent.parent / "reports" / "generators" / "configs" / f"{paper_id}.yaml"
@@ -227,14 +198,21 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
                         print(f"[ERROR] 复制配置文件失败: {str(copy_error)}")
 
             # 再次检查配置文件是否存在
-            if not config_path.exists():
+            if not output_path and not config_path.exists():
                 raise Exception(f"配置文件不存在: {config_path}")
 
-            # 调用报告生成函数
-            print(f"[DEBUG] 调用generate_single_report函数: paper_id={paper_id}")
-            generate_single_report(paper_id, report_data, output_path)
-            
-            print(f"[DEBUG] PDF生成成功: {output_path}")
+            if not output_path:
+                # 先渲染到临时文件，完成后再登记为产物，避免其他任务读到写了一半的PDF
+                render_path = new_render_path(content_hash)
+                print(f"[DEBUG] 调用报告渲染函数: paper_id={paper_id}, 临时路径: {render_path}")
+                try:
+                    render_func(paper_id, report_data, render_path)
+                    output_path, _ = commit_artifact(db, content_hash, render_path)
+                finally:
+                    if os.path.exists(render_path):
+                        os.remove(render_path)
+                print(f"[DEBUG] PDF生成成功: {output_path}")
+                task_store.update(task_id, progress=90)
         except Exception as e:
             print(f"[ERROR] 生成PDF失败: {str(e)}")
             import traceback
@@ -261,7 +239,8 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
                 file_path=output_path,
                 file_name=output_filename,
                 file_size=file_size,
-                status="completed"
+                status="completed",
+                content_hash=content_hash
             )
             db.add(report)
             db.commit()
@@ -270,10 +249,7 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
             
             # 更新任务状态
             print(f"[DEBUG] 更新任务状态为已完成: task_id={task_id}")
-            report_tasks[task_id]["status"] = "completed"
-            report_tasks[task_id]["progress"] = 100
-            report_tasks[task_id]["file_path"] = output_path
-            report_tasks[task_id]["report_id"] = report.id
+            task_store.update(task_id, status="completed", progress=100, file_path=output_path, report_id=report.id)
         except Exception as e:
             print(f"[ERROR] 保存报告记录失败: {str(e)}")
             import traceback
@@ -283,10 +259,11 @@ def generate_report_task(task_id, user_id, paper_id, report_tasks, SessionLocal)
         print(f"[ERROR] 生成报告失败: {str(e)}")
         import traceback
         print(f"[ERROR] 详细错误: {traceback.format_exc()}")
+        if raise_errors:
+            db.rollback()
+            raise
         try:
-            report_tasks[task_id]["status"] = "failed"
-            report_tasks[task_id]["error_message"] = str(e)
-            report_tasks[task_id]["progress"] = 100
+            task_store.update(task_id, status="failed", error_message=str(e), progress=100)
             print(f"[DEBUG] 已更新任务状态为失败: task_id={task_id}")
         except Exception as ex:
             print(f"[ERROR] 更新任务状态失败: {str(ex)}")
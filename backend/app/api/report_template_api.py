@@ -42,20 +42,20 @@ async def preview_report_template(template_data: Dict[str, Any] = Body(...)):
             print(f"使用模板ID {template_id} 获取配置")
             try:
                 # 获取数据库会话
-                from app.main import get_db_session
-                db = next(get_db_session())
+                from app.database import session_scope
+                with session_scope("模板预览") as db:
                 
-                # 获取模板
-                template = report_template_service.get_report_template(db, template_id)
+                    # 获取模板
+                    template = report_template_service.get_report_template(db, template_id)
                 
-                # 解析配置
-                config = json.loads(template.config) if isinstance(template.config, str) else template.config
+                    # 解析配置
+                    config = json.loads(template.config) if isinstance(template.config, str) else template.config
                 
-                # 更新请求数据
-                template_data['config'] = config
-                template_data['yaml_config'] = template.yaml_config or ''
+                    # 更新请求数据
+                    template_data['config'] = config
+                    template_data['yaml_config'] = template.yaml_config or ''
                 
-                print(f"成功从数据库获取模板 {template.name} 的配置")
+                    print(f"成功从数据库获取模板 {template.name} 的配置")
             except Exception as e:
                 print(f"获取模板配置失败: {str(e)}")
         
@@ -0,0 +1,73 @@
+"""
+答题记录写入服务
+
+提交试卷时一次性构造全部答题记录，并以单条 executemany 语句批量写入 answers 表
+（pymysql 会将其改写为多行 INSERT），避免每道题一次数据库往返。
+写入不单独提交，由调用方与试卷状态更新放在同一事务中，失败时整体回滚。
+"""
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+INSERT_ANSWERS_SQL = text(
+    "INSERT INTO answers (user_id, question_id, answer, score, answered_at) "
+    "VALUES (:user_id, :question_id, :answer, :score, :answered_at)"
+)
+
+# 单批写入的最大行数，避免超出 max_allowed_packet
+INSERT_BATCH_SIZE = 500
+
+
+def option_index(ans) -> Optional[int]:
+    """解析提交的答案得到选项下标（支持 ['A']、[0]、'A' 等格式）"""
+    if isinstance(ans, list) and len(ans) > 0:
+        first = ans[0]
+        if isinstance(first, int):
+            return first
+        if isinstance(first, str) and len(first) == 1:
+            return ord(first.upper()) - ord('A')
+    elif isinstance(ans, str) and len(ans) == 1:
+        return ord(ans.upper()) - ord('A')
+    return None
+
+
+def build_answer_rows(user_id: int, answers: Dict[str, Any], question_score_map: Dict[int, Any],
+                      answered_at: datetime) -> List[dict]:
+    """
+    根据提交内容构造答题记录
+
+    Args:
+        answers: {题目ID: 答案}
+        question_score_map: {题目ID: 选项分数列表}
+
+    Returns:
+        可直接用于批量插入的参数列表；题目不存在时分数为 None，无效答案记 0 分
+    """
+    rows = []
+    for qid, ans in answers.items():
+        question_id = int(qid)
+        score = None
+        if question_id in question_score_map:
+            q_scores = question_score_map[question_id] or []
+            idx = option_index(ans)
+            if idx is not None and 0 <= idx < len(q_scores):
+                score = q_scores[idx]
+            else:
+                score = 0
+        rows.append({
+            "user_id": user_id,
+            "question_id": question_id,
+            "answer": json.dumps(ans, ensure_ascii=False),
+            "score": score,
+            "answered_at": answered_at,
+        })
+    return rows
+
+
+def insert_answers(db, rows: List[dict]) -> int:
+    """批量写入答题记录（不提交事务），返回写入行数"""
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.execute(INSERT_ANSWERS_SQL, rows[start:start + INSERT_BATCH_SIZE])
+    return len(rows)
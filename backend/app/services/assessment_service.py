@@ -0,0 +1,188 @@
+"""
+被试者测试流程
+
+同步接口（app.main）和异步接口（app.api.participant_async）共用的组装与提交逻辑。
+这里的函数只接收同步 Session；异步接口通过 AsyncSession.run_sync 调用，
+在异步驱动上执行同样的查询，不占用线程池。
+"""
+from datetime import datetime
+from typing import List, Optional
+
+OPTION_LABELS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+
+
+def _fmt(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+def assignment_item(assignment) -> dict:
+    """我的试卷列表中的一项（assignment.paper 需已加载）"""
+    # 兼容paper为None的情况
+    paper = assignment.paper
+    return {
+        "id": assignment.id,
+        "paper_id": assignment.paper_id,
+        "paper_name": paper.name if paper else None,
+        "paper_description": paper.description if paper else None,
+        "duration": paper.duration if paper else None,
+        "status": assignment.status,
+        "assigned_at": _fmt(assignment.assigned_at),
+        "started_at": _fmt(assignment.started_at),
+        "completed_at": _fmt(assignment.completed_at)
+    }
+
+
+def start_payload(assignment, paper) -> dict:
+    """开始测试返回的试卷内容"""
+    questions = [
+        {
+            "id": q.question_id,
+            "content": q.content,
+            "type": q.type,
+            "options": list(q.options),
+            "scores": list(q.scores),
+            "order_num": q.order_num,
+            "parent_case_id": q.parent_case_id
+        }
+        for q in paper.questions
+    ]
+    return {
+        "assignment_id": assignment.id,
+        "paper_id": paper.paper_id,
+        "paper_name": paper.name,
+        "duration": paper.duration,
+        "questions": questions,
+        "status": assignment.status,
+        "started_at": _fmt(assignment.started_at)
+    }
+
+
+def get_shuffle_layout(db, paper, user_id: int, assignment_id: Optional[int]):
+    """
+    计算被试者在该试卷上的题目和选项顺序（由乱序服务即时推导，不读取已保存的顺序）
+
+    assignment_id 由页面传入，与提交答案时使用的分配相同，两边才能按同一排列还原选项
+    （同一用户在同一试卷上可能有多条分配）。分配不属于 user_id 或不属于该试卷时返回 None；
+    未传入时（如管理员预览）得到试卷级顺序，选项不乱序。
+    """
+    from app.main import PaperAssignment
+    from app.services.shuffle_service import build_layout
+    if assignment_id is not None:
+        owned = db.query(PaperAssignment.id).filter(
+            PaperAssignment.id == assignment_id,
+            PaperAssignment.paper_id == paper.paper_id,
+            PaperAssignment.user_id == user_id
+        ).first()
+        if owned is None:
+            return None
+    return build_layout(paper, assignment_id)
+
+
+def paper_questions(paper, layout) -> List[dict]:
+    """按被试者的题目顺序列出题目"""
+    return [
+        {
+            "id": q.question_id,
+            "content": q.content,
+            "type": q.type,
+            "options": list(q.options),
+            "scores": list(q.scores),
+            "dimension_id": q.dimension_id,
+            "order_num": i + 1,  # 显示顺序
+            "original_order": q.order_num,  # 原始顺序
+            "parent_case_id": q.parent_case_id
+        }
+        for i, q in enumerate(paper.ordered_questions(layout.question_order))
+    ]
+
+
+def paper_questions_with_options(paper, layout) -> List[dict]:
+    """按被试者的题目顺序和选项顺序列出题目"""
+    result = []
+    for i, q in enumerate(paper.ordered_questions(layout.question_order)):
+        # 处理选项顺序
+        original_options = q.options
+        original_scores = q.scores
+        if q.shuffle_options and q.question_id in layout.option_orders:
+            option_order = layout.option_orders[q.question_id]
+            shuffled_options = [original_options[j] for j in option_order]
+            shuffled_scores = [original_scores[j] if j < len(original_scores) else None for j in option_order]
+        else:
+            shuffled_options = original_options
+            shuffled_scores = original_scores
+        # 组装前端需要的格式
+        formatted_options = []
+        for idx, (opt, score) in enumerate(zip(shuffled_options, shuffled_scores)):
+            formatted_options.append({
+                "label": OPTION_LABELS[idx] if idx < len(OPTION_LABELS) else chr(65 + idx),
+                "text": opt,
+                "score": score
+            })
+        result.append({
+            "id": q.question_id,
+            "content": q.content,
+            "type": q.type,
+            "options": formatted_options,
+            "shuffle_options": q.shuffle_options,
+            "dimension_id": q.dimension_id,
+            "order_num": i + 1,  # 显示顺序
+            "original_order": q.order_num,  # 原始顺序
+            "parent_case_id": q.parent_case_id
+        })
+    return result
+
+
+def submit_answers(db, assignment, paper, user_id: int, answers: dict, now: datetime) -> Optional[float]:
+    """
+    保存答题记录、完成试卷分配并写入物化得分，返回总分（调用方负责提交或回滚事务）
+
+    Args:
+        paper: 试卷快照，试卷已删除时为 None（全部按题库分数计算）
+
+    Raises:
+        ValueError: 答案中的题目ID不是整数
+    """
+    from app.main import AssignmentScore, Question
+    from app.services.answer_service import build_answer_rows, insert_answers
+    from app.services.assignment_score_service import materialize_assignment_scores
+    from app.services.shuffle_service import build_layout, restore_answers
+
+    try:
+        question_ids = [int(qid) for qid in answers.keys()]
+    except (TypeError, ValueError):
+        raise ValueError("答案格式错误")
+
+    # 从试卷快照获取题目分数，并把展示给被试者的乱序选项还原为原始选项
+    # （题目接口按登录用户在该试卷上的分配即 assignment 推导顺序，这里使用同一分配）
+    question_score_map = {}
+    if paper is not None:
+        answers = restore_answers(build_layout(paper, assignment.id), answers)
+        question_score_map = {q.question_id: list(q.scores) for q in paper.questions}
+    # 不属于该试卷的题目仍按题库分数计算
+    missing_ids = [qid for qid in question_ids if qid not in question_score_map]
+    if missing_ids:
+        question_score_map.update({
+            qid: scores for qid, scores in db.query(Question.id, Question.scores).filter(Question.id.in_(missing_ids)).all()
+        })
+
+    # 批量写入全部答题记录
+    rows = build_answer_rows(user_id, answers, question_score_map, now)
+    insert_answers(db, rows)
+
+    # 更新状态为已完成
+    assignment.status = "completed"
+    assignment.completed_at = now
+    # 同一事务内写入本次提交的物化得分
+    materialize_assignment_scores(db, [assignment])
+    return db.query(AssignmentScore.score).filter(
+        AssignmentScore.assignment_id == assignment.id,
+        AssignmentScore.dimension_id.is_(None)
+    ).scalar()
+
+
+def record_submitted(total_score: Optional[float]) -> None:
+    """提交成功后更新仪表盘计数器并失效仪表盘缓存（完成数和平均分已变化）"""
+    from app.services.dashboard_stats import dashboard_stats
+    from app.services.response_cache import invalidate_dashboard_cache
+    dashboard_stats.record_submit(total_score)
+    invalidate_dashboard_cache()
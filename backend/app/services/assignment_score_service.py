@@ -0,0 +1,225 @@
+"""
+试卷分配得分物化服务
+
+被试者提交试卷时，在同一事务内把总分和各维度分数写入 assignment_scores 表，
+结果页、仪表盘和报告生成直接按索引读取，不再从 answers 表重复计算。
+
+当算分依据发生变化（题目重新匹配维度、选项分数修改、试卷增删题目、维度调整）时，
+调用 refresh_* 系列函数重算受影响试卷的全部已完成分配。所有写入函数只 flush
+不 commit，由调用方在自己的事务中提交。
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from app.services.score_service import calculate_paper_scores
+
+# 单条 IN 查询允许的最大分配数
+CHUNK_SIZE = 1000
+
+
+def _chunks(items: List, size: int = CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def clear_assignment_scores(db, assignment_ids: Iterable[int]) -> None:
+    """删除指定分配的物化分数"""
+    from app.main import AssignmentScore
+
+    ids = list(dict.fromkeys(assignment_ids))
+    for chunk in _chunks(ids):
+        db.query(AssignmentScore).filter(
+            AssignmentScore.assignment_id.in_(chunk)
+        ).delete(synchronize_session=False)
+
+
+def materialize_assignment_scores(db, assignments: Iterable) -> int:
+    """
+    重新计算并写入若干分配的得分
+
+    Args:
+        assignments: PaperAssignment 对象或 (assignment_id, paper_id, user_id) 元组
+
+    Returns:
+        写入的分配数量
+    """
+    from app.main import AssignmentScore, Dimension
+
+    by_paper = defaultdict(list)
+    for a in assignments:
+        if isinstance(a, tuple):
+            assignment_id, paper_id, user_id = a
+        else:
+            assignment_id, paper_id, user_id = a.id, a.paper_id, a.user_id
+        by_paper[paper_id].append((assignment_id, user_id))
+
+    if not by_paper:
+        return 0
+
+    # 确保同一事务中尚未提交的答题记录对算分查询可见
+    db.flush()
+
+    count = 0
+    for paper_id, items in by_paper.items():
+        scores = calculate_paper_scores(db, paper_id, [user_id for _, user_id in items])
+        dims = db.query(Dimension.id, Dimension.name, Dimension.parent_id).filter(
+            Dimension.paper_id == paper_id
+        ).order_by(Dimension.id).all()
+        big_ids = [d.id for d in dims if d.parent_id is None]
+        sub_ids = defaultdict(list)
+        for d in dims:
+            if d.parent_id is not None:
+                sub_ids[d.parent_id].append(d.id)
+
+        clear_assignment_scores(db, [assignment_id for assignment_id, _ in items])
+
+        rows = []
+        for assignment_id, user_id in items:
+            info = scores[user_id]
+            base = {"assignment_id": assignment_id, "paper_id": paper_id, "user_id": user_id}
+            rows.append(dict(base, dimension_id=None, score=info["total_score"]))
+            # 大维度与其下小维度的顺序与算分结果一致
+            for big_id, big in zip(big_ids, info["big_dimensions"]):
+                rows.append(dict(base, dimension_id=big_id, score=big["score"]))
+                for sub_id, sub in zip(sub_ids.get(big_id, []), big["sub_dimensions"]):
+                    rows.append(dict(base, dimension_id=sub_id, score=sub["score"]))
+        if rows:
+            db.bulk_insert_mappings(AssignmentScore, rows)
+        count += len(items)
+    db.flush()
+    return count
+
+
+def refresh_paper_scores(db, paper_ids: Iterable[int]) -> int:
+    """重算试卷下所有已完成分配的得分"""
+    from app.main import PaperAssignment
+
+    paper_ids = [pid for pid in dict.fromkeys(paper_ids) if pid is not None]
+    if not paper_ids:
+        return 0
+    db.flush()
+    assignments = db.query(
+        PaperAssignment.id, PaperAssignment.paper_id, PaperAssignment.user_id
+    ).filter(
+        PaperAssignment.paper_id.in_(paper_ids),
+        PaperAssignment.status == "completed"
+    ).all()
+    count = materialize_assignment_scores(db, [tuple(a) for a in assignments])
+    if count:
+        # 已完成分配的总分发生变化，仪表盘平均分需要对账
+        from app.services.dashboard_stats import dashboard_stats
+        dashboard_stats.mark_dirty()
+    return count
+
+
+def refresh_scores_for_questions(db, question_ids: Iterable[int]) -> int:
+    """重算包含指定题目的所有试卷的得分"""
+    from app.main import PaperQuestion
+
+    question_ids = list(dict.fromkeys(question_ids))
+    if not question_ids:
+        return 0
+    db.flush()
+    paper_ids = set()
+    for chunk in _chunks(question_ids):
+        paper_ids.update(
+            pid for (pid,) in db.query(PaperQuestion.paper_id).filter(
+                PaperQuestion.question_id.in_(chunk)
+            ).distinct().all()
+        )
+    return refresh_paper_scores(db, paper_ids)
+
+
+def _build_score_info(dims, score_map: Dict[Optional[int], float]) -> dict:
+    """根据维度结构和物化分数组装与算分服务相同格式的结果"""
+    big_dims = [d for d in dims if d.parent_id is None]
+    subs = defaultdict(list)
+    for d in dims:
+        if d.parent_id is not None:
+            subs[d.parent_id].append(d)
+
+    big_detail = [
+        {
+            "name": big.name,
+            "score": score_map.get(big.id, 0.0),
+            "sub_dimensions": [
+                {"name": sub.name, "score": score_map.get(sub.id, 0.0)} for sub in subs.get(big.id, [])
+            ]
+        }
+        for big in big_dims
+    ]
+    return {"total_score": score_map.get(None, 0), "big_dimensions": big_detail}
+
+
+def load_assignment_scores(db, assignment_ids: Iterable[int], compute_missing: bool = True) -> Dict[int, dict]:
+    """
+    读取分配的物化得分
+
+    尚未物化的分配（例如历史数据未回填）在 compute_missing 为 True 时即时计算，但不写入。
+
+    Returns:
+        {assignment_id: {"total_score": ..., "big_dimensions": [...]}}
+    """
+    from app.main import AssignmentScore, Dimension, PaperAssignment
+
+    ids = list(dict.fromkeys(assignment_ids))
+    if not ids:
+        return {}
+
+    score_rows = []
+    for chunk in _chunks(ids):
+        score_rows.extend(db.query(
+            AssignmentScore.assignment_id, AssignmentScore.paper_id,
+            AssignmentScore.dimension_id, AssignmentScore.score
+        ).filter(AssignmentScore.assignment_id.in_(chunk)).all())
+
+    score_maps = defaultdict(dict)
+    paper_of = {}
+    for assignment_id, paper_id, dimension_id, score in score_rows:
+        score_maps[assignment_id][dimension_id] = score
+        paper_of[assignment_id] = paper_id
+
+    missing = [aid for aid in ids if aid not in score_maps]
+    computed = {}
+    if missing and compute_missing:
+        missing_assignments = []
+        for chunk in _chunks(missing):
+            missing_assignments.extend(db.query(
+                PaperAssignment.id, PaperAssignment.paper_id, PaperAssignment.user_id
+            ).filter(PaperAssignment.id.in_(chunk)).all())
+        by_paper = defaultdict(list)
+        for assignment_id, paper_id, user_id in missing_assignments:
+            by_paper[paper_id].append((assignment_id, user_id))
+        for paper_id, items in by_paper.items():
+            scores = calculate_paper_scores(db, paper_id, [user_id for _, user_id in items])
+            for assignment_id, user_id in items:
+                computed[assignment_id] = scores[user_id]
+
+    paper_ids = set(paper_of.values())
+    dims_by_paper = defaultdict(list)
+    if paper_ids:
+        for d in db.query(Dimension.id, Dimension.name, Dimension.parent_id, Dimension.paper_id).filter(
+            Dimension.paper_id.in_(list(paper_ids))
+        ).order_by(Dimension.id).all():
+            dims_by_paper[d.paper_id].append(d)
+
+    result = {}
+    for aid in ids:
+        if aid in score_maps:
+            result[aid] = _build_score_info(dims_by_paper.get(paper_of[aid], []), score_maps[aid])
+        elif aid in computed:
+            result[aid] = computed[aid]
+    return result
+
+
+def load_paper_scores(db, paper_id: int) -> Dict[int, dict]:
+    """读取试卷下所有已完成分配的得分，返回 {assignment_id: 分数信息}"""
+    from app.main import PaperAssignment
+
+    assignment_ids = [
+        aid for (aid,) in db.query(PaperAssignment.id).filter(
+            PaperAssignment.paper_id == paper_id,
+            PaperAssignment.status == "completed"
+        ).all()
+    ]
+    return load_assignment_scores(db, assignment_ids)
@@ -0,0 +1,232 @@
+"""
+当前登录用户的识别与缓存
+
+受保护接口原来各自复制一段 jwt.decode 校验，再按用户名查询一次 users 表，每个请求都多一次
+数据库往返。这里统一为 FastAPI 依赖：
+- get_current_user: 校验 Token 并返回当前用户（Principal，用户信息的只读快照）
+- get_current_admin: 在此基础上要求管理员角色
+- 用户信息按用户名（Token 的 sub）缓存在进程内，有效期短（默认 60 秒）且条数有上限；
+  修改资料、密码、角色、启用状态或删除用户后调用 invalidate_principal 立即失效。
+  多进程部署时其他进程的缓存最多滞后一个 TTL
+- 需要修改用户记录的接口请按 Principal.id 重新加载 ORM 对象，不要修改缓存的快照
+- 报告打包下载由浏览器直接请求（无法携带 Authorization 头），改用 create_download_token
+  签发的短期下载 Token，只能下载签发时指定的报告，不能当作登录 Token 使用
+
+相关环境变量：
+- AUTH_CACHE_TTL: 用户信息缓存有效期（秒），默认 60，设为 0 关闭缓存
+- AUTH_CACHE_SIZE: 最多缓存的用户数，默认 10000
+- REPORT_DOWNLOAD_TOKEN_TTL: 报告下载 Token 有效期（秒），默认 600
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
+
+# 报告下载 Token 的用途标记，登录 Token 没有这个字段
+DOWNLOAD_TOKEN_SCOPE = "report-archive"
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+@dataclass(frozen=True)
+class Principal:
+    """当前用户信息的只读快照"""
+    id: int
+    username: str
+    role: str
+    real_name: Optional[str] = None
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    gender: Optional[str] = None
+    age: Optional[int] = None
+    position: Optional[str] = None
+    is_active: bool = True
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            role=user.role,
+            real_name=user.real_name,
+            email=user.email,
+            phone=user.phone,
+            gender=user.gender,
+            age=user.age,
+            position=user.position,
+            is_active=bool(user.is_active),
+        )
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == "admin"
+
+
+class PrincipalCache:
+    """按用户名缓存用户信息，带 TTL 和条数上限（LRU 淘汰）"""
+
+    def __init__(self, ttl: Optional[int] = None, max_size: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else _get_int_env("AUTH_CACHE_TTL", 60)
+        self.max_size = max_size or _get_int_env("AUTH_CACHE_SIZE", 10000)
+        self._entries: "OrderedDict[str, Tuple[float, Principal]]" = OrderedDict()
+        # 用户名和全局的版本号，失效时递增，丢弃失效期间正在加载的结果
+        self._versions: Dict[str, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, username: str) -> Tuple[Optional[Principal], Tuple[int, int]]:
+        """
+        读取缓存
+
+        Returns:
+            (缓存的用户信息或 None, 版本号)；未命中时加载完成后把版本号传给 store
+        """
+        now = time.time()
+        with self._lock:
+            stamp = (self._epoch, self._versions.get(username, 0))
+            entry = self._entries.get(username)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(username)
+                    self.hits += 1
+                    return entry[1], stamp
+                del self._entries[username]
+            self.misses += 1
+            return None, stamp
+
+    def store(self, username: str, principal: Principal, stamp: Tuple[int, int]) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if stamp != (self._epoch, self._versions.get(username, 0)):
+                return
+            self._entries[username] = (time.time() + self.ttl, principal)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, username: str, loader: Callable[[], Optional[Principal]]) -> Optional[Principal]:
+        """读取缓存，未命中时调用 loader 加载（用户不存在时不缓存）"""
+        principal, stamp = self.lookup(username)
+        if principal is None:
+            principal = loader()
+            if principal is not None:
+                self.store(username, principal, stamp)
+        return principal
+
+    def invalidate(self, *usernames: Optional[str]) -> None:
+        with self._lock:
+            for username in usernames:
+                if username:
+                    self._versions[username] = self._versions.get(username, 0) + 1
+                    self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        return {"size": size, "max_size": self.max_size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_principal(*usernames: Optional[str]) -> None:
+    """用户资料、密码、角色、启用状态变化或用户被删除后调用"""
+    principal_cache.invalidate(*usernames)
+
+
+def decode_token(token: str) -> dict:
+    """校验 Token 并返回其内容，Token 无效时抛出 401"""
+    from app.main import ALGORITHM, SECRET_KEY
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Token校验失败")
+    if payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="无效Token")
+    return payload
+
+
+def load_principal(db: Session, username: str) -> Optional[Principal]:
+    """按用户名获取用户信息（优先读缓存）"""
+    from app.main import User
+
+    def _load():
+        user = db.query(User).filter(User.username == username).first()
+        return Principal.from_user(user) if user is not None else None
+
+    return principal_cache.get_or_load(username, _load)
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """FastAPI 依赖：当前登录用户"""
+    principal = load_principal(db, decode_token(token)["sub"])
+    if principal is None:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return principal
+
+
+def get_current_admin(principal: Principal = Depends(get_current_user)) -> Principal:
+    """FastAPI 依赖：当前登录的管理员"""
+    if not principal.is_admin:
+        raise HTTPException(status_code=403, detail="无权限")
+    return principal
+
+
+def _report_id_list(report_ids: Iterable[int]) -> str:
+    return ",".join(str(rid) for rid in sorted(set(report_ids)))
+
+
+def create_download_token(username: str, report_ids: Iterable[int]) -> str:
+    """签发报告打包下载的短期 Token，绑定下载人和报告ID"""
+    from app.main import ALGORITHM, SECRET_KEY
+    ttl = _get_int_env("REPORT_DOWNLOAD_TOKEN_TTL", 600)
+    payload = {
+        # 不使用 sub 字段，decode_token 不会把下载 Token 当作登录 Token
+        "scope": DOWNLOAD_TOKEN_SCOPE,
+        "user": username,
+        "ids": _report_id_list(report_ids),
+        "exp": datetime.utcnow() + timedelta(seconds=ttl),
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_download_token(token: str, report_ids: Iterable[int]) -> str:
+    """校验报告下载 Token 与请求的报告ID一致，返回下载人用户名"""
+    from app.main import ALGORITHM, SECRET_KEY
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="下载链接已过期，请重新发起下载")
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="下载Token校验失败")
+    if payload.get("scope") != DOWNLOAD_TOKEN_SCOPE:
+        raise HTTPException(status_code=401, detail="无效的下载Token")
+    if payload.get("ids") != _report_id_list(report_ids):
+        raise HTTPException(status_code=403, detail="下载Token与请求的报告不一致")
+    return payload.get("user")
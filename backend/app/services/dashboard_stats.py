@@ -0,0 +1,152 @@
+"""
+仪表盘统计计数器
+
+仪表盘首页是管理端访问最频繁的接口，原实现每次请求执行四次全表 COUNT，平均分为写死的 78.5。
+这里在进程内维护一组计数器：
+- 被试者数、题目数、试卷数、已完成分配数
+- 已完成分配总分之和与计数（来自 assignment_scores 中的总分行），用于计算真实平均分
+
+新增/删除/交卷等接口在提交事务后增量更新计数器，读取为 O(1)。批量删除、重做、
+重算得分等难以精确增量的操作只标记为脏，下次读取时与数据库对账；后台线程定期对账，
+修正多进程部署和并发写入带来的偏差（最终一致）。
+
+相关环境变量：
+- DASHBOARD_STATS_RECONCILE_INTERVAL: 后台对账间隔（秒），默认 60
+"""
+import os
+import threading
+import time
+from typing import Optional
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class DashboardStats:
+    """仪表盘计数器"""
+
+    FIELDS = ("total_participants", "total_questions", "total_papers", "completed_reports",
+              "score_sum", "score_count")
+
+    def __init__(self, reconcile_interval: Optional[int] = None):
+        self.reconcile_interval = reconcile_interval if reconcile_interval is not None else \
+            _get_int_env("DASHBOARD_STATS_RECONCILE_INTERVAL", 60)
+        self._lock = threading.Lock()
+        self._values = dict.fromkeys(self.FIELDS, 0)
+        self._loaded = False
+        self._dirty = False
+        self.last_reconciled_at = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- 增量更新 ----------
+
+    def adjust(self, **deltas) -> None:
+        """增量调整计数器，尚未从数据库加载时忽略（加载时会得到最新值）"""
+        with self._lock:
+            if not self._loaded:
+                return
+            for name, delta in deltas.items():
+                self._values[name] += delta
+
+    def record_submit(self, total_score: Optional[float]) -> None:
+        """记录一次交卷"""
+        if total_score is None:
+            self.adjust(completed_reports=1)
+        else:
+            self.adjust(completed_reports=1, score_sum=float(total_score), score_count=1)
+
+    def mark_dirty(self) -> None:
+        """标记计数器需要在下次读取时与数据库对账"""
+        with self._lock:
+            self._dirty = True
+
+    # ---------- 读取与对账 ----------
+
+    def snapshot(self, db) -> dict:
+        """返回仪表盘统计数据，必要时先与数据库对账"""
+        with self._lock:
+            need_reconcile = not self._loaded or self._dirty
+        if need_reconcile:
+            self.reconcile(db)
+        with self._lock:
+            values = dict(self._values)
+        count = values.pop("score_count")
+        score_sum = values.pop("score_sum")
+        values["avg_score"] = round(score_sum / count, 2) if count else 0
+        return values
+
+    def reconcile(self, db) -> dict:
+        """从数据库重新统计全部计数器"""
+        with self._lock:
+            self._dirty = False
+        values = self._query(db)
+        with self._lock:
+            self._values = values
+            self._loaded = True
+            self.last_reconciled_at = time.time()
+        return dict(values)
+
+    @staticmethod
+    def _query(db) -> dict:
+        """一次查询得到全部计数"""
+        from sqlalchemy import func, select
+        from app.main import AssignmentScore, Paper, PaperAssignment, Question, User, UserRole
+
+        completed_scores = select(AssignmentScore.score).join(
+            PaperAssignment, PaperAssignment.id == AssignmentScore.assignment_id
+        ).where(
+            AssignmentScore.dimension_id.is_(None),
+            PaperAssignment.status == "completed"
+        ).subquery()
+
+        row = db.execute(select(
+            select(func.count(User.id)).where(User.role == UserRole.participant).scalar_subquery(),
+            select(func.count(Question.id)).scalar_subquery(),
+            select(func.count(Paper.id)).scalar_subquery(),
+            select(func.count(PaperAssignment.id)).where(PaperAssignment.status == "completed").scalar_subquery(),
+            select(func.coalesce(func.sum(completed_scores.c.score), 0)).scalar_subquery(),
+            select(func.count(completed_scores.c.score)).scalar_subquery(),
+        )).one()
+        return {
+            "total_participants": int(row[0] or 0),
+            "total_questions": int(row[1] or 0),
+            "total_papers": int(row[2] or 0),
+            "completed_reports": int(row[3] or 0),
+            "score_sum": float(row[4] or 0),
+            "score_count": int(row[5] or 0),
+        }
+
+    # ---------- 后台对账线程 ----------
+
+    def start_reconciler(self, session_factory) -> None:
+        """启动后台定期对账线程（重复调用无副作用）"""
+        if self.reconcile_interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+
+        def _run():
+            while not self._stop_event.wait(self.reconcile_interval):
+                db = session_factory()
+                try:
+                    self.reconcile(db)
+                except Exception as e:
+                    print(f"仪表盘统计对账失败: {e}")
+                finally:
+                    db.close()
+
+        self._thread = threading.Thread(target=_run, name="dashboard-stats-reconciler", daemon=True)
+        self._thread.start()
+
+    def stop_reconciler(self) -> None:
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+dashboard_stats = DashboardStats()
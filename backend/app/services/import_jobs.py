@@ -0,0 +1,144 @@
+"""
+后台导入任务
+
+大文件导入（被试者名单、题库）耗时较长，放在请求线程里执行会一直占用线程，浏览器也可能超时。
+这里提供一个进程内的后台任务登记表：
+- 接口提交任务后立即返回任务ID，前端轮询任务状态（进度、成功/失败数、结果）
+- 任务在独立的线程池中执行（默认 1 个线程，导入之间互不抢占数据库和 CPU）
+- 已结束的任务保留一段时间后清理；任务状态只保存在当前进程，服务重启后丢失
+
+相关环境变量：
+- IMPORT_JOB_WORKERS: 同时执行的导入任务数，默认 1
+- IMPORT_JOB_RETENTION: 已结束任务的保留秒数，默认 3600
+"""
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ImportJob:
+    """一个导入任务的状态"""
+
+    def __init__(self, kind: str, total: int):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = JOB_PENDING
+        self.total = total
+        self.processed = 0
+        self.message: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def progress(self, processed: int, message: Optional[str] = None) -> None:
+        """更新已处理的行数"""
+        with self._lock:
+            self.processed = min(processed, self.total) if self.total else processed
+            if message is not None:
+                self.message = message
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "total": self.total,
+                "processed": self.processed,
+                "progress": round(self.processed * 100 / self.total) if self.total else (100 if self.finished else 0),
+                "message": self.message,
+                "result": self.result,
+            }
+
+
+class ImportJobRegistry:
+    """进程内的导入任务登记表"""
+
+    def __init__(self, workers: Optional[int] = None, retention: Optional[int] = None, max_jobs: int = 200):
+        self.workers = workers or _get_int_env("IMPORT_JOB_WORKERS", 1)
+        self.retention = retention if retention is not None else _get_int_env("IMPORT_JOB_RETENTION", 3600)
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, kind: str, total: int, runner: Callable[[ImportJob], dict]) -> ImportJob:
+        """
+        提交导入任务
+
+        Args:
+            runner: 执行导入，返回结果字典；通过 job.progress 报告进度
+        """
+        job = ImportJob(kind, total)
+        with self._lock:
+            self._evict()
+            self._jobs[job.job_id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import-job")
+            executor = self._executor
+        executor.submit(self._run, job, runner)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: ImportJob, runner: Callable[[ImportJob], dict]) -> None:
+        with job._lock:
+            job.status = JOB_RUNNING
+        try:
+            result = runner(job)
+        except Exception as e:
+            traceback.print_exc()
+            with job._lock:
+                job.status = JOB_FAILED
+                job.message = f"导入失败: {e}"
+                job.finished_at = time.time()
+            return
+        with job._lock:
+            job.result = result
+            job.processed = job.total
+            job.message = (result or {}).get("msg")
+            job.status = JOB_COMPLETED
+            job.finished_at = time.time()
+
+    def _evict(self) -> None:
+        """清理超过保留时间的已结束任务，任务数超出上限时先清理最早结束的"""
+        now = time.time()
+        for job_id in [jid for jid, job in self._jobs.items()
+                       if job.finished_at is not None and now - job.finished_at > self.retention]:
+            del self._jobs[job_id]
+        finished = [jid for jid, job in self._jobs.items() if job.finished_at is not None]
+        while len(self._jobs) >= self.max_jobs and finished:
+            del self._jobs[finished.pop(0)]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+import_jobs = ImportJobRegistry()
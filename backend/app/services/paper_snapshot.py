@@ -0,0 +1,226 @@
+"""
+试卷快照缓存
+
+开考时大量被试者在同一分钟内打开同一份试卷，每次都重新查询并组装相同的题目列表。
+这里把试卷的题目、选项、分数、维度归属和顺序构建为只读快照缓存在进程内：
+- 每份试卷只在首次访问时查询数据库构建一次（同一试卷并发构建时只有一个线程查询）
+- 试卷、题目、维度匹配等被修改时主动失效
+- 缓存按 LRU 淘汰，并设置 TTL，多进程部署时其他进程的快照最多在 TTL 内过期
+
+乱序等与被试者相关的处理在快照之上进行，快照本身不可修改。
+
+相关环境变量：
+- PAPER_SNAPSHOT_CACHE_SIZE: 最多缓存的试卷数，默认 64
+- PAPER_SNAPSHOT_TTL: 快照有效期（秒），默认 300
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class QuestionEntry(NamedTuple):
+    """快照中的单道题目"""
+    question_id: int
+    content: str
+    type: str
+    options: tuple
+    scores: tuple
+    shuffle_options: bool
+    dimension_id: Optional[int]
+    order_num: int
+    parent_case_id: Optional[int]
+
+
+class PaperSnapshot(NamedTuple):
+    """试卷只读快照，questions 按原始题目顺序排列"""
+    paper_id: int
+    version: int
+    name: str
+    description: Optional[str]
+    duration: int
+    status: str
+    is_shuffled: bool
+    shuffled_order: Tuple[int, ...]
+    questions: Tuple[QuestionEntry, ...]
+    question_map: MappingProxyType
+    built_at: float
+
+    def ordered_questions(self, question_order: Optional[Iterable[int]] = None) -> list:
+        """按给定题目ID顺序返回题目，未给定时使用原始顺序"""
+        if not question_order:
+            return list(self.questions)
+        return [self.question_map[qid] for qid in question_order if qid in self.question_map]
+
+
+def _freeze(value):
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class PaperSnapshotCache:
+    """带 LRU 和 TTL 的试卷快照缓存"""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[int] = None):
+        self.max_size = max_size or _get_int_env("PAPER_SNAPSHOT_CACHE_SIZE", 64)
+        self.ttl = ttl if ttl is not None else _get_int_env("PAPER_SNAPSHOT_TTL", 300)
+        self._snapshots: "OrderedDict[int, PaperSnapshot]" = OrderedDict()
+        self._versions: Dict[int, int] = {}
+        # 按题目失效时递增，用于丢弃失效期间正在构建的快照
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self._build_locks: Dict[int, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _get_cached(self, paper_id: int) -> Optional[PaperSnapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(paper_id)
+            if snapshot is None:
+                return None
+            if snapshot.version != self._versions.get(paper_id, 0) or \
+                    (self.ttl > 0 and time.time() - snapshot.built_at > self.ttl):
+                del self._snapshots[paper_id]
+                return None
+            self._snapshots.move_to_end(paper_id)
+            return snapshot
+
+    def peek(self, paper_id: int) -> Optional[PaperSnapshot]:
+        """只读取缓存，未缓存时返回 None（不查询数据库，供异步接口在事件循环中调用）"""
+        snapshot = self._get_cached(paper_id)
+        if snapshot is not None:
+            self.hits += 1
+        return snapshot
+
+    def get(self, db, paper_id: int) -> Optional[PaperSnapshot]:
+        """获取试卷快照，试卷不存在时返回 None"""
+        snapshot = self._get_cached(paper_id)
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(paper_id, threading.Lock())
+        with build_lock:
+            # 等待期间其他线程可能已经构建完成
+            snapshot = self._get_cached(paper_id)
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+            self.misses += 1
+            with self._lock:
+                version = self._versions.get(paper_id, 0)
+                epoch = self._epoch
+            snapshot = self._build(db, paper_id, version)
+            if snapshot is None:
+                return None
+            with self._lock:
+                # 构建期间发生失效则不缓存本次结果
+                if version == self._versions.get(paper_id, 0) and epoch == self._epoch:
+                    self._snapshots[paper_id] = snapshot
+                    self._snapshots.move_to_end(paper_id)
+                    while len(self._snapshots) > self.max_size:
+                        self._snapshots.popitem(last=False)
+            return snapshot
+
+    def invalidate(self, paper_id: int) -> None:
+        with self._lock:
+            self._versions[paper_id] = self._versions.get(paper_id, 0) + 1
+            self._snapshots.pop(paper_id, None)
+
+    def invalidate_questions(self, question_ids: Iterable[int]) -> None:
+        """失效包含指定题目的所有快照"""
+        ids = set(question_ids)
+        if not ids:
+            return
+        with self._lock:
+            self._epoch += 1
+            paper_ids = [
+                pid for pid, snapshot in self._snapshots.items()
+                if any(qid in snapshot.question_map for qid in ids)
+            ]
+        for pid in paper_ids:
+            self.invalidate(pid)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            for pid in list(self._snapshots.keys()):
+                self._versions[pid] = self._versions.get(pid, 0) + 1
+            self._snapshots.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._snapshots)
+        return {"size": size, "max_size": self.max_size, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _build(db, paper_id: int, version: int) -> Optional[PaperSnapshot]:
+        from app.main import Paper, PaperQuestion, Question
+
+        paper = db.query(Paper).filter(Paper.id == paper_id).first()
+        if not paper:
+            return None
+
+        rows = db.query(PaperQuestion, Question).join(
+            Question, Question.id == PaperQuestion.question_id
+        ).filter(PaperQuestion.paper_id == paper_id).order_by(PaperQuestion.order_num, PaperQuestion.id).all()
+
+        questions = tuple(
+            QuestionEntry(
+                question_id=question.id,
+                content=question.content,
+                type=question.type,
+                options=_freeze(question.options or []),
+                scores=_freeze(question.scores or []),
+                shuffle_options=bool(question.shuffle_options),
+                dimension_id=pq.dimension_id,
+                order_num=pq.order_num,
+                parent_case_id=question.parent_case_id,
+            )
+            for pq, question in rows
+        )
+        # 题目乱序设置在每条试卷题目上保存同一份，取第一条
+        first_pq = rows[0][0] if rows else None
+        is_shuffled = bool(first_pq.is_shuffled) if first_pq else False
+        shuffled_order = tuple(first_pq.shuffled_order or []) if first_pq and is_shuffled else ()
+
+        return PaperSnapshot(
+            paper_id=paper.id,
+            version=version,
+            name=paper.name,
+            description=paper.description,
+            duration=paper.duration,
+            status=paper.status,
+            is_shuffled=is_shuffled,
+            shuffled_order=shuffled_order,
+            questions=questions,
+            question_map=MappingProxyType({q.question_id: q for q in questions}),
+            built_at=time.time(),
+        )
+
+
+paper_snapshot_cache = PaperSnapshotCache()
+
+
+def get_paper_snapshot(db, paper_id: int) -> Optional[PaperSnapshot]:
+    return paper_snapshot_cache.get(db, paper_id)
+
+
+def invalidate_paper_snapshot(*paper_ids: int) -> None:
+    for paper_id in paper_ids:
+        paper_snapshot_cache.invalidate(int(paper_id))
+
+
+def invalidate_question_snapshots(question_ids: Iterable[int]) -> None:
+    paper_snapshot_cache.invalidate_questions(question_ids)
@@ -0,0 +1,271 @@
+"""
+被试者名单批量导入
+
+原来逐行处理 Excel：每行一次 SELECT 检查用户名、串行计算 bcrypt 哈希（每个约 0.1~0.3 秒），
+最后一次性提交；导入 5000 人需要十几分钟，期间一直占用请求线程，中途出错全部回滚。这里改为：
+1. 解析并校验所有行，文件内重复的用户名只保留第一次出现
+2. 按块用一条 IN 查询检查用户名是否已存在
+3. 密码哈希在进程池中并行计算（进程数默认等于 CPU 核数）
+4. 每块一次批量 INSERT、一个事务；某块因并发写入等原因插入失败时，逐行重试该块并记录失败行，
+   不影响其他块
+5. 每处理完一块报告一次进度，返回成功数和逐行的失败原因
+
+行数超过阈值的文件由接口放到后台任务执行（见 import_jobs），前端轮询进度。
+
+相关环境变量：
+- PARTICIPANT_IMPORT_HASH_WORKERS: 计算密码哈希的进程数，默认等于 CPU 核数
+- PARTICIPANT_IMPORT_CHUNK: 每块（一次批量插入、一个事务）的行数，默认 500
+- PARTICIPANT_IMPORT_SYNC_ROWS: 不超过该行数的文件在请求内直接导入，超过时转为后台任务，默认 200
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from passlib.context import CryptContext
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+REQUIRED_COLUMNS = ["username", "password", "real_name"]
+LOOKUP_CHUNK = 1000
+
+# 与 app.main.pwd_context 配置一致；在子进程中使用，不导入 app.main
+_pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def sync_row_limit() -> int:
+    """请求内直接导入的最大行数"""
+    return _get_int_env("PARTICIPANT_IMPORT_SYNC_ROWS", 200)
+
+
+class ParticipantRow(NamedTuple):
+    line: int  # Excel 中的行号（含表头，从 2 开始）
+    username: str
+    password: str
+    real_name: str
+    email: Optional[str]
+    phone: Optional[str]
+    is_active: bool
+
+
+def _is_missing(value) -> bool:
+    if value is None:
+        return True
+    try:
+        return bool(value != value)  # NaN
+    except (TypeError, ValueError):
+        return False
+
+
+def _cell(row: dict, key: str) -> Optional[str]:
+    value = row.get(key)
+    if _is_missing(value):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # 含空单元格的数字列（如手机号）会被读成浮点数
+    text = str(value).strip()
+    return text or None
+
+
+def _parse_bool(value, default: bool = True) -> bool:
+    if _is_missing(value):
+        return default
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if not text:
+            return default
+        return text in ("true", "1", "是", "yes", "y")
+    return bool(value)
+
+
+def parse_rows(records: Iterable[dict], first_line: int = 2) -> Tuple[List[ParticipantRow], List[Tuple[int, str]]]:
+    """
+    校验名单中的每一行
+
+    Args:
+        records: 每行一个字典（列名 → 单元格值）
+
+    Returns:
+        (有效行, [(行号, 错误信息)])
+    """
+    rows: List[ParticipantRow] = []
+    errors: List[Tuple[int, str]] = []
+    seen: Dict[str, int] = {}
+    for offset, record in enumerate(records):
+        line = first_line + offset
+        username = _cell(record, "username")
+        password = _cell(record, "password")
+        real_name = _cell(record, "real_name")
+        if not username or not password or not real_name:
+            errors.append((line, f"第{line}行: 用户名、密码、真实姓名不能为空"))
+            continue
+        if username in seen:
+            errors.append((line, f"第{line}行: 用户名 '{username}' 与第{seen[username]}行重复"))
+            continue
+        seen[username] = line
+        rows.append(ParticipantRow(
+            line, username, password, real_name, _cell(record, "email"), _cell(record, "phone"),
+            _parse_bool(record.get("is_active"), True)
+        ))
+    return rows, errors
+
+
+def _hash_passwords(passwords: Sequence[str]) -> List[str]:
+    """在子进程中计算一组密码的哈希"""
+    return [_pwd_context.hash(p) for p in passwords]
+
+
+class PasswordHasher:
+    """并行计算密码哈希；进程池不可用时在当前线程计算"""
+
+    def __init__(self, workers: Optional[int] = None):
+        self.workers = max(1, workers or _get_int_env("PARTICIPANT_IMPORT_HASH_WORKERS", 0) or os.cpu_count() or 1)
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "PasswordHasher":
+        if self.workers > 1:
+            try:
+                # spawn 启动的子进程不继承服务进程的线程和数据库连接
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            except (OSError, ValueError) as e:
+                print(f"[被试者导入] 无法创建进程池，改为串行计算密码哈希: {e}")
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def hash_many(self, passwords: Sequence[str]) -> List[str]:
+        if self._pool is None or len(passwords) < 2:
+            return _hash_passwords(passwords)
+        # 按进程数切分，每个进程处理连续的一段，减少进程间传输次数
+        size = -(-len(passwords) // self.workers)
+        parts = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+        try:
+            return [h for part in self._pool.map(_hash_passwords, parts) for h in part]
+        except BrokenProcessPool:
+            print("[被试者导入] 进程池异常退出，改为串行计算密码哈希")
+            self._pool = None
+            return _hash_passwords(passwords)
+
+
+def find_existing_usernames(db, usernames: Sequence[str], chunk_size: int = LOOKUP_CHUNK) -> set:
+    """按块查询已存在的用户名"""
+    from app.main import User
+    existing = set()
+    for i in range(0, len(usernames), chunk_size):
+        chunk = list(usernames[i:i + chunk_size])
+        existing.update(name for (name,) in db.query(User.username).filter(User.username.in_(chunk)).all())
+    return existing
+
+
+def _integrity_error_message(db, line: int, row: dict, error: IntegrityError) -> str:
+    """逐行写入失败的原因：用户名已被占用时提示已存在，其他约束（如必填字段为空）报告数据库的错误信息"""
+    from app.main import User
+    if db.query(User.id).filter(User.username == row["username"]).first() is not None:
+        return f"第{line}行: 用户名 '{row['username']}' 已存在"
+    return f"第{line}行: 写入失败（{error.orig}）"
+
+
+def _insert_chunk(session_factory, values: List[dict], lines: List[int]) -> Tuple[int, List[Tuple[int, str]]]:
+    """批量插入一块；失败时逐行重试，返回 (成功数, 失败行)"""
+    from app.main import User
+    db = session_factory()
+    try:
+        try:
+            db.execute(insert(User), values)
+            db.commit()
+            return len(values), []
+        except IntegrityError:
+            db.rollback()
+        # 逐行重试，找出冲突的行（例如导入期间其他请求创建了同名用户）
+        inserted, errors = 0, []
+        for line, row in zip(lines, values):
+            try:
+                with db.begin_nested():
+                    db.execute(insert(User), [row])
+                inserted += 1
+            except IntegrityError as e:
+                errors.append((line, _integrity_error_message(db, line, row, e)))
+        db.commit()
+        return inserted, errors
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def import_participants(rows: Sequence[ParticipantRow], errors: Sequence[Tuple[int, str]], session_factory=None,
+                        progress: Optional[Callable[[int], None]] = None, chunk_size: Optional[int] = None,
+                        hash_workers: Optional[int] = None) -> dict:
+    """
+    导入校验通过的被试者
+
+    Args:
+        rows, errors: parse_rows 的结果
+        progress: 每处理完一块调用一次，参数为已处理的行数（含校验失败的行）
+
+    Returns:
+        {"msg", "success_count", "error_count", "errors"}，errors 按行号排序
+    """
+    from app.database import SessionLocal, session_scope
+    from app.main import UserRole
+
+    session_factory = session_factory or SessionLocal
+    chunk_size = chunk_size or _get_int_env("PARTICIPANT_IMPORT_CHUNK", 500)
+    failures = list(errors)
+    processed = len(failures)
+
+    with session_scope("被试者导入-查重", session_factory=session_factory) as db:
+        existing = find_existing_usernames(db, [r.username for r in rows])
+    pending = []
+    for row in rows:
+        if row.username in existing:
+            failures.append((row.line, f"第{row.line}行: 用户名 '{row.username}' 已存在"))
+            processed += 1
+        else:
+            pending.append(row)
+    if progress:
+        progress(processed)
+
+    success_count = 0
+    with PasswordHasher(hash_workers) as hasher:
+        for i in range(0, len(pending), chunk_size):
+            chunk = pending[i:i + chunk_size]
+            hashes = hasher.hash_many([r.password for r in chunk])
+            now = datetime.utcnow()
+            values = [
+                {"username": r.username, "password_hash": h, "real_name": r.real_name, "email": r.email,
+                 "phone": r.phone, "role": UserRole.participant, "is_active": r.is_active,
+                 "created_at": now, "updated_at": now}
+                for r, h in zip(chunk, hashes)
+            ]
+            inserted, chunk_errors = _insert_chunk(session_factory, values, [r.line for r in chunk])
+            success_count += inserted
+            failures.extend(chunk_errors)
+            processed += len(chunk)
+            if progress:
+                progress(processed)
+
+    if success_count:
+        from app.services.dashboard_stats import dashboard_stats
+        dashboard_stats.adjust(total_participants=success_count)
+    failures.sort(key=lambda item: item[0])
+    return {
+        "msg": f"成功导入 {success_count} 个被试者",
+        "success_count": success_count,
+        "error_count": len(failures),
+        "errors": [message for _, message in failures],
+    }
@@ -0,0 +1,251 @@
+"""
+题库批量导入
+
+原来的导入确认接口逐题 db.add + db.flush() 取ID（每题一次数据库往返），写入试卷时再逐条添加
+PaperQuestion；Excel 预览用 df.iterrows() 逐行、逐单元格跑正则；上传文件整个读入内存再解析。
+迁移上万题的旧题库要很久，经过反向代理时会超时。这里改为：
+1. 解析：Excel 按列整体处理（去空白、去选项前缀、类型/乱序标记），直接从上传的临时文件读取，
+   不再复制一份到内存；Word 同样直接读临时文件
+2. 写入：按块（默认 500 题）一条多行 INSERT 并取回ID，每块一个事务；
+   支持 RETURNING 的数据库（SQLite、PostgreSQL、MariaDB）用 INSERT ... RETURNING，
+   MySQL 用多行 INSERT 的 LAST_INSERT_ID() 推算ID并校验，校验不通过时该块改为逐题插入
+3. 写入试卷时 order_num 在导入开始时一次算好，PaperQuestion 随同一块题目批量插入
+4. 题目数超过阈值时由接口放到后台任务执行（见 import_jobs），每处理完一块报告一次进度
+5. 每块提交后更新题目相似度索引（见 question_similarity）
+
+相关环境变量：
+- QUESTION_IMPORT_CHUNK: 每块（一次批量插入、一个事务）的题目数，默认 500
+- QUESTION_IMPORT_SYNC_ROWS: 不超过该题数时在请求内直接导入，超过时转为后台任务，默认 1000
+"""
+import os
+import re
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence
+
+import pandas as pd
+from sqlalchemy import func, insert, select
+
+DEFAULT_SCORES = [10, 7, 4, 1]
+OPTION_COLUMN = re.compile(r"选项[ABCD]")
+EXCEL_OPTION_PREFIX = r'^[A-D][\.|．、)]\s*'
+WORD_OPTION_PREFIX = re.compile(r'^[A-DＡ-Ｄa-dａ-ｄ][\.、．\)]\s*')
+TRUE_VALUES = ['true', '1', '是', 'yes']
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def sync_row_limit() -> int:
+    """请求内直接导入的最大题目数"""
+    return _get_int_env("QUESTION_IMPORT_SYNC_ROWS", 1000)
+
+
+def default_scores(option_count: int) -> List[int]:
+    """默认分数 [10,7,4,1]，多于4个选项时后续为0"""
+    return DEFAULT_SCORES[:option_count] + [0] * max(0, option_count - len(DEFAULT_SCORES))
+
+
+# ---------- 解析 ----------
+
+def _text_column(df: pd.DataFrame, column: str) -> pd.Series:
+    """某列转为去掉首尾空白的字符串，空单元格为空字符串；列不存在时全为空字符串"""
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    values = df[column]
+    return values.where(values.notna(), "").astype(str).str.strip()
+
+
+def parse_excel_questions(source) -> List[dict]:
+    """
+    解析题目 Excel，返回预览数据
+
+    Excel格式：| 题目内容 | 选项A | 选项B | 选项C | 选项D | 题目类型 | 选项乱序 |
+    """
+    df = pd.read_excel(source, dtype=object)
+    contents = _text_column(df, '题目内容').tolist()
+    types = _text_column(df, '题目类型').str.lower().replace("", "single").tolist()
+    shuffles = _text_column(df, '选项乱序').str.lower().isin(TRUE_VALUES).tolist()
+    option_cols = [col for col in df.columns if OPTION_COLUMN.match(str(col))]
+    option_values = [
+        _text_column(df, col).str.replace(EXCEL_OPTION_PREFIX, '', regex=True).str.strip().tolist()
+        for col in option_cols
+    ]
+    del df
+
+    questions = []
+    for i, content in enumerate(contents):
+        options = [values[i] for values in option_values if values[i]]
+        questions.append({
+            "content": content,
+            "type": types[i],
+            "options": options,
+            "scores": default_scores(len(options)),
+            "shuffle_options": shuffles[i],
+        })
+    return questions
+
+
+def parse_word_questions(source) -> List[dict]:
+    """
+    解析题目 Word 文档，返回预览数据
+
+    每题以"题目"开头的段落开始，"场景："段落或第一段普通文字为题干，"A." 等开头的段落为选项
+    """
+    import docx
+    doc = docx.Document(source)
+    questions = []
+    current_question = None
+    for para in doc.paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        # 题目编号（如"题目1"）
+        if text.startswith("题目"):
+            if current_question:
+                questions.append(current_question)
+            current_question = {"content": "", "type": "single", "options": [], "scores": []}
+        elif text.startswith("场景：") or text.startswith("场景:"):
+            if current_question is not None:
+                current_question["content"] = text
+        elif len(text) > 1 and text[0] in "ABCD" and text[1] in ".．":
+            # 选项，如"A.内容"
+            if current_question is not None:
+                current_question["options"].append(WORD_OPTION_PREFIX.sub('', text))
+        else:
+            # 兼容没有"场景："的题干
+            if current_question is not None and not current_question["content"]:
+                current_question["content"] = text
+    if current_question:
+        questions.append(current_question)
+    for q in questions:
+        q["scores"] = default_scores(len(q["options"]))
+    return questions
+
+
+# ---------- 写入 ----------
+
+class _IdMismatch(Exception):
+    """MySQL 多行插入推算出的ID与实际不符（并发插入导致自增值不连续）"""
+
+
+def _question_values(q: dict, now: datetime) -> dict:
+    return {
+        "content": q.get('content', ''),
+        "type": q.get('type', 'single'),
+        "options": q.get('options', []),
+        "scores": q.get('scores', []),
+        "shuffle_options": bool(q.get('shuffle_options', False)),
+        "parent_case_id": q.get('parent_case_id'),
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def insert_questions(db, values: List[dict]) -> List[int]:
+    """一条多行 INSERT 写入一块题目，按输入顺序返回ID"""
+    from app.main import Question
+    dialect = db.get_bind().dialect
+    if getattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False):
+        result = db.execute(insert(Question).returning(Question.id, sort_by_parameter_order=True), values)
+        return [row[0] for row in result]
+    if dialect.name in ("mysql", "mariadb"):
+        # 多行 INSERT 的 LAST_INSERT_ID() 是第一行的ID；并发插入时自增值可能不连续，插入后按内容校验
+        first_id = db.execute(insert(Question).values(values)).lastrowid
+        ids = list(range(first_id, first_id + len(values)))
+        rows = db.execute(
+            select(Question.id, Question.content).where(Question.id.between(ids[0], ids[-1])).order_by(Question.id)
+        ).all()
+        if [row.id for row in rows] != ids or [row.content for row in rows] != [v["content"] for v in values]:
+            raise _IdMismatch()
+        return ids
+    # 其他数据库：ORM 逐题插入
+    questions = [Question(**v) for v in values]
+    db.add_all(questions)
+    db.flush()
+    return [q.id for q in questions]
+
+
+def _insert_chunk(session_factory, values: List[dict], paper_id: Optional[int], first_order: int) -> List[int]:
+    """一块题目（及试卷关联）在一个事务中写入"""
+    from app.main import PaperQuestion, Question
+    db = session_factory()
+    try:
+        try:
+            ids = insert_questions(db, values)
+        except _IdMismatch:
+            db.rollback()
+            questions = [Question(**v) for v in values]
+            db.add_all(questions)
+            db.flush()
+            ids = [q.id for q in questions]
+        if paper_id is not None:
+            now = values[0]["created_at"]
+            db.execute(insert(PaperQuestion), [
+                {"paper_id": paper_id, "question_id": question_id, "order_num": first_order + i,
+                 "is_shuffled": False, "created_at": now}
+                for i, question_id in enumerate(ids)
+            ])
+        db.commit()
+        return ids
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def next_order_num(db, paper_id: int) -> int:
+    """试卷中下一道题的 order_num"""
+    from app.main import PaperQuestion
+    return db.query(func.coalesce(func.max(PaperQuestion.order_num), 0)).filter(
+        PaperQuestion.paper_id == paper_id
+    ).scalar() + 1
+
+
+def import_questions(questions: Sequence[dict], paper_id: Optional[int] = None, session_factory=None,
+                     progress: Optional[Callable[[int], None]] = None, chunk_size: Optional[int] = None) -> dict:
+    """
+    批量写入题库，指定 paper_id 时同时按顺序加入试卷
+
+    Args:
+        progress: 每写入一块调用一次，参数为已写入的题目数
+
+    Returns:
+        {"msg", "created": [{"id", "content"}], "count"}
+    """
+    from app.database import SessionLocal, session_scope
+    from app.services.question_similarity import refresh_index
+
+    session_factory = session_factory or SessionLocal
+    chunk_size = chunk_size or _get_int_env("QUESTION_IMPORT_CHUNK", 500)
+    order_num = 1
+    if paper_id is not None:
+        with session_scope("题目导入-试卷题序", session_factory=session_factory) as db:
+            order_num = next_order_num(db, paper_id)
+
+    created = []
+    try:
+        for i in range(0, len(questions), chunk_size):
+            now = datetime.utcnow()
+            values = [_question_values(q, now) for q in questions[i:i + chunk_size]]
+            ids = _insert_chunk(session_factory, values, paper_id, order_num + i)
+            refresh_index(rows=[(question_id, v["content"], v["options"]) for question_id, v in zip(ids, values)],
+                          session_factory=session_factory)
+            created.extend({"id": question_id, "content": v["content"]} for question_id, v in zip(ids, values))
+            if progress:
+                progress(len(created))
+    finally:
+        # 中途失败时已提交的块仍然有效，同样需要更新统计和试卷缓存
+        if created:
+            from app.services.dashboard_stats import dashboard_stats
+            from app.services.question_search import text_index
+            dashboard_stats.adjust(total_questions=len(created))
+            text_index.mark_dirty()
+            if paper_id is not None:
+                from app.services.paper_snapshot import invalidate_paper_snapshot
+                invalidate_paper_snapshot(paper_id)
+    return {"msg": f"成功导入 {len(created)} 道题目", "created": created, "count": len(created)}
@@ -0,0 +1,329 @@
+"""
+题库搜索与分页
+
+原来 GET /questions 按ID倒序返回全部题目，前端下载整个题库（含富文本题干，数MB）后在浏览器中
+分页和筛选，题库页面打开很慢。这里提供服务端搜索（GET /questions/search）：
+1. 筛选：题干关键词、题型、维度、所属案例题（parent_case_id），或只列出顶层题目
+2. 关键词：
+   - MySQL 上已按 scripts/add_question_search_index.sql 建立 ngram 全文索引时，用
+     MATCH ... AGAINST 短语检索缩小范围
+   - 其他情况使用进程内的字符 2-gram 倒排索引：取关键词各 2-gram 的倒排表求交得到候选ID
+   两种方式最终都再用 LIKE 校验候选题目，结果与原来的子串匹配一致；单个字符的关键词直接用 LIKE
+3. 分页：按ID倒序的键集（游标）分页，游标为上一页最后一道题的ID（编码后），
+   翻页不随页码增大而变慢，翻页期间新增题目也不会造成重复或遗漏
+4. 总数：只在第一页（没有游标时）计算。匹配数不超过 QUESTION_SEARCH_COUNT_LIMIT 时为精确值；
+   超过时不再全量计数，按已扫描部分的命中比例估算（total_estimated 为 true）
+
+进程内倒排索引在首次搜索时从题库建立，之后每次搜索前（间隔不小于 QUESTION_SEARCH_SYNC_INTERVAL 秒）
+按 updated_at 增量读取新增和修改的题目，题目数与索引不一致时再比对ID找出删除的题目；
+本进程内的增删改调用 mark_dirty() 使下一次搜索立即同步。修改和删除后旧的倒排记录保留
+（由 LIKE 校验过滤），失效记录过多时整体重建。
+
+相关环境变量：
+- QUESTION_SEARCH_BACKEND: auto（默认，有全文索引时使用）/ fulltext / ngram
+- QUESTION_SEARCH_COUNT_LIMIT: 精确计数的上限，默认 10000
+- QUESTION_SEARCH_SYNC_INTERVAL: 倒排索引与题库同步的最小间隔（秒），默认 2
+"""
+import base64
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import func, select, text
+
+NGRAM_SIZE = 2
+MAX_LIMIT = 200
+# 每次按候选ID查库的数量
+ID_CHUNK = 500
+TAG_PATTERN = re.compile(r"<[^>]*>")
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析"""
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(data["id"])
+    except Exception:
+        raise InvalidCursorError("无效的分页游标")
+
+
+def index_text(content) -> str:
+    """参与索引的文本：去掉 HTML 标签（富文本题干中的图片等），转小写"""
+    return TAG_PATTERN.sub(" ", str(content or "")).lower()
+
+
+def ngrams(value: str, size: int = NGRAM_SIZE) -> Set[str]:
+    return {value[i:i + size] for i in range(len(value) - size + 1)}
+
+
+class NgramIndex:
+    """
+    字符 n-gram 倒排索引：n-gram -> 题目ID数组（int32）
+
+    只追加不删除：修改题目时追加新内容的记录，旧记录由调用方校验过滤，失效记录过多时重建。
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, array] = defaultdict(lambda: array("i"))
+        self.documents = 0  # 累计加入的文档数（含被替换的旧内容）
+
+    def add(self, question_id: int, content) -> None:
+        for gram in ngrams(index_text(content)):
+            self._postings[gram].append(question_id)
+        self.documents += 1
+
+    def candidates(self, keyword: str) -> Optional[np.ndarray]:
+        """
+        包含关键词所有 n-gram 的题目ID（按ID倒序）；关键词短于 n 个字符时返回 None（无法使用索引）
+        """
+        grams = ngrams(keyword.lower())
+        if not grams:
+            return None
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if not posting:
+                return np.empty(0, dtype=np.int32)
+            postings.append(posting)
+        # 从最短的倒排表开始求交
+        postings.sort(key=len)
+        result = np.unique(np.frombuffer(postings[0], dtype=np.int32))
+        for posting in postings[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, np.frombuffer(posting, dtype=np.int32))
+        return result[::-1]
+
+
+class QuestionTextIndex:
+    """与题库保持同步的进程内倒排索引"""
+
+    def __init__(self, sync_interval: Optional[int] = None):
+        self.sync_interval = sync_interval if sync_interval is not None else \
+            _get_int_env("QUESTION_SEARCH_SYNC_INTERVAL", 2)
+        self._lock = threading.Lock()
+        self._index: Optional[NgramIndex] = None
+        self._ids: Set[int] = set()
+        self._watermark = None  # 已索引题目的最大 updated_at
+        self._dirty = True
+        self._synced_at = 0.0
+        self.builds = 0
+
+    def mark_dirty(self) -> None:
+        """本进程修改了题库，下一次搜索前立即同步"""
+        self._dirty = True
+
+    def candidates(self, db, keyword: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if self._index is None or self._dirty or time.monotonic() - self._synced_at >= self.sync_interval:
+                self._sync(db)
+            return self._index.candidates(keyword)
+
+    def _add_rows(self, rows: Iterable) -> None:
+        for question_id, content in rows:
+            self._index.add(question_id, content)
+            self._ids.add(question_id)
+
+    def _rebuild(self, db) -> None:
+        from app.main import Question
+        start = time.time()
+        self._index, self._ids = NgramIndex(), set()
+        self._watermark = db.execute(select(func.max(Question.updated_at))).scalar()
+        self._add_rows(db.execute(select(Question.id, Question.content)).yield_per(2000))
+        self.builds += 1
+        print(f"题库搜索索引已建立: {len(self._ids)} 道题目，用时 {time.time() - start:.2f}s")
+
+    def _sync(self, db) -> None:
+        from app.main import Question
+        self._dirty = False
+        self._synced_at = time.monotonic()
+        if self._index is None:
+            self._rebuild(db)
+            return
+        count, watermark = db.execute(select(func.count(Question.id), func.max(Question.updated_at))).one()
+        if count == len(self._ids) and watermark == self._watermark:
+            return
+        if watermark is not None:
+            # 新增和修改的题目（同一秒内的修改可能已索引过，重复加入不影响结果）
+            query = select(Question.id, Question.content)
+            if self._watermark is not None:
+                query = query.where(Question.updated_at >= self._watermark)
+            self._add_rows(db.execute(query))
+            self._watermark = watermark
+        if count != len(self._ids):
+            # 有删除（或 updated_at 为空的新题），按ID比对
+            current = set(db.execute(select(Question.id)).scalars())
+            self._ids &= current
+            missing = sorted(current - self._ids)
+            for i in range(0, len(missing), ID_CHUNK):
+                self._add_rows(db.execute(
+                    select(Question.id, Question.content).where(Question.id.in_(missing[i:i + ID_CHUNK]))
+                ))
+        # 失效记录超过一半时重建
+        if self._index.documents > 2 * len(self._ids) + 1000:
+            self._rebuild(db)
+
+
+text_index = QuestionTextIndex()
+
+_fulltext_cache: Dict[str, bool] = {}
+
+
+def _use_fulltext(db) -> bool:
+    """是否使用 MySQL ngram 全文索引"""
+    backend = os.getenv("QUESTION_SEARCH_BACKEND", "auto").lower()
+    dialect = db.get_bind().dialect.name
+    if backend == "ngram" or dialect not in ("mysql", "mariadb"):
+        return False
+    if backend == "fulltext":
+        return True
+    if dialect not in _fulltext_cache:
+        _fulltext_cache[dialect] = bool(db.execute(text(
+            "SELECT COUNT(*) FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() "
+            "AND TABLE_NAME = 'questions' AND COLUMN_NAME = 'content' AND INDEX_TYPE = 'FULLTEXT'"
+        )).scalar())
+    return _fulltext_cache[dialect]
+
+
+def _filters(keyword: str, question_type: Optional[str], dimension_id: Optional[int],
+             parent_case_id: Optional[int], top_level: bool) -> list:
+    from app.main import Question
+    conditions = []
+    if keyword:
+        conditions.append(Question.content.contains(keyword, autoescape=True))
+    if question_type:
+        conditions.append(Question.type == question_type)
+    if dimension_id is not None:
+        conditions.append(Question.dimension_id == dimension_id)
+    if parent_case_id is not None:
+        conditions.append(Question.parent_case_id == parent_case_id)
+    elif top_level:
+        conditions.append(Question.parent_case_id.is_(None))
+    return conditions
+
+
+def _sql_count(db, conditions: list, limit: int) -> tuple:
+    """
+    按 SQL 条件计数：最多数到 limit + 1，超过时按第 limit + 1 条匹配的ID在ID范围中的位置估算
+
+    Returns:
+        (total, estimated)
+    """
+    from app.main import Question
+    matched = select(Question.id).where(*conditions).order_by(Question.id.desc()).limit(limit + 1).subquery()
+    counted, boundary = db.execute(select(func.count(), func.min(matched.c.id))).one()
+    if counted <= limit:
+        return counted, False
+    low, high = db.execute(select(func.min(Question.id), func.max(Question.id))).one()
+    # 已扫描的ID区间 [boundary, high] 中有 counted 条匹配，按相同比例外推到整个ID区间
+    return int(counted * (high - low + 1) / (high - boundary + 1)), True
+
+
+def _page_from_candidates(db, candidates: np.ndarray, conditions: list, after: Optional[int], limit: int,
+                          need_total: bool, count_limit: int) -> tuple:
+    """在倒排索引给出的候选ID（按ID倒序）中分页，候选题目仍按全部条件（含 LIKE）校验"""
+    from app.main import Question
+    if after is not None:
+        candidates = candidates[candidates < after]
+    rows, scanned, matched = [], 0, 0
+    for i in range(0, len(candidates), ID_CHUNK):
+        chunk = candidates[i:i + ID_CHUNK].tolist()
+        found = db.query(Question).filter(Question.id.in_(chunk), *conditions).order_by(Question.id.desc()).all()
+        scanned += len(chunk)
+        matched += len(found)
+        rows.extend(found)
+        if len(rows) > limit:
+            break
+
+    total, estimated = None, False
+    if need_total:
+        if scanned == len(candidates):
+            total = matched
+        elif len(candidates) <= count_limit:
+            total = matched
+            for i in range(scanned, len(candidates), ID_CHUNK):
+                chunk = candidates[i:i + ID_CHUNK].tolist()
+                total += db.query(func.count(Question.id)).filter(Question.id.in_(chunk), *conditions).scalar()
+        else:
+            total, estimated = int(len(candidates) * matched / scanned), True
+    return rows, total, estimated
+
+
+def search_questions(db, keyword: Optional[str] = None, question_type: Optional[str] = None,
+                     dimension_id: Optional[int] = None, parent_case_id: Optional[int] = None,
+                     top_level: bool = False, cursor: Optional[str] = None, limit: int = 20) -> dict:
+    """
+    搜索题目，按ID倒序分页
+
+    Returns:
+        {"items": [Question], "next_cursor", "total", "total_estimated"}；
+        total 只在第一页（cursor 为空）时计算，其余页为 None
+
+    Raises:
+        InvalidCursorError: 游标无法解析
+    """
+    from app.main import Question
+    keyword = (keyword or "").strip()
+    after = decode_cursor(cursor)
+    limit = max(1, min(limit, MAX_LIMIT))
+    need_total = after is None
+    count_limit = _get_int_env("QUESTION_SEARCH_COUNT_LIMIT", 10000)
+    conditions = _filters(keyword, question_type, dimension_id, parent_case_id, top_level)
+
+    candidates = None
+    if len(keyword) >= NGRAM_SIZE:
+        if _use_fulltext(db):
+            phrase = '"' + keyword.replace('"', " ") + '"'
+            conditions.append(text("MATCH (questions.content) AGAINST (:phrase IN BOOLEAN MODE)").bindparams(phrase=phrase))
+        else:
+            candidates = text_index.candidates(db, keyword)
+
+    if candidates is not None:
+        rows, total, estimated = _page_from_candidates(db, candidates, conditions, after, limit, need_total, count_limit)
+    else:
+        query = db.query(Question).filter(*conditions)
+        if after is not None:
+            query = query.filter(Question.id < after)
+        rows = query.order_by(Question.id.desc()).limit(limit + 1).all()
+        total, estimated = _sql_count(db, conditions, count_limit) if need_total else (None, False)
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1].id) if has_more else None,
+        "total": total,
+        "total_estimated": estimated,
+    }
+
+
+def case_children(db, case_ids: List[int]) -> Dict[int, list]:
+    """案例题的子题，按ID升序"""
+    from app.main import Question
+    children: Dict[int, list] = defaultdict(list)
+    if case_ids:
+        for child in db.query(Question).filter(Question.parent_case_id.in_(case_ids)).order_by(Question.id):
+            children[child.parent_case_id].append(child)
+    return children
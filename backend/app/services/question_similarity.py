@@ -0,0 +1,353 @@
+"""
+题库近似重复检测索引（MinHash + LSH）
+
+多个供应商的题库互有重叠，原来只能靠手工运行的 tests/test_question_uniqueness.py 检查，
+导入前判断一道新题是否已在题库中需要全表扫描 Question.content 逐题比较。这里为题干和选项
+建立持久化的相似度索引：
+1. 文本：题干和各选项做 NFKC 规范化、转小写、去掉空白和标点后，取字符 3-gram（中文不分词）
+2. 签名：对 3-gram 集合计算 64 个哈希函数的 MinHash，两题签名中相同位置取值相等的比例即
+   Jaccard 相似度的估计
+3. 分桶：签名分为 16 段、每段 4 个值，每段哈希为一个桶号；相似度 0.7 的两题至少有一段落入
+   同一桶的概率约 99%，相似度 0.3 时约 12%
+4. 存储：签名存 question_signatures，桶号存 question_lsh_buckets（索引列为桶号），
+   查询时按桶号取候选题，再用签名估计相似度过滤，不随题库规模线性增长
+5. 维护：新增、修改（题干或选项变化）、删除题目和批量导入后增量更新；索引写入失败只打印警告，
+   不影响题目本身的写入，可运行 scripts/rebuild_question_similarity_index.py 从题库重建
+
+哈希参数（SHINGLE_SIZE、NUM_PERM、BANDS、HASH_SEED）变化后已存的签名失效，需要重建索引。
+
+相关环境变量：
+- QUESTION_DUPLICATE_THRESHOLD: 判定为疑似重复的估计相似度，默认 0.7
+- QUESTION_DUPLICATE_LIMIT: 每道题最多返回的疑似重复题数，默认 5
+"""
+import hashlib
+import os
+import unicodedata
+import zlib
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+HASH_SEED = 20240601
+# 小于 2^32 的最大素数，签名值可以用 uint32 存储
+_PRIME = np.uint64(4294967291)
+# 每条 IN 查询的最大桶号数
+QUERY_CHUNK = 1000
+
+_rng = np.random.RandomState(HASH_SEED)
+# a 取 [1, 2^31)，a*x + b 不会超出 uint64
+_PERM_A = _rng.randint(1, 2 ** 31, size=(NUM_PERM, 1)).astype(np.uint64)
+_PERM_B = _rng.randint(0, 2 ** 31, size=(NUM_PERM, 1)).astype(np.uint64)
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _get_float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def duplicate_threshold() -> float:
+    return _get_float_env("QUESTION_DUPLICATE_THRESHOLD", 0.7)
+
+
+# ---------- 签名 ----------
+
+def normalize_text(text) -> str:
+    """NFKC 规范化（全角转半角）、转小写，只保留文字和数字"""
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(text)).lower()
+    return "".join(ch for ch in text if ch.isalnum())
+
+
+def question_text(content, options: Optional[Iterable] = None) -> str:
+    """题干和选项拼成参与比较的文本，各部分之间用分隔符隔开"""
+    parts = [normalize_text(content)]
+    parts.extend(normalize_text(option) for option in options or [])
+    return "|".join(part for part in parts if part)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """字符 n-gram 集合；不足 n 个字符时整段文本作为一个元素"""
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def signature(content, options: Optional[Iterable] = None) -> Optional[np.ndarray]:
+    """题目的 MinHash 签名（NUM_PERM 个 uint32）；题干和选项都为空时返回 None"""
+    grams = shingles(question_text(content, options))
+    if not grams:
+        return None
+    values = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    return ((_PERM_A * values + _PERM_B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(sig: np.ndarray) -> List[int]:
+    """签名各段的桶号（带段号，不同段之间不会相撞），为有符号 64 位整数"""
+    bands = sig.reshape(BANDS, ROWS_PER_BAND)
+    return [
+        int.from_bytes(hashlib.blake2b(bytes([band]) + bands[band].tobytes(), digest_size=8).digest(),
+                       "little", signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(sig: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """签名与一组签名（二维数组，每行一个）的估计 Jaccard 相似度"""
+    return (others == sig).mean(axis=1)
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def from_bytes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype="<u4").astype(np.uint32)
+
+
+# ---------- 内存索引 ----------
+
+class MinHashLSH:
+    """
+    内存中的 LSH 索引，与数据库索引使用相同的签名和分桶
+
+    用于检查同一批导入题目之间的重复，以及 scripts/rebuild_question_similarity_index.py 的压测。
+    """
+
+    def __init__(self):
+        self._buckets: Dict[int, List] = defaultdict(list)
+        self._signatures: Dict = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key, sig: np.ndarray) -> None:
+        self._signatures[key] = sig
+        for bucket in band_keys(sig):
+            self._buckets[bucket].append(key)
+
+    def candidates(self, sig: np.ndarray) -> Set:
+        found = set()
+        for bucket in band_keys(sig):
+            found.update(self._buckets.get(bucket, ()))
+        return found
+
+    def query(self, sig: np.ndarray, threshold: float) -> List[Tuple[object, float]]:
+        """估计相似度不低于 threshold 的 (key, 相似度)，按相似度从高到低"""
+        keys = list(self.candidates(sig))
+        if not keys:
+            return []
+        scores = similarity(sig, np.stack([self._signatures[k] for k in keys]))
+        matches = [(k, float(s)) for k, s in zip(keys, scores) if s >= threshold]
+        return sorted(matches, key=lambda m: -m[1])
+
+
+# ---------- 数据库索引 ----------
+
+def _index_rows(db, rows: Sequence[Tuple[int, object, object]]) -> int:
+    """写入 (question_id, content, options) 的签名和桶号，已存在的先删除；不提交"""
+    from sqlalchemy import delete, insert
+    from app.main import QuestionLshBucket, QuestionSignature
+
+    ids = [row[0] for row in rows]
+    if not ids:
+        return 0
+    db.execute(delete(QuestionLshBucket).where(QuestionLshBucket.question_id.in_(ids)))
+    db.execute(delete(QuestionSignature).where(QuestionSignature.question_id.in_(ids)))
+    now = datetime.utcnow()
+    signatures, buckets = [], []
+    for question_id, content, options in rows:
+        sig = signature(content, options)
+        if sig is None:
+            continue
+        signatures.append({"question_id": question_id, "signature": to_bytes(sig), "updated_at": now})
+        buckets.extend({"bucket": bucket, "question_id": question_id} for bucket in set(band_keys(sig)))
+    if signatures:
+        db.execute(insert(QuestionSignature), signatures)
+        db.execute(insert(QuestionLshBucket), buckets)
+    return len(signatures)
+
+
+def index_questions(db, question_ids: Sequence[int]) -> int:
+    """按ID从题库读取题目并更新其索引；不提交"""
+    from app.main import Question
+
+    ids = list(question_ids)
+    rows = db.query(Question.id, Question.content, Question.options).filter(Question.id.in_(ids)).all() if ids else []
+    found = {row[0] for row in rows}
+    # 已不存在的题目一并从索引中删除
+    missing = [qid for qid in ids if qid not in found]
+    if missing:
+        remove_questions(db, missing)
+    return _index_rows(db, rows)
+
+
+def remove_questions(db, question_ids: Sequence[int]) -> None:
+    """从索引中删除题目；不提交"""
+    from sqlalchemy import delete
+    from app.main import QuestionLshBucket, QuestionSignature
+
+    ids = list(question_ids)
+    if ids:
+        db.execute(delete(QuestionLshBucket).where(QuestionLshBucket.question_id.in_(ids)))
+        db.execute(delete(QuestionSignature).where(QuestionSignature.question_id.in_(ids)))
+
+
+def refresh_index(question_ids: Sequence[int] = (), rows: Sequence[Tuple[int, object, object]] = (),
+                  removed: Sequence[int] = (), session_factory=None) -> None:
+    """
+    题目写入提交后更新索引，失败时只打印警告
+
+    Args:
+        question_ids: 需要从题库重新读取并建立索引的题目
+        rows: 调用方已有的 (question_id, content, options)，直接建立索引
+        removed: 已删除的题目
+    """
+    from app.database import session_scope
+    try:
+        with session_scope("题目相似度索引", session_factory=session_factory) as db:
+            if removed:
+                remove_questions(db, removed)
+            if question_ids:
+                index_questions(db, question_ids)
+            if rows:
+                _index_rows(db, rows)
+            db.commit()
+    except Exception as e:
+        print(f"警告: 更新题目相似度索引失败（可运行 scripts/rebuild_question_similarity_index.py 重建）: {e}")
+
+
+def _lookup(db, signatures: Sequence[Optional[np.ndarray]], threshold: float, limit: int) -> List[List[dict]]:
+    """在题库索引中查找每个签名的疑似重复题"""
+    from sqlalchemy import select
+    from app.main import Question, QuestionLshBucket, QuestionSignature
+
+    keys_per_sig = [band_keys(sig) if sig is not None else [] for sig in signatures]
+    all_keys = sorted({key for keys in keys_per_sig for key in keys})
+    bucket_members: Dict[int, List[int]] = defaultdict(list)
+    for i in range(0, len(all_keys), QUERY_CHUNK):
+        chunk = all_keys[i:i + QUERY_CHUNK]
+        for bucket, question_id in db.execute(
+            select(QuestionLshBucket.bucket, QuestionLshBucket.question_id).where(QuestionLshBucket.bucket.in_(chunk))
+        ):
+            bucket_members[bucket].append(question_id)
+
+    candidate_ids = sorted({qid for members in bucket_members.values() for qid in members})
+    stored: Dict[int, np.ndarray] = {}
+    for i in range(0, len(candidate_ids), QUERY_CHUNK):
+        chunk = candidate_ids[i:i + QUERY_CHUNK]
+        for question_id, data in db.execute(
+            select(QuestionSignature.question_id, QuestionSignature.signature).where(QuestionSignature.question_id.in_(chunk))
+        ):
+            stored[question_id] = from_bytes(data)
+
+    matches_per_sig: List[List[Tuple[int, float]]] = []
+    for sig, keys in zip(signatures, keys_per_sig):
+        ids = sorted({qid for key in keys for qid in bucket_members.get(key, ()) if qid in stored})
+        if not ids:
+            matches_per_sig.append([])
+            continue
+        scores = similarity(sig, np.stack([stored[qid] for qid in ids]))
+        matches = sorted(((qid, float(s)) for qid, s in zip(ids, scores) if s >= threshold), key=lambda m: (-m[1], m[0]))
+        matches_per_sig.append(matches[:limit])
+
+    matched_ids = sorted({qid for matches in matches_per_sig for qid, _ in matches})
+    contents: Dict[int, str] = {}
+    for i in range(0, len(matched_ids), QUERY_CHUNK):
+        chunk = matched_ids[i:i + QUERY_CHUNK]
+        contents.update(db.execute(select(Question.id, Question.content).where(Question.id.in_(chunk))).all())
+    return [
+        [{"id": qid, "content": contents[qid], "similarity": round(s, 2)} for qid, s in matches if qid in contents]
+        for matches in matches_per_sig
+    ]
+
+
+def find_duplicates(db, questions: Sequence[dict], threshold: Optional[float] = None,
+                    limit: Optional[int] = None) -> List[List[dict]]:
+    """
+    查找每道题在题库中的疑似重复题
+
+    Returns:
+        与 questions 一一对应的列表，每项为 [{"id", "content", "similarity"}]（按相似度从高到低）
+    """
+    threshold = duplicate_threshold() if threshold is None else threshold
+    limit = limit or _get_int_env("QUESTION_DUPLICATE_LIMIT", 5)
+    signatures = [signature(q.get("content"), q.get("options")) for q in questions]
+    return _lookup(db, signatures, threshold, limit)
+
+
+def batch_duplicates(questions: Sequence[dict], threshold: Optional[float] = None) -> List[Optional[int]]:
+    """同一批题目内部的重复：每道题与之前哪道题（序号）疑似重复，没有时为 None"""
+    threshold = duplicate_threshold() if threshold is None else threshold
+    index = MinHashLSH()
+    result: List[Optional[int]] = []
+    for i, q in enumerate(questions):
+        sig = signature(q.get("content"), q.get("options"))
+        if sig is None:
+            result.append(None)
+            continue
+        matches = index.query(sig, threshold)
+        result.append(min(k for k, _ in matches) if matches else None)
+        index.add(i, sig)
+    return result
+
+
+def annotate_duplicates(questions: List[dict], session_factory=None) -> List[dict]:
+    """
+    导入预览：为每道题加上 duplicates（题库中的疑似重复题）和 duplicate_of（本批中与之重复的
+    前一道题的序号，从 0 开始）；题库索引查询失败时 duplicates 为空列表
+    """
+    from app.database import session_scope
+
+    for q, earlier in zip(questions, batch_duplicates(questions)):
+        q["duplicate_of"] = earlier
+        q["duplicates"] = []
+    try:
+        with session_scope("题目导入-重复检测", session_factory=session_factory) as db:
+            for q, matches in zip(questions, find_duplicates(db, questions)):
+                q["duplicates"] = matches
+    except Exception as e:
+        print(f"警告: 查询题目相似度索引失败: {e}")
+    return questions
+
+
+def rebuild_index(session_factory=None, chunk_size: int = 2000, progress=None) -> int:
+    """清空索引并按ID顺序分块从题库重建，返回建立索引的题目数"""
+    from sqlalchemy import delete, select
+    from app.database import session_scope
+    from app.main import Question, QuestionLshBucket, QuestionSignature
+
+    with session_scope("题目相似度索引-重建", session_factory=session_factory) as db:
+        db.execute(delete(QuestionLshBucket))
+        db.execute(delete(QuestionSignature))
+        db.commit()
+
+        total, last_id = 0, 0
+        while True:
+            rows = db.execute(
+                select(Question.id, Question.content, Question.options)
+                .where(Question.id > last_id).order_by(Question.id).limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            total += _index_rows(db, rows)
+            db.commit()
+            last_id = rows[-1][0]
+            if progress:
+                progress(total)
+    return total
@@ -0,0 +1,246 @@
+"""
+内容寻址的报告产物存储
+
+报告任务原来每次运行都重新渲染并写出一个带时间戳的新 PDF，即使分数、模板和配置都没有变化；
+删除报告时逐个删除文件，重复生成留下的旧文件从不清理。这里按报告输入的内容哈希存储 PDF：
+- 键为 (报告数据, 模板内容, 试卷配置内容, 渲染版本) 的 SHA-256，同一输入只渲染一次
+- 同一用户/试卷/键已有报告记录时直接复用该记录，不再渲染也不新增记录；
+  其他输入相同的报告（如重复生成）共享同一个 PDF 文件
+- report_artifacts.ref_count 记录引用该文件的报告数，删除报告时递减，归零后删除文件
+- collect_garbage 与报告表对账引用计数，并清理 output、assets 目录中没有任何记录引用的旧文件
+
+修改姓名等报告数据只会改变对应用户的键，重新批量生成时只有这一份报告需要重新渲染。
+修改报告的渲染逻辑（而非模板或配置）后需要递增 RENDER_VERSION，使旧产物失效。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yaml
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+# 渲染逻辑版本，雷达图/PDF 生成代码的输出发生变化时递增
+RENDER_VERSION = "1"
+
+GENERATORS_DIR = Path(__file__).resolve().parent.parent.parent / "reports" / "generators"
+OUTPUT_DIR = GENERATORS_DIR / "output"
+ARTIFACT_DIR = OUTPUT_DIR / "artifacts"
+ASSETS_DIR = GENERATORS_DIR / "assets"
+
+_digest_cache: Dict[Tuple[str, int, int], Tuple[str, Optional[dict]]] = {}
+_digest_lock = threading.Lock()
+
+
+def _file_digest(path: Path, parse_yaml: bool = False) -> Tuple[str, Optional[dict]]:
+    """文件内容哈希（按修改时间和大小缓存），可同时返回解析后的 YAML"""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return "missing", None
+    key = (str(path), st.st_mtime_ns, st.st_size)
+    with _digest_lock:
+        cached = _digest_cache.get(key)
+    if cached is None:
+        content = path.read_bytes()
+        parsed = yaml.safe_load(content) if parse_yaml else None
+        cached = (hashlib.sha256(content).hexdigest(), parsed)
+        with _digest_lock:
+            _digest_cache[key] = cached
+    return cached
+
+
+def compute_report_key(paper_id: int, report_data: dict) -> str:
+    """计算报告输入的内容哈希"""
+    config_digest, config = _file_digest(GENERATORS_DIR / "configs" / f"{paper_id}.yaml", parse_yaml=True)
+    template_config = (config or {}).get("template", {}) or {}
+    template_name = template_config.get("name", "report_template.html")
+    template_digest, _ = _file_digest(GENERATORS_DIR / "templates" / template_name)
+    payload = {
+        "render_version": RENDER_VERSION,
+        "chart_format": template_config.get("chart_format", os.getenv("REPORT_CHART_FORMAT", "png")),
+        "paper_id": paper_id,
+        "config": config_digest,
+        "template": template_digest,
+        "data": report_data,
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def artifact_path(key: str) -> Path:
+    return ARTIFACT_DIR / key[:2] / f"{key}.pdf"
+
+
+def new_render_path(key: str) -> str:
+    """渲染用的临时文件路径，渲染完成后由 commit_artifact 原子地移动到最终位置"""
+    path = artifact_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return str(path.with_name(f"{key}.{uuid.uuid4().hex[:8]}.tmp.pdf"))
+
+
+def find_report(db, user_id: int, paper_id: int, key: str):
+    """查找同一用户/试卷/输入已生成且文件仍存在的报告"""
+    from app.main import Report
+    report = db.query(Report).filter(
+        Report.user_id == user_id,
+        Report.paper_id == paper_id,
+        Report.content_hash == key,
+        Report.status == "completed"
+    ).order_by(Report.id.desc()).first()
+    if report is not None and os.path.exists(report.file_path):
+        return report
+    return None
+
+
+def acquire_artifact(db, key: str) -> Optional[str]:
+    """
+    引用已存在的产物，返回文件路径；不存在时返回 None
+
+    引用计数的递增与调用方新增的报告记录在同一事务中提交。
+    """
+    from app.main import ReportArtifact
+    updated = db.query(ReportArtifact).filter(ReportArtifact.content_hash == key).update(
+        {ReportArtifact.ref_count: ReportArtifact.ref_count + 1,
+         ReportArtifact.last_used_at: datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        return None
+    path = db.query(ReportArtifact.file_path).filter(ReportArtifact.content_hash == key).scalar()
+    if path and os.path.exists(path):
+        return path
+    # 文件已丢失：撤销本次引用，由调用方重新渲染
+    db.query(ReportArtifact).filter(ReportArtifact.content_hash == key).update(
+        {ReportArtifact.ref_count: ReportArtifact.ref_count - 1}, synchronize_session=False
+    )
+    return None
+
+
+def commit_artifact(db, key: str, rendered_path: str) -> Tuple[str, int]:
+    """把渲染好的临时文件登记为产物并引用一次，返回 (最终路径, 文件大小)"""
+    from app.main import ReportArtifact
+    final_path = artifact_path(key)
+    os.replace(rendered_path, final_path)
+    file_size = final_path.stat().st_size
+    values = {ReportArtifact.ref_count: ReportArtifact.ref_count + 1, ReportArtifact.file_path: str(final_path),
+              ReportArtifact.file_size: file_size, ReportArtifact.last_used_at: datetime.utcnow()}
+    query = db.query(ReportArtifact).filter(ReportArtifact.content_hash == key)
+    if not query.update(values, synchronize_session=False):
+        try:
+            with db.begin_nested():
+                db.add(ReportArtifact(content_hash=key, file_path=str(final_path), file_size=file_size, ref_count=1))
+        except IntegrityError:
+            # 其他任务同时渲染了相同的输入，内容一致，引用已有记录即可
+            query.update(values, synchronize_session=False)
+    return str(final_path), file_size
+
+
+def release_artifacts(db, keys: Iterable[Optional[str]]) -> List[str]:
+    """
+    释放报告对产物的引用（每个键出现一次释放一次），删除引用归零的产物记录
+
+    Returns:
+        需要在事务提交后删除的文件路径（见 remove_files）
+    """
+    from app.main import ReportArtifact
+    counts: Dict[str, int] = {}
+    for key in keys:
+        if key:
+            counts[key] = counts.get(key, 0) + 1
+    if not counts:
+        return []
+    for key, count in counts.items():
+        db.query(ReportArtifact).filter(ReportArtifact.content_hash == key).update(
+            {ReportArtifact.ref_count: ReportArtifact.ref_count - count}, synchronize_session=False
+        )
+    orphans = db.query(ReportArtifact.id, ReportArtifact.file_path).filter(
+        ReportArtifact.content_hash.in_(list(counts)), ReportArtifact.ref_count <= 0
+    ).all()
+    if orphans:
+        db.query(ReportArtifact).filter(
+            ReportArtifact.id.in_([row[0] for row in orphans]), ReportArtifact.ref_count <= 0
+        ).delete(synchronize_session=False)
+    return [row[1] for row in orphans]
+
+
+def remove_files(paths: Iterable[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"删除报告文件失败 {path}: {e}")
+    return removed
+
+
+def collect_garbage(db, grace_seconds: int = 3600, dry_run: bool = False) -> dict:
+    """
+    清理孤立的报告文件
+
+    1. 按报告表重新统计每个产物的引用数，修正计数偏差
+    2. 删除无引用的产物记录及文件
+    3. 删除 output 目录中没有报告记录引用的 PDF、渲染中断留下的临时文件，以及 assets 中旧版本留下的雷达图
+
+    最近 grace_seconds 秒内修改过的文件不清理，避免误删正在渲染或刚生成尚未登记的文件。
+    """
+    from app.main import Report, ReportArtifact
+
+    stats = {"recounted": 0, "artifacts_removed": 0, "files_removed": 0, "bytes_freed": 0}
+    cutoff = time.time() - grace_seconds
+
+    # 1. 对账引用计数
+    actual = dict(db.query(Report.content_hash, func.count(Report.id)).filter(
+        Report.content_hash.isnot(None)
+    ).group_by(Report.content_hash).all())
+    for artifact in db.query(ReportArtifact).all():
+        refs = actual.get(artifact.content_hash, 0)
+        if artifact.ref_count != refs:
+            stats["recounted"] += 1
+            artifact.ref_count = refs
+    # 会话未开启 autoflush，先写入修正后的计数，下面才能按新计数找出无引用的产物
+    db.flush()
+
+    # 2. 无引用的产物
+    doomed = []
+    grace_time = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    for artifact in db.query(ReportArtifact).filter(ReportArtifact.ref_count <= 0).all():
+        if artifact.last_used_at and artifact.last_used_at > grace_time:
+            continue
+        doomed.append(artifact.file_path)
+        stats["artifacts_removed"] += 1
+        if not dry_run:
+            db.delete(artifact)
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+
+    # 3. 没有任何记录引用的文件
+    referenced = {os.path.abspath(p) for (p,) in db.query(Report.file_path).all() if p}
+    referenced |= {os.path.abspath(p) for (p,) in db.query(ReportArtifact.file_path).all() if p}
+    referenced -= {os.path.abspath(p) for p in doomed}
+    candidates = list(OUTPUT_DIR.rglob("*.pdf")) if OUTPUT_DIR.exists() else []
+    if ASSETS_DIR.exists():
+        candidates += list(ASSETS_DIR.glob("radar_chart_*.png")) + list(ASSETS_DIR.glob("radar_chart_*.svg"))
+    for path in candidates:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        if str(path.resolve()) in referenced or os.path.abspath(path) in referenced or st.st_mtime > cutoff:
+            continue
+        stats["files_removed"] += 1
+        stats["bytes_freed"] += st.st_size
+        if not dry_run:
+            remove_files([str(path)])
+    return stats
@@ -0,0 +1,363 @@
+"""
+报告渲染引擎
+
+批量生成报告时不再为每个用户启动一个线程，而是：
+- 请求线程只负责把任务放入有界优先级队列（队列满时直接拒绝，避免压垮API进程）
+- 少量调度线程从队列取任务，在API进程内完成轻量的数据库读写
+- 雷达图绘制与PDF排版这类CPU密集的工作交给独立的渲染进程池
+
+调度策略：
+- 结果页单份生成的优先级高于批量生成，排在所有批量任务之前
+- 准入控制：批量任务只能占用队列的一部分（REPORT_QUEUE_BATCH_RATIO），
+  剩余容量留给单份生成，队列较深时新批次直接被拒绝
+- 数据库连接中断、渲染进程崩溃、超时等暂时性错误按指数退避（带随机抖动）重试，
+  其他错误（数据缺失、配置错误等）直接标记失败
+- 整批取消写在任务存储中，调度线程执行任务前检查状态，已取消的任务直接跳过
+
+每个渲染进程启动时预热一次：导入报告生成模块、固定matplotlib为Agg后端、
+加载试卷配置，之后的任务都复用进程内已经热身的Jinja环境、字体和配置缓存。
+
+相关环境变量：
+- REPORT_WORKERS: 渲染进程数，默认为CPU核数
+- REPORT_QUEUE_SIZE: 等待队列长度上限，默认2000
+- REPORT_DISPATCHERS: 调度线程数，默认与渲染进程数相同
+- REPORT_QUEUE_BATCH_RATIO: 批量任务可占用的队列比例（百分比），默认80
+- REPORT_TASK_MAX_RETRIES: 暂时性错误的最大重试次数，默认3
+- REPORT_TASK_RETRY_DELAY: 首次重试的等待秒数，之后每次翻倍，默认2
+"""
+import os
+import sys
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional
+
+from app.services.report_task_store import CANCELLED_FIELDS
+
+# 任务优先级，数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+_PRIORITY_STOP = float("inf")
+
+# 重试等待时间上限（秒）
+MAX_RETRY_DELAY = 60
+
+GENERATORS_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "../../reports/generators")
+)
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    判断异常是否为暂时性错误（重试可能成功）
+
+    报告任务内部会把异常包装成 Exception 重新抛出，这里沿异常链检查原始异常。
+    """
+    try:
+        from sqlalchemy.exc import DBAPIError, DisconnectionError, OperationalError, TimeoutError as PoolTimeout
+        db_errors = (OperationalError, DisconnectionError, PoolTimeout)
+    except ImportError:
+        DBAPIError, db_errors = None, ()
+
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if isinstance(exc, db_errors):
+            return True
+        if DBAPIError is not None and isinstance(exc, DBAPIError) and exc.connection_invalidated:
+            return True
+        if isinstance(exc, (BrokenProcessPool, TimeoutError, ConnectionError)):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def retry_delay(attempt: int, base: float) -> float:
+    """第 attempt 次重试（从0开始）的等待时间：指数退避，随机抖动避免同时重试"""
+    delay = min(base * (2 ** attempt), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+class ReportJob:
+    """队列中的一个报告任务"""
+    __slots__ = ("task_id", "user_id", "paper_id", "task_store", "session_factory",
+                 "priority", "batch_id", "attempts")
+
+    def __init__(self, task_id: str, user_id: int, paper_id: int, task_store, session_factory: Callable,
+                 priority: int = PRIORITY_BATCH, batch_id: Optional[str] = None, attempts: int = 0):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.paper_id = paper_id
+        self.task_store = task_store
+        self.session_factory = session_factory
+        self.priority = priority
+        self.batch_id = batch_id
+        self.attempts = attempts
+
+
+# ---------------------------------------------------------------------------
+# 以下函数运行在渲染子进程中
+# ---------------------------------------------------------------------------
+
+def _init_render_worker():
+    """渲染进程初始化：准备导入路径并预热报告生成模块"""
+    if GENERATORS_DIR not in sys.path:
+        sys.path.insert(0, GENERATORS_DIR)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    try:
+        import report_core
+        from config_loader import config_loader
+        # 预加载所有试卷配置，避免首个任务承担加载开销
+        for paper in config_loader.get_available_papers():
+            try:
+                config_loader.load_config(paper["paper_id"])
+            except Exception:
+                pass
+        print(f"[报告引擎] 渲染进程 {os.getpid()} 已就绪")
+    except Exception as e:
+        # 初始化失败不终止进程，具体错误会在渲染任务中再次暴露
+        print(f"[报告引擎] 渲染进程 {os.getpid()} 预热失败: {str(e)}")
+
+
+def _render_report(paper_id: int, report_data: dict, output_path: str) -> str:
+    """在渲染进程中生成单份PDF报告"""
+    from report_core import generate_single_report
+    return generate_single_report(paper_id, report_data, output_path)
+
+
+# ---------------------------------------------------------------------------
+# API进程侧
+# ---------------------------------------------------------------------------
+
+class ReportEngine:
+    """有界优先级队列 + 渲染进程池的报告生成引擎"""
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None,
+                 dispatchers: Optional[int] = None, batch_ratio: Optional[int] = None,
+                 max_retries: Optional[int] = None, retry_base_delay: Optional[float] = None,
+                 runner: Optional[Callable[[ReportJob], None]] = None):
+        """
+        Args:
+            runner: 执行单个任务的函数，出错时抛出异常。默认在渲染进程池中生成报告；
+                    测试时可传入替代实现（此时不启动渲染进程池）
+        """
+        self.workers = workers or _get_int_env("REPORT_WORKERS", os.cpu_count() or 2)
+        self.queue_size = queue_size or _get_int_env("REPORT_QUEUE_SIZE", 2000)
+        self.dispatchers = dispatchers or _get_int_env("REPORT_DISPATCHERS", self.workers)
+        batch_ratio = min(batch_ratio or _get_int_env("REPORT_QUEUE_BATCH_RATIO", 80), 100)
+        self.batch_limit = max(self.queue_size * batch_ratio // 100, 1)
+        self.max_retries = max_retries if max_retries is not None else _get_int_env("REPORT_TASK_MAX_RETRIES", 3)
+        self.retry_base_delay = retry_base_delay if retry_base_delay is not None else \
+            _get_int_env("REPORT_TASK_RETRY_DELAY", 2)
+        self._use_pool = runner is None
+        self._runner = runner or self._run_job
+
+        # 队列上限在 submit 中检查，停止信号和重试任务不受上限限制
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()  # 同优先级按提交顺序执行
+        # 等待重试的任务: [(到期时间, 序号, 任务)]
+        self._delayed: list = []
+        self._delayed_cond = threading.Condition()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._stopping = False
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            if self._use_pool:
+                self._executor = self._new_executor()
+            self._stopping = False
+            for i in range(self.dispatchers):
+                thread = threading.Thread(
+                    target=self._dispatch_loop, name=f"report-dispatcher-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._retry_loop, name="report-retry", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            self._started = True
+            print(f"[报告引擎] 已启动: 渲染进程={self.workers}, 调度线程={self.dispatchers}, 队列上限={self.queue_size}")
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            if not self._started:
+                return
+            self._stopping = True
+            with self._delayed_cond:
+                self._delayed_cond.notify_all()
+            # 停止信号排在所有任务之后
+            for _ in range(self.dispatchers):
+                self._queue.put((_PRIORITY_STOP, next(self._seq), None))
+            if wait:
+                for thread in self._threads:
+                    thread.join(timeout=30)
+            self._threads = []
+            if self._executor:
+                self._executor.shutdown(wait=wait, cancel_futures=not wait)
+                self._executor = None
+            self._started = False
+            print("[报告引擎] 已停止")
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # 使用spawn启动子进程，避免fork继承API进程中的数据库连接和线程锁
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_render_worker,
+        )
+
+    # ---- 队列 ----
+
+    def free_slots(self) -> int:
+        return max(self.queue_size - self._queue.qsize(), 0)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def admit_batch(self, count: int) -> bool:
+        """准入控制：批次加入后排队任务数不超过批量上限时才接受"""
+        return self._queue.qsize() + count <= self.batch_limit
+
+    def submit(self, task_id: str, user_id: int, paper_id: int, task_store,
+               session_factory: Callable, priority: int = PRIORITY_BATCH,
+               batch_id: Optional[str] = None):
+        """
+        提交一个报告任务，队列已满时抛出 queue.Full
+        """
+        if not self._started:
+            self.start()
+        if self._queue.qsize() >= self.queue_size:
+            raise queue.Full
+        job = ReportJob(task_id, user_id, paper_id, task_store, session_factory, priority, batch_id)
+        self._queue.put((priority, next(self._seq), job))
+
+    def cancel_batch(self, batch_id: str, task_store) -> List[str]:
+        """取消批次中尚未开始的任务（排队中和等待重试的），返回被取消的任务ID"""
+        cancelled = task_store.cancel_batch(batch_id)
+        with self._delayed_cond:
+            remaining = [item for item in self._delayed if item[2].batch_id != batch_id]
+            if len(remaining) != len(self._delayed):
+                heapq.heapify(remaining)
+                self._delayed = remaining
+        return cancelled
+
+    def render(self, paper_id: int, report_data: dict, output_path: str) -> str:
+        """在渲染进程池中生成PDF，阻塞等待结果"""
+        executor = self._executor
+        if not executor:
+            raise RuntimeError("报告引擎未启动")
+        try:
+            return executor.submit(_render_report, paper_id, report_data, output_path).result()
+        except BrokenProcessPool:
+            # 渲染进程异常退出后进程池不可再用，重建后由重试机制重新执行
+            with self._lock:
+                if self._executor is executor and not self._stopping:
+                    print("[报告引擎] 渲染进程池已损坏，正在重建")
+                    self._executor = self._new_executor()
+                    executor.shutdown(wait=False)
+            raise
+
+    def _run_job(self, job: ReportJob):
+        from app.api.report_generator import generate_report_task
+        generate_report_task(
+            job.task_id, job.user_id, job.paper_id, job.task_store, job.session_factory,
+            render_func=self.render, raise_errors=True,
+        )
+
+    def _execute(self, job: ReportJob):
+        # 只有仍处于 pending/retrying 的任务才会被标记为生成中（原子操作），
+        # 在读取状态和开始执行之间被其他进程取消的任务不会被覆盖为生成中
+        if not job.task_store.mark_started(job.task_id):
+            task = job.task_store.get(job.task_id)
+            if task is not None and task["status"] == "cancelled":
+                # 批次可能是在其他进程中取消的，取消通知只到达了那个进程的监听器；
+                # 再写入一次取消状态，让本进程的事件总线也能推送（状态未变化时不产生事件）
+                job.task_store.update(job.task_id, **CANCELLED_FIELDS)
+            return
+        try:
+            self._runner(job)
+        except Exception as e:
+            if is_transient_error(e) and job.attempts < self.max_retries and not self._stopping:
+                delay = retry_delay(job.attempts, self.retry_base_delay)
+                job.attempts += 1
+                print(f"[报告引擎] 任务 {job.task_id} 暂时性错误，{delay:.1f}秒后第{job.attempts}次重试: {str(e)}")
+                job.task_store.update(job.task_id, status="retrying", progress=0, attempts=job.attempts,
+                                      error_message=f"第{job.attempts}次重试: {str(e)}")
+                with self._delayed_cond:
+                    heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), job))
+                    self._delayed_cond.notify()
+            else:
+                print(f"[报告引擎] 任务 {job.task_id} 失败: {str(e)}")
+                job.task_store.update(job.task_id, status="failed", progress=100, error_message=str(e))
+
+    def _dispatch_loop(self):
+        while True:
+            _, _, job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._execute(job)
+            except Exception as e:
+                print(f"[报告引擎] 调度任务异常: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def _retry_loop(self):
+        """到期的重试任务按原优先级放回队列"""
+        while True:
+            with self._delayed_cond:
+                while not self._stopping and (
+                        not self._delayed or self._delayed[0][0] > time.monotonic()):
+                    timeout = self._delayed[0][0] - time.monotonic() if self._delayed else None
+                    self._delayed_cond.wait(timeout)
+                if self._stopping:
+                    return
+                _, _, job = heapq.heappop(self._delayed)
+            # 重试任务已经占用过队列名额，不再受上限限制
+            self._queue.put((job.priority, next(self._seq), job))
+
+
+_engine: Optional[ReportEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_report_engine() -> ReportEngine:
+    """获取全局报告引擎（首次调用时创建并启动）"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ReportEngine()
+        _engine.start()
+        return _engine
+
+
+def shutdown_report_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.shutdown(wait=False)
+            _engine = None
@@ -0,0 +1,402 @@
+"""
+报告批次进度事件
+
+前端原来每 2 秒用 GET /reports/status?task_ids[]=... 轮询整个批次，批次有几千份报告时每次请求都带着
+几千个任务ID，每个打开的管理页面都在重复同样的请求。这里改为服务端推送（SSE）：
+- 任务存储的每次写入（创建、进度更新、取消）通过监听器进入事件总线
+- 每个批次一个事件通道，保存各任务的最新状态并增量维护汇总，按顺序编号产生
+  task（单个任务）和 batch（批次汇总）事件，最近的事件保存在环形缓冲区中
+- 新连接先收到一次完整快照（snapshot）；断线重连时浏览器自动带上 Last-Event-ID，
+  从缓冲区补发之后的事件，缓冲区已被覆盖时重新发送快照
+- 批次全部结束后发送 done 事件并关闭连接，通道保留一段时间供重连后获取最终状态
+
+批次在其他 API 进程中生成（多进程部署）或通道已被淘汰时，退化为按 batch_id 定时查询任务存储，
+同样只推送发生变化的任务。其他进程对本进程批次的写入（如整批取消）不经过本进程的监听器，
+连接空闲（一个心跳间隔内没有新事件）时与任务存储对账一次，补发已结束但通道中尚未结束的任务。
+
+相关环境变量：
+- REPORT_EVENT_BUFFER: 每个批次保留的最近事件数，默认5000
+- REPORT_EVENT_RETENTION: 批次结束后事件通道的保留秒数，默认600
+- REPORT_EVENT_POLL_INTERVAL: 退化为查询任务存储时的查询间隔（秒），默认2
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.services.report_task_store import CANCELLED_FIELDS, register_store_listener
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+TASK_STATUSES = ("pending", "generating", "retrying") + TERMINAL_STATUSES
+TASK_EVENT_FIELDS = ("task_id", "user_id", "status", "progress", "error_message", "file_path", "report_id")
+
+# 没有事件时发送心跳的间隔（秒），防止代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+# 浏览器断线后的重连等待时间（毫秒）
+RECONNECT_DELAY_MS = 3000
+# 最多保留的批次通道数
+MAX_CHANNELS = 200
+# 退化查询时单个批次最多读取的任务数
+MAX_BATCH_TASKS = 100000
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """格式化一条 SSE 消息"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+def _task_view(task: dict) -> dict:
+    return {k: task.get(k) for k in TASK_EVENT_FIELDS}
+
+
+def summarize(batch_id: str, tasks: Iterable[dict]) -> dict:
+    """按任务列表计算批次汇总"""
+    counts = dict.fromkeys(TASK_STATUSES, 0)
+    progress = 0
+    for task in tasks:
+        counts[task["status"]] = counts.get(task["status"], 0) + 1
+        progress += task.get("progress") or 0
+    return _summary(batch_id, counts, progress)
+
+
+def _summary(batch_id: str, counts: Dict[str, int], progress_sum: int) -> dict:
+    total = sum(counts.values())
+    finished = sum(counts.get(status, 0) for status in TERMINAL_STATUSES)
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "finished": finished,
+        "counts": dict(counts),
+        # 各任务进度的平均值，生成中的任务按其当前进度计入
+        "progress": round(progress_sum / total, 1) if total else 0,
+        "done": total > 0 and finished == total,
+    }
+
+
+class BatchChannel:
+    """单个批次的任务状态和最近事件（由事件总线的锁保护）"""
+
+    def __init__(self, batch_id: str, buffer_size: int):
+        self.batch_id = batch_id
+        self.tasks: Dict[str, dict] = {}
+        self.counts: Dict[str, int] = dict.fromkeys(TASK_STATUSES, 0)
+        self.progress_sum = 0
+        self.events: "deque[Tuple[int, str]]" = deque(maxlen=buffer_size)
+        self.last_id = 0
+        self.done_at: Optional[float] = None
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def add_task(self, task: dict) -> None:
+        view = _task_view(task)
+        self.tasks[view["task_id"]] = view
+        self.counts[view["status"]] = self.counts.get(view["status"], 0) + 1
+        self.progress_sum += view["progress"] or 0
+        self.done_at = None
+
+    def update_task(self, task_id: str, fields: dict) -> Optional[dict]:
+        task = self.tasks.get(task_id)
+        if task is None:
+            return None
+        changes = {k: v for k, v in fields.items() if k in TASK_EVENT_FIELDS and task.get(k) != v}
+        if not changes:
+            return None
+        self.counts[task["status"]] -= 1
+        self.progress_sum -= task["progress"] or 0
+        task.update(changes)
+        self.counts[task["status"]] = self.counts.get(task["status"], 0) + 1
+        self.progress_sum += task["progress"] or 0
+        return task
+
+    def summary(self) -> dict:
+        return _summary(self.batch_id, self.counts, self.progress_sum)
+
+    def emit(self, event: str, data: dict) -> None:
+        self.last_id += 1
+        self.events.append((self.last_id, format_event(event, data, self.last_id)))
+
+    def emit_summary(self) -> None:
+        summary = self.summary()
+        self.emit("batch", summary)
+        if summary["done"] and self.done_at is None:
+            self.done_at = time.time()
+            self.emit("done", summary)
+
+    def snapshot(self) -> str:
+        """完整快照，带当前事件编号，客户端据此从之后的事件继续"""
+        return format_event("snapshot", {"batch": self.summary(), "tasks": list(self.tasks.values())}, self.last_id)
+
+
+class ReportEventBus:
+    """进程内的批次进度事件总线"""
+
+    def __init__(self, buffer_size: Optional[int] = None, retention: Optional[int] = None):
+        self.buffer_size = buffer_size or _get_int_env("REPORT_EVENT_BUFFER", 5000)
+        self.retention = retention or _get_int_env("REPORT_EVENT_RETENTION", 600)
+        self._channels: "OrderedDict[str, BatchChannel]" = OrderedDict()
+        self._task_batches: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    # ---- 任务存储监听器（在写入线程中调用） ----
+
+    def on_store_event(self, kind: str, data: dict) -> None:
+        with self._lock:
+            if kind == "created":
+                touched = self._on_created(data["tasks"])
+            elif kind == "updated":
+                touched = self._on_updated(data["task_id"], data["fields"])
+            elif kind == "cancelled":
+                touched = self._on_cancelled(data["task_ids"])
+            else:
+                touched = []
+            waiters = [waiter for channel in touched for waiter in channel.waiters]
+        self._wake(waiters)
+
+    @staticmethod
+    def _wake(waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]) -> None:
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭，连接随之结束
+                pass
+
+    def _on_created(self, tasks: List[dict]) -> List[BatchChannel]:
+        touched = {}
+        for task in tasks:
+            batch_id = task.get("batch_id")
+            if not batch_id:
+                continue
+            channel = self._channels.get(batch_id)
+            if channel is None:
+                channel = self._channels[batch_id] = BatchChannel(batch_id, self.buffer_size)
+            channel.add_task(task)
+            self._task_batches[task["task_id"]] = batch_id
+            touched[batch_id] = channel
+        for channel in touched.values():
+            channel.emit_summary()
+        if touched:
+            self._evict()
+        return list(touched.values())
+
+    def _on_updated(self, task_id: str, fields: dict) -> List[BatchChannel]:
+        channel = self._channels.get(self._task_batches.get(task_id))
+        if channel is None:
+            return []
+        task = channel.update_task(task_id, fields)
+        if task is None:
+            return []
+        channel.emit("task", dict(task))
+        channel.emit_summary()
+        return [channel]
+
+    def _on_cancelled(self, task_ids: List[str]) -> List[BatchChannel]:
+        touched = {}
+        for task_id in task_ids:
+            channel = self._channels.get(self._task_batches.get(task_id))
+            if channel is None:
+                continue
+            task = channel.update_task(task_id, CANCELLED_FIELDS)
+            if task is not None:
+                channel.emit("task", dict(task))
+                touched[channel.batch_id] = channel
+        for channel in touched.values():
+            channel.emit_summary()
+        return list(touched.values())
+
+    def sync_from_store(self, batch_id: str, tasks: Iterable[dict]) -> bool:
+        """
+        用任务存储中的状态校正批次通道，返回是否有变化
+
+        只补上存储中已结束、通道中尚未结束的任务；其余进度以本进程的监听器为准，
+        避免用查询时刻的旧状态覆盖查询之后到达的更新。
+        """
+        with self._lock:
+            channel = self._channels.get(batch_id)
+            if channel is None:
+                return False
+            changed = False
+            for task in tasks:
+                known = channel.tasks.get(task["task_id"])
+                if known is None or known["status"] in TERMINAL_STATUSES \
+                        or task["status"] not in TERMINAL_STATUSES:
+                    continue
+                updated = channel.update_task(task["task_id"], _task_view(task))
+                if updated is not None:
+                    channel.emit("task", dict(updated))
+                    changed = True
+            if not changed:
+                return False
+            channel.emit_summary()
+            waiters = list(channel.waiters)
+        self._wake(waiters)
+        return True
+
+    def _evict(self) -> None:
+        """淘汰结束已久的通道；通道过多时优先淘汰已结束的，其次是最早创建的"""
+        now = time.time()
+        expired = [bid for bid, ch in self._channels.items()
+                   if ch.done_at is not None and now - ch.done_at > self.retention and not ch.waiters]
+        overflow = len(self._channels) - len(expired) - MAX_CHANNELS
+        if overflow > 0:
+            candidates = [bid for bid, ch in self._channels.items() if bid not in expired and ch.done_at is not None]
+            candidates += [bid for bid in self._channels if bid not in expired and bid not in candidates]
+            expired += candidates[:overflow]
+        for batch_id in expired:
+            channel = self._channels.pop(batch_id)
+            for task_id in channel.tasks:
+                self._task_batches.pop(task_id, None)
+
+    # ---- 订阅 ----
+
+    def has_batch(self, batch_id: str) -> bool:
+        with self._lock:
+            return batch_id in self._channels
+
+    def subscribe(self, batch_id: str, loop: asyncio.AbstractEventLoop) -> Optional[asyncio.Event]:
+        """订阅批次的新事件通知，本进程中没有该批次时返回 None"""
+        with self._lock:
+            channel = self._channels.get(batch_id)
+            if channel is None:
+                return None
+            waiter = asyncio.Event()
+            channel.waiters.append((loop, waiter))
+            return waiter
+
+    def unsubscribe(self, batch_id: str, waiter: asyncio.Event) -> None:
+        with self._lock:
+            channel = self._channels.get(batch_id)
+            if channel is not None:
+                channel.waiters = [w for w in channel.waiters if w[1] is not waiter]
+
+    def read(self, batch_id: str, last_id: Optional[int]) -> Optional[Tuple[List[str], int, bool]]:
+        """
+        读取 last_id 之后的事件
+
+        Returns:
+            (SSE 消息列表, 最新事件编号, 批次是否已结束)；通道不存在时返回 None
+        """
+        with self._lock:
+            channel = self._channels.get(batch_id)
+            if channel is None:
+                return None
+            done = channel.done_at is not None
+            oldest = channel.events[0][0] if channel.events else channel.last_id + 1
+            if last_id is None or last_id < oldest - 1 or last_id > channel.last_id:
+                # 新连接、落后太多或事件编号不属于本通道（例如服务重启）：发送快照
+                chunks = [channel.snapshot()]
+            else:
+                chunks = [text for event_id, text in channel.events if event_id > last_id]
+            if done and not (chunks and "event: done\n" in chunks[-1]):
+                # 已结束的批次补发一次 done，让客户端关闭连接而不是反复重连
+                chunks.append(format_event("done", channel.summary()))
+            return chunks, channel.last_id, done
+
+
+report_event_bus = ReportEventBus()
+register_store_listener(report_event_bus.on_store_event)
+
+
+def get_report_event_bus() -> ReportEventBus:
+    return report_event_bus
+
+
+# ---------------------------------------------------------------------------
+# SSE 流
+# ---------------------------------------------------------------------------
+
+async def _wait(waiter: Optional[asyncio.Event], timeout: float) -> bool:
+    """等待新事件，超时返回 False"""
+    try:
+        if waiter is None:
+            await asyncio.sleep(timeout)
+            return False
+        await asyncio.wait_for(waiter.wait(), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def _poll_store(batch_id: str, task_store, is_disconnected: Callable[[], Awaitable[bool]],
+                      interval: float) -> AsyncIterator[str]:
+    """本进程中没有批次通道时，定时查询任务存储并推送变化"""
+    from starlette.concurrency import run_in_threadpool
+
+    known: Dict[str, Tuple] = {}
+    idle = 0.0
+    while True:
+        tasks = await run_in_threadpool(task_store.find, limit=MAX_BATCH_TASKS, batch_id=batch_id)
+        if not tasks:
+            yield format_event("error", {"batch_id": batch_id, "message": "批次不存在或已过期"})
+            return
+        summary = summarize(batch_id, tasks)
+        if not known:
+            yield format_event("snapshot", {"batch": summary, "tasks": [_task_view(t) for t in tasks]})
+        else:
+            changed = [t for t in tasks if known.get(t["task_id"]) != (t["status"], t["progress"])]
+            for task in changed:
+                yield format_event("task", _task_view(task))
+            if changed:
+                yield format_event("batch", summary)
+                idle = 0.0
+        known = {t["task_id"]: (t["status"], t["progress"]) for t in tasks}
+        if summary["done"]:
+            yield format_event("done", summary)
+            return
+        await asyncio.sleep(interval)
+        idle += interval
+        if idle >= HEARTBEAT_INTERVAL:
+            yield ": keepalive\n\n"
+            idle = 0.0
+        if await is_disconnected():
+            return
+
+
+async def batch_event_stream(batch_id: str, last_event_id: Optional[int], task_store,
+                             is_disconnected: Callable[[], Awaitable[bool]],
+                             bus: Optional[ReportEventBus] = None) -> AsyncIterator[str]:
+    """批次进度的 SSE 消息流，批次结束或客户端断开时结束"""
+    from starlette.concurrency import run_in_threadpool
+
+    bus = bus or report_event_bus
+    yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+    waiter = bus.subscribe(batch_id, asyncio.get_running_loop())
+    if waiter is not None:
+        try:
+            last_id = last_event_id
+            while True:
+                waiter.clear()
+                result = bus.read(batch_id, last_id)
+                if result is None:
+                    break  # 通道已被淘汰，改为查询任务存储
+                chunks, last_id, done = result
+                for chunk in chunks:
+                    yield chunk
+                if done:
+                    return
+                if not await _wait(waiter, HEARTBEAT_INTERVAL):
+                    # 空闲时与任务存储对账，有变化时下一轮直接读取补发的事件
+                    tasks = await run_in_threadpool(task_store.find, limit=MAX_BATCH_TASKS, batch_id=batch_id)
+                    if not bus.sync_from_store(batch_id, tasks):
+                        yield ": keepalive\n\n"
+                if await is_disconnected():
+                    return
+        finally:
+            bus.unsubscribe(batch_id, waiter)
+
+    interval = _get_int_env("REPORT_EVENT_POLL_INTERVAL", 2)
+    async for chunk in _poll_store(batch_id, task_store, is_disconnected, interval):
+        yield chunk
@@ -0,0 +1,404 @@
+"""
+报告任务状态存储
+
+替代 report_api 中进程内的 report_tasks 字典，任务状态可以在多个uvicorn
+worker之间共享，服务重启后也不会丢失。提供两种实现：
+- SQLReportTaskStore: 基于数据库表 report_tasks（主库或本地SQLite文件）
+- MemoryReportTaskStore: 进程内字典，仅用于单进程调试和测试
+
+所有任务都带有过期时间，过期记录在读取时被忽略，并在写入时按间隔批量清理。
+同一次批量生成的任务带有相同的 batch_id，可以整批取消（取消标记写在存储中，对所有进程可见）。
+任务开始执行时用 mark_started 原子地把状态从 pending/retrying 改为 generating，
+与其他进程的取消操作不会互相覆盖。
+任务的创建、更新和取消会通知已注册的监听器（见 register_store_listener），用于推送进度事件。
+
+相关环境变量：
+- REPORT_TASK_STORE: db（默认，使用主数据库）/ sqlite / memory
+- REPORT_TASK_STORE_URL: sqlite 模式下的数据库地址，默认 sqlite:///./report_tasks.db
+- REPORT_TASK_TTL: 任务保留时长（秒），默认 86400
+"""
+import itertools
+import os
+import threading
+from abc import ABC, abstractmethod
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Index, Integer, MetaData, String, Table, Text,
+    create_engine, delete, select, update,
+)
+
+# 任务状态字段（除主键和索引字段外，可通过 update 修改的字段）
+TASK_FIELDS = ("status", "progress", "file_path", "error_message", "report_id", "attempts")
+# 任务标识字段
+KEY_FIELDS = ("task_id", "user_id", "paper_id", "batch_id")
+# 尚未开始执行、可以取消的状态
+CANCELLABLE_STATUSES = ("pending", "retrying")
+# 任务开始执行时写入的字段
+STARTED_FIELDS = {"status": "generating", "progress": 5, "error_message": None}
+# 任务被取消时写入的字段
+CANCELLED_FIELDS = {"status": "cancelled", "progress": 100, "error_message": "任务已取消"}
+
+# 单条 IN 查询允许的最大任务数
+QUERY_CHUNK_SIZE = 1000
+
+
+def _default_ttl() -> int:
+    try:
+        return int(os.getenv("REPORT_TASK_TTL", 86400))
+    except ValueError:
+        return 86400
+
+
+def _new_task(task_id: str, user_id: int, paper_id: int, batch_id: Optional[str] = None, **fields) -> dict:
+    task = {
+        "task_id": task_id,
+        "user_id": user_id,
+        "paper_id": paper_id,
+        "batch_id": batch_id,
+        "status": "pending",
+        "progress": 0,
+        "file_path": None,
+        "error_message": None,
+        "report_id": None,
+        "attempts": 0,
+    }
+    task.update({k: v for k, v in fields.items() if k in TASK_FIELDS})
+    return task
+
+
+class ReportTaskStore(ABC):
+    """任务状态存储接口"""
+
+    def __init__(self, ttl: Optional[int] = None):
+        self.ttl = ttl if ttl is not None else _default_ttl()
+        self._listeners: List[Callable[[str, dict], None]] = []
+
+    def add_listener(self, listener: Callable[[str, dict], None]) -> None:
+        """
+        注册变更监听器，listener(kind, data) 在写入成功后于写入线程中调用：
+        - created: {"tasks": [任务, ...]}
+        - updated: {"task_id": 任务ID, "fields": 更新的字段}
+        - cancelled: {"batch_id": 批次ID, "task_ids": [被取消的任务ID, ...]}
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, kind: str, data: dict) -> None:
+        for listener in self._listeners:
+            try:
+                listener(kind, data)
+            except Exception as e:
+                print(f"[任务存储] 通知监听器失败: {str(e)}")
+
+    def create(self, task_id: str, user_id: int, paper_id: int, **fields) -> dict:
+        return self.create_many([_new_task(task_id, user_id, paper_id, **fields)])[0]
+
+    @abstractmethod
+    def create_many(self, tasks: List[dict]) -> List[dict]:
+        """批量创建任务，tasks 中每项至少包含 task_id/user_id/paper_id"""
+
+    @abstractmethod
+    def update(self, task_id: str, **fields) -> None:
+        """更新任务状态字段（TASK_FIELDS 以外的字段忽略）"""
+
+    @abstractmethod
+    def mark_started(self, task_id: str) -> bool:
+        """
+        把尚未开始的任务（pending/retrying）标记为生成中并清除上次的错误信息
+
+        状态检查和更新是一次原子操作；任务已被取消、已在执行或不存在时返回 False。
+        """
+
+    def get(self, task_id: str) -> Optional[dict]:
+        return self.get_many([task_id]).get(task_id)
+
+    @abstractmethod
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        """批量读取未过期的任务，返回 任务ID -> 任务"""
+
+    @abstractmethod
+    def find(self, paper_id: Optional[int] = None, user_id: Optional[int] = None,
+             limit: int = 1000, batch_id: Optional[str] = None) -> List[dict]:
+        """按条件查询未过期的任务，按创建时间倒序（最新的在前）"""
+
+    @abstractmethod
+    def cancel_batch(self, batch_id: str) -> List[str]:
+        """取消批次中尚未开始执行的任务，返回被取消的任务ID"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """删除过期任务，返回删除的条数"""
+
+
+def _public(task: dict) -> dict:
+    """去掉内存存储的内部字段"""
+    return {k: v for k, v in task.items() if k not in ("expires_at", "_seq")}
+
+
+class MemoryReportTaskStore(ReportTaskStore):
+    """进程内任务存储"""
+
+    def __init__(self, ttl: Optional[int] = None):
+        super().__init__(ttl)
+        self._tasks: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()  # 创建顺序，find 按此倒序返回（与 SQL 实现的 created_at 倒序一致）
+
+    def create_many(self, tasks: List[dict]) -> List[dict]:
+        tasks = [_new_task(**task) for task in tasks]
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            for task in tasks:
+                self._tasks[task["task_id"]] = dict(task, expires_at=expires_at, _seq=next(self._seq))
+        self.purge_expired()
+        self._notify("created", {"tasks": tasks})
+        return tasks
+
+    def update(self, task_id: str, **fields) -> None:
+        values = {k: v for k, v in fields.items() if k in TASK_FIELDS}
+        if not values:
+            return
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                return
+            task.update(values)
+        self._notify("updated", {"task_id": task_id, "fields": values})
+
+    def mark_started(self, task_id: str) -> bool:
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task["status"] not in CANCELLABLE_STATUSES:
+                return False
+            task.update(STARTED_FIELDS)
+        self._notify("updated", {"task_id": task_id, "fields": dict(STARTED_FIELDS)})
+        return True
+
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        now = time.time()
+        result = {}
+        with self._lock:
+            for tid in task_ids:
+                task = self._tasks.get(tid)
+                if task is not None and task["expires_at"] > now:
+                    result[tid] = _public(task)
+        return result
+
+    def find(self, paper_id: Optional[int] = None, user_id: Optional[int] = None,
+             limit: int = 1000, batch_id: Optional[str] = None) -> List[dict]:
+        now = time.time()
+        with self._lock:
+            tasks = [
+                task for task in self._tasks.values()
+                if task["expires_at"] > now
+                and (paper_id is None or task["paper_id"] == paper_id)
+                and (user_id is None or task["user_id"] == user_id)
+                and (batch_id is None or task["batch_id"] == batch_id)
+            ]
+            tasks.sort(key=lambda task: task["_seq"], reverse=True)
+            return [_public(task) for task in tasks[:limit]]
+
+    def cancel_batch(self, batch_id: str) -> List[str]:
+        cancelled = []
+        with self._lock:
+            for task in self._tasks.values():
+                if task["batch_id"] == batch_id and task["status"] in CANCELLABLE_STATUSES:
+                    task.update(CANCELLED_FIELDS)
+                    cancelled.append(task["task_id"])
+        if cancelled:
+            self._notify("cancelled", {"batch_id": batch_id, "task_ids": cancelled})
+        return cancelled
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [tid for tid, task in self._tasks.items() if task["expires_at"] <= now]
+            for tid in expired:
+                del self._tasks[tid]
+        return len(expired)
+
+
+# 任务表使用独立的 MetaData，避免依赖 app.main 中的 Base（后台进程和测试中也能使用）
+metadata = MetaData()
+
+report_tasks_table = Table(
+    "report_tasks",
+    metadata,
+    Column("task_id", String(64), primary_key=True),
+    Column("user_id", Integer, nullable=False, index=True),
+    Column("paper_id", Integer, nullable=False, index=True),
+    Column("batch_id", String(32), index=True),
+    Column("status", String(20), nullable=False, default="pending"),
+    Column("progress", Integer, nullable=False, default=0),
+    Column("file_path", String(500)),
+    Column("error_message", Text),
+    Column("report_id", Integer),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("created_at", DateTime, default=datetime.now),
+    Column("updated_at", DateTime, default=datetime.now, onupdate=datetime.now),
+    Column("expires_at", DateTime, nullable=False, index=True),
+    Index("idx_report_tasks_paper_user", "paper_id", "user_id"),
+)
+
+
+class SQLReportTaskStore(ReportTaskStore):
+    """基于数据库表的任务存储"""
+
+    # 两次过期清理之间的最小间隔（秒）
+    PURGE_INTERVAL = 300
+
+    def __init__(self, engine, ttl: Optional[int] = None):
+        super().__init__(ttl)
+        self.engine = engine
+        self._last_purge = 0.0
+        metadata.create_all(bind=engine, tables=[report_tasks_table], checkfirst=True)
+
+    @staticmethod
+    def _row_to_task(row) -> dict:
+        data = dict(row._mapping)
+        return {k: data.get(k) for k in KEY_FIELDS + TASK_FIELDS}
+
+    def create_many(self, tasks: List[dict]) -> List[dict]:
+        if not tasks:
+            return tasks
+        tasks = [_new_task(**task) for task in tasks]
+        now = datetime.now()
+        expires_at = now + timedelta(seconds=self.ttl)
+        rows = [
+            dict({k: task.get(k) for k in KEY_FIELDS + TASK_FIELDS},
+                 created_at=now, updated_at=now, expires_at=expires_at)
+            for task in tasks
+        ]
+        with self.engine.begin() as conn:
+            conn.execute(report_tasks_table.insert(), rows)
+        self._maybe_purge()
+        self._notify("created", {"tasks": tasks})
+        return tasks
+
+    def update(self, task_id: str, **fields) -> None:
+        values = {k: v for k, v in fields.items() if k in TASK_FIELDS}
+        if not values:
+            return
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(report_tasks_table)
+                .where(report_tasks_table.c.task_id == task_id)
+                .values(updated_at=datetime.now(), **values)
+            )
+        self._notify("updated", {"task_id": task_id, "fields": values})
+
+    def mark_started(self, task_id: str) -> bool:
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                update(report_tasks_table)
+                .where(report_tasks_table.c.task_id == task_id)
+                .where(report_tasks_table.c.status.in_(CANCELLABLE_STATUSES))
+                .values(updated_at=datetime.now(), **STARTED_FIELDS)
+            )
+        if result.rowcount != 1:
+            return False
+        self._notify("updated", {"task_id": task_id, "fields": dict(STARTED_FIELDS)})
+        return True
+
+    def get_many(self, task_ids: Iterable[str]) -> Dict[str, dict]:
+        ids = list(dict.fromkeys(task_ids))
+        result = {}
+        if not ids:
+            return result
+        now = datetime.now()
+        with self.engine.connect() as conn:
+            for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+                chunk = ids[start:start + QUERY_CHUNK_SIZE]
+                rows = conn.execute(
+                    select(report_tasks_table)
+                    .where(report_tasks_table.c.task_id.in_(chunk))
+                    .where(report_tasks_table.c.expires_at > now)
+                )
+                for row in rows:
+                    task = self._row_to_task(row)
+                    result[task["task_id"]] = task
+        return result
+
+    def find(self, paper_id: Optional[int] = None, user_id: Optional[int] = None,
+             limit: int = 1000, batch_id: Optional[str] = None) -> List[dict]:
+        stmt = select(report_tasks_table).where(report_tasks_table.c.expires_at > datetime.now())
+        if paper_id is not None:
+            stmt = stmt.where(report_tasks_table.c.paper_id == paper_id)
+        if user_id is not None:
+            stmt = stmt.where(report_tasks_table.c.user_id == user_id)
+        if batch_id is not None:
+            stmt = stmt.where(report_tasks_table.c.batch_id == batch_id)
+        stmt = stmt.order_by(report_tasks_table.c.created_at.desc()).limit(limit)
+        with self.engine.connect() as conn:
+            return [self._row_to_task(row) for row in conn.execute(stmt)]
+
+    def cancel_batch(self, batch_id: str) -> List[str]:
+        condition = (report_tasks_table.c.batch_id == batch_id) & \
+            report_tasks_table.c.status.in_(CANCELLABLE_STATUSES)
+        with self.engine.begin() as conn:
+            task_ids = [row[0] for row in conn.execute(select(report_tasks_table.c.task_id).where(condition))]
+            conn.execute(
+                update(report_tasks_table).where(condition).values(updated_at=datetime.now(), **CANCELLED_FIELDS)
+            )
+        if task_ids:
+            self._notify("cancelled", {"batch_id": batch_id, "task_ids": task_ids})
+        return task_ids
+
+    def purge_expired(self) -> int:
+        self._last_purge = time.time()
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                delete(report_tasks_table).where(report_tasks_table.c.expires_at <= datetime.now())
+            )
+            return result.rowcount or 0
+
+    def _maybe_purge(self):
+        if time.time() - self._last_purge < self.PURGE_INTERVAL:
+            return
+        try:
+            removed = self.purge_expired()
+            if removed:
+                print(f"[任务存储] 已清理过期任务 {removed} 条")
+        except Exception as e:
+            print(f"[任务存储] 清理过期任务失败: {str(e)}")
+
+
+_store: Optional[ReportTaskStore] = None
+_store_lock = threading.Lock()
+_default_listeners: List[Callable[[str, dict], None]] = []
+
+
+def register_store_listener(listener: Callable[[str, dict], None]) -> None:
+    """注册全局任务存储的变更监听器（全局存储尚未创建时在创建后注册）"""
+    with _store_lock:
+        if listener not in _default_listeners:
+            _default_listeners.append(listener)
+        if _store is not None:
+            _store.add_listener(listener)
+
+
+def create_report_task_store(backend: Optional[str] = None) -> ReportTaskStore:
+    """根据配置创建任务存储"""
+    backend = (backend or os.getenv("REPORT_TASK_STORE", "db")).lower()
+    if backend == "memory":
+        return MemoryReportTaskStore()
+    if backend == "sqlite":
+        url = os.getenv("REPORT_TASK_STORE_URL", "sqlite:///./report_tasks.db")
+        return SQLReportTaskStore(create_engine(url, future=True))
+    # 默认使用主数据库
+    from app.main import engine
+    return SQLReportTaskStore(engine)
+
+
+def get_report_task_store() -> ReportTaskStore:
+    """获取全局任务存储"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = create_report_task_store()
+            for listener in _default_listeners:
+                _store.add_listener(listener)
+        return _store
@@ -10,6 +10,7 @@ from datetime import datetime
 from app.models.report_template import ReportTemplate
 from app.schemas.report_template import ReportTemplateCreate, ReportTemplateUpdate
 from reports.generators.generate_report import generate_preview_html
+from reports.generators.template_registry import invalidate_templates
 from reports.generators.template_components import (
     get_component, get_components_by_type, 
     generate_template_with_components, generate_default_template
@@ -165,6 +166,7 @@ class ReportTemplateService:
                 template_path = self.template_base_path / template_name
                 if template_path.exists():
                     template_path.unlink()
+                invalidate_templates(template_name)
             
             # 删除配置文件
             config_path = self.config_base_path / f"{db_template.paper_id}.yaml"
@@ -186,28 +188,27 @@ class ReportTemplateService:
             if template_id:
                 print(f"使用模板ID预览: {template_id}")
                 try:
-                    from sqlalchemy.orm import Session
-                    from app.main import get_db_session
+                    from app.database import session_scope
                     
                     # 获取数据库会话
-                    db: Session = next(get_db_session())
+                    with session_scope("模板预览") as db:
                     
-                    # 获取模板详情
-                    template = self.get_report_template(db, template_id)
+                        # 获取模板详情
+                        template = self.get_report_template(db, template_id)
                     
-                    if not template:
-                        print(f"错误: 未找到ID为{template_id}的模板")
-                        raise HTTPException(status_code=404, detail=f"未找到ID为{template_id}的模板")
+                        if not template:
+                            print(f"错误: 未找到ID为{template_id}的模板")
+                            raise HTTPException(status_code=404, detail=f"未找到ID为{template_id}的模板")
                     
-                    # 解析配置
-                    config = json.loads(template.config) if isinstance(template.config, str) else template.config
-                    yaml_config = template.yaml_config
+                        # 解析配置
+                        config = json.loads(template.config) if isinstance(template.config, str) else template.config
+                        yaml_config = template.yaml_config
                     
-                    # 更新模板数据
-                    template_data['config'] = config
-                    template_data['yaml_config'] = yaml_config
+                        # 更新模板数据
+                        template_data['config'] = config
+                        template_data['yaml_config'] = yaml_config
                     
-                    print(f"成功获取模板配置: {template.name}")
+                        print(f"成功获取模板配置: {template.name}")
                 except Exception as e:
                     print(f"获取模板详情失败: {str(e)}")
                     return f"""<!DOCTYPE html>
@@ -627,6 +628,8 @@ class ReportTemplateService:
         if html_content:
             with open(template_path, 'w', encoding='utf-8') as f:
                 f.write(html_content)
+            # 模板内容已变化，丢弃已编译的旧模板
+            invalidate_templates(template_name)
 
 # 创建服务实例
 report_template_service = ReportTemplateService() 
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+接口响应短时缓存
+
+仪表盘等聚合接口的结果在短时间内被大量重复请求，这里按 (命名空间, 参数) 缓存计算结果：
+- 到期（默认 30 秒）后重新计算，多进程部署时各进程缓存最多滞后一个 TTL
+- 数据发生变化时（如被试者交卷）按命名空间主动失效
+- 缓存的结果会被多个请求共享，调用方不得修改返回的对象
+
+相关环境变量：
+- DASHBOARD_CACHE_TTL: 仪表盘缓存有效期（秒），默认 30，设为 0 关闭缓存
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ResponseCache:
+    """带 TTL 的进程内响应缓存"""
+
+    def __init__(self, ttl: Optional[int] = None, max_entries: int = 1024):
+        self.ttl = ttl if ttl is not None else _get_int_env("DASHBOARD_CACHE_TTL", 30)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Tuple[int, int], Any]]" = OrderedDict()
+        # 全局和各命名空间的版本号，失效时递增，丢弃失效期间正在计算的结果
+        self._epoch = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def _generation(self, namespace: Hashable) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(namespace, 0)
+
+    def get_or_set(self, key: Tuple[Hashable, ...], loader: Callable[[], Any]) -> Any:
+        """
+        读取缓存，未命中或已过期时调用 loader 计算并写入
+
+        Args:
+            key: 第一个元素为命名空间，例如 ("dashboard", "paper-completion")
+        """
+        if self.ttl <= 0:
+            return loader()
+        namespace = key[0]
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation(namespace)
+            if entry is not None:
+                expires_at, entry_generation, value = entry
+                if expires_at > now and entry_generation == generation:
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+        value = loader()
+        with self._lock:
+            if self._generation(namespace) == generation:
+                self._entries[key] = (now + self.ttl, generation, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, namespace: Optional[Hashable] = None) -> None:
+        """失效某个命名空间下的全部缓存，未指定时清空所有缓存"""
+        with self._lock:
+            if namespace is None:
+                self._epoch += 1
+                self._entries.clear()
+                return
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[key]
+
+
+response_cache = ResponseCache()
+
+DASHBOARD_NAMESPACE = "dashboard"
+
+
+def cached_dashboard(name: str, *args, loader: Callable[[], Any]) -> Any:
+    return response_cache.get_or_set((DASHBOARD_NAMESPACE, name) + args, loader)
+
+
+def invalidate_dashboard_cache() -> None:
+    response_cache.invalidate(DASHBOARD_NAMESPACE)
@@ -0,0 +1,234 @@
+"""
+试卷算分服务
+
+按试卷批量计算被试者的小维度、大维度及总分：
+- 题目-维度映射、维度、题目分数各查询一次
+- 所有被试者的答题记录一次性取出（被试者较多时按批次分块）
+- 答案解析按不同答案文本去重缓存，打分与按维度汇总使用 pandas 向量化完成
+
+计算规则与原 calculate_user_paper_score 完全一致：
+小维度分 = 该维度下各题得分的平均值；
+大维度分 = 其下小维度分的平均值（没有小维度时取直接挂在大维度下题目的平均分）；
+总分 = 各大维度分的平均值。所有平均值均保留两位小数。
+"""
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+# 题目未配置分数时使用的默认选项分数
+DEFAULT_OPTION_SCORES = [10, 7, 4, 1]
+
+# 单次查询答题记录时的最大被试者数
+USER_CHUNK_SIZE = 1000
+
+
+class DimensionInfo(NamedTuple):
+    id: int
+    name: str
+    parent_id: Optional[int]
+
+
+class PaperScoringData(NamedTuple):
+    """试卷算分所需的静态数据"""
+    question_dim_map: Dict[int, Optional[int]]   # 题目ID -> 维度ID（按试卷题目顺序）
+    dimensions: List[DimensionInfo]               # 试卷全部维度
+    question_scores: Dict[int, Any]               # 题目ID -> 选项分数列表
+
+
+def answer_to_index(ans) -> Optional[int]:
+    """
+    将答题记录中的答案解析为选项下标
+
+    支持 JSON 字符串（如 '["A"]'、'[0]'）、单个字母（如 'B'）以及已解析的列表。
+    无法解析时返回 None。
+    """
+    def _label_to_index(label):
+        if isinstance(label, str) and len(label) == 1:
+            return ord(label.upper()) - ord('A')
+        return None
+
+    if isinstance(ans, str):
+        try:
+            parsed = json.loads(ans)
+        except (ValueError, TypeError):
+            return _label_to_index(ans)
+        ans = parsed
+        if not isinstance(ans, list):
+            return None
+    if isinstance(ans, list) and len(ans) > 0:
+        first = ans[0]
+        if isinstance(first, int):
+            return first
+        if isinstance(first, str):
+            return _label_to_index(first)
+    return None
+
+
+def load_paper_scoring_data(db, paper_id: int) -> PaperScoringData:
+    """读取试卷算分所需的题目、维度与分数配置"""
+    from app.main import PaperQuestion, Dimension, Question
+
+    rows = db.query(PaperQuestion.question_id, PaperQuestion.dimension_id).filter(
+        PaperQuestion.paper_id == paper_id
+    ).order_by(PaperQuestion.id).all()
+    question_dim_map = {}
+    for question_id, dimension_id in rows:
+        question_dim_map[question_id] = dimension_id
+
+    dimensions = [
+        DimensionInfo(d.id, d.name, d.parent_id)
+        for d in db.query(Dimension.id, Dimension.name, Dimension.parent_id).filter(
+            Dimension.paper_id == paper_id
+        ).order_by(Dimension.id).all()
+    ]
+
+    question_scores = {}
+    if question_dim_map:
+        question_scores = {
+            qid: scores
+            for qid, scores in db.query(Question.id, Question.scores).filter(
+                Question.id.in_(list(question_dim_map.keys()))
+            ).all()
+        }
+
+    return PaperScoringData(question_dim_map, dimensions, question_scores)
+
+
+def fetch_answer_rows(db, user_ids: List[int], question_ids: List[int]) -> List[tuple]:
+    """批量读取答题记录，返回 (user_id, question_id, answer) 列表（按记录ID排序）"""
+    if not user_ids or not question_ids:
+        return []
+    query = text(
+        "SELECT user_id, question_id, answer FROM answers "
+        "WHERE user_id IN :uids AND question_id IN :qids ORDER BY id"
+    ).bindparams(bindparam("uids", expanding=True), bindparam("qids", expanding=True))
+
+    rows = []
+    for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+        chunk = user_ids[start:start + USER_CHUNK_SIZE]
+        rows.extend(tuple(r) for r in db.execute(query, {"uids": chunk, "qids": question_ids}).fetchall())
+    return rows
+
+
+def _build_score_table(data: PaperScoringData) -> pd.DataFrame:
+    """展开为长表：每个（题目, 选项下标）一行，附带得分、维度及题目顺序"""
+    records = []
+    for order, (qid, dim_id) in enumerate(data.question_dim_map.items()):
+        if dim_id is None:
+            continue
+        q_scores = data.question_scores.get(qid, DEFAULT_OPTION_SCORES)
+        if not q_scores:
+            continue
+        for idx, score in enumerate(q_scores):
+            records.append((qid, idx, score, dim_id, order))
+    return pd.DataFrame(records, columns=["question_id", "idx", "score", "dim_id", "q_order"])
+
+
+def _sum_scores(scored: pd.DataFrame) -> pd.DataFrame:
+    """按（被试者, 维度）汇总得分和题数"""
+    grouped = scored.groupby(["user_id", "dim_id"], sort=False)["score"]
+    values = scored["score"].tolist()
+    if all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        # 整数分数直接向量化求和，结果精确
+        scored = scored.assign(score=scored["score"].astype("int64"))
+        grouped = scored.groupby(["user_id", "dim_id"], sort=False)["score"]
+        sums = grouped.sum()
+    else:
+        # 含小数分数时按题目顺序逐项相加，保证与逐题累加的结果一致
+        sums = grouped.agg(lambda s: sum(s.tolist()))
+    counts = grouped.size()
+    return pd.DataFrame({"total": sums, "count": counts}).reset_index()
+
+
+def compute_paper_scores(data: PaperScoringData, answer_rows: Iterable[tuple],
+                         user_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    根据已加载的数据计算每个被试者的分数
+
+    Returns:
+        {user_id: {"total_score": ..., "big_dimensions": [{"name", "score", "sub_dimensions": [...]}]}}
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+
+    # 1. 解析答案（相同答案文本只解析一次）
+    answers = pd.DataFrame(list(answer_rows), columns=["user_id", "question_id", "answer"])
+    dim_scores: Dict[int, Dict[int, tuple]] = defaultdict(dict)
+    if not answers.empty:
+        # 同一题存在多条记录时以最后一条为准
+        answers = answers.drop_duplicates(["user_id", "question_id"], keep="last")
+        index_cache = {}
+        def _cached_index(ans):
+            key = ans if isinstance(ans, str) else json.dumps(ans)
+            if key not in index_cache:
+                index_cache[key] = answer_to_index(ans)
+            return index_cache[key]
+        answers["idx"] = answers["answer"].map(_cached_index)
+        answers = answers.dropna(subset=["idx"])
+
+        # 2. 与分数长表关联得到每题得分（无效下标自然被过滤）
+        score_table = _build_score_table(data)
+        if not answers.empty and not score_table.empty:
+            answers["idx"] = answers["idx"].astype("int64")
+            scored = answers.merge(score_table, on=["question_id", "idx"], how="inner")
+            scored = scored.sort_values("q_order", kind="stable")
+            if not scored.empty:
+                summary = _sum_scores(scored)
+                for user_id, dim_id, total, count in summary.itertuples(index=False):
+                    dim_scores[int(user_id)][int(dim_id)] = (total, int(count))
+
+    # 3. 按维度层级计算平均分
+    big_dims = [d for d in data.dimensions if d.parent_id is None]
+    small_dims = [d for d in data.dimensions if d.parent_id is not None]
+    subs_by_parent = defaultdict(list)
+    for d in small_dims:
+        subs_by_parent[d.parent_id].append(d)
+
+    def _avg(entry):
+        if not entry:
+            return 0.0
+        total, count = entry
+        return round(_to_python(total) / count, 2)
+
+    results = {}
+    for user_id in user_ids:
+        user_scores = dim_scores.get(user_id, {})
+        small_avg = {d.id: _avg(user_scores.get(d.id)) for d in small_dims}
+
+        big_avgs = []
+        big_detail = []
+        for big in big_dims:
+            sub_dims = subs_by_parent.get(big.id, [])
+            if sub_dims:
+                sub_scores = [small_avg[d.id] for d in sub_dims]
+                avg = round(sum(sub_scores) / len(sub_scores), 2)
+            else:
+                avg = _avg(user_scores.get(big.id))
+            big_avgs.append(avg)
+            big_detail.append({
+                "name": big.name,
+                "score": avg,
+                "sub_dimensions": [{"name": d.name, "score": small_avg[d.id]} for d in sub_dims]
+            })
+
+        total_score = 0
+        if big_avgs:
+            total_score = round(sum(big_avgs) / len(big_avgs), 2)
+
+        results[user_id] = {"total_score": total_score, "big_dimensions": big_detail}
+    return results
+
+
+def _to_python(value):
+    """numpy 标量转换为 Python 数值"""
+    return value.item() if hasattr(value, "item") else value
+
+
+def calculate_paper_scores(db, paper_id: int, user_ids: Iterable[int]) -> Dict[int, dict]:
+    """批量计算一份试卷下多个被试者的分数"""
+    user_ids = list(dict.fromkeys(user_ids))
+    data = load_paper_scoring_data(db, paper_id)
+    answer_rows = fetch_answer_rows(db, user_ids, list(data.question_dim_map.keys()))
+    return compute_paper_scores(data, answer_rows, user_ids)
@@ -0,0 +1,169 @@
+"""
+题目/选项乱序服务
+
+每个被试者看到的题目顺序和选项顺序由 (试卷ID, 分配ID, 题目ID) 的带密钥哈希即时推导，
+不再写入 paper_assignments.question_order / option_orders，也不使用全局 random 状态：
+- 同一分配每次请求得到完全相同的顺序，重做试卷（分配ID不变）时顺序也不变
+- 每道题的排序键只取决于该题自身，试卷增删题目不会打乱其他题目的选项顺序
+- 整份试卷的哈希结果拼成矩阵后用 numpy 一次性排序
+
+提交答案时，前端传回的是展示给被试者的选项标签，使用 restore_answers 还原为原始选项，
+answers 表中保存的始终是原始选项标签，算分逻辑无需感知乱序。
+
+相关环境变量：
+- SHUFFLE_KEY: 乱序哈希密钥，未设置时使用 JWT 密钥派生
+"""
+import hashlib
+import os
+import struct
+from types import MappingProxyType
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 每个题目摘要 64 字节：前 48 字节作为 12 个选项的排序键，最后 8 字节作为题目排序键
+DIGEST_SIZE = 64
+OPTION_KEY_SLOTS = 12
+_UINT64_MAX = np.iinfo(np.uint64).max
+
+_shuffle_key: Optional[bytes] = None
+
+
+def _get_shuffle_key() -> bytes:
+    global _shuffle_key
+    if _shuffle_key is None:
+        secret = os.getenv("SHUFFLE_KEY")
+        if not secret:
+            from app.main import SECRET_KEY
+            secret = SECRET_KEY
+        # blake2b 密钥最长 64 字节，统一派生为 32 字节
+        _shuffle_key = hashlib.blake2b(secret.encode("utf-8"), digest_size=32, person=b"shuffle-key").digest()
+    return _shuffle_key
+
+
+class ShuffleLayout(NamedTuple):
+    """某个分配的题目顺序与选项顺序"""
+    question_order: Tuple[int, ...]
+    # {题目ID: 展示位置 -> 原始选项下标}，未启用选项乱序的题目不在其中
+    option_orders: MappingProxyType
+
+    def option_order(self, question_id: int, option_count: int) -> Tuple[int, ...]:
+        return self.option_orders.get(question_id) or tuple(range(option_count))
+
+
+def _digest_matrix(paper_id: int, assignment_id: int, question_ids: Sequence[int]) -> np.ndarray:
+    """计算每道题的带密钥摘要，返回 (题目数, 64) 的 uint8 矩阵"""
+    key = _get_shuffle_key()
+    prefix = struct.pack("<qq", paper_id, assignment_id)
+    buf = b"".join(
+        hashlib.blake2b(prefix + struct.pack("<q", qid), key=key, digest_size=DIGEST_SIZE).digest()
+        for qid in question_ids
+    )
+    return np.frombuffer(buf, dtype=np.uint8).reshape(len(question_ids), DIGEST_SIZE)
+
+
+def _question_keys(digests: np.ndarray) -> np.ndarray:
+    return digests[:, DIGEST_SIZE - 8:].copy().view("<u8").ravel()
+
+
+def _option_permutations(digests: np.ndarray, option_counts: Sequence[int]) -> List[Tuple[int, ...]]:
+    """按摘要为每道题生成选项排列，选项数超过排序键数量的题目退化为摘要种子的局部随机数生成器"""
+    if len(option_counts) == 0:
+        return []
+    counts = np.asarray(option_counts, dtype=np.int64)
+    keys = digests[:, :OPTION_KEY_SLOTS * 4].copy().view("<u4").astype(np.uint64)
+    slots = np.arange(OPTION_KEY_SLOTS)
+    keys[slots[None, :] >= counts[:, None]] = _UINT64_MAX
+    perms = np.argsort(keys, axis=1, kind="stable")
+
+    result = []
+    for row, count, digest in zip(perms, counts.tolist(), digests):
+        if count <= OPTION_KEY_SLOTS:
+            result.append(tuple(row[:count].tolist()))
+        else:
+            rng = np.random.default_rng(np.frombuffer(digest.tobytes(), dtype="<u4"))
+            result.append(tuple(rng.permutation(count).tolist()))
+    return result
+
+
+def question_order(paper_id: int, assignment_id: int, question_ids: Sequence[int]) -> List[int]:
+    """返回该分配的题目乱序结果"""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return []
+    keys = _question_keys(_digest_matrix(paper_id, assignment_id, question_ids))
+    order = np.lexsort((np.asarray(question_ids, dtype=np.int64), keys))
+    return [question_ids[i] for i in order.tolist()]
+
+
+def option_orders(paper_id: int, assignment_id: int, question_ids: Sequence[int],
+                  option_counts: Sequence[int]) -> Dict[int, Tuple[int, ...]]:
+    """返回 {题目ID: 选项排列}"""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return {}
+    perms = _option_permutations(_digest_matrix(paper_id, assignment_id, question_ids), option_counts)
+    return dict(zip(question_ids, perms))
+
+
+def build_layout(snapshot, assignment_id: Optional[int]) -> ShuffleLayout:
+    """
+    根据试卷快照计算某个分配的题目和选项顺序
+
+    没有分配（例如管理员预览）时使用试卷级的乱序顺序，选项保持原始顺序。
+    """
+    if assignment_id is None:
+        order = snapshot.shuffled_order if snapshot.is_shuffled and snapshot.shuffled_order else ()
+        ordered = snapshot.ordered_questions(order)
+        return ShuffleLayout(tuple(q.question_id for q in ordered), MappingProxyType({}))
+
+    question_ids = [q.question_id for q in snapshot.questions]
+    if not question_ids:
+        return ShuffleLayout((), MappingProxyType({}))
+    digests = _digest_matrix(snapshot.paper_id, assignment_id, question_ids)
+
+    if snapshot.is_shuffled:
+        keys = _question_keys(digests)
+        order = np.lexsort((np.asarray(question_ids, dtype=np.int64), keys))
+        ordered_ids = tuple(question_ids[i] for i in order.tolist())
+    else:
+        ordered_ids = tuple(question_ids)
+
+    rows = [i for i, q in enumerate(snapshot.questions) if q.shuffle_options and q.options]
+    perms = _option_permutations(digests[rows], [len(snapshot.questions[i].options) for i in rows])
+    return ShuffleLayout(
+        ordered_ids,
+        MappingProxyType({question_ids[i]: perm for i, perm in zip(rows, perms)}),
+    )
+
+
+def _restore_choice(choice, perm: Tuple[int, ...]):
+    """把单个展示选项（标签或下标）还原为原始选项"""
+    if isinstance(choice, bool):
+        return choice
+    if isinstance(choice, int):
+        return perm[choice] if 0 <= choice < len(perm) else choice
+    if isinstance(choice, str) and len(choice) == 1:
+        idx = ord(choice.upper()) - ord('A')
+        if 0 <= idx < len(perm):
+            return chr(ord('A') + perm[idx])
+    return choice
+
+
+def restore_answers(layout: ShuffleLayout, answers: Dict[str, object]) -> Dict[str, object]:
+    """把提交的展示标签还原为原始选项标签，未乱序的题目原样返回"""
+    if not layout.option_orders:
+        return answers
+    restored = {}
+    for qid, ans in answers.items():
+        try:
+            perm = layout.option_orders.get(int(qid))
+        except (TypeError, ValueError):
+            perm = None
+        if perm is None:
+            restored[qid] = ans
+        elif isinstance(ans, list):
+            restored[qid] = [_restore_choice(choice, perm) for choice in ans]
+        else:
+            restored[qid] = _restore_choice(ans, perm)
+    return restored
@@ -0,0 +1,254 @@
+"""
+流式 ZIP 打包下载
+
+批量下载原来只返回下载链接列表，浏览器再逐个带认证请求 PDF，HR 一次下载 500 份报告就是 500 次往返。
+这里把选中的报告文件即时打包成一个 ZIP 流返回：
+- PDF 本身已经压缩，条目使用存储方式（不再压缩），边读文件边输出，内存占用恒定
+- 打包前根据文件大小计算出完整的归档布局，响应带 Content-Length，可以按任意字节区间重新生成，
+  因此支持 HTTP Range 断点续传（配合 ETag / If-Range 校验文件未变化）
+- 每个条目的 CRC32 在输出该条目前计算，按 (路径, 大小, 修改时间) 缓存，重复下载和续传不再重复计算
+
+只生成标准 ZIP（非 ZIP64），总大小和条目数受 ZIP 格式限制，另有可配置的上限。
+
+相关环境变量：
+- REPORT_ARCHIVE_MAX_FILES: 单个归档最多包含的报告数，默认 1000
+- REPORT_ARCHIVE_MAX_BYTES: 单个归档最大字节数，默认 2GB
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+ZIP32_LIMIT = 0xFFFFFFFF
+CHUNK_SIZE = 256 * 1024
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_VERSION = 20  # 2.0，存储方式
+_FLAG_UTF8 = 0x800  # 文件名使用 UTF-8 编码
+_EXTERNAL_ATTR = (0o100644 & 0xFFFF) << 16
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ArchiveTooLarge(ValueError):
+    """归档超出格式或配置上限"""
+
+
+class ArchiveEntry(NamedTuple):
+    name: bytes
+    path: str
+    size: int
+    mtime_ns: int
+    dos_time: int
+    dos_date: int
+    offset: int  # 本地文件头在归档中的位置
+
+
+class _CrcCache:
+    """按 (路径, 大小, 修改时间) 缓存文件的 CRC32"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._items: "OrderedDict[Tuple[str, int, int], int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, entry: ArchiveEntry) -> int:
+        key = (entry.path, entry.size, entry.mtime_ns)
+        with self._lock:
+            crc = self._items.get(key)
+            if crc is not None:
+                self._items.move_to_end(key)
+                return crc
+        crc = 0
+        for chunk in _read_file(entry, 0, entry.size):
+            crc = zlib.crc32(chunk, crc)
+        with self._lock:
+            self._items[key] = crc
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return crc
+
+
+_crc_cache = _CrcCache()
+
+
+def _read_file(entry: ArchiveEntry, start: int, end: int) -> Iterator[bytes]:
+    """读取文件 [start, end) 区间；文件在打包期间被修改时中止，避免输出损坏的归档"""
+    with open(entry.path, "rb") as f:
+        if os.fstat(f.fileno()).st_size != entry.size:
+            raise IOError(f"文件在打包期间发生变化: {entry.path}")
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                raise IOError(f"文件在打包期间发生变化: {entry.path}")
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _dos_datetime(mtime: float) -> Tuple[int, int]:
+    t = time.localtime(max(mtime, 315532800))  # ZIP 时间最早为 1980 年
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+def _unique_names(names: Sequence[str]) -> List[str]:
+    """同名文件追加序号，保证归档内文件名唯一且每次结果一致"""
+    seen = set()
+    result = []
+    for name in names:
+        name = name.replace("\\", "/").lstrip("/") or "report.pdf"
+        candidate, n = name, 1
+        stem, ext = os.path.splitext(name)
+        while candidate.lower() in seen:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+        seen.add(candidate.lower())
+        result.append(candidate)
+    return result
+
+
+class ZipArchive:
+    """布局固定的存储式 ZIP 归档，可按字节区间生成内容"""
+
+    def __init__(self, files: Sequence[Tuple[str, str]], max_files: Optional[int] = None,
+                 max_bytes: Optional[int] = None):
+        """
+        Args:
+            files: [(归档内文件名, 文件路径)]，按给定顺序打包
+        """
+        max_files = max_files or _get_int_env("REPORT_ARCHIVE_MAX_FILES", 1000)
+        max_bytes = min(max_bytes or _get_int_env("REPORT_ARCHIVE_MAX_BYTES", 2 * 1024 ** 3), ZIP32_LIMIT)
+        if len(files) > min(max_files, 0xFFFF):
+            raise ArchiveTooLarge(f"单次最多打包 {min(max_files, 0xFFFF)} 个文件")
+
+        entries = []
+        offset = 0
+        for name, (_, path) in zip(_unique_names([f[0] for f in files]), files):
+            st = os.stat(path)
+            dos_time, dos_date = _dos_datetime(st.st_mtime)
+            entry = ArchiveEntry(name.encode("utf-8"), path, st.st_size, st.st_mtime_ns, dos_time, dos_date, offset)
+            entries.append(entry)
+            offset += _LOCAL_HEADER.size + len(entry.name) + entry.size
+        self.entries = entries
+        self.central_offset = offset
+        self.central_size = sum(_CENTRAL_HEADER.size + len(e.name) for e in entries)
+        self.size = self.central_offset + self.central_size + _END_RECORD.size
+        if self.size > max_bytes:
+            raise ArchiveTooLarge(f"归档大小 {self.size} 字节超过上限 {max_bytes} 字节")
+
+        fingerprint = hashlib.sha1()
+        for e in entries:
+            fingerprint.update(b"%s\0%d\0%d\0" % (e.name, e.size, e.mtime_ns))
+        self.etag = f'"{fingerprint.hexdigest()}"'
+
+    # ---------- 各部分的字节内容 ----------
+
+    def _local_header(self, entry: ArchiveEntry) -> bytes:
+        crc = _crc_cache.get(entry)
+        return _LOCAL_HEADER.pack(
+            0x04034b50, _VERSION, _FLAG_UTF8, 0, entry.dos_time, entry.dos_date,
+            crc, entry.size, entry.size, len(entry.name), 0
+        ) + entry.name
+
+    def _central_directory(self) -> bytes:
+        parts = []
+        for entry in self.entries:
+            parts.append(_CENTRAL_HEADER.pack(
+                0x02014b50, _VERSION, _VERSION, _FLAG_UTF8, 0, entry.dos_time, entry.dos_date,
+                _crc_cache.get(entry), entry.size, entry.size, len(entry.name), 0, 0, 0, 0,
+                _EXTERNAL_ATTR, entry.offset
+            ))
+            parts.append(entry.name)
+        count = len(self.entries)
+        parts.append(_END_RECORD.pack(0x06054b50, 0, 0, count, count, self.central_size, self.central_offset, 0))
+        return b"".join(parts)
+
+    def iter_range(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """生成归档 [start, end] 区间（含两端）的字节"""
+        end = self.size - 1 if end is None else end
+        stop = end + 1
+        for entry in self.entries:
+            header_size = _LOCAL_HEADER.size + len(entry.name)
+            data_start = entry.offset + header_size
+            data_end = data_start + entry.size
+            if data_end <= start:
+                continue
+            if entry.offset >= stop:
+                return
+            if start < data_start:
+                yield self._local_header(entry)[max(0, start - entry.offset):stop - entry.offset]
+            if start < data_end and stop > data_start:
+                yield from _read_file(entry, max(0, start - data_start), min(entry.size, stop - data_start))
+        if stop > self.central_offset:
+            yield self._central_directory()[max(0, start - self.central_offset):stop - self.central_offset]
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单个 Range 请求头
+
+    Returns:
+        (start, end) 含两端；未请求区间或不支持的多区间请求返回 None（按完整内容响应）
+
+    Raises:
+        ValueError: 区间无法满足
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first == "":
+            length = int(last)
+            if length <= 0:
+                raise ValueError("无效的区间")
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        raise ValueError("无效的区间")
+    if start >= size or end < start:
+        raise ValueError("区间超出范围")
+    return start, min(end, size - 1)
+
+
+def archive_response(archive: ZipArchive, headers, filename: str):
+    """构造支持断点续传的流式下载响应"""
+    from fastapi.responses import Response, StreamingResponse
+
+    response_headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": archive.etag,
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+    }
+    byte_range = None
+    if_range = headers.get("if-range")
+    if if_range is None or if_range == archive.etag:
+        try:
+            byte_range = parse_range(headers.get("range"), archive.size)
+        except ValueError:
+            response_headers["Content-Range"] = f"bytes */{archive.size}"
+            return Response(status_code=416, headers=response_headers)
+
+    if byte_range is None:
+        response_headers["Content-Length"] = str(archive.size)
+        return StreamingResponse(archive.iter_range(), media_type="application/zip", headers=response_headers)
+
+    start, end = byte_range
+    response_headers["Content-Length"] = str(end - start + 1)
+    response_headers["Content-Range"] = f"bytes {start}-{end}/{archive.size}"
+    return StreamingResponse(archive.iter_range(start, end), status_code=206,
+                             media_type="application/zip", headers=response_headers)
@@ -1,207 +1,427 @@
-import yaml
+"""
+试卷配置加载器
+
+配置原来以 YAML 原始字典永久缓存、从不失效；加载时还会在"备用目录"之间复制文件；
+get_available_papers 每次调用都重新读取并校验两个目录下的全部 YAML；分数区间逐项线性查找，
+评价级别是写死的阈值。一份报告要查几十次配置，这里改为：
+- 每个配置文件编译为只读的 CompiledPaperConfig：按下限排序的分数区间表（二分查找）、
+  维度/子维度名称索引、维度评价索引、预先计算好的雷达图布局
+- 文件按 (修改时间, 大小) 检测变化，变化时再比较内容哈希，内容确实改变才重新编译，
+  编译成功后整体替换缓存项；重新加载失败时继续使用旧的编译结果
+- 同一文件的检查间隔默认 2 秒，间隔内的查询完全走内存，不访问文件系统
+- 试卷目录（get_available_papers）同样缓存，目录中文件增删改后自动重建
+- 备用配置目录只作为只读的查找路径，不再复制文件
+
+本模块既会以 config_loader（报告生成器目录在 sys.path 中）也会以
+reports.generators.config_loader 的名字被导入，两者共享同一个加载器实例。
+
+相关环境变量：
+- REPORT_CONFIG_CHECK_INTERVAL: 检查配置文件是否变化的最小间隔（秒），默认 2，设为 0 每次都检查
+"""
+import hashlib
 import os
-from typing import Dict, List, Optional, Any
+import sys
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
 from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import yaml
+
+# 维度/子维度评价级别：分数 >= 阈值即达到对应级别
+EVALUATION_THRESHOLDS = (6.5, 7.5, 8.5)
+EVALUATION_LEVELS = ('bad', 'low', 'medium', 'high')
+
+REQUIRED_FIELDS = ['paper_id', 'paper_name', 'dimensions', 'score_levels']
+REQUIRED_LEVEL_FIELDS = ['name', 'min', 'max', 'summary', 'development_focus']
+
+
+def _get_float_env(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def evaluation_level(score: float) -> str:
+    """根据分数确定评价级别（high / medium / low / bad）"""
+    if score != score:  # NaN（Excel 空单元格）按最低级别处理
+        return EVALUATION_LEVELS[0]
+    return EVALUATION_LEVELS[bisect_right(EVALUATION_THRESHOLDS, score)]
+
+
+def validate_config(config: Dict[str, Any]) -> None:
+    """验证配置文件的完整性"""
+    if not isinstance(config, dict):
+        raise ValueError("配置文件内容不是有效的字典")
+
+    for field_name in REQUIRED_FIELDS:
+        if field_name not in config:
+            raise ValueError(f"配置文件缺少必需字段: {field_name}")
+
+    for dimension in config['dimensions']:
+        if 'name' not in dimension:
+            raise ValueError("维度配置缺少name字段")
+        if 'sub_dimensions' not in dimension:
+            raise ValueError(f"维度 {dimension['name']} 缺少sub_dimensions字段")
+
+    for level in config['score_levels']:
+        for field_name in REQUIRED_LEVEL_FIELDS:
+            if field_name not in level:
+                raise ValueError(f"分数区间配置缺少必需字段: {field_name}")
+
+
+@dataclass(frozen=True)
+class RadarGroup:
+    """雷达图中的一个大维度分组：名称、颜色和各子维度的 (名称, 角度)"""
+    name: str
+    color: Optional[str]
+    dims: Tuple[Tuple[str, float], ...]
+
+
+@dataclass(frozen=True)
+class CompiledPaperConfig:
+    """
+    编译后的试卷配置（只读）
+
+    raw 为原始配置字典，与 load_config 的返回值相同，供模板和旧代码使用，请勿修改。
+    """
+    paper_id: Any
+    raw: Dict[str, Any]
+    path: Path
+    digest: str
+    dimension_names: Tuple[str, ...]
+    dimensions: Mapping[str, Dict[str, Any]]
+    # 子维度名称 -> (所属大维度名称, 子维度配置)
+    sub_dimensions: Mapping[str, Tuple[str, Dict[str, Any]]]
+    evaluations: Mapping[str, Dict[str, Any]]
+    radar_layout: Tuple[RadarGroup, ...]
+    # 区间互不重叠时 _levels 按下限升序排列，用二分查找；
+    # 有重叠时保持配置顺序，逐项查找第一个匹配的区间（与原来的语义一致）
+    _level_mins: Tuple[float, ...] = field(repr=False)
+    _levels: Tuple[Dict[str, Any], ...] = field(repr=False)
+    _levels_overlap: bool = field(repr=False)
+
+    @classmethod
+    def compile(cls, config: Dict[str, Any], path: Path, digest: str) -> "CompiledPaperConfig":
+        validate_config(config)
+        dimensions: Dict[str, Dict[str, Any]] = {}
+        sub_dimensions: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        radar_layout = []
+        for dimension in config['dimensions']:
+            dim_name = dimension['name']
+            dimensions.setdefault(dim_name, dimension)
+            sub_cfgs = dimension.get('sub_dimensions') or []
+            angles = dimension.get('radar_angles') or []
+            for sub in sub_cfgs:
+                sub_dimensions.setdefault(sub['name'], (dim_name, sub))
+            radar_layout.append(RadarGroup(
+                name=dim_name,
+                color=dimension.get('color'),
+                dims=tuple((sub['name'], angles[idx] if idx < len(angles) else 0)
+                           for idx, sub in enumerate(sub_cfgs)),
+            ))
+
+        levels = list(config['score_levels'])
+        levels_sorted = sorted(levels, key=lambda level: level['min'])
+        overlap = any(levels_sorted[i]['max'] >= levels_sorted[i + 1]['min'] for i in range(len(levels_sorted) - 1))
+        return cls(
+            paper_id=config.get('paper_id'),
+            raw=config,
+            path=path,
+            digest=digest,
+            dimension_names=tuple(dimension['name'] for dimension in config['dimensions']),
+            dimensions=MappingProxyType(dimensions),
+            sub_dimensions=MappingProxyType(sub_dimensions),
+            evaluations=MappingProxyType(dict(config.get('dimension_evaluations') or {})),
+            radar_layout=tuple(radar_layout),
+            _level_mins=tuple(level['min'] for level in levels_sorted),
+            _levels=tuple(levels if overlap else levels_sorted),
+            _levels_overlap=overlap,
+        )
+
+    def score_level(self, score: float) -> Optional[Dict[str, Any]]:
+        """分数所在的分数区间配置，不在任何区间内时返回 None"""
+        if self._levels_overlap:
+            return next((level for level in self._levels if level['min'] <= score <= level['max']), None)
+        idx = bisect_right(self._level_mins, score) - 1
+        if idx < 0:
+            return None
+        level = self._levels[idx]
+        return level if score <= level['max'] else None
+
+    def dimension_evaluation(self, dimension_name: str, score: float) -> Optional[Dict[str, Any]]:
+        """大维度在该分数下的评价内容"""
+        evaluations = self.evaluations.get(dimension_name)
+        if not evaluations:
+            return None
+        return evaluations.get(evaluation_level(score))
+
+    def dimension_description(self, dimension_name: str) -> str:
+        dimension = self.dimensions.get(dimension_name)
+        return dimension.get('description', '') if dimension else ''
+
+    def catalogue_entry(self) -> Dict[str, Any]:
+        return {
+            'paper_id': self.raw.get('paper_id'),
+            'paper_name': self.raw.get('paper_name'),
+            'paper_description': self.raw.get('paper_description'),
+            'paper_version': self.raw.get('paper_version'),
+            'dimensions_count': len(self.dimension_names),
+            'config_file': str(self.path),
+        }
+
+
+class _Entry:
+    """一个配置文件的缓存项"""
+    __slots__ = ("compiled", "signature", "checked_at")
+
+    def __init__(self, compiled: Optional[CompiledPaperConfig], signature: Tuple[int, int], checked_at: float):
+        self.compiled = compiled
+        self.signature = signature
+        self.checked_at = checked_at
+
 
 class PaperConfigLoader:
     """试卷配置加载器 - 用于读取和管理不同试卷的配置文件"""
-    
-    def __init__(self, config_dir: str = "configs"):
+
+    def __init__(self, config_dir: str = "configs", check_interval: Optional[float] = None):
         # 获取当前文件所在目录
         current_dir = Path(__file__).parent
         self.config_dir = current_dir / config_dir
-        self._configs_cache = {}
-        
-        # 初始化备用配置目录
+        self.check_interval = (check_interval if check_interval is not None
+                               else _get_float_env("REPORT_CONFIG_CHECK_INTERVAL", 2.0))
+
+        # 备用配置目录（只读查找，不复制文件）
         self.alt_config_dir = None
         parent_dir = current_dir.parent.parent.parent
         alt_path = parent_dir / "backend" / "reports" / "generators" / "configs"
-        if alt_path.exists():
+        if alt_path.exists() and alt_path.resolve() != self.config_dir.resolve():
             self.alt_config_dir = alt_path
             print(f"配置加载器发现备用配置目录: {self.alt_config_dir}")
-        
-    def load_config(self, paper_id: int) -> Dict[str, Any]:
-        """加载指定试卷的配置文件"""
-        if paper_id in self._configs_cache:
-            return self._configs_cache[paper_id]
-            
+
+        self._lock = threading.RLock()
+        # 文件路径 -> 缓存项；试卷ID -> 文件路径
+        self._entries: Dict[Path, _Entry] = {}
+        self._paths: Dict[int, Path] = {}
+        self._catalogue: Optional[List[Dict[str, Any]]] = None
+        self._catalogue_signature: Optional[tuple] = None
+        self._catalogue_checked_at = 0.0
+        self.compiles = 0
+
+    # ---------- 编译结果 ----------
+
+    def get_compiled(self, paper_id: int) -> CompiledPaperConfig:
+        """获取编译后的试卷配置；配置文件不存在时抛出 FileNotFoundError"""
+        path = self._paths.get(paper_id)
+        if path is not None:
+            entry = self._entries.get(path)
+            if (entry is not None and entry.compiled is not None
+                    and time.monotonic() - entry.checked_at < self.check_interval):
+                return entry.compiled
+        with self._lock:
+            path = self._resolve_path(paper_id)
+            compiled = self._refresh(path, strict=True)
+            self._paths[paper_id] = path
+            return compiled
+
+    def _resolve_path(self, paper_id: int) -> Path:
         config_file = self.config_dir / f"{paper_id}.yaml"
-        
-        # 如果配置文件不存在，尝试从备用路径加载
-        if not config_file.exists() and self.alt_config_dir:
+        if config_file.exists():
+            return config_file
+        if self.alt_config_dir:
             alt_config_file = self.alt_config_dir / f"{paper_id}.yaml"
             if alt_config_file.exists():
-                try:
-                    print(f"配置文件在主路径不存在，尝试从备用路径加载: {alt_config_file}")
-                    import shutil
-                    shutil.copy2(alt_config_file, config_file)
-                    print(f"已复制配置文件到主路径: {config_file}")
-                except Exception as e:
-                    print(f"复制配置文件失败: {str(e)}")
-                    # 如果复制失败，直接使用备用路径的文件
-                    config_file = alt_config_file
-        
-        if not config_file.exists():
-            raise FileNotFoundError(f"配置文件不存在: {config_file}")
-            
-        print(f"正在加载配置文件: {config_file}")
-            
+                return alt_config_file
+        self._paths.pop(paper_id, None)
+        raise FileNotFoundError(f"配置文件不存在: {config_file}")
+
+    def _refresh(self, path: Path, strict: bool) -> Optional[CompiledPaperConfig]:
+        """
+        检查文件是否变化，必要时重新编译（调用方持有锁）
+
+        strict 为 True 时读取或校验失败会抛出异常（没有可用的旧编译结果时）；
+        否则返回 None（文件无效）。
+        """
+        now = time.monotonic()
+        entry = self._entries.get(path)
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
-                
-            self._validate_config(config)
-            self._configs_cache[paper_id] = config
-            return config
-            
-        except yaml.YAMLError as e:
-            raise yaml.YAMLError(f"配置文件格式错误 {config_file}: {e}")
-    
+            stat = path.stat()
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            if strict:
+                raise FileNotFoundError(f"配置文件不存在: {path}")
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if entry is not None and entry.signature == signature:
+            entry.checked_at = now
+            if entry.compiled is None and strict:
+                # 同一个无效文件，重新走一遍加载以抛出具体错误
+                return self._load(path, signature, now, entry, strict)
+            return entry.compiled
+        return self._load(path, signature, now, entry, strict)
+
+    def _load(self, path: Path, signature: Tuple[int, int], now: float, entry: Optional[_Entry],
+              strict: bool) -> Optional[CompiledPaperConfig]:
+        content = path.read_bytes()
+        digest = hashlib.sha1(content).hexdigest()
+        if entry is not None and entry.compiled is not None and entry.compiled.digest == digest:
+            # 只是修改时间变化（例如 touch、重新部署），内容未变
+            self._entries[path] = _Entry(entry.compiled, signature, now)
+            return entry.compiled
+
+        print(f"正在加载配置文件: {path}")
+        try:
+            config = yaml.safe_load(content)
+            compiled = CompiledPaperConfig.compile(config, path, digest)
+        except (yaml.YAMLError, ValueError, KeyError, TypeError) as e:
+            if entry is not None and entry.compiled is not None:
+                # 文件可能正在被编辑，继续使用上一次成功的编译结果
+                print(f"警告: 配置文件 {path} 重新加载失败，继续使用旧配置: {e}")
+                self._entries[path] = _Entry(entry.compiled, signature, now)
+                return entry.compiled
+            self._entries[path] = _Entry(None, signature, now)
+            if not strict:
+                print(f"警告: 无法读取配置文件 {path}: {e}")
+                return None
+            if isinstance(e, yaml.YAMLError):
+                raise yaml.YAMLError(f"配置文件格式错误 {path}: {e}")
+            raise
+
+        # 新的编译结果整体替换旧缓存项，并发读取者要么拿到旧配置，要么拿到新配置
+        self._entries[path] = _Entry(compiled, signature, now)
+        self.compiles += 1
+        return compiled
+
+    # ---------- 兼容原有接口 ----------
+
+    def load_config(self, paper_id: int) -> Dict[str, Any]:
+        """加载指定试卷的配置（原始字典，只读）"""
+        return self.get_compiled(paper_id).raw
+
     def get_available_papers(self) -> List[Dict[str, Any]]:
-        """获取所有可用的试卷配置信息"""
-        papers = []
-        
-        # 首先检查主配置目录
-        for config_file in self.config_dir.glob("*.yaml"):
-            try:
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = yaml.safe_load(f)
-                    
-                if self._is_valid_paper_config(config):
-                    papers.append({
-                        'paper_id': config.get('paper_id'),
-                        'paper_name': config.get('paper_name'),
-                        'paper_description': config.get('paper_description'),
-                        'paper_version': config.get('paper_version'),
-                        'dimensions_count': len(config.get('dimensions', [])),
-                        'config_file': str(config_file)
-                    })
-                    
-            except Exception as e:
-                print(f"警告: 无法读取配置文件 {config_file}: {e}")
-                continue
-        
-        # 如果有备用配置目录，也检查一下
-        if self.alt_config_dir and self.alt_config_dir.exists():
-            for config_file in self.alt_config_dir.glob("*.yaml"):
-                # 跳过已经在主路径找到的配置
-                if any(p['config_file'] == config_file.name for p in papers):
-                    continue
-                    
+        """获取所有可用的试卷配置信息（目录内容变化时重建）"""
+        catalogue = self._catalogue
+        if catalogue is not None and time.monotonic() - self._catalogue_checked_at < self.check_interval:
+            return list(catalogue)
+        with self._lock:
+            files = self._config_files()
+            signature = []
+            for config_file in files:
                 try:
-                    with open(config_file, 'r', encoding='utf-8') as f:
-                        config = yaml.safe_load(f)
-                        
-                    if self._is_valid_paper_config(config):
-                        papers.append({
-                            'paper_id': config.get('paper_id'),
-                            'paper_name': config.get('paper_name'),
-                            'paper_description': config.get('paper_description'),
-                            'paper_version': config.get('paper_version'),
-                            'dimensions_count': len(config.get('dimensions', [])),
-                            'config_file': str(config_file)
-                        })
-                        
-                except Exception as e:
-                    print(f"警告: 无法读取备用配置文件 {config_file}: {e}")
+                    stat = config_file.stat()
+                except FileNotFoundError:
                     continue
-                
-        return sorted(papers, key=lambda x: x['paper_id'])
-        
+                signature.append((str(config_file), stat.st_mtime_ns, stat.st_size))
+            signature = tuple(signature)
+            if self._catalogue is None or signature != self._catalogue_signature:
+                papers = []
+                for config_file in files:
+                    try:
+                        compiled = self._refresh(config_file, strict=False)
+                    except OSError as e:
+                        print(f"警告: 无法读取配置文件 {config_file}: {e}")
+                        continue
+                    if compiled is not None:
+                        papers.append(compiled.catalogue_entry())
+                self._catalogue = sorted(papers, key=lambda x: x['paper_id'])
+                self._catalogue_signature = signature
+            self._catalogue_checked_at = time.monotonic()
+            return list(self._catalogue)
+
+    def _config_files(self) -> List[Path]:
+        """主目录和备用目录中的配置文件，同名文件以主目录为准"""
+        files = {path.name: path for path in self.config_dir.glob("*.yaml")}
+        if self.alt_config_dir and self.alt_config_dir.exists():
+            for path in self.alt_config_dir.glob("*.yaml"):
+                files.setdefault(path.name, path)
+        return sorted(files.values())
+
     def get_dimension_names(self, paper_id: int) -> List[str]:
         """获取试卷的维度名称列表"""
-        config = self.load_config(paper_id)
-        return [dim['name'] for dim in config.get('dimensions', [])]
-        
+        return list(self.get_compiled(paper_id).dimension_names)
+
     def get_score_level(self, paper_id: int, score: float) -> Optional[Dict[str, Any]]:
         """根据分数获取对应的分数区间配置"""
-        config = self.load_config(paper_id)
-        
-        for level in config.get('score_levels', []):
-            if level['min'] <= score <= level['max']:
-                return level
-                
-        return None
-        
+        return self.get_compiled(paper_id).score_level(score)
+
     def get_dimension_evaluation(self, paper_id: int, dimension_name: str, score: float) -> Optional[Dict[str, Any]]:
         """获取维度评价内容"""
-        config = self.load_config(paper_id)
-        
-        level = self._get_evaluation_level(score)
-        if not level:
-            return None
-            
-        dimension_evaluations = config.get('dimension_evaluations', {})
-        if dimension_name not in dimension_evaluations:
-            return None
-            
-        return dimension_evaluations[dimension_name].get(level)
-        
+        return self.get_compiled(paper_id).dimension_evaluation(dimension_name, score)
+
     def get_field_mapping(self, paper_id: int) -> Dict[str, str]:
         """获取字段映射配置"""
-        config = self.load_config(paper_id)
-        return config.get('field_mapping', {})
-        
+        return self.load_config(paper_id).get('field_mapping', {})
+
     def get_radar_chart_config(self, paper_id: int) -> Dict[str, Any]:
         """获取雷达图配置"""
-        config = self.load_config(paper_id)
-        return config.get('radar_chart', {})
-        
+        return self.load_config(paper_id).get('radar_chart', {})
+
     def get_template_config(self, paper_id: int) -> Dict[str, Any]:
         """获取模板配置"""
-        config = self.load_config(paper_id)
-        return config.get('template', {})
-        
+        return self.load_config(paper_id).get('template', {})
+
     def _validate_config(self, config: Dict[str, Any]) -> None:
         """验证配置文件的完整性"""
-        required_fields = ['paper_id', 'paper_name', 'dimensions', 'score_levels']
-        
-        for field in required_fields:
-            if field not in config:
-                raise ValueError(f"配置文件缺少必需字段: {field}")
-                
-        for dimension in config['dimensions']:
-            if 'name' not in dimension:
-                raise ValueError("维度配置缺少name字段")
-            if 'sub_dimensions' not in dimension:
-                raise ValueError(f"维度 {dimension['name']} 缺少sub_dimensions字段")
-                
-        for level in config['score_levels']:
-            required_level_fields = ['name', 'min', 'max', 'summary', 'development_focus']
-            for field in required_level_fields:
-                if field not in level:
-                    raise ValueError(f"分数区间配置缺少必需字段: {field}")
-                    
+        validate_config(config)
+
     def _is_valid_paper_config(self, config: Dict[str, Any]) -> bool:
         """检查是否为有效的试卷配置"""
         try:
-            self._validate_config(config)
+            validate_config(config)
             return True
-        except ValueError:
+        except (ValueError, KeyError, TypeError):
             return False
-            
+
     def _get_evaluation_level(self, score: float) -> Optional[str]:
         """根据分数确定评价级别"""
-        if score >= 8.5:
-            return 'high'
-        elif score >= 7.5:
-            return 'medium'
-        elif score >= 6.5:
-            return 'low'
-        else:
-            return 'bad'
-            
+        return evaluation_level(score)
+
     def clear_cache(self) -> None:
-        """清空配置缓存"""
-        self._configs_cache.clear()
+        """清空配置缓存（下次访问时重新读取文件）"""
+        with self._lock:
+            self._entries.clear()
+            self._paths.clear()
+            self._catalogue = None
+            self._catalogue_signature = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "configs": sum(1 for entry in self._entries.values() if entry.compiled is not None),
+                "catalogue": len(self._catalogue) if self._catalogue is not None else None,
+                "compiles": self.compiles,
+                "check_interval": self.check_interval,
+            }
+
+
+def _shared_loader() -> PaperConfigLoader:
+    """两种导入路径下复用同一个加载器实例"""
+    for module_name in ("config_loader", "reports.generators.config_loader"):
+        module = sys.modules.get(module_name)
+        loader = getattr(module, "config_loader", None) if module is not None else None
+        if loader is not None:
+            return loader
+    return PaperConfigLoader()
+
 
 # 全局配置加载器实例
-config_loader = PaperConfigLoader()
+config_loader = _shared_loader()
+
 
 def get_paper_config(paper_id: int) -> Dict[str, Any]:
     """获取试卷配置的便捷函数"""
     return config_loader.load_config(paper_id)
 
+
+def get_compiled_config(paper_id: int) -> CompiledPaperConfig:
+    """获取编译后试卷配置的便捷函数"""
+    return config_loader.get_compiled(paper_id)
+
+
 def get_available_papers() -> List[Dict[str, Any]]:
     """获取所有可用试卷的便捷函数"""
-    return config_loader.get_available_papers() 
\ No newline at end of file
+    return config_loader.get_available_papers()
@@ -0,0 +1,222 @@
+"""
+报告批量生成的 Excel 读取
+
+原来有三份读取代码：generate_report 中的 read_excel_to_report_data_list、read_excel_with_averages
+写死了管理潜质测评的 16 个列名，UniversalReportGenerator.read_excel_data 用 pandas 整表读入后
+df.iterrows() 逐行拼嵌套字典；两万行的 HR 名单要全部变成 Python 字典后才开始生成第一份报告。
+这里统一为一条按试卷配置（field_mapping + dimensions）驱动的读取路径：
+- openpyxl 只读模式流式读取，不加载整个工作簿
+- 打开时先校验表头：姓名、总分和各大维度列缺失时直接报错（列出缺失的 Excel 列名）；
+  子维度列缺失时按 0 分处理并给出警告（与原来的行为一致）
+- 按块（默认 1000 行）构造 DataFrame，分数列用 pd.to_numeric 整列转换，再按列拼出报告数据
+- 以生成器逐条产出报告数据，内存中只保留当前块
+- 可选把最后一行当作平均分行（read_excel_with_averages 的约定），不作为人员数据产出
+
+本模块只依赖 openpyxl 和 pandas，不导入报告生成器的其他模块，
+调用方传入试卷配置（原始字典或 CompiledPaperConfig.raw）。
+"""
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import pandas as pd
+from openpyxl import load_workbook
+
+DEFAULT_CHUNK_SIZE = 1000
+NAME_FIELD = "name"
+TOTAL_FIELD = "total_score"
+
+
+class MissingColumnsError(ValueError):
+    """Excel 缺少试卷配置要求的列"""
+
+    def __init__(self, missing: Sequence[str]):
+        self.missing = list(missing)
+        super().__init__(f"Excel缺少必需的列: {', '.join(self.missing)}")
+
+
+class ExcelLayout:
+    """由试卷配置得到的列布局：Excel 列名映射和维度/子维度结构"""
+
+    def __init__(self, field_mapping: Mapping[str, str], dimensions: Sequence[Tuple[str, Sequence[str]]]):
+        self.field_mapping = {str(k).strip(): v for k, v in (field_mapping or {}).items()}
+        self.dimensions = [(dim_name, list(subs)) for dim_name, subs in dimensions]
+        # 内部字段名 -> Excel 列名，用于报错提示
+        self._excel_names = {v: k for k, v in self.field_mapping.items()}
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "ExcelLayout":
+        return cls(
+            config.get("field_mapping") or {},
+            [(dim["name"], [sub["name"] for sub in dim.get("sub_dimensions") or []])
+             for dim in config.get("dimensions") or []],
+        )
+
+    @property
+    def required_fields(self) -> List[str]:
+        return [NAME_FIELD, TOTAL_FIELD] + [dim_name for dim_name, _ in self.dimensions]
+
+    @property
+    def optional_fields(self) -> List[str]:
+        return [sub for _, subs in self.dimensions for sub in subs]
+
+    def excel_name(self, field: str) -> str:
+        return self._excel_names.get(field, field)
+
+    def resolve(self, header: Sequence[Any]) -> Dict[str, int]:
+        """
+        把表头映射为 内部字段名 -> 列序号，校验必需列
+
+        Raises:
+            MissingColumnsError: 缺少姓名、总分或大维度列
+        """
+        positions: Dict[str, int] = {}
+        for idx, cell in enumerate(header):
+            if cell is None:
+                continue
+            name = str(cell).strip()
+            positions.setdefault(self.field_mapping.get(name, name), idx)
+        missing = [self.excel_name(f) for f in self.required_fields if f not in positions]
+        if missing:
+            raise MissingColumnsError(missing)
+        absent = [self.excel_name(f) for f in self.optional_fields if f not in positions]
+        if absent:
+            print(f"警告: Excel缺少子维度列，按0分处理: {', '.join(absent)}")
+        return positions
+
+
+def _is_blank(row: Sequence[Any]) -> bool:
+    return all(cell is None or (isinstance(cell, str) and not cell.strip()) for cell in row)
+
+
+class ReportWorkbook:
+    """
+    流式读取报告数据的 Excel 工作簿
+
+    用法:
+        with ReportWorkbook(path, config, average_row=True) as book:
+            averages = book.average_scores
+            for report_data in book:
+                ...
+
+    count 和 average_scores 需要额外扫描一遍工作表（只读取单元格值，不构造报告数据）。
+    """
+
+    def __init__(self, path, config: Mapping[str, Any], average_row: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.layout = ExcelLayout.from_config(config)
+        self.average_row = average_row
+        self.chunk_size = max(1, chunk_size)
+        self._workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            self._sheet = self._workbook.worksheets[0]
+            header = next(self._sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+            self.positions = self.layout.resolve(header)
+        except Exception:
+            self._workbook.close()
+            raise
+        self._width = len(header)
+        self._scanned: Optional[Tuple[int, Optional[tuple]]] = None
+
+    def __enter__(self) -> "ReportWorkbook":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._workbook.close()
+
+    def _rows(self) -> Iterator[tuple]:
+        """表头之后的非空行（按表头宽度截齐）"""
+        width = self._width
+        for row in self._sheet.iter_rows(min_row=2, values_only=True):
+            if _is_blank(row):
+                continue
+            if len(row) < width:
+                row = tuple(row) + (None,) * (width - len(row))
+            yield row[:width]
+
+    def _scan(self) -> Tuple[int, Optional[tuple]]:
+        if self._scanned is None:
+            count, last = 0, None
+            for row in self._rows():
+                count += 1
+                last = row
+            self._scanned = (count, last)
+        return self._scanned
+
+    @property
+    def count(self) -> int:
+        """人员数据行数（不含表头和平均分行）"""
+        count, _ = self._scan()
+        return max(0, count - 1) if self.average_row else count
+
+    @property
+    def average_scores(self) -> Optional[Dict[str, Any]]:
+        """平均分行：{"总分", "维度": {...}, "子维度": {...}}；未启用平均分行或表中无数据时为 None"""
+        if not self.average_row:
+            return None
+        _, last = self._scan()
+        if last is None:
+            return None
+        columns = self._columns([last])
+        averages = {"总分": columns[TOTAL_FIELD][0], "维度": {}, "子维度": {}}
+        for dim_name, subs in self.layout.dimensions:
+            averages["维度"][dim_name] = columns[dim_name][0]
+            for sub in subs:
+                averages["子维度"][sub] = columns[sub][0]
+        return averages
+
+    def _columns(self, rows: List[tuple]) -> Dict[str, list]:
+        """把一块行数据按列转换：姓名转为字符串，分数列整列转为数值（无法识别的为 NaN）"""
+        frame = pd.DataFrame.from_records(rows, columns=range(self._width))
+        columns: Dict[str, list] = {}
+        names = frame[self.positions[NAME_FIELD]]
+        columns[NAME_FIELD] = names.where(names.notna(), "").astype(str).str.strip().tolist()
+        zeros = None
+        for field in [TOTAL_FIELD] + [dim for dim, _ in self.layout.dimensions] + self.layout.optional_fields:
+            if field in columns:
+                continue
+            idx = self.positions.get(field)
+            if idx is None:
+                zeros = zeros or [0] * len(rows)
+                columns[field] = zeros
+            else:
+                columns[field] = pd.to_numeric(frame[idx], errors="coerce").tolist()
+        return columns
+
+    def _records(self, rows: List[tuple]) -> Iterator[Dict[str, Any]]:
+        columns = self._columns(rows)
+        dimensions = [(dim, columns[dim], [(sub, columns[sub]) for sub in subs])
+                      for dim, subs in self.layout.dimensions]
+        names, totals = columns[NAME_FIELD], columns[TOTAL_FIELD]
+        for i in range(len(rows)):
+            yield {
+                "user_info": {"name": names[i], "total_score": totals[i]},
+                "dimensions": {
+                    dim: {"score": scores[i], "subs": {sub: sub_scores[i] for sub, sub_scores in subs}}
+                    for dim, scores, subs in dimensions
+                },
+            }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """逐条产出报告数据（启用平均分行时不含最后一行）"""
+        chunk: List[tuple] = []
+        # 启用平均分行时多缓存一行，读到表尾时丢弃最后一行
+        limit = self.chunk_size + (1 if self.average_row else 0)
+        for row in self._rows():
+            chunk.append(row)
+            if len(chunk) >= limit:
+                ready, chunk = (chunk[:-1], chunk[-1:]) if self.average_row else (chunk, [])
+                yield from self._records(ready)
+        if self.average_row:
+            chunk = chunk[:-1]
+        if chunk:
+            yield from self._records(chunk)
+
+
+def iter_report_data(path, config: Mapping[str, Any], average_row: bool = False,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """按试卷配置逐条读取 Excel 中的报告数据"""
+    with ReportWorkbook(path, config, average_row=average_row, chunk_size=chunk_size) as book:
+        yield from book
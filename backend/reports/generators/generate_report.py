@@ -1,8 +1,13 @@
-from jinja2 import Environment, FileSystemLoader, Template
-from weasyprint import HTML
 import base64
 # 修复导入路径
-from .radar_chart import generate_radar_chart
+from .radar_chart import generate_radar_chart, render_radar_chart
+from .pdf_pipeline import asset_url, get_pdf_pipeline
+# 报告模板过滤器统一定义在 template_registry，这里导入原名称供旧代码使用
+from .template_registry import (
+    REPORT_FILTERS, get_dim_strengths, get_dim_weaknesses, get_main_weakness, get_sub_strengths,
+    get_sub_weaknesses, get_top_strength, template_registry,
+)
+from .excel_ingest import ReportWorkbook, iter_report_data
 import os
 import re
 import unicodedata
@@ -41,7 +46,6 @@ class TemplateParser:
         self.template_content = template_content
         self.config = config or {}
         self.components = []
-        self._env = Environment(autoescape=True)
     
     def parse_components(self) -> List[Dict]:
         """从模板中解析组件结构
@@ -108,7 +112,7 @@ class TemplateParser:
         Returns:
             渲染后的HTML
         """
-        template = self._env.from_string(component['content'])
+        template = template_registry.from_string(component['content'], f"component:{component['id']}", autoescape=True)
         return template.render(**data)
     
     def assemble_template(self) -> str:
@@ -140,7 +144,7 @@ class TemplateParser:
         Returns:
             渲染后的HTML内容
         """
-        template = self._env.from_string(self.template_content)
+        template = template_registry.from_string(self.template_content, "parser", autoescape=True)
         return template.render(**data)
 
 def generate_mock_data(config: Dict) -> Dict:
@@ -365,20 +369,9 @@ def generate_preview_html(config_path, template_path, test_data=None):
             # 提供一个默认的1x1像素透明PNG
             processed_data["chart_img"] = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
         
-        # 设置Jinja2环境
+        # 渲染模板（使用共享的Jinja2环境，相同模板内容只编译一次）
         template_dir = os.path.dirname(template_path)
-        env = Environment(loader=FileSystemLoader(template_dir))
-        
-        # 添加自定义过滤器
-        env.filters['get_dim_strengths'] = get_dim_strengths
-        env.filters['get_sub_strengths'] = get_sub_strengths
-        env.filters['get_dim_weaknesses'] = get_dim_weaknesses
-        env.filters['get_sub_weaknesses'] = get_sub_weaknesses
-        env.filters['get_top_strength'] = get_top_strength
-        env.filters['get_main_weakness'] = get_main_weakness
-        
-        # 渲染模板
-        template = env.from_string(template_content)
+        template = template_registry.from_string(template_content, os.path.basename(template_path), template_dir)
         html_output = template.render(**processed_data)
         
         # 添加更多调试信息
@@ -415,15 +408,9 @@ def generate_preview_html(config_path, template_path, test_data=None):
 </html>"""
 
 
-def read_excel_to_report_data_list(file_path):
-    """
-    从Excel文件读取多个人才数据，并转换为report_data列表
-    """
-    # 读取Excel文件
-    df = pd.read_excel(file_path, engine='openpyxl')
-
-    # 列名映射字典 (从Excel列名到代码中使用的名称)
-    column_mapping = {
+# 管理潜质测评（旧版报告）的 Excel 列布局，与 configs 中的试卷配置格式相同
+LEGACY_EXCEL_LAYOUT = {
+    "field_mapping": {
         '姓名': 'name',
         '总分': 'total_score',
         '大维度1：自我成长与发展': '自我成长与发展',
@@ -442,162 +429,54 @@ def read_excel_to_report_data_list(file_path):
         '小维度10：跨领域思考': '跨领域思考',
         '小维度11：概念性思维': '概念性思维',
         '小维度12：适应变化情境': '适应变化情景'
-    }
+    },
+    "dimensions": [
+        {"name": "自我成长与发展", "sub_dimensions": [
+            {"name": "学习与探索动机"}, {"name": "寻求和运用反馈"}, {"name": "情感成熟度"}]},
+        {"name": "管理动力", "sub_dimensions": [
+            {"name": "领导意愿"}, {"name": "追求成就"}, {"name": "组织意识"}]},
+        {"name": "管理他人", "sub_dimensions": [
+            {"name": "人际洞察"}, {"name": "同理心"}, {"name": "发挥他人"}]},
+        {"name": "管理事务", "sub_dimensions": [
+            {"name": "跨领域思考"}, {"name": "概念性思维"}, {"name": "适应变化情景"}]},
+    ],
+}
 
-    # 简化列名（移除前缀）
-    df.columns = [column_mapping.get(col, col) for col in df.columns]
-
-    report_data_list = []
-    for _, row in df.iterrows():
-        # 创建数据结构
-        report_data = {
-            "user_info": {
-                "name": row['name'],
-                "total_score": row['total_score']
-            },
-            "dimensions": {
-                "自我成长与发展": {
-                    "score": row['自我成长与发展'],
-                    "subs": {
-                        "学习与探索动机": row['学习与探索动机'],
-                        "寻求和运用反馈": row['寻求和运用反馈'],
-                        "情感成熟度": row['情感成熟度']
-                    }
-                },
-                "管理动力": {
-                    "score": row['管理动力'],
-                    "subs": {
-                        "领导意愿": row['领导意愿'],
-                        "追求成就": row['追求成就'],
-                        "组织意识": row['组织意识']
-                    }
-                },
-                "管理他人": {
-                    "score": row['管理他人'],
-                    "subs": {
-                        "人际洞察": row['人际洞察'],
-                        "同理心": row['同理心'],
-                        "发挥他人": row['发挥他人']
-                    }
-                },
-                "管理事务": {
-                    "score": row['管理事务'],
-                    "subs": {
-                        "跨领域思考": row['跨领域思考'],
-                        "概念性思维": row['概念性思维'],
-                        "适应变化情景": row['适应变化情景']
-                    }
-                }
-            }
-        }
-        report_data_list.append(report_data)
 
-    return report_data_list
+def _excel_layout(paper_id=None):
+    """指定试卷时使用该试卷配置的列布局，否则使用旧版管理潜质测评的布局"""
+    if paper_id is None:
+        return LEGACY_EXCEL_LAYOUT
+    from .config_loader import get_paper_config
+    return get_paper_config(paper_id)
 
 
-def read_excel_with_averages(file_path):
-    """
-    读取Excel文件，并提取平均分数据
-    返回两个结果：人才数据列表和平均分字典
+def open_report_workbook(file_path, paper_id=None, average_row=True):
     """
-    # 读取Excel文件
-    df = pd.read_excel(file_path, engine='openpyxl')
-
-    # 列名映射
-    column_mapping = {
-        '姓名': 'name',
-        '总分': 'total_score',
-        '大维度1：自我成长与发展': '自我成长与发展',
-        '小维度1：学习与探索动机': '学习与探索动机',
-        '小维度2：寻求和运用反馈': '寻求和运用反馈',
-        '小维度3：情感成熟度': '情感成熟度',
-        '大维度2：管理动力': '管理动力',
-        '小维度4：领导意愿': '领导意愿',
-        '小维度5：追求成就': '追求成就',
-        '小维度6：组织意识': '组织意识',
-        '大维度3：管理他人': '管理他人',
-        '小维度7：人际洞察': '人际洞察',
-        '小维度8：同理心': '同理心',
-        '小维度9：发挥他人': '发挥他人',
-        '大维度4：管理事务': '管理事务',
-        '小维度10：跨领域思考': '跨领域思考',
-        '小维度11：概念性思维': '概念性思维',
-        '小维度12：适应变化情境': '适应变化情景'
-    }
+    流式打开人才数据Excel（默认最后一行为平均分行）
 
-    # 简化列名
-    df.columns = [column_mapping.get(col, col) for col in df.columns]
+    返回 ReportWorkbook：count 为人数，average_scores 为平均分字典，迭代时逐条产出 report_data
+    """
+    return ReportWorkbook(file_path, _excel_layout(paper_id), average_row=average_row)
 
-    # 提取平均分行（最后一行）
-    average_row = df.iloc[-1].copy()
 
-    # 创建平均分字典
-    average_scores = {
-        "总分": average_row['total_score'],
-        "维度": {},
-        "子维度": {}
-    }
+def read_excel_to_report_data_list(file_path, paper_id=None):
+    """
+    从Excel文件读取多个人才数据，并转换为report_data列表
+    """
+    return list(iter_report_data(file_path, _excel_layout(paper_id)))
 
-    # 添加维度平均分
-    for dim in ['自我成长与发展', '管理动力', '管理他人', '管理事务']:
-        average_scores["维度"][dim] = average_row[dim]
-
-    # 添加子维度平均分
-    for sub_dim in ['学习与探索动机', '寻求和运用反馈', '情感成熟度',
-                    '领导意愿', '追求成就', '组织意识',
-                    '人际洞察', '同理心', '发挥他人',
-                    '跨领域思考', '概念性思维', '适应变化情景']:
-        average_scores["子维度"][sub_dim] = average_row[sub_dim]
-
-    # 只保留人才数据行（排除最后一行平均分行）
-    talent_df = df.iloc[:-1]
-
-    # 转换为人才数据列表
-    report_data_list = []
-    for _, row in talent_df.iterrows():
-        report_data = {
-            "user_info": {
-                "name": row['name'],
-                "total_score": row['total_score']
-            },
-            "dimensions": {
-                "自我成长与发展": {
-                    "score": row['自我成长与发展'],
-                    "subs": {
-                        "学习与探索动机": row['学习与探索动机'],
-                        "寻求和运用反馈": row['寻求和运用反馈'],
-                        "情感成熟度": row['情感成熟度']
-                    }
-                },
-                "管理动力": {
-                    "score": row['管理动力'],
-                    "subs": {
-                        "领导意愿": row['领导意愿'],
-                        "追求成就": row['追求成就'],
-                        "组织意识": row['组织意识']
-                    }
-                },
-                "管理他人": {
-                    "score": row['管理他人'],
-                    "subs": {
-                        "人际洞察": row['人际洞察'],
-                        "同理心": row['同理心'],
-                        "发挥他人": row['发挥他人']
-                    }
-                },
-                "管理事务": {
-                    "score": row['管理事务'],
-                    "subs": {
-                        "跨领域思考": row['跨领域思考'],
-                        "概念性思维": row['概念性思维'],
-                        "适应变化情景": row['适应变化情景']
-                    }
-                }
-            }
-        }
-        report_data_list.append(report_data)
 
-    return report_data_list, average_scores
+def read_excel_with_averages(file_path, paper_id=None):
+    """
+    读取Excel文件，并提取平均分数据
+    返回两个结果：人才数据列表和平均分字典
+    """
+    with open_report_workbook(file_path, paper_id) as book:
+        average_scores = book.average_scores
+        if average_scores is None:
+            raise ValueError("Excel中没有数据行")
+        return list(book), average_scores
 
 
 def compare_with_average(report_data, average_scores):
@@ -1430,45 +1309,6 @@ def generate_filename(prefix, user_name, extension="png", with_timestamp=True):
 #     print(f"PDF报告已生成: {output_path}")
 
 
-def get_dim_strengths(strengths):
-    """获取所有优势维度"""
-    return strengths.get("维度", [])
-
-def get_sub_strengths(strengths):
-    """获取所有优势子维度"""
-    return strengths.get("子维度", [])
-
-# 在报告中显示劣势维度的过滤器
-def get_dim_weaknesses(weaknesses):
-    """获取所有劣势维度"""
-    return weaknesses.get("维度", [])
-
-def get_sub_weaknesses(weaknesses):
-    """获取所有劣势子维度"""
-    return weaknesses.get("子维度", [])
-
-
-def get_top_strength(strengths):
-    """获取最显著的优势维度或子维度"""
-    candidates = strengths.get("维度", []) + strengths.get("子维度", [])
-    if not candidates:
-        return None
-
-    # 按差异值从大到小排序
-    candidates.sort(key=lambda x: x["diff"], reverse=True)
-    return candidates[0]
-
-
-def get_main_weakness(weaknesses):
-    """获取最显著的劣势维度或子维度"""
-    candidates = weaknesses.get("维度", []) + weaknesses.get("子维度", [])
-    if not candidates:
-        return None
-
-    # 按差异值从小到大排序（差异值越小说明越需要关注）
-    candidates.sort(key=lambda x: x["diff"])
-    return candidates[0]
-
 def batch_generate_reports(excel_path, output_dir="output", assets_dir="assets"):
     """
     批量生成人才报告
@@ -1480,53 +1320,40 @@ def batch_generate_reports(excel_path, output_dir="output", assets_dir="assets")
     os.makedirs(output_dir, exist_ok=True)
     os.makedirs(assets_dir, exist_ok=True)
 
-    # 读取Excel数据
+    # 流式读取Excel数据，边读边生成
     print(f"读取Excel数据: {excel_path}")
-    report_data_list, average_scores = read_excel_with_averages(excel_path)
-
-    # 批量生成报告
-    print(f"开始批量生成报告 (共{len(report_data_list)}份)")
-    for i, report_data in enumerate(tqdm(report_data_list, desc="生成报告")):
-        try:
-            user_name = report_data['user_info']['name']
-            report_data = prepare_report_data(report_data)
-            report_data = compare_with_average(report_data, average_scores)
-
-            # 生成雷达图
-            radar_data = convert_to_radar_data(report_data['dimensions'])
-            chart_filename = generate_filename("radar_chart", user_name)
-            chart_path = os.path.join(assets_dir, chart_filename)
-            generated_path = generate_radar_chart(radar_data, chart_path)
-
-            # 设置Jinja2环境
-            env = Environment(loader=FileSystemLoader('.'))
-            env.filters['get_dim_strengths'] = get_dim_strengths
-            env.filters['get_dim_weaknesses'] = get_dim_weaknesses
-            env.filters['get_sub_strengths'] = get_sub_strengths
-            env.filters['get_sub_weaknesses'] = get_sub_weaknesses
-            env.filters['get_top_strength'] = get_top_strength
-            env.filters['get_main_weakness'] = get_main_weakness
-
-            template = env.get_template('assets/report_template.html')
-
-            # 嵌入图片为Base64
-            with open(generated_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            chart_base64 = f"data:image/png;base64,{encoded_string}"
-
-            # 渲染HTML内容
-            html_out = template.render(**report_data, chart_img=chart_base64)
-
-            # 生成PDF报告
-            report_filename = generate_filename("管理潜质测评报告", user_name, extension="pdf", with_timestamp=False)
-            report_path = os.path.join(output_dir, report_filename)
-            HTML(string=html_out).write_pdf(report_path)
+    with open_report_workbook(excel_path) as book:
+        average_scores = book.average_scores
+
+        # 批量生成报告
+        print(f"开始批量生成报告 (共{book.count}份)")
+        for i, report_data in enumerate(tqdm(book, total=book.count, desc="生成报告")):
+            try:
+                user_name = report_data['user_info']['name']
+                report_data = prepare_report_data(report_data)
+                report_data = compare_with_average(report_data, average_scores)
+
+                # 生成雷达图
+                radar_data = convert_to_radar_data(report_data['dimensions'])
+                chart_filename = generate_filename("radar_chart", user_name)
+                chart_bytes = render_radar_chart(radar_data)
+
+                # 使用共享的Jinja2环境，模板只解析一次
+                template = template_registry.get_template('assets/report_template.html', '.')
+
+                # 渲染HTML并生成PDF报告，雷达图通过内存资源表加载
+                report_filename = generate_filename("管理潜质测评报告", user_name, extension="pdf", with_timestamp=False)
+                report_path = os.path.join(output_dir, report_filename)
+                get_pdf_pipeline().render(
+                    template, dict(report_data, chart_img=asset_url(chart_filename)), report_path,
+                    assets={chart_filename: chart_bytes}
+                )
 
-        except Exception as e:
-            print(f"生成 {user_name} 的报告时出错: {str(e)}")
-            # 打印详细错误信息
-            import traceback
-            traceback.print_exc()
+            except Exception as e:
+                print(f"生成 {user_name} 的报告时出错: {str(e)}")
+                # 打印详细错误信息
+                import traceback
+                traceback.print_exc()
 
     print(f"\n报告生成完成，保存在: {output_dir}")
 
@@ -1633,20 +1460,9 @@ def generate_preview_html(config_path, template_path, test_data=None):
             # 提供一个默认的1x1像素透明PNG
             processed_data["chart_img"] = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
         
-        # 设置Jinja2环境
+        # 渲染模板（使用共享的Jinja2环境，相同模板内容只编译一次）
         template_dir = os.path.dirname(template_path)
-        env = Environment(loader=FileSystemLoader(template_dir))
-        
-        # 添加自定义过滤器
-        env.filters['get_dim_strengths'] = get_dim_strengths
-        env.filters['get_sub_strengths'] = get_sub_strengths
-        env.filters['get_dim_weaknesses'] = get_dim_weaknesses
-        env.filters['get_sub_weaknesses'] = get_sub_weaknesses
-        env.filters['get_top_strength'] = get_top_strength
-        env.filters['get_main_weakness'] = get_main_weakness
-        
-        # 渲染模板
-        template = env.from_string(template_content)
+        template = template_registry.from_string(template_content, os.path.basename(template_path), template_dir)
         html_output = template.render(**processed_data)
         
         # 添加更多调试信息
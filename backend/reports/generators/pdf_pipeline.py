@@ -0,0 +1,281 @@
+"""
+PDF 生成流水线
+
+原来每份报告都调用 HTML(string=html).write_pdf(path)，每次都要重新解析模板里的整段 CSS、
+重新下载 <link> 引用的外部样式表并重新解析字体；雷达图以几百 KB 的 base64 data URI
+内嵌在 HTML 中，解析 HTML 时还要再解码一遍。这里把 PDF 生成拆成三个阶段并复用可共享的部分：
+
+- 渲染 HTML：Jinja 模板渲染（模板编译结果由 template_registry 缓存）
+- 排版：HTML 中的 <style> 和 <link rel="stylesheet"> 按内容/地址缓存为预解析的 CSS 对象，
+  进程内共享同一个 FontConfiguration；图片等资源通过自定义 url_fetcher 从内存资源表读取
+- 写出：把排版结果写成 PDF 文件
+
+排版是 CPU 密集的纯 Python 计算，多份报告的并行由报告引擎的渲染进程池完成，
+本模块的缓存按进程保存，每个渲染进程热身后对后续任务持续生效。
+
+模板中引用内存资源时使用 asset_url(name) 生成的地址，例如：
+    <img src="{{ chart_img }}">，chart_img = asset_url("radar_chart.png")
+
+相关环境变量：
+- REPORT_CSS_CACHE_SIZE: 缓存的预解析样式表数量，默认 32
+- REPORT_REMOTE_CACHE_SIZE: 缓存的外部资源（字体、样式表、图片）数量，默认 64
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import quote, unquote, urljoin
+
+from weasyprint import CSS, HTML, default_url_fetcher
+
+try:
+    from weasyprint.text.fonts import FontConfiguration
+except ImportError:  # WeasyPrint < 53
+    from weasyprint.fonts import FontConfiguration
+
+ASSET_SCHEME = "report-asset:"
+
+# 可以提取的 <style> 块和样式表 <link>（不带 media 属性）
+_STYLESHEET_RE = re.compile(
+    r"<style\b(?![^>]*\bmedia\s*=)[^>]*>(?P<style>.*?)</style\s*>"
+    r"|(?P<link><link\b(?![^>]*\bmedia\s*=)[^>]*\brel\s*=\s*[\"']?stylesheet[\"']?[^>]*>)",
+    re.IGNORECASE | re.DOTALL,
+)
+_ANY_STYLESHEET_RE = re.compile(r"<style\b|<link\b[^>]*\brel\s*=\s*[\"']?stylesheet", re.IGNORECASE)
+_HREF_RE = re.compile(r"\bhref\s*=\s*[\"']([^\"']+)[\"']", re.IGNORECASE)
+
+AssetMap = Dict[str, Union[bytes, Tuple[bytes, str]]]
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def asset_url(name: str) -> str:
+    """内存资源在 HTML 中的引用地址（名称中的中文等字符会被百分号编码）"""
+    return f"{ASSET_SCHEME}{quote(name, safe='')}"
+
+
+class PdfTimings(NamedTuple):
+    """各阶段耗时（秒）"""
+    render_html: float
+    layout: float
+    write: float
+
+    @property
+    def total(self) -> float:
+        return self.render_html + self.layout + self.write
+
+
+class PdfResult(NamedTuple):
+    path: str
+    pages: int
+    timings: PdfTimings
+
+
+class _LRU:
+    """线程安全的小型 LRU 字典"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            value = self._items.setdefault(key, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class PdfPipeline:
+    """进程内共享的 PDF 生成流水线"""
+
+    def __init__(self, css_cache_size: Optional[int] = None, remote_cache_size: Optional[int] = None):
+        self.font_config = FontConfiguration()
+        self._stylesheets = _LRU(css_cache_size or _get_int_env("REPORT_CSS_CACHE_SIZE", 32))
+        self._remote = _LRU(remote_cache_size or _get_int_env("REPORT_REMOTE_CACHE_SIZE", 64))
+        # 共享的 FontConfiguration 不保证线程安全，同一进程内的排版串行进行（并行依靠多进程）
+        self._layout_lock = threading.Lock()
+
+    # ---------- 资源加载 ----------
+
+    def _fetch_remote(self, url: str) -> dict:
+        """加载外部资源，http(s) 资源按地址缓存（本地文件可能被修改，不缓存）"""
+        if not url.startswith(("http://", "https://")):
+            return default_url_fetcher(url)
+        cached = self._remote.get(url)
+        if cached is None:
+            result = default_url_fetcher(url)
+            content = result.get("string")
+            if content is None:
+                content = result["file_obj"].read()
+                result["file_obj"].close()
+            cached = self._remote.put(url, {
+                "string": content,
+                "mime_type": result.get("mime_type"),
+                "encoding": result.get("encoding"),
+                "redirected_url": result.get("redirected_url", url),
+            })
+        return dict(cached)
+
+    def make_url_fetcher(self, assets: Optional[AssetMap] = None):
+        """生成 url_fetcher：report-asset: 地址从内存资源表读取，其余地址走默认加载（带缓存）"""
+        assets = assets or {}
+
+        def fetch(url: str, *args, **kwargs) -> dict:
+            if url.startswith(ASSET_SCHEME):
+                name = unquote(url[len(ASSET_SCHEME):])
+                if name not in assets:
+                    raise ValueError(f"报告资源不存在: {name}")
+                value = assets[name]
+                if isinstance(value, tuple):
+                    content, mime_type = value
+                else:
+                    content, mime_type = value, mimetypes.guess_type(name)[0] or "application/octet-stream"
+                return {"string": content, "mime_type": mime_type, "redirected_url": url}
+            return self._fetch_remote(url)
+
+        return fetch
+
+    # ---------- 样式表缓存 ----------
+
+    def _parse_css(self, source: Union[str, bytes], base_url: Optional[str], encoding: Optional[str] = None):
+        """预解析样式表，返回 (是否可提取, CSS)"""
+        important = b"!important" if isinstance(source, bytes) else "!important"
+        if important in source:
+            # 传给 render() 的样式表按用户样式表参与层叠，!important 的优先级会反转，保留在文档中
+            return False, None
+        return True, CSS(string=source, base_url=base_url, encoding=encoding, font_config=self.font_config,
+                         url_fetcher=self.make_url_fetcher())
+
+    def _inline_css(self, source: str, base_url: Optional[str]):
+        key = ("style", hashlib.sha1(source.encode("utf-8")).hexdigest(), base_url)
+        entry = self._stylesheets.get(key)
+        if entry is None:
+            entry = self._stylesheets.put(key, self._parse_css(source, base_url))
+        return entry
+
+    def _linked_css(self, href: str, base_url: Optional[str]):
+        url = urljoin(base_url, href) if base_url else href
+        key = ("link", url)
+        entry = self._stylesheets.get(key)
+        if entry is None:
+            try:
+                result = self._fetch_remote(url)
+                content = result.get("string")
+                if content is None:
+                    content = result["file_obj"].read()
+                    result["file_obj"].close()
+                entry = self._parse_css(content, result.get("redirected_url") or url, result.get("encoding"))
+            except Exception as e:
+                # 与 WeasyPrint 处理失效链接的方式一致：忽略该样式表继续排版（不缓存，下次重试）
+                print(f"加载样式表失败 {href}: {e}")
+                return True, None
+            entry = self._stylesheets.put(key, entry)
+        return entry
+
+    def extract_stylesheets(self, html_content: str, base_url: Optional[str] = None) -> Tuple[str, List[CSS]]:
+        """
+        把 HTML 中的 <style> 和样式表 <link> 替换为缓存的预解析 CSS 对象
+
+        WeasyPrint 把传给 render() 的样式表当作用户样式表，与文档内样式表同时存在时层叠顺序会变化，
+        因此只有文档内全部样式表都可以提取时才提取，否则原样返回交给 WeasyPrint 解析。
+
+        Returns:
+            (去掉样式后的 HTML, 按文档顺序排列的样式表列表)
+        """
+        matches = list(_STYLESHEET_RE.finditer(html_content))
+        if not matches or len(matches) != len(_ANY_STYLESHEET_RE.findall(html_content)):
+            return html_content, []
+        stylesheets = []
+        for match in matches:
+            if match.group("style") is not None:
+                extractable, stylesheet = self._inline_css(match.group("style"), base_url)
+            else:
+                href = _HREF_RE.search(match.group("link"))
+                extractable, stylesheet = self._linked_css(href.group(1), base_url) if href else (True, None)
+            if not extractable:
+                return html_content, []
+            if stylesheet is not None:
+                stylesheets.append(stylesheet)
+        return _STYLESHEET_RE.sub("", html_content), stylesheets
+
+    # ---------- 生成 ----------
+
+    def layout(self, html_content: str, assets: Optional[AssetMap] = None, base_url: Optional[str] = None):
+        """排版 HTML，返回 WeasyPrint Document"""
+        with self._layout_lock:
+            stripped, stylesheets = self.extract_stylesheets(html_content, base_url)
+            document = HTML(string=stripped, base_url=base_url, url_fetcher=self.make_url_fetcher(assets))
+            return document.render(stylesheets=stylesheets, font_config=self.font_config)
+
+    def write_pdf(self, html_content: str, output_path: str, assets: Optional[AssetMap] = None,
+                  base_url: Optional[str] = None, render_html_time: float = 0.0) -> PdfResult:
+        """排版并写出 PDF"""
+        started = time.perf_counter()
+        document = self.layout(html_content, assets, base_url)
+        laid_out = time.perf_counter()
+        document.write_pdf(output_path)
+        finished = time.perf_counter()
+        return PdfResult(str(output_path), len(document.pages),
+                         PdfTimings(render_html_time, laid_out - started, finished - laid_out))
+
+    def render(self, template, context: dict, output_path: str, assets: Optional[AssetMap] = None,
+               base_url: Optional[str] = None) -> PdfResult:
+        """渲染 Jinja 模板并生成 PDF"""
+        started = time.perf_counter()
+        html_content = template.render(**context)
+        return self.write_pdf(html_content, output_path, assets, base_url, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {"stylesheets": len(self._stylesheets), "remote_resources": len(self._remote)}
+
+    def clear(self) -> None:
+        self._stylesheets.clear()
+        self._remote.clear()
+
+
+_default_pipeline: Optional[PdfPipeline] = None
+_default_pipeline_lock = threading.Lock()
+
+
+def get_pdf_pipeline() -> PdfPipeline:
+    """获取进程内共享的流水线（pdf_pipeline 和 reports.generators.pdf_pipeline 两种导入路径共用）"""
+    global _default_pipeline
+    if _default_pipeline is None:
+        with _default_pipeline_lock:
+            if _default_pipeline is None:
+                for module_name in ("pdf_pipeline", "reports.generators.pdf_pipeline"):
+                    module = sys.modules.get(module_name)
+                    shared = getattr(module, "_default_pipeline", None) if module is not None else None
+                    if shared is not None:
+                        _default_pipeline = shared
+                        break
+                else:
+                    _default_pipeline = PdfPipeline()
+    return _default_pipeline
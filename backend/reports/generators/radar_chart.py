@@ -1,213 +1,284 @@
-import matplotlib.pyplot as plt
+"""
+雷达图生成器
+
+使用面向对象的 Figure + Agg 画布绘图，不经过 pyplot 全局状态，也不修改全局 rcParams，可在多线程中并发调用。
+
+同一份试卷配置下所有被试者的雷达图只有分数不同，因此把网格、辐条、象限色块、维度标签、
+象限标题等静态内容按维度布局绘制一次并缓存为背景像素，每次只在背景上绘制被试者的折线、
+分数点和分数徽标，直接输出内存中的 PNG 字节（或 SVG），不再经过磁盘中转。
+
+相关环境变量：
+- RADAR_BACKGROUND_CACHE_SIZE: 缓存的背景数量（每种维度布局一个），默认 8
+"""
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from PIL import Image
+
+# 中文字体（替代原来对全局 rcParams 的修改）
+FONT_FAMILY = ['SimHei', 'Microsoft YaHei', 'SimSun', 'sans-serif']
+DEFAULT_DPI = 150
+
+# 象限背景色填充
+QUADRANT_PARAMS = [
+    (0, 90, "#00CC0060"),  # 深绿色
+    (90, 180, "#9900FF60"),  # 深紫色
+    (180, 270, "#0066FF60"),  # 深蓝色
+    (270, 360, "#FF333360")  # 深红色
+]
+# 紧贴10分圆圈的背景色环
+RING_COLORS = {0: "#00CC0020", 90: "#9900FF20", 180: "#0066FF20", 270: "#FF333320"}
+# 象限标题（沿圆形排列，紧贴外圈）
+GROUP_LABELS = [
+    (45, "自我成长与发展", "#00CC00"),  # 深绿色
+    (135, "管理动力", "#9900FF"),  # 深紫色
+    (225, "管理事务", "#0066FF"),  # 深蓝色
+    (315, "管理他人", "#FF3333")  # 深红色
+]
+RADII = np.arange(0, 11, 2)
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _font(size: float, weight: str = 'normal') -> FontProperties:
+    return FontProperties(family=FONT_FAMILY, size=size, weight=weight)
+
+
+class RadarLayout(NamedTuple):
+    """按角度排序后的维度布局，作为背景缓存的键"""
+    angles: Tuple[float, ...]
+    labels: Tuple[str, ...]
+    colors: Tuple[str, ...]
+
+
+def _prepare(data) -> Tuple[RadarLayout, List[float]]:
+    """数据预处理：展开各组维度并按角度排序"""
+    angles, scores, labels, colors = [], [], [], []
+    for group in data:
+        for dim in group["dims"]:
+            angles.append(float(np.deg2rad(dim["angle"])))
+            scores.append(float(dim["score"]))
+            labels.append(str(dim["name"]))
+            colors.append(group["color"])
+    order = np.argsort(angles, kind="stable")
+    layout = RadarLayout(
+        tuple(angles[i] for i in order),
+        tuple(labels[i] for i in order),
+        tuple(colors[i] for i in order),
+    )
+    return layout, [scores[i] for i in order]
+
+
+def _new_axes(dpi: int):
+    fig = Figure(figsize=(10, 10), facecolor='white', dpi=dpi)
+    fig.patch.set_alpha(1.0)  # 确保背景不透明
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, polar=True, facecolor='white')
+    ax.set_theta_direction(-1)  # 顺时针
+    ax.set_theta_zero_location('N')  # 0度在上方
+    ax.set_xticks([])
+    ax.set_ylim(0, 18)  # 扩大范围以容纳更大的元素
+    return fig, canvas, ax
+
+
+def _draw_background(ax, layout: RadarLayout) -> None:
+    """绘制与分数无关的静态内容"""
+    full_circle = np.linspace(0, 2 * np.pi, 361)
+    # 蜘蛛网格线
+    for r in RADII:
+        ax.plot(full_circle, [r] * 361, color="#DDDDDD", lw=0.8, zorder=1)
+
+    # 从中心到各维度的虚线
+    for angle in layout.angles:
+        ax.plot([0, angle], [0, 10], linestyle='--', color='#CCCCCC', linewidth=1.0, alpha=0.7, zorder=1)
+
+    # 维度名称（外圈）
+    for angle, label, color in zip(layout.angles, layout.labels, layout.colors):
+        ax.text(angle, 13.5, label, ha='center', va='center', color='#333333', zorder=6,
+                fontproperties=_font(12, 'bold'),
+                bbox=dict(boxstyle="round,pad=0.2", ec=color, fc='white', alpha=0.8))
+
+    # 象限背景色填充
+    for start, end, color in QUADRANT_PARAMS:
+        theta = np.linspace(np.deg2rad(start), np.deg2rad(end), 100)
+        ax.fill_between(theta, 10.5, 16.5, color=color, zorder=3)
+
+    # 增强外部圆形轮廓
+    ax.plot(full_circle, [10] * 361, color="#666666", lw=1.5, zorder=2)
+
+    # 在雷达图最外圈圆形线外侧添加背景色环
+    for deg in range(0, 360, 90):
+        theta = np.linspace(np.deg2rad(deg), np.deg2rad(deg + 90), 100)
+        ax.fill_between(theta, 10.0, 11.0, color=RING_COLORS.get(deg, "#CCCCCC"), zorder=3)
+
+    # 象限标题，带轻微文字阴影增强可读性
+    title_radius = 18.8
+    for deg, text, color in GROUP_LABELS:
+        ax.text(np.deg2rad(deg), title_radius - 0.05, text, color='white', ha='center', va='center',
+                zorder=7, alpha=0.5, fontproperties=_font(20, 'bold'))
+        ax.text(np.deg2rad(deg), title_radius, text, color=color, ha='center', va='center',
+                zorder=8, fontproperties=_font(20, 'bold'))
+
+    # 刻度标签
+    ax.set_yticks(RADII)
+    ax.set_yticklabels([str(int(x)) for x in RADII], color='#333333', fontproperties=_font(12))
+    ax.tick_params(axis='y', pad=22)  # 刻度外移更多
+
+
+def _draw_scores(ax, layout: RadarLayout, scores: List[float]) -> list:
+    """绘制被试者的分数相关内容，返回新增的图元"""
+    artists = []
+    # 维度点标记
+    for angle, score, color in zip(layout.angles, scores, layout.colors):
+        artists.extend(ax.plot(angle, score, 'o', markersize=8, markerfacecolor=color,
+                               markeredgecolor='white', markeredgewidth=1.5, zorder=3))
+
+    # 雷达图主体
+    closed_angles = list(layout.angles) + list(layout.angles[:1])
+    closed_scores = list(scores) + list(scores[:1])
+    artists.extend(ax.fill(closed_angles, closed_scores, color='#8000FF', alpha=0.15, zorder=4))
+    artists.extend(ax.plot(closed_angles, closed_scores, color='#8000FF', linewidth=2.5, zorder=5))  # 深紫色线条
+
+    # 分数徽标
+    marker_radius = 15.5
+    for angle, score, color in zip(layout.angles, scores, layout.colors):
+        artists.extend(ax.plot(angle, marker_radius, 'o', markersize=32, markerfacecolor=color,
+                               markeredgecolor='white', markeredgewidth=2.5, zorder=7))
+        artists.append(ax.text(angle, marker_radius, f"{score:.1f}", ha='center', va='center',
+                               color='white', zorder=8, fontproperties=_font(16, 'bold')))
+    return artists
+
+
+class _Background:
+    """某种维度布局的预渲染背景"""
+
+    def __init__(self, layout: RadarLayout, dpi: int):
+        self.lock = threading.Lock()
+        self.fig, self.canvas, self.ax = _new_axes(dpi)
+        _draw_background(self.ax, layout)
+        self.ax.set_autoscale_on(False)
+        self.fig.tight_layout()
+        self.canvas.draw()
+        self.region = self.canvas.copy_from_bbox(self.fig.bbox)
+
+        # 与 savefig(bbox_inches='tight') 相同的裁剪区域（四周留 0.1 英寸）
+        width, height = self.canvas.get_width_height()
+        tight = self.fig.get_tightbbox(self.canvas.get_renderer()).padded(0.1)
+        x0 = max(0, int(np.floor(tight.x0 * dpi)))
+        x1 = min(width, int(np.ceil(tight.x1 * dpi)))
+        y0 = max(0, int(np.floor(height - tight.y1 * dpi)))
+        y1 = min(height, int(np.ceil(height - tight.y0 * dpi)))
+        self.crop = (slice(y0, y1), slice(x0, x1))
+
+    def render(self, layout: RadarLayout, scores: List[float]) -> np.ndarray:
+        """在背景上绘制分数，返回裁剪后的 RGB 像素"""
+        with self.lock:
+            self.canvas.restore_region(self.region)
+            artists = _draw_scores(self.ax, layout, scores)
+            try:
+                for artist in artists:
+                    self.ax.draw_artist(artist)
+                pixels = np.asarray(self.canvas.buffer_rgba())[self.crop][..., :3].copy()
+            finally:
+                for artist in artists:
+                    artist.remove()
+        return pixels
+
+
+class RadarChartRenderer:
+    """线程安全的雷达图渲染器，按维度布局缓存背景"""
+
+    def __init__(self, dpi: int = DEFAULT_DPI, cache_size: Optional[int] = None):
+        self.dpi = dpi
+        self.cache_size = cache_size or _get_int_env("RADAR_BACKGROUND_CACHE_SIZE", 8)
+        self._backgrounds: "OrderedDict[RadarLayout, _Background]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_background(self, layout: RadarLayout) -> _Background:
+        with self._lock:
+            background = self._backgrounds.get(layout)
+            if background is not None:
+                self._backgrounds.move_to_end(layout)
+                return background
+        # 背景构建较慢，放在全局锁外进行；并发构建同一布局时保留先完成的一个
+        background = _Background(layout, self.dpi)
+        with self._lock:
+            background = self._backgrounds.setdefault(layout, background)
+            self._backgrounds.move_to_end(layout)
+            while len(self._backgrounds) > self.cache_size:
+                self._backgrounds.popitem(last=False)
+        return background
+
+    def render_png(self, data) -> bytes:
+        """渲染雷达图，返回 PNG 字节"""
+        layout, scores = _prepare(data)
+        pixels = self._get_background(layout).render(layout, scores)
+        buf = io.BytesIO()
+        Image.fromarray(pixels).save(buf, format="PNG", dpi=(self.dpi, self.dpi), compress_level=3)
+        return buf.getvalue()
+
+    def render_svg(self, data) -> bytes:
+        """渲染矢量雷达图，返回 SVG 字节（矢量输出无法复用像素背景，每次完整绘制）"""
+        layout, scores = _prepare(data)
+        fig, canvas, ax = _new_axes(self.dpi)
+        _draw_background(ax, layout)
+        _draw_scores(ax, layout, scores)
+        fig.tight_layout()
+        buf = io.BytesIO()
+        fig.savefig(buf, format="svg", bbox_inches='tight', facecolor='white')
+        return buf.getvalue()
+
+    def render(self, data, fmt: str = "png") -> bytes:
+        if fmt == "svg":
+            return self.render_svg(data)
+        return self.render_png(data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._backgrounds.clear()
+
+
+_default_renderer: Optional[RadarChartRenderer] = None
+_default_renderer_lock = threading.Lock()
+
+
+def get_radar_renderer() -> RadarChartRenderer:
+    global _default_renderer
+    if _default_renderer is None:
+        with _default_renderer_lock:
+            if _default_renderer is None:
+                _default_renderer = RadarChartRenderer()
+    return _default_renderer
+
+
+def render_radar_chart(data, fmt: str = "png") -> bytes:
+    """在内存中生成雷达图，fmt 为 png 或 svg"""
+    return get_radar_renderer().render(data, fmt)
 
 
 def generate_radar_chart(data, output_path="assets/radar_chart.png"):
-    """生成雷达图并保存为文件"""
+    """生成雷达图并保存为文件（兼容旧调用方式，报告生成请使用 render_radar_chart）"""
     try:
         # 确保输出目录存在
         from pathlib import Path
         output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
-        # 设置全局字体
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'SimSun']
-        plt.rcParams['axes.unicode_minus'] = False
-
-        # 创建白色背景
-        fig = plt.figure(figsize=(10, 10), facecolor='white')
-        fig.patch.set_alpha(1.0)  # 确保背景不透明
-
-        ax = plt.subplot(111, polar=True, facecolor='white')
-        ax.set_theta_direction(-1)  # 顺时针
-        ax.set_theta_zero_location('N')  # 0度在上方
-        ax.set_xticks([])
-        ax.set_ylim(0, 18)  # 扩大范围以容纳更大的元素
-
-
-
-        ax = plt.subplot(111, polar=True, facecolor='white')
-        ax.set_theta_direction(-1)  # 顺时针
-        ax.set_theta_zero_location('N')  # 0度在上方
-        ax.set_xticks([])
-        ax.set_ylim(0, 18)  # 扩大范围以容纳更大的元素
-
-        # 数据预处理
-        angles, scores, labels, colors = [], [], [], []
-        for group in data:
-            for dim in group["dims"]:
-                angles.append(np.deg2rad(dim["angle"]))
-                scores.append(dim["score"])
-                labels.append(dim["name"])
-                colors.append(group["color"])
-
-        # 按角度排序
-        sorted_indices = np.argsort(angles)
-        angles = np.array(angles)[sorted_indices].tolist()
-        scores = np.array(scores)[sorted_indices].tolist()
-        labels = np.array(labels)[sorted_indices].tolist()
-        colors = np.array(colors)[sorted_indices].tolist()
-
-        # 蜘蛛网格线
-        radii = np.arange(0, 11, 2)
-        for r in radii:
-            ax.plot(np.linspace(0, 2 * np.pi, 361), [r] * 361,
-                    color="#DDDDDD", lw=0.8, zorder=1)
-
-        # 添加维度点标记和虚线 ======================================
-        for i in range(len(angles)):
-            # 获取当前点的角度和分数
-            angle = angles[i]
-            score = scores[i]
-            color = colors[i]
-
-            # 绘制从中心到点的虚线
-            ax.plot([0, angle], [0, 10],
-                    linestyle='--',
-                    color='#CCCCCC',
-                    linewidth=1.0,
-                    alpha=0.7,
-                    zorder=1)
-
-            # 在点上添加标记
-            ax.plot(angle, score, 'o',
-                    markersize=8,
-                    markerfacecolor=color,
-                    markeredgecolor='white',
-                    markeredgewidth=1.5,
-                    zorder=3)
-        # =====================================================
-
-        # 雷达图主体
-        angles += angles[:1]
-        scores += scores[:1]
-        ax.plot(angles, scores, color='#8000FF', linewidth=2.5, zorder=5)  # 深紫色线条
-        ax.fill(angles, scores, color='#8000FF', alpha=0.15, zorder=4)
-
-        # 维度标签与分数显示
-        for angle, score, label, color in zip(angles[:-1], scores[:-1], labels, colors):
-            # 维度名称（移到外圈）
-            text_radius = 13.5
-            ax.text(angle, text_radius, label,
-                    ha='center', va='center',
-                    fontsize=12, color='#333333',
-                    fontweight='bold', zorder=6,
-                    bbox=dict(boxstyle="round,pad=0.2",
-                              ec=color,
-                              fc='white',
-                              alpha=0.8))
-
-            # 分数标记
-            marker_radius = 15.5
-            ax.plot(angle, marker_radius, 'o',
-                    markersize=32,
-                    markerfacecolor=color,
-                    markeredgecolor='white',
-                    markeredgewidth=2.5,
-                    zorder=7)
-
-            ax.text(angle, marker_radius, f"{score:.1f}",
-                    ha='center', va='center',
-                    fontsize=16,
-                    color='white',
-                    fontweight='bold', zorder=8)
-
-        # 象限背景色填充
-        quadrant_params = [
-            (0, 90, "#00CC0060"),  # 深绿色
-            (90, 180, "#9900FF60"),  # 深紫色
-            (180, 270, "#0066FF60"),  # 深蓝色
-            (270, 360, "#FF333360")  # 深红色
-        ]
-        for start, end, color in quadrant_params:
-            theta = np.linspace(np.deg2rad(start), np.deg2rad(end), 100)
-            ax.fill_between(theta, 10.5, 16.5,  # 填充范围稍作调整
-                            color=color, zorder=3)
-
-        # 增强外部圆形轮廓
-        ax.plot(np.linspace(0, 2 * np.pi, 361), [10] * 361,
-                color="#666666", lw=1.5, zorder=2)
-
-        # 圆弧文字函数
-        def circular_text(ax, deg, radius, text, color, fontsize=16):
-            rad = np.deg2rad(deg)
-            if deg > 180:
-                rotation = rad - np.pi / 2
-                ha = 'right'
-            else:
-                rotation = rad + np.pi / 2
-                ha = 'left'
-
-            # 沿弧线排列文字
-            ax.text(rad, radius, text,
-                    fontsize=fontsize,
-                    color=color,
-                    fontweight='bold',
-                    ha=ha,
-                    va='center',
-                    rotation_mode='anchor',
-                    rotation=np.rad2deg(rotation),
-                    zorder=8)
-
-        # 象限标题（沿圆形排列，紧贴外圈）
-        group_labels = [
-            (45, "自我成长与发展", "#00CC00"),  # 深绿色
-            (135, "管理动力", "#9900FF"),  # 深紫色
-            (225, "管理事务", "#0066FF"),  # 深蓝色
-            (315, "管理他人", "#FF3333")  # 深红色
-        ]
-
-        # 在雷达图最外圈圆形线外侧添加背景色环
-        for deg in range(0, 360, 90):
-            theta = np.linspace(np.deg2rad(deg), np.deg2rad(deg + 90), 100)
-            # 确定当前象限对应的颜色
-            quadrant_color = "#CCCCCC"
-            if deg == 0:
-                quadrant_color = "#00CC0020"
-            elif deg == 90:
-                quadrant_color = "#9900FF20"
-            elif deg == 180:
-                quadrant_color = "#0066FF20"
-            elif deg == 270:
-                quadrant_color = "#FF333320"
-
-            ax.fill_between(theta, 10.0, 11.0,  # 紧贴10分圆圈的背景环
-                            color=quadrant_color, zorder=3)
-
-        # 标题文字位置
-        title_radius = 18.8
-        for deg, text, color in group_labels:
-            # 添加轻微文字阴影增强可读性
-            ax.text(np.deg2rad(deg), title_radius - 0.05, text,
-                    fontsize=20,
-                    color='white',
-                    fontweight='bold',
-                    ha='center',
-                    va='center',
-                    zorder=7,
-                    alpha=0.5)
-
-            # 添加主文字
-            ax.text(np.deg2rad(deg), title_radius, text,
-                    fontsize=20,
-                    color=color,
-                    fontweight='bold',
-                    ha='center',
-                    va='center',
-                    zorder=8)
-
-        # 刻度标签
-        ax.set_yticks(radii)
-        ax.set_yticklabels([str(int(x)) for x in radii],
-                           color='#333333', fontsize=12)
-        ax.tick_params(axis='y', pad=22)  # 刻度外移更多
-
-        # 保存图像
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=150, bbox_inches='tight', facecolor='white')
-        plt.close()
-
+        fmt = "svg" if output_path.suffix.lower() == ".svg" else "png"
+        output_path.write_bytes(render_radar_chart(data, fmt))
         return output_path
 
     except Exception as e:
         print(f"生成雷达图时出错: {str(e)}")
-        return None
\ No newline at end of file
+        return None
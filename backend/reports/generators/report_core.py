@@ -1,15 +1,15 @@
 import yaml
-import pandas as pd
-import base64
 import os
-from typing import Dict, List, Any, Optional
+from typing import Dict, Iterator, List, Any, Optional
 from datetime import datetime
 from pathlib import Path
 
-from config_loader import get_paper_config, get_available_papers
-from radar_chart import generate_radar_chart
-from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
+from config_loader import evaluation_level, get_available_papers, get_compiled_config, get_paper_config
+from excel_ingest import iter_report_data
+from radar_chart import render_radar_chart
+from jinja2 import Environment
+from template_registry import template_registry
+from pdf_pipeline import asset_url, get_pdf_pipeline
 
 
 class UniversalReportGenerator:
@@ -20,6 +20,7 @@ class UniversalReportGenerator:
         current_dir = Path(__file__).parent
         self.config_dir = current_dir / config_dir
         self.template_dir = current_dir / template_dir
+        self._jinja_env = None
         
         # 确保目录存在
         self.config_dir.mkdir(exist_ok=True)
@@ -29,24 +30,7 @@ class UniversalReportGenerator:
         print(f"报告生成器配置目录: {self.config_dir}")
         print(f"报告生成器模板目录: {self.template_dir}")
         
-        # 检查备用路径
-        self.alt_config_dir = None
-        parent_dir = current_dir.parent.parent.parent
-        alt_path = parent_dir / "backend" / "reports" / "generators" / "configs"
-        if alt_path.exists():
-            self.alt_config_dir = alt_path
-            print(f"发现备用配置目录: {self.alt_config_dir}")
-            
-            # 尝试复制文件
-            try:
-                for file in alt_path.glob("*.yaml"):
-                    target_file = self.config_dir / file.name
-                    if not target_file.exists():
-                        import shutil
-                        shutil.copy2(file, target_file)
-                        print(f"已复制配置文件: {file.name}")
-            except Exception as e:
-                print(f"复制配置文件失败: {str(e)}")
+        # 备用配置目录由配置加载器只读查找，这里不再复制文件
         
     def read_excel_data(self, excel_path: str, paper_id: int) -> List[Dict[str, Any]]:
         """
@@ -59,45 +43,16 @@ class UniversalReportGenerator:
         Returns:
             标准化后的数据列表
         """
-        config = get_paper_config(paper_id)
-        field_mapping = config.get('field_mapping', {})
-        
-        # 读取Excel文件
-        df = pd.read_excel(excel_path, engine='openpyxl')
-        
-        # 应用字段映射
-        df.columns = [field_mapping.get(col, col) for col in df.columns]
-        
-        # 转换为标准数据结构
-        report_data_list = []
-        for _, row in df.iterrows():
-            report_data = {
-                "user_info": {
-                    "name": row.get('name', ''),
-                    "total_score": row.get('total_score', 0)
-                },
-                "dimensions": {}
-            }
-            
-            # 构建维度数据结构
-            for dimension in config['dimensions']:
-                dim_name = dimension['name']
-                dim_score = row.get(dim_name, 0)
-                
-                report_data["dimensions"][dim_name] = {
-                    "score": dim_score,
-                    "subs": {}
-                }
-                
-                # 添加子维度数据
-                for sub_dim in dimension['sub_dimensions']:
-                    sub_name = sub_dim['name']
-                    sub_score = row.get(sub_name, 0)
-                    report_data["dimensions"][dim_name]["subs"][sub_name] = sub_score
-                    
-            report_data_list.append(report_data)
-            
-        return report_data_list
+        return list(self.iter_excel_data(excel_path, paper_id))
+        
+    def iter_excel_data(self, excel_path: str, paper_id: int) -> Iterator[Dict[str, Any]]:
+        """
+        根据试卷配置逐条读取Excel数据（流式读取，不一次性构造全部数据）
+        
+        Raises:
+            MissingColumnsError: Excel缺少姓名、总分或大维度列
+        """
+        return iter_report_data(excel_path, get_paper_config(paper_id))
         
     def prepare_report_data(self, report_data: Dict[str, Any], paper_id: int) -> Dict[str, Any]:
         """
@@ -110,11 +65,11 @@ class UniversalReportGenerator:
         Returns:
             处理后的报告数据
         """
-        config = get_paper_config(paper_id)
+        compiled = get_compiled_config(paper_id)
         
         # 获取总分评价
         total_score = report_data["user_info"]["total_score"]
-        performance_level = self._get_performance_level(paper_id, total_score)
+        performance_level = compiled.score_level(total_score)
         
         report_data["performance_eval"] = performance_level
         report_data["dimension_evaluations"] = {}
@@ -129,7 +84,7 @@ class UniversalReportGenerator:
                     score = dim_data.get("score", 0)
                 else:
                     score = dim_data  # 如果直接是分数
-                eval_data = self._get_dimension_evaluation(paper_id, dim_name, score)
+                eval_data = compiled.dimension_evaluation(dim_name, score)
                 
                 # 创建维度对象
                 dimension_obj = {
@@ -138,7 +93,7 @@ class UniversalReportGenerator:
                     "avg_score": 7.0,  # 默认平均分
                     "level_key": self._get_evaluation_level(score),
                     "level_description": self._get_level_description(score),
-                    "definition": self._get_dimension_definition(config, dim_name),
+                    "definition": compiled.dimension_description(dim_name),
                     "characteristics": [],
                     "typical_performances": [],
                     "suggestion": "",
@@ -160,7 +115,8 @@ class UniversalReportGenerator:
                             
                             # 获取子维度评价内容
                             if "sub_dimensions" in eval_data and sub_name in eval_data["sub_dimensions"]:
-                                sub_eval = eval_data["sub_dimensions"][sub_name]
+                                # 复制一份再加级别，不修改缓存的配置
+                                sub_eval = dict(eval_data["sub_dimensions"][sub_name])
                                 sub_eval["eval_level"] = sub_level
                                 
                                 dim_data["subs"][sub_name] = {
@@ -193,7 +149,7 @@ class UniversalReportGenerator:
             for dim_data in report_data["dimensions"]:
                 dim_name = dim_data["name"]
                 score = dim_data["score"]
-                eval_data = self._get_dimension_evaluation(paper_id, dim_name, score)
+                eval_data = compiled.dimension_evaluation(dim_name, score)
                 
                 # 创建维度对象
                 dimension_obj = {
@@ -202,7 +158,7 @@ class UniversalReportGenerator:
                     "avg_score": 7.0,  # 默认平均分
                     "level_key": self._get_evaluation_level(score),
                     "level_description": self._get_level_description(score),
-                    "definition": self._get_dimension_definition(config, dim_name),
+                    "definition": compiled.dimension_description(dim_name),
                     "characteristics": [],
                     "typical_performances": [],
                     "suggestion": "",
@@ -224,7 +180,8 @@ class UniversalReportGenerator:
                             
                             # 获取子维度评价内容
                             if "sub_dimensions" in eval_data and sub_name in eval_data["sub_dimensions"]:
-                                sub_eval = eval_data["sub_dimensions"][sub_name]
+                                # 复制一份再加级别，不修改缓存的配置
+                                sub_eval = dict(eval_data["sub_dimensions"][sub_name])
                                 sub_eval["eval_level"] = sub_level
                                 
                                 dim_data["subs"][sub_name] = {
@@ -292,7 +249,7 @@ class UniversalReportGenerator:
         Returns:
             雷达图数据
         """
-        config = get_paper_config(paper_id)
+        compiled = get_compiled_config(paper_id)
         radar_data = []
         
         # 处理维度数据格式
@@ -314,19 +271,15 @@ class UniversalReportGenerator:
                 })
             report_dimensions = dimensions_list
         
-        for dimension in config['dimensions']:
-            dim_name = dimension['name']
+        report_groups = {d['name']: d for d in reversed(report_dimensions)}
+        for group in compiled.radar_layout:
             # 在列表中查找对应维度
-            report_group = next((d for d in report_dimensions if d['name'] == dim_name), None)
+            report_group = report_groups.get(group.name)
             if not report_group:
                 continue
             group_dims = []
             subs = report_group.get('subs', {})
-            sub_dim_cfgs = dimension.get('sub_dimensions', [])
-            radar_angles = dimension.get('radar_angles', [])
-            for idx, sub_dim in enumerate(sub_dim_cfgs):
-                sub_name = sub_dim['name']
-                angle = radar_angles[idx] if idx < len(radar_angles) else 0
+            for sub_name, angle in group.dims:
                 # 分数优先取subs中的分数，否则为0
                 sub_score = subs.get(sub_name, 0)
                 if isinstance(sub_score, dict):
@@ -341,8 +294,8 @@ class UniversalReportGenerator:
                     "angle": angle
                 })
             radar_data.append({
-                "group": dim_name,
-                "color": dimension['color'],
+                "group": group.name,
+                "color": group.color,
                 "dims": group_dims
             })
         return radar_data
@@ -367,60 +320,45 @@ class UniversalReportGenerator:
         # 生成雷达图
         radar_data = self.convert_to_radar_data(report_data['dimensions'], paper_id)
         
-        if not chart_path:
-            user_name = report_data['user_info']['name']
-            chart_filename = f"radar_chart_{user_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            # 确保assets目录存在
-            assets_dir = Path(__file__).parent / "assets"
-            assets_dir.mkdir(exist_ok=True)
-            chart_path = str(assets_dir / chart_filename)
-            
-        # 生成雷达图文件
         print("雷达图数据：", radar_data)
-        generated_chart_path = generate_radar_chart(radar_data, chart_path)
-        
-        # 检查雷达图生成是否成功
-        if generated_chart_path is None:
-            raise Exception("雷达图生成失败")
-        
-        # 设置Jinja2环境
-        env = Environment(loader=FileSystemLoader(self.template_dir))
+        chart_format = template_config.get('chart_format', os.getenv('REPORT_CHART_FORMAT', 'png'))
+        try:
+            chart_bytes = render_radar_chart(radar_data, chart_format)
+        except Exception as e:
+            raise Exception(f"雷达图生成失败: {e}")
+        if chart_path:
+            # 指定了图表路径时额外写出文件，便于调试
+            Path(chart_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(chart_path).write_bytes(chart_bytes)
         
-        # 添加自定义过滤器
-        env.filters.update({
-            'get_dim_strengths': self._get_dim_strengths,
-            'get_dim_weaknesses': self._get_dim_weaknesses,
-            'get_sub_strengths': self._get_sub_strengths,
-            'get_sub_weaknesses': self._get_sub_weaknesses,
-            'get_top_strength': self._get_top_strength,
-            'get_main_weakness': self._get_main_weakness
-        })
+        # 复用已初始化的Jinja2环境（模板编译结果由环境缓存）
+        env = self._get_jinja_env()
         
         # 加载模板
         template_name = template_config.get('name', 'report_template.html')
         template = env.get_template(template_name)
         
-        # 嵌入图片为Base64
-        with open(generated_chart_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-        chart_base64 = f"data:image/png;base64,{encoded_string}"
+        # 雷达图通过内存资源表交给WeasyPrint，不再以Base64内嵌到HTML中
+        chart_name = "radar_chart.svg" if chart_format == "svg" else "radar_chart.png"
+        mime_type = "image/svg+xml" if chart_format == "svg" else "image/png"
         
-        # 渲染HTML内容
-        html_content = template.render(**report_data, chart_img=chart_base64)
-        
-        # 生成PDF
-        try:
-            HTML(string=html_content).write_pdf(output_path)
-        except TypeError as e:
-            if "PDF.__init__() takes 1 positional argument" in str(e):
-                # 兼容旧版本的WeasyPrint
-                html = HTML(string=html_content)
-                html.write_pdf(output_path)
-            else:
-                raise
+        # 渲染HTML并生成PDF（样式表和字体配置在进程内复用）
+        result = get_pdf_pipeline().render(
+            template, dict(report_data, chart_img=asset_url(chart_name)), output_path,
+            assets={chart_name: (chart_bytes, mime_type)}
+        )
+        timings = result.timings
+        print(f"PDF生成完成: {result.pages}页, 渲染HTML {timings.render_html:.3f}s, "
+              f"排版 {timings.layout:.3f}s, 写出 {timings.write:.3f}s")
         
         return output_path
         
+    def _get_jinja_env(self) -> Environment:
+        """获取进程内共享的Jinja2环境（过滤器已注册，编译结果由模板注册表缓存）"""
+        if self._jinja_env is None:
+            self._jinja_env = template_registry.get_environment(self.template_dir)
+        return self._jinja_env
+        
     def batch_generate_reports(self, excel_path: str, paper_id: int, 
                               output_dir: str = "output") -> List[str]:
         """
@@ -436,14 +374,11 @@ class UniversalReportGenerator:
         """
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
-        os.makedirs("assets", exist_ok=True)
-        
-        # 读取数据
-        report_data_list = self.read_excel_data(excel_path, paper_id)
         
         generated_files = []
         
-        for report_data in report_data_list:
+        # 逐条读取数据，边读边生成
+        for report_data in self.iter_excel_data(excel_path, paper_id):
             try:
                 # 准备报告数据
                 processed_data = self.prepare_report_data(report_data, paper_id)
@@ -468,38 +403,15 @@ class UniversalReportGenerator:
         
     def _get_performance_level(self, paper_id: int, score: float) -> Optional[Dict[str, Any]]:
         """获取绩效等级评价"""
-        config = get_paper_config(paper_id)
-        
-        for level in config.get('score_levels', []):
-            if level['min'] <= score <= level['max']:
-                return level
-                
-        return None
+        return get_compiled_config(paper_id).score_level(score)
         
     def _get_dimension_evaluation(self, paper_id: int, dimension_name: str, score: float) -> Optional[Dict[str, Any]]:
         """获取维度评价"""
-        config = get_paper_config(paper_id)
-        level = self._get_evaluation_level(score)
-        
-        if not level:
-            return None
-            
-        dimension_evaluations = config.get('dimension_evaluations', {})
-        if dimension_name not in dimension_evaluations:
-            return None
-            
-        return dimension_evaluations[dimension_name].get(level)
+        return get_compiled_config(paper_id).dimension_evaluation(dimension_name, score)
         
     def _get_evaluation_level(self, score: float) -> Optional[str]:
         """根据分数确定评价级别"""
-        if score >= 8.5:
-            return 'high'
-        elif score >= 7.5:
-            return 'medium'
-        elif score >= 6.5:
-            return 'low'
-        else:
-            return 'bad'
+        return evaluation_level(score)
             
     def _get_level_description(self, score: float) -> str:
         """根据分数获取级别描述"""
@@ -557,33 +469,6 @@ class UniversalReportGenerator:
             name = "unknown"
             
         return name
-        
-    # 模板过滤器方法
-    def _get_dim_strengths(self, strengths):
-        return strengths.get("维度", [])
-        
-    def _get_dim_weaknesses(self, weaknesses):
-        return weaknesses.get("维度", [])
-        
-    def _get_sub_strengths(self, strengths):
-        return strengths.get("子维度", [])
-        
-    def _get_sub_weaknesses(self, weaknesses):
-        return weaknesses.get("子维度", [])
-        
-    def _get_top_strength(self, strengths):
-        candidates = strengths.get("维度", []) + strengths.get("子维度", [])
-        if not candidates:
-            return None
-        candidates.sort(key=lambda x: x["diff"], reverse=True)
-        return candidates[0]
-        
-    def _get_main_weakness(self, weaknesses):
-        candidates = weaknesses.get("维度", []) + weaknesses.get("子维度", [])
-        if not candidates:
-            return None
-        candidates.sort(key=lambda x: x["diff"])
-        return candidates[0]
 
 
 # 全局报告生成器实例
@@ -1,58 +1,20 @@
 import os
 import base64
-import jinja2
 from datetime import time
-from weasyprint import HTML
 from generate_report import (  # 替换为您的报告生成模块
-    read_excel_with_averages,
+    open_report_workbook,
     prepare_report_data,
     convert_to_radar_data,
     generate_filename,
     compare_with_average
 )
-from radar_chart import generate_radar_chart
-
-
-# 添加之前的所有依赖函数（convert_to_radar_data, sanitize_filename, generate_filename等）
-# 确保所有依赖函数都包含在这个文件中或从其他模块导入
-def get_dim_strengths(strengths):
-    """获取所有优势维度"""
-    return strengths.get("维度", [])
-
-def get_sub_strengths(strengths):
-    """获取所有优势子维度"""
-    return strengths.get("子维度", [])
-
-# 在报告中显示劣势维度的过滤器
-def get_dim_weaknesses(weaknesses):
-    """获取所有劣势维度"""
-    return weaknesses.get("维度", [])
-
-def get_sub_weaknesses(weaknesses):
-    """获取所有劣势子维度"""
-    return weaknesses.get("子维度", [])
-
-
-def get_top_strength(strengths):
-    """获取最显著的优势维度或子维度"""
-    candidates = strengths.get("维度", []) + strengths.get("子维度", [])
-    if not candidates:
-        return None
-
-    # 按差异值从大到小排序
-    candidates.sort(key=lambda x: x["diff"], reverse=True)
-    return candidates[0]
-
-
-def get_main_weakness(weaknesses):
-    """获取最显著的劣势维度或子维度"""
-    candidates = weaknesses.get("维度", []) + weaknesses.get("子维度", [])
-    if not candidates:
-        return None
-
-    # 按差异值从小到大排序（差异值越小说明越需要关注）
-    candidates.sort(key=lambda x: x["diff"])
-    return candidates[0]
+from radar_chart import render_radar_chart
+# 报告模板过滤器统一定义在 template_registry，这里导入原名称供旧代码使用
+from template_registry import (
+    REPORT_FILTERS, get_dim_strengths, get_dim_weaknesses, get_main_weakness, get_sub_strengths,
+    get_sub_weaknesses, get_top_strength, template_registry,
+)
+from pdf_pipeline import asset_url, get_pdf_pipeline
 
 
 def save_temp_image(report_data, base_dir):
@@ -77,26 +39,17 @@ def save_temp_image(report_data, base_dir):
     return ""
 
 
-def generate_pdf_report(report_data, output_path, base_dir):
+def generate_pdf_report(report_data, output_path, base_dir, assets=None):
     """
     生成PDF报告
 
     :param report_data: 完整的报告数据
     :param output_path: 输出PDF文件路径
+    :param assets: 内存资源表 {名称: 字节}，模板中以 asset_url(名称) 引用
     """
-    # 1. 设置Jinja2环境
+    # 1. 获取共享的Jinja2环境（过滤器已注册）
     template_dir = os.path.join(base_dir, 'assets')
-    env = jinja2.Environment(loader=jinja2.FileSystemLoader(template_dir))
-
-    # 添加自定义过滤器
-    env.filters.update({
-        'get_dim_strengths': get_dim_strengths,
-        'get_dim_weaknesses': get_dim_weaknesses,
-        'get_sub_strengths': get_sub_strengths,
-        'get_sub_weaknesses': get_sub_weaknesses,
-        'get_top_strength': get_top_strength,
-        'get_main_weakness': get_main_weakness
-    })
+    env = template_registry.get_environment(template_dir)
 
     # 2. 加载模板
     template_path = os.path.join(template_dir, 'report_template.html')
@@ -108,7 +61,7 @@ def generate_pdf_report(report_data, output_path, base_dir):
         except Exception:
             with open(template_path, 'r', encoding='utf-8') as f:
                 template_content = f.read()
-                template = env.from_string(template_content)
+                template = template_registry.from_string(template_content, 'report_template.html', template_dir)
     else:
         raise RuntimeError(f"无法找到模板文件: {template_path}")
 
@@ -129,8 +82,8 @@ def generate_pdf_report(report_data, output_path, base_dir):
         #     f.write(html_content)
         #print(f"调试HTML已保存至: {debug_html_path}")
 
-        # 生成PDF（带超时）
-        HTML(string=html_content).write_pdf(output_path)
+        # 生成PDF（样式表和字体配置在进程内复用）
+        get_pdf_pipeline().write_pdf(html_content, output_path, assets=assets)
         #print("zheli")
     except Exception as e:
         #print("222222222333333")
@@ -141,10 +94,7 @@ def generate_pdf_report(report_data, output_path, base_dir):
             temp_report_data['chart_img'] = f"file://{temp_img_path}"
             try:
                 html_content = template.render(**temp_report_data)
-                HTML(string=html_content).write_pdf(
-                    output_path,
-                    timeout=60
-                )
+                get_pdf_pipeline().write_pdf(html_content, output_path, assets=assets)
             except Exception as e2:
                 raise RuntimeError(f"PDF生成失败: {str(e)} 和 {str(e2)}")
         else:
@@ -231,76 +181,68 @@ def batch_generate_reports(excel_path, output_dir, progress_callback, log_callba
     log_callback("读取Excel数据和平均分...")
 
     try:
-        # 使用之前定义的函数读取Excel
-        report_data_list, average_scores = read_excel_with_averages(excel_path)
-        total_reports = len(report_data_list)
+        # 流式读取Excel：先取人数和平均分行，报告数据在生成时逐条读取
+        book = open_report_workbook(excel_path)
+        average_scores = book.average_scores
+        total_reports = book.count
         log_callback(f"发现 {total_reports} 份报告需要生成")
     except Exception as e:
         log_callback(f"读取Excel失败: {str(e)}")
         raise
 
-    # 2. 批量生成报告
-    successful_reports = 0
-    failed_users = []
+    with book:
+        # 2. 批量生成报告
+        successful_reports = 0
+        failed_users = []
 
-    for i, report_data in enumerate(report_data_list):
-        user_name = report_data['user_info']['name']
-        report_num = i + 1
+        for i, report_data in enumerate(book):
+            user_name = report_data['user_info']['name']
+            report_num = i + 1
 
-        # 检查是否被取消
-        if not progress_callback(10 + i * 75 // total_reports,
-                                 f"处理用户 {report_num}/{total_reports}: {user_name}"):
-            return
+            # 检查是否被取消
+            if not progress_callback(10 + i * 75 // total_reports,
+                                     f"处理用户 {report_num}/{total_reports}: {user_name}"):
+                return
 
-        log_callback(f"\n>> 开始处理: {user_name} ({report_num}/{total_reports})")
+            log_callback(f"\n>> 开始处理: {user_name} ({report_num}/{total_reports})")
 
-        try:
-            # 2.1 准备报告数据
-            log_callback("准备报告数据...")
-
-            report_data = prepare_report_data(report_data)
-            report_data = compare_with_average(report_data, average_scores)
-
-            report_data = prepare_report_data(report_data)
-
-            # 2.2 转换为雷达图数据
-            log_callback("生成雷达图数据...")
-            radar_data = convert_to_radar_data(report_data['dimensions'])
-
-            # 2.3 生成雷达图
-            log_callback("创建雷达图...")
-            chart_filename = generate_filename("radar_chart", user_name)
-            chart_path = os.path.join(assets_dir, chart_filename)
-
-            # 假设您的雷达图生成函数是 generate_radar_chart
-            generated_path = generate_radar_chart(radar_data, chart_path)
-            log_callback(f"雷达图已保存: {generated_path}")
-            #print("111111111")
-            #(generated_path)
-            # 嵌入图片为Base64
-            with open(generated_path, "rb") as image_file:
-                encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-            #print(encoded_string)
-            # 将图片存储在report_data中
-            report_data['chart_img'] = f"data:image/png;base64,{encoded_string}"
-            #print(report_data['chart_img'])
-            # 2.4 生成PDF报告
-            log_callback("生成PDF报告...")
-            report_filename = generate_filename("2025年5月管培生管理潜质测评", user_name, extension="pdf",
-                                                with_timestamp=False)
-            report_path = os.path.join(output_dir, report_filename)
-            #print("111111111111111")
-            # 调用PDF生成函数 - 只传入base_dir
-            generate_pdf_report(report_data, report_path, base_dir)
-            #print("111111111111111")
-            log_callback(f"报告已生成: {report_path}")
-
-            successful_reports += 1
-
-        except Exception as e:
-            error_msg = f"生成 {user_name} 的报告时出错: {str(e)}"
-            log_callback(error_msg)
-            failed_users.append(user_name)
+            try:
+                # 2.1 准备报告数据
+                log_callback("准备报告数据...")
+
+                report_data = prepare_report_data(report_data)
+                report_data = compare_with_average(report_data, average_scores)
+
+                report_data = prepare_report_data(report_data)
+
+                # 2.2 转换为雷达图数据
+                log_callback("生成雷达图数据...")
+                radar_data = convert_to_radar_data(report_data['dimensions'])
+
+                # 2.3 生成雷达图
+                log_callback("创建雷达图...")
+                chart_filename = generate_filename("radar_chart", user_name)
+                chart_bytes = render_radar_chart(radar_data)
+                log_callback(f"雷达图已生成: {chart_filename}")
+                # 雷达图通过内存资源表交给PDF流水线，不再以Base64内嵌
+                report_data['chart_img'] = asset_url(chart_filename)
+                # 2.4 生成PDF报告
+                log_callback("生成PDF报告...")
+                report_filename = generate_filename("2025年5月管培生管理潜质测评", user_name, extension="pdf",
+                                                    with_timestamp=False)
+                report_path = os.path.join(output_dir, report_filename)
+                #print("111111111111111")
+                # 调用PDF生成函数 - 只传入base_dir
+                generate_pdf_report(report_data, report_path, base_dir, assets={chart_filename: chart_bytes})
+                #print("111111111111111")
+                log_callback(f"报告已生成: {report_path}")
+
+                successful_reports += 1
+
+            except Exception as e:
+                error_msg = f"生成 {user_name} 的报告时出错: {str(e)}"
+                log_callback(error_msg)
+                failed_users.append(user_name)
 
     # 完成所有报告
     completion_message = f"报告生成完成: {successful_reports}份成功"
@@ -0,0 +1,218 @@
+"""
+报告模板注册表
+
+报告生成、预览和批量生成原来每次调用都新建 jinja2.Environment、重新注册六个优势/劣势过滤器，
+并从磁盘或字符串重新解析模板。这里提供进程级共享的模板注册表：
+- 每个模板目录（及是否自动转义）只创建一个 Environment，过滤器注册一次
+- 字符串模板按 (模板名, 内容哈希) 缓存编译结果，内容不变时不再重复解析
+- 文件模板交给 Environment 自身的缓存（自动检查修改时间）
+- 可选使用 Jinja 的磁盘字节码缓存，多个渲染进程之间共享编译结果
+- ReportTemplateService 保存或删除模板时调用 invalidate_templates 主动失效
+
+本模块既会以 template_registry（报告生成器目录在 sys.path 中）也会以
+reports.generators.template_registry 的名字被导入，两者共享同一个注册表实例。
+
+相关环境变量：
+- REPORT_TEMPLATE_CACHE_SIZE: 每个 Environment 缓存的编译模板数，默认 400
+- REPORT_TEMPLATE_BYTECODE_DIR: 字节码缓存目录，未设置时不启用
+"""
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from jinja2 import (
+    BaseLoader, ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, Template,
+    TemplateNotFound,
+)
+
+STRING_TEMPLATE_PREFIX = "@string/"
+
+
+# ---------- 报告模板过滤器 ----------
+
+def get_dim_strengths(strengths):
+    """获取所有优势维度"""
+    return strengths.get("维度", [])
+
+
+def get_sub_strengths(strengths):
+    """获取所有优势子维度"""
+    return strengths.get("子维度", [])
+
+
+def get_dim_weaknesses(weaknesses):
+    """获取所有劣势维度"""
+    return weaknesses.get("维度", [])
+
+
+def get_sub_weaknesses(weaknesses):
+    """获取所有劣势子维度"""
+    return weaknesses.get("子维度", [])
+
+
+def get_top_strength(strengths):
+    """获取最显著的优势维度或子维度"""
+    candidates = strengths.get("维度", []) + strengths.get("子维度", [])
+    if not candidates:
+        return None
+    # 按差异值从大到小排序
+    candidates.sort(key=lambda x: x["diff"], reverse=True)
+    return candidates[0]
+
+
+def get_main_weakness(weaknesses):
+    """获取最显著的劣势维度或子维度"""
+    candidates = weaknesses.get("维度", []) + weaknesses.get("子维度", [])
+    if not candidates:
+        return None
+    # 按差异值从小到大排序
+    candidates.sort(key=lambda x: x["diff"])
+    return candidates[0]
+
+
+REPORT_FILTERS = {
+    'get_dim_strengths': get_dim_strengths,
+    'get_dim_weaknesses': get_dim_weaknesses,
+    'get_sub_strengths': get_sub_strengths,
+    'get_sub_weaknesses': get_sub_weaknesses,
+    'get_top_strength': get_top_strength,
+    'get_main_weakness': get_main_weakness,
+}
+
+
+def _get_int_env(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class _StringTemplateLoader(BaseLoader):
+    """保存已注册的字符串模板源码，按 LRU 淘汰"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._sources: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str, source: str) -> None:
+        with self._lock:
+            self._sources[key] = source
+            self._sources.move_to_end(key)
+            while len(self._sources) > self.max_size:
+                self._sources.popitem(last=False)
+
+    def discard(self, name: Optional[str] = None) -> None:
+        with self._lock:
+            if name is None:
+                self._sources.clear()
+                return
+            prefix = f"{STRING_TEMPLATE_PREFIX}{name}@"
+            for key in [k for k in self._sources if k.startswith(prefix)]:
+                del self._sources[key]
+
+    def get_source(self, environment, template):
+        with self._lock:
+            source = self._sources.get(template)
+        if source is None:
+            raise TemplateNotFound(template)
+        # 键中已包含内容哈希，同一键的源码不会变化
+        return source, None, lambda: True
+
+
+class TemplateRegistry:
+    """进程级模板注册表"""
+
+    def __init__(self, cache_size: Optional[int] = None, bytecode_dir: Optional[str] = None):
+        self.cache_size = cache_size or _get_int_env("REPORT_TEMPLATE_CACHE_SIZE", 400)
+        bytecode_dir = bytecode_dir if bytecode_dir is not None else os.getenv("REPORT_TEMPLATE_BYTECODE_DIR")
+        self.bytecode_cache = None
+        if bytecode_dir:
+            os.makedirs(bytecode_dir, exist_ok=True)
+            self.bytecode_cache = FileSystemBytecodeCache(bytecode_dir)
+        self._environments: Dict[Tuple[Optional[str], bool], Tuple[Environment, _StringTemplateLoader]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, template_dir=None, autoescape: bool = False) -> Tuple[Environment, _StringTemplateLoader]:
+        key = (os.path.abspath(str(template_dir)) if template_dir else None, bool(autoescape))
+        entry = self._environments.get(key)
+        if entry is not None:
+            return entry
+        with self._lock:
+            entry = self._environments.get(key)
+            if entry is None:
+                string_loader = _StringTemplateLoader(self.cache_size)
+                loader = ChoiceLoader([string_loader, FileSystemLoader(key[0])]) if key[0] else string_loader
+                env = Environment(
+                    loader=loader,
+                    autoescape=autoescape,
+                    cache_size=self.cache_size,
+                    bytecode_cache=self.bytecode_cache,
+                )
+                env.filters.update(REPORT_FILTERS)
+                entry = (env, string_loader)
+                self._environments[key] = entry
+        return entry
+
+    def get_environment(self, template_dir=None, autoescape: bool = False) -> Environment:
+        """获取共享的 Environment（已注册报告过滤器）"""
+        return self._get(template_dir, autoescape)[0]
+
+    def get_template(self, name: str, template_dir, autoescape: bool = False) -> Template:
+        """加载模板目录中的模板文件"""
+        return self.get_environment(template_dir, autoescape).get_template(name)
+
+    def from_string(self, source: str, name: str = "template", template_dir=None,
+                    autoescape: bool = False) -> Template:
+        """
+        编译字符串模板，相同 (name, 内容) 只编译一次
+
+        Args:
+            name: 模板名，用于失效和调试（例如模板文件名）
+            template_dir: 模板中 include/extends 引用文件时的查找目录
+        """
+        env, string_loader = self._get(template_dir, autoescape)
+        digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        key = f"{STRING_TEMPLATE_PREFIX}{name}@{digest}"
+        string_loader.add(key, source)
+        return env.get_template(key)
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """失效模板缓存，name 为空时清空全部"""
+        with self._lock:
+            entries = list(self._environments.values())
+        for env, string_loader in entries:
+            string_loader.discard(name)
+            # 文件模板按修改时间检查，但同一秒内的多次保存可能检测不到，这里直接清空编译缓存
+            if env.cache is not None:
+                env.cache.clear()
+        if self.bytecode_cache is not None and name is None:
+            self.bytecode_cache.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = list(self._environments.values())
+        return {
+            "environments": len(entries),
+            "cached_templates": sum(len(env.cache) for env, _ in entries if env.cache is not None),
+        }
+
+
+def _shared_registry() -> TemplateRegistry:
+    """两种导入路径下复用同一个注册表实例"""
+    for module_name in ("template_registry", "reports.generators.template_registry"):
+        module = sys.modules.get(module_name)
+        registry = getattr(module, "template_registry", None) if module is not None else None
+        if registry is not None:
+            return registry
+    return TemplateRegistry()
+
+
+template_registry = _shared_registry()
+
+
+def invalidate_templates(name: Optional[str] = None) -> None:
+    template_registry.invalidate(name)
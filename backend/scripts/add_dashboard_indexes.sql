@@ -0,0 +1,7 @@
+-- 仪表盘聚合查询所需的覆盖索引
+
+-- 维度平均分：按题目聚合作答分数时无需回表
+CREATE INDEX `idx_answers_question_score` ON `answers` (`question_id`, `score`);
+
+-- 试卷完成量：按试卷分组统计分配数和完成数
+CREATE INDEX `idx_paper_assignments_paper_status` ON `paper_assignments` (`paper_id`, `status`);
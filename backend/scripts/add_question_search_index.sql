@@ -0,0 +1,7 @@
+-- 题库搜索：题干 ngram 全文索引（MySQL 5.7.6+ / 8.0，中文按 2 个字符切分，见 ngram_token_size）
+-- 未建立时 GET /questions/search 使用进程内的 2-gram 倒排索引
+ALTER TABLE `questions`
+ADD FULLTEXT INDEX `ft_questions_content` (`content`) WITH PARSER ngram;
+
+-- 案例题子题的查询和“只看顶层题目”的筛选
+CREATE INDEX `ix_questions_parent_case_id` ON `questions` (`parent_case_id`);
@@ -0,0 +1,15 @@
+-- 题目近似重复检测索引：MinHash 签名和 LSH 桶（见 app/services/question_similarity.py）
+CREATE TABLE IF NOT EXISTS `question_signatures` (
+    `question_id` INT NOT NULL PRIMARY KEY,
+    `signature` BLOB NOT NULL COMMENT '64个uint32的MinHash签名（小端）',
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS `question_lsh_buckets` (
+    `bucket` BIGINT NOT NULL COMMENT '签名分段哈希（含段号）',
+    `question_id` INT NOT NULL,
+    PRIMARY KEY (`bucket`, `question_id`),
+    KEY `ix_question_lsh_buckets_question_id` (`question_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 建表后运行 python scripts/rebuild_question_similarity_index.py 为已有题目建立索引
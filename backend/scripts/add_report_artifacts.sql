@@ -0,0 +1,19 @@
+-- 报告产物按内容哈希存储：相同输入的报告共享同一个PDF文件
+CREATE TABLE IF NOT EXISTS `report_artifacts` (
+    `id` INT AUTO_INCREMENT PRIMARY KEY,
+    `content_hash` CHAR(64) NOT NULL,
+    `file_path` VARCHAR(500) NOT NULL,
+    `file_size` INT,
+    `ref_count` INT NOT NULL DEFAULT 0 COMMENT '引用该文件的报告数',
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    `last_used_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY `uq_report_artifacts_content_hash` (`content_hash`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+ALTER TABLE `reports`
+ADD COLUMN `content_hash` CHAR(64) NULL COMMENT '报告输入的内容哈希，对应report_artifacts';
+
+CREATE INDEX `ix_reports_content_hash` ON `reports` (`content_hash`);
+
+-- 历史报告的content_hash为空，删除时仍按原方式直接删除文件；
+-- 定期运行 python scripts/gc_report_artifacts.py 清理孤立文件
@@ -0,0 +1,6 @@
+-- report_tasks表增加批次和重试次数字段（支持整批取消与失败重试）
+ALTER TABLE `report_tasks`
+ADD COLUMN `batch_id` VARCHAR(32) NULL COMMENT '批量生成批次ID' AFTER `paper_id`,
+ADD COLUMN `attempts` INT NOT NULL DEFAULT 0 COMMENT '已重试次数' AFTER `report_id`;
+
+CREATE INDEX `ix_report_tasks_batch_id` ON `report_tasks` (`batch_id`);
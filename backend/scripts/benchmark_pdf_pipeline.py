@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+PDF 报告生成分阶段耗时基准
+
+用测试 Excel 中的被试者数据逐份生成报告，分别测试旧方式（雷达图 Base64 内嵌 +
+HTML(string=...).write_pdf）与 PDF 流水线（预解析样式表、共享字体配置、内存资源表），
+输出各阶段（雷达图、渲染 HTML、排版、写出）的平均值与 p50/p95，以及 PDF 阶段占比。
+
+用法:
+    python scripts/benchmark_pdf_pipeline.py
+    python scripts/benchmark_pdf_pipeline.py --paper-id 10 --count 50 --output /tmp/bench_pdf
+"""
+import argparse
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+GENERATORS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'reports', 'generators')
+sys.path.insert(0, GENERATORS_DIR)
+
+from weasyprint import HTML
+
+from config_loader import get_paper_config
+from pdf_pipeline import asset_url, get_pdf_pipeline
+from radar_chart import render_radar_chart
+from report_core import UniversalReportGenerator
+
+STAGES = ("chart", "render_html", "layout", "write")
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def _legacy(template, report_data, chart_bytes, output_path):
+    """旧实现：Base64 内嵌雷达图，每份报告重新解析样式表和字体"""
+    started = time.perf_counter()
+    chart_img = f"data:image/png;base64,{base64.b64encode(chart_bytes).decode('utf-8')}"
+    html_content = template.render(**report_data, chart_img=chart_img)
+    rendered = time.perf_counter()
+    document = HTML(string=html_content).render()
+    laid_out = time.perf_counter()
+    document.write_pdf(output_path)
+    return rendered - started, laid_out - rendered, time.perf_counter() - laid_out
+
+
+def _pipeline(template, report_data, chart_bytes, output_path):
+    result = get_pdf_pipeline().render(
+        template, dict(report_data, chart_img=asset_url("radar_chart.png")), output_path,
+        assets={"radar_chart.png": chart_bytes}
+    )
+    return result.timings
+
+
+def run(mode, generator, paper_id, records, output_dir):
+    template_name = get_paper_config(paper_id).get('template', {}).get('name', 'report_template.html')
+    template = generator._get_jinja_env().get_template(template_name)
+    timings = {stage: [] for stage in STAGES}
+    for i, report_data in enumerate(records):
+        started = time.perf_counter()
+        chart_bytes = render_radar_chart(generator.convert_to_radar_data(report_data['dimensions'], paper_id))
+        timings["chart"].append(time.perf_counter() - started)
+
+        output_path = os.path.join(output_dir, f"{mode}_{i}.pdf")
+        runner = _legacy if mode == "legacy" else _pipeline
+        render_html, layout, write = runner(template, report_data, chart_bytes, output_path)
+        timings["render_html"].append(render_html)
+        timings["layout"].append(layout)
+        timings["write"].append(write)
+    return timings
+
+
+def report(mode, timings):
+    totals = [sum(stage[i] for stage in timings.values()) for i in range(len(timings["chart"]))]
+    pdf_share = (sum(timings["layout"]) + sum(timings["write"])) / sum(totals)
+    print(f"\n[{mode}] {len(totals)} 份报告，平均每份 {statistics.mean(totals):.3f}s，PDF阶段占比 {pdf_share:.0%}")
+    print(f"  {'阶段':<12}{'平均':>10}{'p50':>10}{'p95':>10}")
+    for stage in STAGES:
+        values = timings[stage]
+        print(f"  {stage:<12}{statistics.mean(values):>10.3f}{_percentile(values, 0.5):>10.3f}"
+              f"{_percentile(values, 0.95):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 报告生成分阶段耗时基准")
+    parser.add_argument("--paper-id", type=int, default=10)
+    parser.add_argument("--excel", default=os.path.join(GENERATORS_DIR, "test_data", "management_potential_test.xlsx"))
+    parser.add_argument("--count", type=int, default=20, help="生成报告份数（不足时循环使用Excel中的数据）")
+    parser.add_argument("--output", default=None, help="PDF输出目录，默认使用临时目录")
+    parser.add_argument("--mode", choices=("both", "legacy", "pipeline"), default="both")
+    args = parser.parse_args()
+
+    generator = UniversalReportGenerator()
+    rows = generator.read_excel_data(args.excel, args.paper_id)
+    if not rows:
+        print("Excel中没有数据")
+        return
+    records = [generator.prepare_report_data(rows[i % len(rows)], args.paper_id) for i in range(args.count)]
+
+    output_dir = args.output or tempfile.mkdtemp(prefix="bench_pdf_")
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"试卷 {args.paper_id}，{args.count} 份报告，输出目录 {output_dir}")
+
+    modes = ("legacy", "pipeline") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        report(mode, run(mode, generator, args.paper_id, records, output_dir))
+
+
+if __name__ == "__main__":
+    main()
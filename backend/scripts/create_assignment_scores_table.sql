@@ -0,0 +1,16 @@
+-- 创建assignment_scores表（试卷分配物化得分，dimension_id为空表示总分）
+CREATE TABLE IF NOT EXISTS `assignment_scores` (
+    `id` INT AUTO_INCREMENT PRIMARY KEY,
+    `assignment_id` INT NOT NULL,
+    `paper_id` INT NOT NULL,
+    `user_id` INT NOT NULL,
+    `dimension_id` INT NULL,
+    `score` DECIMAL(10, 4) NOT NULL DEFAULT 0,
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (`assignment_id`) REFERENCES `paper_assignments`(`id`) ON DELETE CASCADE,
+    INDEX `ix_assignment_scores_assignment_id` (`assignment_id`),
+    INDEX `ix_assignment_scores_paper_id` (`paper_id`),
+    INDEX `ix_assignment_scores_user_id` (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 建表后运行 python scripts/rebuild_assignment_scores.py 回填历史数据
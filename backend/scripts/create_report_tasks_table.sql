@@ -0,0 +1,21 @@
+-- 创建report_tasks表（报告生成任务状态，替代进程内的任务字典）
+CREATE TABLE IF NOT EXISTS `report_tasks` (
+    `task_id` VARCHAR(64) PRIMARY KEY,
+    `user_id` INT NOT NULL,
+    `paper_id` INT NOT NULL,
+    `batch_id` VARCHAR(32),
+    `status` VARCHAR(20) NOT NULL DEFAULT 'pending',
+    `progress` INT NOT NULL DEFAULT 0,
+    `file_path` VARCHAR(500),
+    `error_message` TEXT,
+    `report_id` INT,
+    `attempts` INT NOT NULL DEFAULT 0,
+    `created_at` DATETIME DEFAULT CURRENT_TIMESTAMP,
+    `updated_at` DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    `expires_at` DATETIME NOT NULL,
+    INDEX `ix_report_tasks_user_id` (`user_id`),
+    INDEX `ix_report_tasks_paper_id` (`paper_id`),
+    INDEX `ix_report_tasks_batch_id` (`batch_id`),
+    INDEX `ix_report_tasks_expires_at` (`expires_at`),
+    INDEX `idx_report_tasks_paper_user` (`paper_id`, `user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
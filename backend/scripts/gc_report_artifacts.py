@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+清理孤立的报告文件
+
+与报告表对账产物引用计数，删除无引用的产物，以及 reports/generators/output、assets 中
+没有任何报告记录引用的旧 PDF 和雷达图。建议通过定时任务每天运行一次。
+用法:
+    python scripts/gc_report_artifacts.py --dry-run          # 只统计，不删除
+    python scripts/gc_report_artifacts.py --grace-minutes 120
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.main import SessionLocal
+from app.services.report_artifact_store import collect_garbage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="清理孤立的报告文件")
+    parser.add_argument("--grace-minutes", type=int, default=60, help="最近修改过的文件不清理，默认60分钟")
+    parser.add_argument("--dry-run", action="store_true", help="只统计将被清理的文件，不实际删除")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        stats = collect_garbage(db, grace_seconds=args.grace_minutes * 60, dry_run=args.dry_run)
+    finally:
+        db.close()
+    action = "将清理" if args.dry_run else "已清理"
+    print(f"修正引用计数 {stats['recounted']} 个，{action}产物 {stats['artifacts_removed']} 个、"
+          f"文件 {stats['files_removed']} 个，释放 {stats['bytes_freed'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
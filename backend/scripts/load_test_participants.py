@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+被试者答题流程的并发压测（对比同步接口与异步接口）
+
+每个虚拟被试者依次执行：登录 → 我的试卷 → 开始测试 → 拉取题目 → 提交答案，
+按并发数分批运行，输出每一步和整个流程的 p50/p95 延迟、流程吞吐量和错误数。
+
+压测前用 --setup 在目标库中准备压测账号（loadtest_0000 起）并把它们分配到指定试卷；
+每次运行前都会把这些账号的试卷分配重置为未开始、删除其答题记录，重复运行结果可比。
+请使用测试库，不要对生产库执行 --setup。
+
+对比步骤:
+    # 1. 同步接口
+    ASYNC_PARTICIPANT_API=false uvicorn app.main:app --port 8000
+    python scripts/load_test_participants.py --setup --paper-id 1 --users 200 \\
+        --concurrency 20,50,100,200 --save sync.json
+    # 2. 重启服务，启用异步接口后再次运行并与上一次结果对比
+    ASYNC_PARTICIPANT_API=true uvicorn app.main:app --port 8000
+    python scripts/load_test_participants.py --setup --paper-id 1 --users 200 \\
+        --concurrency 20,50,100,200 --compare sync.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import httpx
+
+STEPS = ["login", "my-assignments", "start", "questions", "submit"]
+USER_PREFIX = "loadtest_"
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[k]
+
+
+def prepare_users(paper_id, count, password):
+    """创建压测账号并分配试卷，重置其分配状态和答题记录"""
+    from sqlalchemy import bindparam, text
+
+    from app.database import session_scope
+    from app.main import AssignmentScore, PaperAssignment, User, UserRole, get_password_hash
+
+    usernames = [f"{USER_PREFIX}{i:04d}" for i in range(count)]
+    with session_scope("压测准备") as db:
+        existing = {u.username: u for u in db.query(User).filter(User.username.in_(usernames)).all()}
+        password_hash = get_password_hash(password)
+        for name in usernames:
+            if name not in existing:
+                user = User(username=name, password_hash=password_hash, real_name=name,
+                            role=UserRole.participant, is_active=True)
+                db.add(user)
+                existing[name] = user
+        db.flush()
+        user_ids = [existing[name].id for name in usernames]
+
+        assigned = {a.user_id: a for a in db.query(PaperAssignment).filter(
+            PaperAssignment.paper_id == paper_id, PaperAssignment.user_id.in_(user_ids)
+        ).all()}
+        for user_id in user_ids:
+            assignment = assigned.get(user_id)
+            if assignment is None:
+                db.add(PaperAssignment(paper_id=paper_id, user_id=user_id, status="assigned"))
+            else:
+                assignment.status = "assigned"
+                assignment.started_at = None
+                assignment.completed_at = None
+        db.flush()
+        assignment_ids = [a.id for a in db.query(PaperAssignment.id).filter(
+            PaperAssignment.paper_id == paper_id, PaperAssignment.user_id.in_(user_ids)
+        ).all()]
+        db.query(AssignmentScore).filter(AssignmentScore.assignment_id.in_(assignment_ids)).delete(
+            synchronize_session=False
+        )
+        db.execute(text("DELETE FROM answers WHERE user_id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                   {"ids": user_ids})
+        db.commit()
+    print(f"已准备 {count} 个压测账号（{usernames[0]} ~ {usernames[-1]}），试卷 {paper_id}")
+    return usernames
+
+
+async def run_flow(client, username, password, paper_id, timings):
+    """一个被试者的完整答题流程，任一步失败时抛出异常"""
+    async def step(name, method, url, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        timings[name].append(time.perf_counter() - started)
+        response.raise_for_status()
+        return response.json()
+
+    token = (await step("login", "POST", "/login", data={"username": username, "password": password}))["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    assignments = await step("my-assignments", "GET", "/my-assignments", headers=headers)
+    assignment = next(a for a in assignments if a["paper_id"] == paper_id)
+    await step("start", "POST", f"/start-assessment/{assignment['id']}", headers=headers)
+    paper = await step("questions", "GET", f"/papers/{paper_id}/questions-with-options", headers=headers)
+    answers = {str(q["id"]): [q["options"][0]["label"]] for q in paper["questions"] if q["options"]}
+    await step("submit", "POST", f"/submit-assessment/{assignment['id']}", json={"answers": answers}, headers=headers)
+
+
+async def run_level(base_url, usernames, password, paper_id, concurrency, timeout):
+    timings = defaultdict(list)
+    flow_times = []
+    errors = defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one(username):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    await run_flow(client, username, password, paper_id, timings)
+                    flow_times.append(time.perf_counter() - started)
+                except httpx.HTTPStatusError as e:
+                    errors[f"HTTP {e.response.status_code}"] += 1
+                except Exception as e:
+                    errors[type(e).__name__] += 1
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(one(name) for name in usernames))
+        wall = time.perf_counter() - wall_start
+
+    result = {
+        "concurrency": concurrency,
+        "flows": len(flow_times),
+        "errors": dict(errors),
+        "throughput": len(flow_times) / wall if wall else 0.0,
+        "flow_p50_ms": percentile(flow_times, 50) * 1000,
+        "flow_p95_ms": percentile(flow_times, 95) * 1000,
+        "steps": {},
+    }
+    for name in STEPS:
+        values = timings.get(name, [])
+        result["steps"][name] = {
+            "p50_ms": percentile(values, 50) * 1000,
+            "p95_ms": percentile(values, 95) * 1000,
+            "mean_ms": statistics.mean(values) * 1000 if values else 0.0,
+        }
+    return result
+
+
+def report(result, baseline=None):
+    errors = sum(result["errors"].values())
+    line = (f"并发={result['concurrency']:<5} 完成={result['flows']:<6} 错误={errors:<4} "
+            f"吞吐={result['throughput']:7.1f} 流程/秒  "
+            f"p50={result['flow_p50_ms']:8.1f}ms  p95={result['flow_p95_ms']:8.1f}ms")
+    if baseline:
+        ratio = result["throughput"] / baseline["throughput"] if baseline["throughput"] else 0
+        line += f"  吞吐为对比结果的 {ratio:.2f} 倍（p95 {baseline['flow_p95_ms']:.1f}ms → {result['flow_p95_ms']:.1f}ms）"
+    print(line)
+    for name in STEPS:
+        s = result["steps"][name]
+        print(f"    {name:<16} p50={s['p50_ms']:8.1f}ms  p95={s['p95_ms']:8.1f}ms")
+    if result["errors"]:
+        print(f"    错误: {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="被试者答题流程并发压测")
+    parser.add_argument("--base-url", default=os.getenv("LOADTEST_BASE_URL", "http://localhost:8000"))
+    parser.add_argument("--paper-id", type=int, required=True, help="压测使用的试卷ID")
+    parser.add_argument("--users", type=int, default=100, help="每轮参与的被试者数")
+    parser.add_argument("--concurrency", default="10,50,100", help="并发数，逗号分隔，每个并发数运行一轮")
+    parser.add_argument("--password", default="loadtest123")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时秒数")
+    parser.add_argument("--setup", action="store_true", help="创建压测账号并在每轮前重置答题状态（直接连接 DATABASE_URL）")
+    parser.add_argument("--save", help="把结果保存为 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.concurrency.split(",") if x.strip()]
+    baseline = {}
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = {r["concurrency"]: r for r in json.load(f)}
+
+    usernames = [f"{USER_PREFIX}{i:04d}" for i in range(args.users)]
+    print(f"目标: {args.base_url}, 试卷={args.paper_id}, 被试者={args.users}, 并发={levels}")
+    results = []
+    for level in levels:
+        if args.setup:
+            prepare_users(args.paper_id, args.users, args.password)
+        result = asyncio.run(run_level(args.base_url, usernames, args.password, args.paper_id, level, args.timeout))
+        report(result, baseline.get(level))
+        results.append(result)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存到 {args.save}")
+
+
+if __name__ == "__main__":
+    main()
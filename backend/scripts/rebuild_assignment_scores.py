@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+重建试卷分配得分（assignment_scores）
+
+用于上线后回填历史数据，或在手工修改数据库后校正物化分数。
+用法:
+    python scripts/rebuild_assignment_scores.py              # 重建全部试卷
+    python scripts/rebuild_assignment_scores.py --paper-id 10 --paper-id 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.main import SessionLocal, Paper
+from app.services.assignment_score_service import refresh_paper_scores
+
+
+def rebuild_assignment_scores(paper_ids=None):
+    """按试卷逐个重建已完成分配的得分，每份试卷单独提交"""
+    db = SessionLocal()
+    try:
+        if not paper_ids:
+            paper_ids = [pid for (pid,) in db.query(Paper.id).order_by(Paper.id).all()]
+        print(f"开始重建得分，共 {len(paper_ids)} 份试卷")
+        total = 0
+        for paper_id in paper_ids:
+            start = time.time()
+            try:
+                count = refresh_paper_scores(db, [paper_id])
+                db.commit()
+                total += count
+                print(f"试卷 {paper_id}: 已重建 {count} 条分配得分，用时 {time.time() - start:.2f}s")
+            except Exception as e:
+                db.rollback()
+                print(f"试卷 {paper_id}: 重建失败: {e}")
+        print(f"重建完成，共 {total} 条分配得分")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重建试卷分配得分")
+    parser.add_argument("--paper-id", type=int, action="append", dest="paper_ids", help="只重建指定试卷，可重复指定")
+    args = parser.parse_args()
+    rebuild_assignment_scores(args.paper_ids)
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+重建题目相似度索引（question_signatures / question_lsh_buckets），或压测近似重复检测
+
+上线后为已有题目建立索引、修改哈希参数后或手工改动题库后运行。
+压测模式不连接数据库：生成 N 道合成题目（其中一部分是改写过的近似重复题），
+比较 LSH 查询与逐题计算相似度的全量扫描的耗时和检出率。
+用法:
+    python scripts/rebuild_question_similarity_index.py                   # 从题库重建
+    python scripts/rebuild_question_similarity_index.py --benchmark 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from app.services.question_similarity import MinHashLSH, duplicate_threshold, signature, similarity
+
+WORDS = ("团队 目标 沟通 客户 项目 进度 计划 冲突 领导 下属 同事 资源 风险 决策 压力 反馈 绩效 变化 "
+         "会议 任务 优先 协调 预算 质量 创新 流程 责任 授权 激励 培训").split()
+
+
+def rebuild(chunk_size):
+    from app.services.question_similarity import rebuild_index
+    start = time.time()
+    total = rebuild_index(chunk_size=chunk_size, progress=lambda n: print(f"已建立索引 {n} 道题目"))
+    print(f"重建完成，共 {total} 道题目，用时 {time.time() - start:.2f}s")
+
+
+def _synthetic_question(rng):
+    content = "当" + "".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))) + "时，你会怎么做？"
+    options = ["".join(rng.choice(WORDS) for _ in range(rng.randint(3, 6))) for _ in range(4)]
+    return content, options
+
+
+def _near_duplicate(rng, content, options):
+    """改写一道题：替换题干中的一个词、加标点和全角空格、打乱选项顺序"""
+    words = list(content)
+    pos = rng.randrange(1, len(words) - 6)
+    words[pos:pos + 2] = list(rng.choice(WORDS))
+    options = list(options)
+    rng.shuffle(options)
+    return "　" + "".join(words).replace("，", "， ") + "。", options
+
+
+def benchmark(total, queries, seed):
+    rng = random.Random(seed)
+    threshold = duplicate_threshold()
+    print(f"生成 {total} 道合成题目...")
+    bank = [_synthetic_question(rng) for _ in range(total)]
+
+    start = time.time()
+    signatures = [signature(content, options) for content, options in bank]
+    elapsed = time.time() - start
+    print(f"计算签名: {elapsed:.2f}s（{total / elapsed:.0f} 题/秒）")
+
+    start = time.time()
+    index = MinHashLSH()
+    for i, sig in enumerate(signatures):
+        index.add(i, sig)
+    print(f"建立LSH索引: {time.time() - start:.2f}s")
+    matrix = np.stack(signatures)
+
+    targets = rng.sample(range(total), queries)
+    probes = [signature(*_near_duplicate(rng, *bank[i])) for i in targets]
+    lsh_times, scan_times, hits, scan_hits, candidates = [], [], 0, 0, []
+    for target, sig in zip(targets, probes):
+        start = time.perf_counter()
+        candidates.append(len(index.candidates(sig)))
+        matches = index.query(sig, threshold)
+        lsh_times.append(time.perf_counter() - start)
+        hits += any(k == target for k, _ in matches)
+
+        start = time.perf_counter()
+        scores = similarity(sig, matrix)
+        scan_times.append(time.perf_counter() - start)
+        scan_hits += scores[target] >= threshold
+
+    print(f"查询 {queries} 道近似重复题（阈值 {threshold}）:")
+    print(f"  LSH:      p50 {statistics.median(lsh_times) * 1000:.2f}ms, "
+          f"检出 {hits}/{queries}, 平均候选 {statistics.mean(candidates):.1f} 题")
+    print(f"  全量扫描: p50 {statistics.median(scan_times) * 1000:.2f}ms, 检出 {scan_hits}/{queries}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重建题目相似度索引")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="每批读取并写入索引的题目数")
+    parser.add_argument("--benchmark", type=int, metavar="N", help="不连接数据库，用 N 道合成题目压测")
+    parser.add_argument("--queries", type=int, default=200, help="压测查询的近似重复题数")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.benchmark:
+        benchmark(args.benchmark, args.queries, args.seed)
+    else:
+        rebuild(args.chunk_size)
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试公共配置
+
+在导入任何后端模块之前把 DATABASE_URL 指向临时 SQLite 文件（可用 TEST_DATABASE_URL 覆盖），
+测试不会连接开发或生产数据库。需要完整后端应用的测试使用 app_db 夹具，
+每个用例开始前清空所有表和进程内缓存。
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+_TEST_DB_DIR = tempfile.mkdtemp(prefix="assessment-tests-")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite:///{_TEST_DB_DIR}/test.db")
+
+
+def _answers_table():
+    """answers 表没有 ORM 模型（由 scripts/init_db.sql 创建），测试库中按相同结构建表"""
+    from sqlalchemy import JSON, Column, DateTime, Float, Integer, MetaData, Table
+
+    return Table(
+        "answers", MetaData(),
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("user_id", Integer, nullable=False),
+        Column("question_id", Integer, nullable=False),
+        Column("answer", JSON, nullable=False),
+        Column("score", Float),
+        Column("answered_at", DateTime),
+    )
+
+
+@pytest.fixture
+def app_db():
+    """导入完整后端应用并清空测试数据库，返回 app.main 模块"""
+    try:
+        import app.main as main
+    except (ImportError, OSError) as e:  # 报告模块依赖 WeasyPrint 及其系统库
+        pytest.skip(f"后端应用无法导入: {e}")
+
+    # 部分模型（如 RedoRequest）定义在 main.py 的 create_all 之后，这里补建
+    main.Base.metadata.create_all(bind=main.engine)
+    answers = _answers_table()
+    answers.create(main.engine, checkfirst=True)
+    with main.engine.begin() as conn:
+        conn.execute(answers.delete())
+        for table in reversed(main.Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+
+    from app.services.auth_service import principal_cache
+    from app.services.dashboard_stats import dashboard_stats
+    from app.services.paper_snapshot import paper_snapshot_cache
+    from app.services.question_search import text_index
+    from app.services.response_cache import response_cache
+
+    paper_snapshot_cache.clear()
+    response_cache.invalidate()
+    principal_cache.clear()
+    dashboard_stats.mark_dirty()
+    text_index.mark_dirty()
+    return main
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试答题记录批量写入（SQLite，不依赖运行中的后端服务）
+"""
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.answer_service import build_answer_rows, insert_answers
+
+
+def test_build_answer_rows_scores():
+    now = datetime(2025, 1, 1)
+    rows = build_answer_rows(
+        5,
+        {"1": ["B"], "2": [0], "3": "d", "4": ["Z"], "99": ["A"]},
+        {1: [10, 7, 4, 1], 2: [10, 7, 4, 1], 3: [10, 7, 4, 1], 4: [10, 7, 4, 1]},
+        now,
+    )
+    assert [r["score"] for r in rows] == [7, 10, 1, 0, None]
+    assert rows[0]["answer"] == json.dumps(["B"])
+    assert all(r["user_id"] == 5 and r["answered_at"] == now for r in rows)
+
+
+def test_insert_answers_is_atomic():
+    engine = create_engine("sqlite://", future=True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE answers (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INT NOT NULL, "
+            "question_id INT NOT NULL, answer TEXT NOT NULL, score FLOAT, answered_at DATETIME)"
+        ))
+    Session = sessionmaker(bind=engine)
+
+    db = Session()
+    rows = build_answer_rows(1, {str(q): ["A"] for q in range(1, 1201)}, {}, datetime.utcnow())
+    assert insert_answers(db, rows) == 1200
+    db.commit()
+    assert db.execute(text("SELECT COUNT(*) FROM answers")).scalar() == 1200
+
+    # 任意一行失败时整批回滚
+    bad_rows = build_answer_rows(2, {"1": ["A"], "2": ["B"]}, {}, datetime.utcnow())
+    bad_rows[1]["answer"] = None
+    with pytest.raises(Exception):
+        insert_answers(db, bad_rows)
+    db.rollback()
+    assert db.execute(text("SELECT COUNT(*) FROM answers WHERE user_id = 2")).scalar() == 0
+    db.close()
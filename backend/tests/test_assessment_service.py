@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试被试者试卷内容的组装（同步和异步接口共用，不依赖数据库）
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType, SimpleNamespace
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+os.environ.setdefault("SHUFFLE_KEY", "test-shuffle-key")
+
+from app.services.assessment_service import (
+    assignment_item, paper_questions, paper_questions_with_options, start_payload,
+)
+from app.services.paper_snapshot import PaperSnapshot, QuestionEntry
+from app.services.shuffle_service import build_layout, restore_answers
+
+
+def _snapshot(question_ids, is_shuffled=True):
+    questions = tuple(
+        QuestionEntry(qid, f"题目{qid}", "single", ("甲", "乙", "丙", "丁"), (10, 7, 4, 1), True, 3, i, None)
+        for i, qid in enumerate(question_ids)
+    )
+    return PaperSnapshot(5, 0, "试卷", "说明", 30, "published", is_shuffled, tuple(reversed(question_ids)),
+                         questions, MappingProxyType({q.question_id: q for q in questions}), time.time())
+
+
+def test_shuffled_options_round_trip_to_original_choice():
+    snapshot = _snapshot(list(range(1, 21)))
+    layout = build_layout(snapshot, 42)
+    questions = paper_questions_with_options(snapshot, layout)
+    assert [q["id"] for q in questions] == list(layout.question_order)
+    assert [q["order_num"] for q in questions] == list(range(1, 21))
+
+    # 每题都选展示给被试者的“甲”，还原后应为原始选项 A
+    answers = {
+        str(q["id"]): [next(o["label"] for o in q["options"] if o["text"] == "甲")]
+        for q in questions
+    }
+    assert all(v == ["A"] for v in restore_answers(layout, answers).values())
+    for q in questions:
+        assert {o["text"]: o["score"] for o in q["options"]} == {"甲": 10, "乙": 7, "丙": 4, "丁": 1}
+
+
+def test_plain_question_list_and_payloads():
+    snapshot = _snapshot([3, 1, 2], is_shuffled=False)
+    layout = build_layout(snapshot, None)
+    assert [q["id"] for q in paper_questions(snapshot, layout)] == [3, 1, 2]
+
+    started = datetime(2024, 5, 1, 9, 30, 0)
+    assignment = SimpleNamespace(id=9, paper_id=5, paper=None, status="started", assigned_at=None,
+                                 started_at=started, completed_at=None)
+    item = assignment_item(assignment)
+    assert item["paper_name"] is None and item["started_at"] == "2024-05-01 09:30:00"
+    payload = start_payload(assignment, snapshot)
+    assert payload["assignment_id"] == 9 and payload["paper_name"] == "试卷"
+    assert [q["options"] for q in payload["questions"]][0] == ["甲", "乙", "丙", "丁"]
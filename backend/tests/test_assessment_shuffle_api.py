@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试选项乱序的端到端一致性：按接口返回的展示选项作答并提交，answers 表中保存的是对应的原始选项
+（使用 conftest 中的 SQLite 测试库，同步接口和异步接口各测一遍）
+"""
+
+import json
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+OPTIONS = ["非常同意", "同意", "不同意", "非常不同意"]
+
+
+def _seed(main):
+    db = main.SessionLocal()
+    try:
+        paper = main.Paper(name="选项乱序试卷", duration=30, status="published")
+        db.add(paper)
+        db.flush()
+        question_ids = []
+        for i in range(8):
+            q = main.Question(content=f"题目{i + 1}", type="single", options=OPTIONS,
+                              scores=[10, 7, 4, 1], shuffle_options=True)
+            db.add(q)
+            db.flush()
+            db.add(main.PaperQuestion(paper_id=paper.id, question_id=q.id, order_num=i + 1))
+            question_ids.append(q.id)
+        users = []
+        for username in ("taker", "other"):
+            user = main.User(username=username, password_hash="x", real_name=username,
+                             role=main.UserRole.participant)
+            db.add(user)
+            db.flush()
+            users.append(user)
+        # 被试者在同一试卷上有两条分配（重新分配后旧记录仍在），页面按所选分配取顺序
+        assignments = [main.PaperAssignment(paper_id=paper.id, user_id=u.id) for u in (users[0], users[0], users[1])]
+        db.add_all(assignments)
+        db.commit()
+        return paper.id, question_ids, users[0].id, assignments[1].id, assignments[0].id, assignments[2].id
+    finally:
+        db.close()
+
+
+@pytest.fixture(params=["sync", "async"])
+def client(request, app_db):
+    if request.param == "sync":
+        yield TestClient(app_db.app)
+        return
+    # 与 main.py 中 ASYNC_PARTICIPANT_API=true 时的注册方式相同，关闭时释放异步引擎的连接
+    from app.api import participant_async
+    from app.database import dispose_async_engine
+    app = FastAPI()
+    app.include_router(participant_async.router)
+    app.add_event_handler("shutdown", dispose_async_engine)
+    with TestClient(app) as async_client:
+        yield async_client
+
+
+def test_submitted_display_label_is_stored_as_original_option(app_db, client):
+    paper_id, question_ids, user_id, assignment_id, earlier_id, other_assignment_id = _seed(app_db)
+    headers = {"Authorization": "Bearer " + app_db.create_access_token({"sub": "taker", "role": "participant"})}
+    url = f"/papers/{paper_id}/questions-with-options"
+
+    resp = client.get(f"{url}?assignment_id={assignment_id}", headers=headers)
+    assert resp.status_code == 200
+    displayed = {q["id"]: q["options"] for q in resp.json()["questions"]}
+    assert set(displayed) == set(question_ids)
+    # 至少有一道题的展示顺序与原始顺序不同，否则测试无法发现还原错误
+    assert any([o["text"] for o in opts] != OPTIONS for opts in displayed.values())
+
+    # 其他用户的分配不能用来取顺序
+    assert client.get(f"{url}?assignment_id={other_assignment_id}", headers=headers).status_code == 404
+    # 同一试卷的另一条分配有自己的顺序
+    earlier = client.get(f"{url}?assignment_id={earlier_id}", headers=headers)
+    assert earlier.status_code == 200
+    assert {q["id"]: q["options"] for q in earlier.json()["questions"]} != displayed
+
+    assert client.post(f"/start-assessment/{assignment_id}", headers=headers).status_code == 200
+    answers = {str(qid): "A" for qid in question_ids}
+    resp = client.post(f"/submit-assessment/{assignment_id}", json={"answers": answers}, headers=headers)
+    assert resp.status_code == 200
+
+    db = app_db.SessionLocal()
+    try:
+        stored = dict(db.execute(
+            text("SELECT question_id, answer FROM answers WHERE user_id = :uid"), {"uid": user_id}
+        ).all())
+    finally:
+        db.close()
+    for qid, opts in displayed.items():
+        original = chr(ord("A") + OPTIONS.index(opts[0]["text"]))
+        assert json.loads(stored[qid]) == original
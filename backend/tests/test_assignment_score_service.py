@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分配得分物化：物化结果与即时算分一致、题目分数修改后重算、缺失时读取即时计算
+（使用 conftest 中的 SQLite 测试库）
+"""
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import text
+
+
+def _seed(main, answers_by_user):
+    """
+    建立一份两层维度的试卷和若干已完成的分配
+
+    Args:
+        answers_by_user: {username: [第1题选项, 第2题选项, 第3题选项]}
+    Returns:
+        (db, paper, questions, assignments)
+    """
+    db = main.SessionLocal()
+    paper = main.Paper(name="领导力测评", duration=30, status="published")
+    db.add(paper)
+    db.flush()
+    big = main.Dimension(paper_id=paper.id, name="管理能力")
+    db.add(big)
+    db.flush()
+    subs = [main.Dimension(paper_id=paper.id, parent_id=big.id, name=name) for name in ("计划", "沟通")]
+    db.add_all(subs)
+    db.flush()
+
+    questions = []
+    for i, dim in enumerate((subs[0], subs[0], subs[1])):
+        q = main.Question(content=f"题目{i + 1}", type="single", options=["A", "B", "C", "D"],
+                          scores=[10, 7, 4, 1])
+        db.add(q)
+        db.flush()
+        db.add(main.PaperQuestion(paper_id=paper.id, question_id=q.id, dimension_id=dim.id, order_num=i + 1))
+        questions.append(q)
+
+    assignments = []
+    for username, choices in answers_by_user.items():
+        user = main.User(username=username, password_hash="x", real_name=username,
+                         role=main.UserRole.participant)
+        db.add(user)
+        db.flush()
+        assignment = main.PaperAssignment(paper_id=paper.id, user_id=user.id, status="completed",
+                                          completed_at=datetime.utcnow())
+        db.add(assignment)
+        for q, choice in zip(questions, choices):
+            db.execute(text(
+                "INSERT INTO answers (user_id, question_id, answer, score, answered_at) "
+                "VALUES (:user_id, :question_id, :answer, NULL, :answered_at)"
+            ), {"user_id": user.id, "question_id": q.id, "answer": json.dumps([choice]),
+                "answered_at": datetime.utcnow()})
+        assignments.append(assignment)
+    db.flush()
+    db.commit()
+    return db, paper, questions, assignments
+
+
+def _expected(db, paper, assignments):
+    from app.services.score_service import calculate_paper_scores
+    scores = calculate_paper_scores(db, paper.id, [a.user_id for a in assignments])
+    return {a.id: scores[a.user_id] for a in assignments}
+
+
+def _materialized_ids(main, db):
+    return {aid for (aid,) in db.query(main.AssignmentScore.assignment_id).distinct()}
+
+
+def test_materialized_scores_match_calculation(app_db):
+    from app.services.assignment_score_service import load_assignment_scores, materialize_assignment_scores
+
+    db, paper, _, assignments = _seed(app_db, {"u1": ["A", "B", "C"], "u2": ["D", "A", "B"]})
+    try:
+        assert materialize_assignment_scores(db, assignments) == 2
+        db.commit()
+        ids = [a.id for a in assignments]
+        assert _materialized_ids(app_db, db) == set(ids)
+        loaded = load_assignment_scores(db, ids, compute_missing=False)
+        assert loaded == _expected(db, paper, assignments)
+        assert loaded[assignments[0].id]["total_score"] == 6.25
+    finally:
+        db.close()
+
+
+def test_updating_question_scores_refreshes_assignments(app_db):
+    from app.services.assignment_score_service import load_assignment_scores, materialize_assignment_scores
+
+    db, paper, questions, assignments = _seed(app_db, {"u1": ["A", "B", "C"], "u2": ["D", "A", "B"]})
+    try:
+        materialize_assignment_scores(db, assignments)
+        db.commit()
+        ids = [a.id for a in assignments]
+        before = load_assignment_scores(db, ids, compute_missing=False)
+
+        app_db.update_question(questions[2].id, app_db.QuestionUpdate(scores=[1, 2, 3, 4]), db=db)
+
+        after = load_assignment_scores(db, ids, compute_missing=False)
+        assert after != before
+        assert after == _expected(db, paper, assignments)
+        assert after[assignments[0].id]["total_score"] == 5.75
+    finally:
+        db.close()
+
+
+def test_missing_scores_are_computed_on_read(app_db):
+    from app.services.assignment_score_service import load_assignment_scores
+
+    db, paper, _, assignments = _seed(app_db, {"u1": ["A", "B", "C"]})
+    try:
+        ids = [a.id for a in assignments]
+        assert _materialized_ids(app_db, db) == set()
+        assert load_assignment_scores(db, ids, compute_missing=False) == {}
+        assert load_assignment_scores(db, ids) == _expected(db, paper, assignments)
+        # 读取时即时计算，不写入物化表
+        assert _materialized_ids(app_db, db) == set()
+    finally:
+        db.close()
+
+
+def test_reassigning_completed_paper_clears_scores(app_db):
+    from app.services.assignment_score_service import materialize_assignment_scores
+
+    db, paper, _, assignments = _seed(app_db, {"u1": ["A", "B", "C"], "u2": ["D", "A", "B"]})
+    try:
+        materialize_assignment_scores(db, assignments)
+        db.commit()
+
+        app_db.assign_paper(str(paper.id), app_db.PaperAssignmentCreate(user_ids=[assignments[0].user_id]), db=db)
+
+        db.refresh(assignments[0])
+        assert assignments[0].status == "assigned"
+        assert _materialized_ids(app_db, db) == {assignments[1].id}
+    finally:
+        db.close()
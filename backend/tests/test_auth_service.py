@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试当前用户信息缓存：命中、过期、容量上限和失效（不依赖数据库）
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.auth_service import Principal, PrincipalCache, get_current_admin
+
+
+def _principal(user_id, username, role="participant"):
+    return Principal(id=user_id, username=username, role=role, real_name=f"用户{user_id}")
+
+
+def test_cached_principal_is_reused_until_ttl():
+    cache = PrincipalCache(ttl=1, max_size=10)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return _principal(1, "alice")
+
+    first = cache.get_or_load("alice", loader)
+    assert cache.get_or_load("alice", loader) is first
+    assert len(loads) == 1
+
+    _, principal = cache._entries["alice"]
+    cache._entries["alice"] = (time.time() - 1, principal)
+    cache.get_or_load("alice", loader)
+    assert len(loads) == 2
+    assert cache.stats()["hits"] == 1
+
+
+def test_missing_user_is_not_cached_and_size_is_bounded():
+    cache = PrincipalCache(ttl=60, max_size=2)
+    assert cache.get_or_load("ghost", lambda: None) is None
+    assert cache.stats()["size"] == 0
+    for i, name in enumerate(["a", "b", "c"]):
+        cache.get_or_load(name, lambda i=i, name=name: _principal(i, name))
+    assert cache.stats()["size"] == 2
+    assert cache.lookup("a")[0] is None
+
+
+def test_invalidation_discards_result_loaded_before_change():
+    cache = PrincipalCache(ttl=60, max_size=10)
+    cache.get_or_load("bob", lambda: _principal(2, "bob"))
+    cache.invalidate("bob")
+    assert cache.lookup("bob")[0] is None
+
+    # 加载期间用户被修改：旧数据不能写入缓存
+    _, stamp = cache.lookup("bob")
+    stale = _principal(2, "bob")
+    cache.invalidate("bob")
+    cache.store("bob", stale, stamp)
+    assert cache.lookup("bob")[0] is None
+
+
+def test_admin_dependency_checks_role():
+    admin = _principal(1, "root", role="admin")
+    assert get_current_admin(admin) is admin
+    with pytest.raises(HTTPException) as exc:
+        get_current_admin(_principal(2, "u"))
+    assert exc.value.status_code == 403
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试试卷配置加载器：编译后的查找表、文件变化后的重新加载、试卷目录缓存
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import yaml
+
+# 添加backend目录和报告生成器目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "reports" / "generators"))
+
+from config_loader import PaperConfigLoader, evaluation_level
+
+
+def _config(paper_id=1, name="测试试卷", description="维度描述"):
+    return {
+        "paper_id": paper_id,
+        "paper_name": name,
+        "dimensions": [
+            {"name": "维度A", "color": "#00CC00", "description": description, "radar_angles": [0, 90],
+             "sub_dimensions": [{"name": "子维度1"}, {"name": "子维度2"}]},
+        ],
+        "score_levels": [
+            {"name": "高", "min": 8.5, "max": 10.0, "summary": "", "development_focus": ""},
+            {"name": "中", "min": 6.5, "max": 8.4, "summary": "", "development_focus": ""},
+            {"name": "低", "min": 1.0, "max": 6.4, "summary": "", "development_focus": ""},
+        ],
+        "dimension_evaluations": {"维度A": {"high": {"dimension_eval": "优秀"}, "bad": {"dimension_eval": "薄弱"}}},
+    }
+
+
+def _write(path, config):
+    path.write_text(yaml.safe_dump(config, allow_unicode=True), encoding="utf-8")
+
+
+def _loader(config_dir, check_interval):
+    loader = PaperConfigLoader(config_dir=str(config_dir), check_interval=check_interval)
+    loader.alt_config_dir = None  # 只使用临时目录中的配置
+    return loader
+
+
+def test_compiled_lookups(tmp_path):
+    _write(tmp_path / "1.yaml", _config())
+    loader = _loader(tmp_path, 60)
+    compiled = loader.get_compiled(1)
+
+    assert loader.get_score_level(1, 9)["name"] == "高"
+    assert loader.get_score_level(1, 8.5)["name"] == "高"
+    assert loader.get_score_level(1, 7)["name"] == "中"
+    assert loader.get_score_level(1, 8.45) is None  # 区间之间的空隙
+    assert loader.get_score_level(1, 0.5) is None
+    assert loader.get_dimension_evaluation(1, "维度A", 9)["dimension_eval"] == "优秀"
+    assert loader.get_dimension_evaluation(1, "维度A", 3)["dimension_eval"] == "薄弱"
+    assert loader.get_dimension_evaluation(1, "维度B", 9) is None
+    assert [evaluation_level(s) for s in (9, 8, 7, 6, float("nan"))] == ["high", "medium", "low", "bad", "bad"]
+
+    assert compiled.sub_dimensions["子维度2"][0] == "维度A"
+    assert compiled.dimension_description("维度A") == "维度描述"
+    group = compiled.radar_layout[0]
+    assert (group.name, group.color, group.dims) == ("维度A", "#00CC00", (("子维度1", 0), ("子维度2", 90)))
+    assert loader.load_config(1) is compiled.raw
+
+
+def test_reload_on_change_and_keep_old_on_error(tmp_path):
+    path = tmp_path / "1.yaml"
+    _write(path, _config())
+    loader = _loader(tmp_path, 0)
+    first = loader.get_compiled(1)
+    assert loader.get_compiled(1) is first
+    assert loader.compiles == 1
+
+    # 只改修改时间不改内容时不重新编译
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10_000_000))
+    assert loader.get_compiled(1) is first
+    assert loader.compiles == 1
+
+    _write(path, _config(description="新的描述"))
+    second = loader.get_compiled(1)
+    assert second is not first
+    assert second.dimension_description("维度A") == "新的描述"
+
+    # 文件写坏时继续使用上一次成功的编译结果
+    path.write_text("paper_id: [", encoding="utf-8")
+    assert loader.get_compiled(1) is second
+
+
+def test_catalogue_is_cached_and_rebuilt(tmp_path):
+    _write(tmp_path / "1.yaml", _config(1, "试卷一"))
+    (tmp_path / "broken.yaml").write_text("paper_name: 缺少字段", encoding="utf-8")
+    loader = _loader(tmp_path, 0)
+
+    papers = loader.get_available_papers()
+    assert [p["paper_name"] for p in papers] == ["试卷一"]
+    compiles = loader.compiles
+    assert loader.get_available_papers() == papers
+    assert loader.compiles == compiles
+
+    _write(tmp_path / "2.yaml", _config(2, "试卷二"))
+    assert [p["paper_id"] for p in loader.get_available_papers()] == [1, 2]
+    # 目录中已编译的配置直接供 load_config 使用
+    assert loader.load_config(2)["paper_name"] == "试卷二"
+    assert loader.compiles == compiles + 1
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试仪表盘计数器的增量更新、平均分与对账（不依赖数据库）
+"""
+
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.dashboard_stats import DashboardStats
+
+
+class FakeStats(DashboardStats):
+    """用内存中的“数据库真实值”代替统计查询"""
+
+    def __init__(self, truth):
+        super().__init__(reconcile_interval=0)
+        self.truth = truth
+        self.queries = 0
+
+    def _query(self, db):
+        self.queries += 1
+        return dict(self.truth)
+
+
+def _truth(**overrides):
+    values = dict(total_participants=10, total_questions=50, total_papers=2, completed_reports=4,
+                  score_sum=30.0, score_count=4)
+    values.update(overrides)
+    return values
+
+
+def test_snapshot_loads_once_and_computes_avg():
+    stats = FakeStats(_truth())
+    result = stats.snapshot(None)
+    assert result["avg_score"] == 7.5
+    assert "score_sum" not in result and "score_count" not in result
+    stats.snapshot(None)
+    assert stats.queries == 1
+
+
+def test_incremental_updates_without_queries():
+    stats = FakeStats(_truth())
+    stats.adjust(total_questions=1)  # 未加载前的增量被忽略
+    stats.snapshot(None)
+    stats.adjust(total_participants=2, total_papers=-1)
+    stats.record_submit(9.0)
+    result = stats.snapshot(None)
+    assert stats.queries == 1
+    assert result["total_questions"] == 50
+    assert result["total_participants"] == 12
+    assert result["total_papers"] == 1
+    assert result["completed_reports"] == 5
+    assert result["avg_score"] == 7.8
+
+
+def test_dirty_triggers_reconcile():
+    stats = FakeStats(_truth())
+    stats.snapshot(None)
+    stats.truth = _truth(completed_reports=0, score_sum=0.0, score_count=0)
+    stats.mark_dirty()
+    result = stats.snapshot(None)
+    assert stats.queries == 2
+    assert result["completed_reports"] == 0
+    assert result["avg_score"] == 0
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试数据库连接池配置、会话作用域和泄漏检测（使用临时 SQLite 数据库）
+"""
+
+import asyncio
+import gc
+import sys
+import threading
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import (
+    InstrumentedAsyncQueuePool, InstrumentedQueuePool, SessionTracker, TrackedSession, async_database_url,
+    create_async_db_engine, create_db_engine, pool_status, session_scope, session_tracker,
+)
+
+
+def _make_engine(tmp_path, **overrides):
+    return create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}", **overrides)
+
+
+def test_engine_uses_configured_pool_without_echo(tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+    engine = _make_engine(tmp_path)
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    assert engine.echo is False
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        status = pool_status(engine)
+        assert status["size"] == 3
+        assert status["max_overflow"] == 2
+        assert status["checked_out"] == 1
+    status = pool_status(engine)
+    assert status["checked_out"] == 0
+    assert status["checkouts"] == 1
+
+
+def test_pool_timeout_is_counted(tmp_path):
+    engine = _make_engine(tmp_path, pool_size=1, max_overflow=0, pool_timeout=0.1)
+    held = engine.connect()
+    try:
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+    finally:
+        held.close()
+    assert pool_status(engine)["timeouts"] == 1
+
+
+def test_session_scope_rolls_back_and_closes(tmp_path):
+    engine = _make_engine(tmp_path)
+    factory = sessionmaker(bind=engine, class_=TrackedSession)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+
+    opened = session_tracker.open_count()
+    with pytest.raises(RuntimeError):
+        with session_scope("测试", session_factory=factory) as db:
+            db.execute(text("INSERT INTO items (name) VALUES ('a')"))
+            assert session_tracker.open_count() == opened + 1
+            raise RuntimeError("boom")
+    assert session_tracker.open_count() == opened
+    assert engine.pool.checkedout() == 0
+    with session_scope(session_factory=factory) as db:
+        assert db.execute(text("SELECT COUNT(*) FROM items")).scalar() == 0
+
+
+def test_unclosed_session_is_reported_as_leak(tmp_path):
+    engine = _make_engine(tmp_path)
+    factory = sessionmaker(bind=engine, class_=TrackedSession)
+    leaked = session_tracker.leaked
+
+    def leak():
+        db = factory()
+        db.execute(text("SELECT 1"))
+
+    leak()
+    gc.collect()
+    assert session_tracker.leaked == leaked + 1
+
+
+def test_long_lived_sessions_are_listed_with_origin():
+    tracker = SessionTracker(leak_seconds=1)
+
+    class Dummy:
+        pass
+
+    session = Dummy()
+    tracker.track(session, label="批量导入")
+    key = id(session)
+    opened, origin, label = tracker._open[key]
+    tracker._open[key] = (opened - 5, origin, label)
+    long_lived = tracker.long_lived()
+    assert long_lived[0]["label"] == "批量导入"
+    assert "test_database.py" in long_lived[0]["origin"]
+    tracker.untrack(session)
+    assert tracker.open_count() == 0
+
+
+def test_async_url_is_derived_from_sync_url(monkeypatch):
+    monkeypatch.delenv("DATABASE_ASYNC_URL", raising=False)
+    assert async_database_url("mysql+pymysql://u:p@db:3306/x?charset=utf8mb4") == \
+        "mysql+aiomysql://u:p@db:3306/x?charset=utf8mb4"
+    assert async_database_url("sqlite:///./a.db") == "sqlite+aiosqlite:///./a.db"
+    assert async_database_url("postgresql://u@h/x") == "postgresql+asyncpg://u@h/x"
+    monkeypatch.setenv("DATABASE_ASYNC_URL", "mysql+asyncmy://u@h/x")
+    assert async_database_url() == "mysql+asyncmy://u@h/x"
+
+
+def test_async_engine_uses_instrumented_pool_and_tracks_sessions(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    engine = create_async_db_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}", pool_size=2)
+    factory = async_sessionmaker(engine, sync_session_class=TrackedSession, expire_on_commit=False)
+    opened = session_tracker.open_count()
+
+    async def scenario():
+        async with factory() as db:
+            assert (await db.execute(text("SELECT 1"))).scalar() == 1
+            assert session_tracker.open_count() == opened + 1
+            # 同步服务代码通过 run_sync 在同一连接上执行
+            assert await db.run_sync(lambda session: session.execute(text("SELECT 2")).scalar()) == 2
+        await engine.dispose()
+
+    asyncio.run(scenario())
+    assert isinstance(engine.sync_engine.pool, InstrumentedAsyncQueuePool)
+    assert session_tracker.open_count() == opened
+    status = pool_status(engine.sync_engine)
+    assert status["checkouts"] >= 1 and status["connects"] >= 1
+
+
+def test_pool_status_endpoint_requires_admin(app_db):
+    from fastapi.testclient import TestClient
+
+    db = app_db.SessionLocal()
+    try:
+        db.add_all([
+            app_db.User(username="admin1", password_hash="x", role=app_db.UserRole.admin),
+            app_db.User(username="p1", password_hash="x", role=app_db.UserRole.participant),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+    client = TestClient(app_db.app)
+    assert client.get("/system/db-pool").status_code == 401
+    token = app_db.create_access_token({"sub": "p1", "role": "participant"})
+    assert client.get("/system/db-pool", headers={"Authorization": f"Bearer {token}"}).status_code == 403
+    token = app_db.create_access_token({"sub": "admin1", "role": "admin"})
+    resp = client.get("/system/db-pool", headers={"Authorization": f"Bearer {token}"})
+    assert resp.status_code == 200
+    assert resp.json()["pool_class"] == "InstrumentedQueuePool"
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告数据的 Excel 读取：按试卷配置映射列、表头校验、分块流式读取、平均分行
+"""
+
+import math
+import sys
+from pathlib import Path
+
+import pytest
+from openpyxl import Workbook
+
+# 添加backend目录和报告生成器目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "reports" / "generators"))
+
+from excel_ingest import MissingColumnsError, ReportWorkbook, iter_report_data
+
+CONFIG = {
+    "field_mapping": {"姓名": "name", "总分": "total_score", "大维度1：维度A": "维度A", "小维度1：子维度1": "子维度1"},
+    "dimensions": [{"name": "维度A", "sub_dimensions": [{"name": "子维度1"}, {"name": "子维度2"}]}],
+}
+HEADER = ["姓名", "总分", "大维度1：维度A", "小维度1：子维度1", "子维度2"]
+
+
+def _workbook(path, rows, header=HEADER):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(header)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+def test_rows_follow_config_mapping(tmp_path):
+    path = _workbook(tmp_path / "a.xlsx", [
+        ["张三", 8.2, 8.0, 7.5, "9"],
+        [None, None, None, None, None],  # 空行跳过
+        ["李四", 6.1, "无效", 6.0, 5.5],
+    ])
+    records = list(iter_report_data(path, CONFIG))
+    assert len(records) == 2
+    assert records[0] == {
+        "user_info": {"name": "张三", "total_score": 8.2},
+        "dimensions": {"维度A": {"score": 8.0, "subs": {"子维度1": 7.5, "子维度2": 9}}},
+    }
+    assert math.isnan(records[1]["dimensions"]["维度A"]["score"])
+
+
+def test_missing_columns(tmp_path):
+    path = _workbook(tmp_path / "b.xlsx", [["张三", 8.0]], header=["姓名", "总分"])
+    with pytest.raises(MissingColumnsError) as exc:
+        ReportWorkbook(path, CONFIG)
+    assert exc.value.missing == ["大维度1：维度A"]
+
+    # 子维度列缺失时按 0 分处理
+    path = _workbook(tmp_path / "c.xlsx", [["张三", 8.0, 7.0]], header=["姓名", "总分", "大维度1：维度A"])
+    record = next(iter_report_data(path, CONFIG))
+    assert record["dimensions"]["维度A"]["subs"] == {"子维度1": 0, "子维度2": 0}
+
+
+def test_average_row_across_chunks(tmp_path):
+    rows = [[f"人员{i}", float(i), 7.0, 7.0, 7.0] for i in range(5)] + [["平均", 6.5, 7.1, 7.2, 7.3]]
+    path = _workbook(tmp_path / "d.xlsx", rows)
+    with ReportWorkbook(path, CONFIG, average_row=True, chunk_size=2) as book:
+        assert book.count == 5
+        assert book.average_scores == {"总分": 6.5, "维度": {"维度A": 7.1}, "子维度": {"子维度1": 7.2, "子维度2": 7.3}}
+        names = [r["user_info"]["name"] for r in book]
+    assert names == [f"人员{i}" for i in range(5)]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试试卷快照缓存的命中、失效与并发构建（不依赖数据库）
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+from types import MappingProxyType
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.paper_snapshot import PaperSnapshot, PaperSnapshotCache, QuestionEntry
+
+
+class FakeCache(PaperSnapshotCache):
+    """用内存数据代替数据库查询的快照缓存"""
+
+    def __init__(self, papers, **kwargs):
+        super().__init__(**kwargs)
+        self.papers = papers
+        self.builds = 0
+
+    def _build(self, db, paper_id, version):
+        self.builds += 1
+        time.sleep(0.01)
+        if paper_id not in self.papers:
+            return None
+        questions = tuple(
+            QuestionEntry(qid, f"题目{qid}", "single", ("A", "B"), (1, 0), False, None, i, None)
+            for i, qid in enumerate(self.papers[paper_id])
+        )
+        return PaperSnapshot(paper_id, version, f"试卷{paper_id}", None, 30, "published", False, (),
+                             questions, MappingProxyType({q.question_id: q for q in questions}), time.time())
+
+
+def test_snapshot_is_cached_and_invalidated():
+    cache = FakeCache({1: [11, 12, 13]}, ttl=300)
+    first = cache.get(None, 1)
+    assert cache.get(None, 1) is first
+    assert cache.builds == 1
+    assert [q.question_id for q in first.ordered_questions([13, 11, 99])] == [13, 11]
+
+    cache.invalidate(1)
+    assert cache.get(None, 1) is not first
+    assert cache.builds == 2
+
+    cache.invalidate_questions([12])
+    cache.get(None, 1)
+    assert cache.builds == 3
+    assert cache.get(None, 404) is None
+
+
+def test_peek_only_reads_cache():
+    cache = FakeCache({1: [11]}, ttl=300)
+    assert cache.peek(1) is None
+    assert cache.builds == 0
+    snapshot = cache.get(None, 1)
+    assert cache.peek(1) is snapshot
+    assert cache.builds == 1
+
+
+def test_lru_and_ttl():
+    cache = FakeCache({1: [1], 2: [2], 3: [3]}, max_size=2, ttl=300)
+    for pid in (1, 2, 3):
+        cache.get(None, pid)
+    assert cache.stats()["size"] == 2
+    cache.get(None, 1)
+    assert cache.builds == 4
+
+    expiring = FakeCache({1: [1]}, ttl=1)
+    snapshot = expiring.get(None, 1)
+    expiring._snapshots[1] = snapshot._replace(built_at=time.time() - 5)
+    expiring.get(None, 1)
+    assert expiring.builds == 2
+
+
+def test_concurrent_requests_build_once():
+    cache = FakeCache({1: list(range(100))}, ttl=300)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get(None, 1))) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert cache.builds == 1
+    assert all(r is results[0] for r in results)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试被试者名单导入的校验、并行密码哈希、逐行写入的失败原因和后台导入任务（写入用例使用 conftest 中的 SQLite 测试库）
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.import_jobs import JOB_COMPLETED, JOB_FAILED, ImportJobRegistry
+from app.services.participant_import import PasswordHasher, _pwd_context, parse_rows
+
+NAN = float("nan")
+
+
+def test_parse_rows_reports_invalid_and_duplicate_lines():
+    rows, errors = parse_rows([
+        {"username": "u1", "password": "pw", "real_name": "张三", "phone": 13800138001.0, "is_active": "否"},
+        {"username": NAN, "password": "pw", "real_name": "李四"},
+        {"username": " u1 ", "password": "pw", "real_name": "重复"},
+        {"username": "u2", "password": 123456, "real_name": "王五", "email": NAN, "is_active": NAN},
+    ])
+    assert [r.username for r in rows] == ["u1", "u2"]
+    assert rows[0].phone == "13800138001" and rows[0].is_active is False
+    assert rows[1].password == "123456" and rows[1].email is None and rows[1].is_active is True
+    assert errors == [
+        (3, "第3行: 用户名、密码、真实姓名不能为空"),
+        (4, "第4行: 用户名 'u1' 与第2行重复"),
+    ]
+
+
+def test_password_hasher_uses_process_pool_and_keeps_order():
+    passwords = [f"pw{i}" for i in range(4)]
+    with PasswordHasher(workers=2) as hasher:
+        hashes = hasher.hash_many(passwords)
+    assert len(hashes) == 4
+    for password, hashed in zip(passwords, hashes):
+        assert _pwd_context.verify(password, hashed)
+    assert not _pwd_context.verify("pw1", hashes[0])
+
+
+def test_import_job_reports_progress_and_result():
+    registry = ImportJobRegistry(workers=1, retention=60)
+    release = threading.Event()
+
+    def runner(job):
+        job.progress(5)
+        release.wait(5)
+        return {"msg": "成功导入 10 个被试者", "success_count": 10}
+
+    job = registry.submit("participants", 10, runner)
+    for _ in range(100):
+        if job.snapshot()["processed"] == 5:
+            break
+        time.sleep(0.01)
+    assert job.snapshot()["progress"] == 50
+    release.set()
+    for _ in range(100):
+        if job.finished:
+            break
+        time.sleep(0.01)
+    snapshot = registry.get(job.job_id).snapshot()
+    assert snapshot["status"] == JOB_COMPLETED
+    assert snapshot["progress"] == 100
+    assert snapshot["result"]["success_count"] == 10
+
+    failed = registry.submit("participants", 1, lambda job: 1 / 0)
+    for _ in range(100):
+        if failed.finished:
+            break
+        time.sleep(0.01)
+    assert failed.status == JOB_FAILED and "导入失败" in failed.message
+    registry.shutdown()
+
+
+def test_insert_chunk_fallback_reports_actual_constraint(app_db):
+    from app.services.participant_import import _insert_chunk
+
+    db = app_db.SessionLocal()
+    try:
+        db.add(app_db.User(username="taken", password_hash="x", role=app_db.UserRole.participant))
+        db.commit()
+    finally:
+        db.close()
+
+    def row(username, password_hash="hash"):
+        return {"username": username, "password_hash": password_hash, "real_name": username,
+                "role": app_db.UserRole.participant, "is_active": True}
+
+    inserted, errors = _insert_chunk(app_db.SessionLocal, [row("ok"), row("taken"), row("nohash", None)], [2, 3, 4])
+    assert inserted == 1
+    assert errors[0] == (3, "第3行: 用户名 'taken' 已存在")
+    assert errors[1][0] == 4
+    assert errors[1][1].startswith("第4行: 写入失败（") and "password_hash" in errors[1][1]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 PDF 流水线：样式表预解析缓存、内存资源加载与分阶段计时（需要 WeasyPrint 及其系统库）
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加报告生成器目录到Python路径
+generators_dir = Path(__file__).parent.parent / "reports" / "generators"
+sys.path.append(str(generators_dir))
+
+try:
+    from pdf_pipeline import PdfPipeline, asset_url
+except (ImportError, OSError) as e:  # 缺少 pango 等系统库时 WeasyPrint 导入会抛出 OSError
+    pytest.skip(f"WeasyPrint 不可用: {e}", allow_module_level=True)
+
+# 1x1 像素 PNG
+PIXEL_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d49484452000000010000000108060000001f15c489"
+    "0000000d49444154789c6360606060000000050001a5f645400000000049454e44ae426082"
+)
+
+HTML_TEMPLATE = """<html><head><style>body {{ color: #333; }} .t {{ font-size: {size}px; }}</style></head>
+<body><p class="t">报告</p><img src="{src}"></body></html>"""
+
+
+def test_stylesheets_are_parsed_once_per_content():
+    pipeline = PdfPipeline()
+    html = HTML_TEMPLATE.format(size=12, src="")
+    stripped, first = pipeline.extract_stylesheets(html)
+    assert "<style" not in stripped and len(first) == 1
+    _, second = pipeline.extract_stylesheets(html)
+    assert second[0] is first[0]
+    _, changed = pipeline.extract_stylesheets(HTML_TEMPLATE.format(size=14, src=""))
+    assert changed[0] is not first[0]
+
+
+def test_stylesheets_kept_when_cascade_would_change():
+    pipeline = PdfPipeline()
+    important = "<style>p { color: red !important; }</style><p>x</p>"
+    assert pipeline.extract_stylesheets(important) == (important, [])
+    with_media = "<style>p { color: red; }</style><style media='screen'>p { color: blue; }</style>"
+    assert pipeline.extract_stylesheets(with_media) == (with_media, [])
+
+
+def test_asset_fetcher_serves_memory_assets():
+    pipeline = PdfPipeline()
+    fetch = pipeline.make_url_fetcher({"雷达图.png": PIXEL_PNG})
+    result = fetch(asset_url("雷达图.png"))
+    assert result["string"] == PIXEL_PNG
+    assert result["mime_type"] == "image/png"
+    with pytest.raises(ValueError):
+        fetch(asset_url("missing.png"))
+
+
+def test_write_pdf_reports_stage_timings(tmp_path):
+    pipeline = PdfPipeline()
+    html = HTML_TEMPLATE.format(size=12, src=asset_url("雷达图.png"))
+    result = pipeline.write_pdf(html, str(tmp_path / "a.pdf"), assets={"雷达图.png": PIXEL_PNG})
+    assert (tmp_path / "a.pdf").read_bytes().startswith(b"%PDF")
+    assert result.pages == 1
+    assert result.timings.layout > 0 and result.timings.write > 0
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试题库导入：Excel / Word 解析，以及分块写入题库和试卷（使用 conftest 中的 SQLite 测试库）
+"""
+
+import io
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import app.services.question_import as question_import
+from app.services.question_import import default_scores, parse_excel_questions, parse_word_questions
+
+
+def test_default_scores():
+    assert default_scores(2) == [10, 7]
+    assert default_scores(4) == [10, 7, 4, 1]
+    assert default_scores(6) == [10, 7, 4, 1, 0, 0]
+
+
+def test_parse_excel_questions_by_column():
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        "题目内容": ["  第一题 ", "第二题"],
+        "选项A": ["A. 甲", "A、丙"],
+        "选项B": ["B)乙", None],
+        "选项C": [None, 3],
+        "题目类型": ["Multiple", None],
+        "选项乱序": ["是", None],
+    }).to_excel(buffer, index=False)
+    buffer.seek(0)
+
+    questions = parse_excel_questions(buffer)
+    assert questions == [
+        {"content": "第一题", "type": "multiple", "options": ["甲", "乙"], "scores": [10, 7], "shuffle_options": True},
+        {"content": "第二题", "type": "single", "options": ["丙", "3"], "scores": [10, 7], "shuffle_options": False},
+    ]
+
+
+def test_parse_word_questions():
+    import docx
+    document = docx.Document()
+    for text in ["说明文字", "题目1", "场景：第一题", "A.甲", "B．乙", "C.丙", "题目2", "第二题题干", "A.丁"]:
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+
+    questions = parse_word_questions(buffer)
+    assert [q["content"] for q in questions] == ["场景：第一题", "第二题题干"]
+    assert questions[0]["options"] == ["甲", "乙", "丙"]
+    assert questions[0]["scores"] == [10, 7, 4]
+    assert questions[1]["options"] == ["丁"]
+
+
+def _rows(count, prefix="导入题"):
+    return [{"content": f"{prefix}{i + 1}", "type": "single", "options": ["甲", "乙"], "scores": [10, 7]}
+            for i in range(count)]
+
+
+def _seed_paper(main, existing=2):
+    """建立一份已有 existing 道题的试卷"""
+    db = main.SessionLocal()
+    try:
+        paper = main.Paper(name="导入试卷", duration=30, status="draft")
+        db.add(paper)
+        db.flush()
+        for i in range(existing):
+            q = main.Question(content=f"已有题{i + 1}", type="single", options=["甲", "乙"], scores=[10, 7])
+            db.add(q)
+            db.flush()
+            db.add(main.PaperQuestion(paper_id=paper.id, question_id=q.id, order_num=i + 1))
+        db.commit()
+        return paper.id
+    finally:
+        db.close()
+
+
+def _paper_order(main, paper_id):
+    """按 order_num 列出试卷中的 (order_num, question_id, content)"""
+    db = main.SessionLocal()
+    try:
+        return db.query(main.PaperQuestion.order_num, main.Question.id, main.Question.content).join(
+            main.Question, main.Question.id == main.PaperQuestion.question_id
+        ).filter(main.PaperQuestion.paper_id == paper_id).order_by(main.PaperQuestion.order_num).all()
+    finally:
+        db.close()
+
+
+def test_import_questions_in_chunks_appends_to_paper(app_db):
+    paper_id = _seed_paper(app_db)
+    calls = []
+
+    result = question_import.import_questions(_rows(1203), paper_id=paper_id, progress=calls.append, chunk_size=500)
+
+    assert result["count"] == 1203
+    assert calls == [500, 1000, 1203]
+    ids = [item["id"] for item in result["created"]]
+    assert len(set(ids)) == 1203
+    rows = _paper_order(app_db, paper_id)
+    # 已有题目在前，导入的题目按输入顺序接在后面，order_num 连续
+    assert [row.order_num for row in rows] == list(range(1, 1206))
+    assert [row.id for row in rows[2:]] == ids
+    assert [row.content for row in rows[2:]] == [f"导入题{i + 1}" for i in range(1203)]
+
+
+def test_mysql_insert_falls_back_when_ids_mismatch(app_db, monkeypatch):
+    """
+    按 MySQL 方式插入：多行 INSERT 后按 lastrowid 推算ID并校验。SQLite 的 lastrowid 是最后一行的ID，
+    多行时推算必然不符，应回滚后逐题插入；单行时推算正确，直接使用
+    """
+    dialect = app_db.engine.dialect
+    monkeypatch.setattr(dialect, "name", "mysql")
+    monkeypatch.setattr(dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+    paper_id = _seed_paper(app_db, existing=0)
+    outcomes = []
+    insert_questions = question_import.insert_questions
+
+    def recording_insert(db, values):
+        try:
+            ids = insert_questions(db, values)
+        except question_import._IdMismatch:
+            outcomes.append("mismatch")
+            raise
+        outcomes.append("ok")
+        return ids
+
+    monkeypatch.setattr(question_import, "insert_questions", recording_insert)
+
+    result = question_import.import_questions(_rows(5) + _rows(1, "单行题"), paper_id=paper_id, chunk_size=5)
+
+    assert outcomes == ["mismatch", "ok"]
+    ids = [item["id"] for item in result["created"]]
+    rows = _paper_order(app_db, paper_id)
+    assert [row.order_num for row in rows] == [1, 2, 3, 4, 5, 6]
+    assert [row.id for row in rows] == ids
+    assert [row.content for row in rows] == [f"导入题{i + 1}" for i in range(5)] + ["单行题1"]
+    db = app_db.SessionLocal()
+    try:
+        # 回滚的多行插入没有留下重复题目
+        assert db.query(app_db.Question).count() == 6
+    finally:
+        db.close()
+
+
+def _wait_job(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        snapshot = client.get(f"/questions/import-jobs/{job_id}").json()
+        if snapshot["status"] in ("completed", "failed"):
+            return snapshot
+        time.sleep(0.05)
+    raise AssertionError("导入任务超时")
+
+
+def test_confirm_imports_small_files_in_request_and_large_files_as_job(app_db, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setenv("QUESTION_IMPORT_SYNC_ROWS", "10")
+    monkeypatch.setenv("QUESTION_IMPORT_CHUNK", "4")
+    paper_id = _seed_paper(app_db, existing=0)
+    client = TestClient(app_db.app)
+
+    assert client.post("/papers/999999/import_excel_confirm", json=_rows(1)).status_code == 404
+
+    resp = client.post(f"/papers/{paper_id}/import_excel_confirm", json=_rows(10))
+    assert resp.status_code == 200
+    assert resp.json()["count"] == 10 and "job_id" not in resp.json()
+
+    resp = client.post(f"/papers/{paper_id}/import_excel_confirm", json=_rows(11, "后台题"))
+    assert resp.status_code == 200
+    assert resp.json()["total"] == 11
+    snapshot = _wait_job(client, resp.json()["job_id"])
+    assert snapshot["status"] == "completed"
+    assert snapshot["processed"] == 11 and snapshot["progress"] == 100
+    assert snapshot["result"]["count"] == 11
+
+    rows = _paper_order(app_db, paper_id)
+    assert [row.order_num for row in rows] == list(range(1, 22))
+    assert [row.id for row in rows[10:]] == [item["id"] for item in snapshot["result"]["created"]]
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试题库搜索：n-gram 倒排索引的候选ID、分页游标，以及在数据库上的分页、筛选、总数估算和
+倒排索引同步（使用 conftest 中的 SQLite 测试库）
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import app.services.question_search as question_search
+from app.services.question_search import (
+    InvalidCursorError, NgramIndex, QuestionTextIndex, decode_cursor, encode_cursor, index_text,
+)
+
+
+def test_index_text_strips_tags():
+    assert index_text('<p>团队<img src="data:image/png;base64,AAAA">Leader</p>') == " 团队 leader "
+    assert index_text(None) == ""
+
+
+def test_candidates():
+    index = NgramIndex()
+    index.add(1, "<p>当团队成员发生冲突时</p>")
+    index.add(2, "团队沟通")
+    index.add(3, "项目中团队冲突")
+    index.add(5, "Team Leader")
+
+    assert index.candidates("团队").tolist() == [3, 2, 1]
+    # 题1包含“团队”和“冲突”，但不包含“队冲”
+    assert index.candidates("团队冲突").tolist() == [3]
+    assert index.candidates("LEADER").tolist() == [5]
+    assert index.candidates("预算").tolist() == []
+    assert index.candidates("团") is None
+
+    # 修改后追加新内容，旧内容的记录保留
+    index.add(2, "预算管理")
+    assert index.candidates("预算").tolist() == [2]
+    assert index.candidates("团队").tolist() == [3, 2, 1]
+    assert index.documents == 5
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(12345)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == 12345
+    assert decode_cursor(None) is None
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.fixture
+def main(app_db, monkeypatch):
+    # 每个用例使用新的倒排索引（SQLite 清表后会复用ID），每次搜索前都与题库同步
+    monkeypatch.setattr(question_search, "text_index", QuestionTextIndex(sync_interval=0))
+    return app_db
+
+
+def _seed(main, count, content=lambda i: f"题目{i}：团队冲突" if i % 2 else f"题目{i}：预算编制",
+          question_type=lambda i: "single" if i % 3 else "multiple"):
+    """按顺序写入 count 道题目，返回按写入顺序的ID"""
+    db = main.SessionLocal()
+    try:
+        questions = [main.Question(content=content(i), type=question_type(i), options=["甲", "乙"], scores=[10, 7])
+                     for i in range(count)]
+        db.add_all(questions)
+        db.commit()
+        return [q.id for q in questions]
+    finally:
+        db.close()
+
+
+def _search(main, **kwargs):
+    db = main.SessionLocal()
+    try:
+        page = question_search.search_questions(db, **kwargs)
+        return {**page, "items": [(q.id, q.content, q.type) for q in page["items"]]}
+    finally:
+        db.close()
+
+
+def _all_pages(main, limit, **kwargs):
+    """逐页翻到底，返回 (全部ID, 第一页的 total, 之后各页的 total)"""
+    first = _search(main, limit=limit, **kwargs)
+    ids, later_totals, page = [item[0] for item in first["items"]], [], first
+    while page["next_cursor"]:
+        page = _search(main, limit=limit, cursor=page["next_cursor"], **kwargs)
+        ids.extend(item[0] for item in page["items"])
+        later_totals.append(page["total"])
+    return ids, first, later_totals
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"question_type": "multiple"},
+    {"keyword": "团队冲突"},
+    {"keyword": "团队冲突", "question_type": "single"},
+    {"keyword": "冲"},
+])
+def test_keyset_paging_has_no_gaps_or_duplicates(main, filters):
+    ids = _seed(main, 53)
+    db = main.SessionLocal()
+    try:
+        rows = db.query(main.Question).all()
+        expected = sorted(
+            (q.id for q in rows
+             if filters.get("keyword", "") in q.content
+             and filters.get("question_type", q.type) == q.type),
+            reverse=True,
+        )
+    finally:
+        db.close()
+    assert 0 < len(expected) <= len(ids)
+
+    found, first, later_totals = _all_pages(main, 7, **filters)
+    assert found == expected
+    assert first["total"] == len(expected) and first["total_estimated"] is False
+    # total 只在第一页计算
+    assert later_totals and all(total is None for total in later_totals)
+
+
+def test_top_level_and_case_filters(main):
+    case_id = _seed(main, 1, content=lambda i: "案例：团队冲突", question_type=lambda i: "case")[0]
+    db = main.SessionLocal()
+    try:
+        children = [main.Question(content=f"子题{i}：团队冲突", type="single", options=["甲"], scores=[10],
+                                  parent_case_id=case_id) for i in range(3)]
+        db.add_all(children)
+        db.commit()
+        child_ids = sorted((q.id for q in children), reverse=True)
+    finally:
+        db.close()
+
+    assert [item[0] for item in _search(main, keyword="团队冲突", top_level=True)["items"]] == [case_id]
+    assert [item[0] for item in _search(main, keyword="团队冲突", parent_case_id=case_id)["items"]] == child_ids
+
+
+def test_total_is_estimated_above_count_limit(main, monkeypatch):
+    # 每隔一题为多选题，精确总数为 30
+    _seed(main, 60, question_type=lambda i: "multiple" if i % 2 else "single")
+    monkeypatch.setenv("QUESTION_SEARCH_COUNT_LIMIT", "10")
+
+    page = _search(main, question_type="multiple", limit=5)
+    assert page["total_estimated"] is True
+    assert abs(page["total"] - 30) <= 3
+    assert len(page["items"]) == 5 and page["next_cursor"]
+
+    monkeypatch.setenv("QUESTION_SEARCH_COUNT_LIMIT", "100")
+    page = _search(main, question_type="multiple", limit=5)
+    assert (page["total"], page["total_estimated"]) == (30, False)
+
+
+def test_keyword_total_is_estimated_from_scanned_candidates(main, monkeypatch):
+    # 600 道题都含关键词（倒排索引给出 600 个候选），其中一半是多选题；
+    # 第一块 500 个候选已足够填满一页，剩余候选不再逐一校验
+    _seed(main, 600, content=lambda i: f"团队冲突{i}", question_type=lambda i: "multiple" if i % 2 else "single")
+
+    monkeypatch.setenv("QUESTION_SEARCH_COUNT_LIMIT", "100")
+    page = _search(main, keyword="团队冲突", question_type="multiple", limit=20)
+    assert (page["total"], page["total_estimated"]) == (300, True)
+
+    # 候选数不超过上限时逐块计数得到精确值
+    monkeypatch.setenv("QUESTION_SEARCH_COUNT_LIMIT", "1000")
+    page = _search(main, keyword="团队冲突", question_type="multiple", limit=20)
+    assert (page["total"], page["total_estimated"]) == (300, False)
+
+
+def test_index_syncs_edits_and_deletes_from_other_processes(main):
+    edited, deleted, kept = _seed(main, 3, content=lambda i: f"团队冲突处理{i}")
+    assert [item[0] for item in _search(main, keyword="团队冲突")["items"]] == [kept, deleted, edited]
+    assert question_search.text_index.builds == 1
+
+    # 直接改库，模拟其他进程的修改：不调用 mark_dirty，靠 updated_at 和题目数同步
+    db = main.SessionLocal()
+    try:
+        db.query(main.Question).filter(main.Question.id == edited).first().content = "预算编制"
+        db.query(main.Question).filter(main.Question.id == deleted).delete()
+        db.commit()
+    finally:
+        db.close()
+
+    assert [item[:2] for item in _search(main, keyword="预算")["items"]] == [(edited, "预算编制")]
+    assert [item[0] for item in _search(main, keyword="团队冲突")["items"]] == [kept]
+    assert question_search.text_index._ids == {edited, kept}
+    # 增量同步，没有整体重建
+    assert question_search.text_index.builds == 1
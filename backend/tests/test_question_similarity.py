@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试题目近似重复检测：文本规范化、MinHash 签名、LSH 分桶和同批题目的重复检查，
+以及题目增删改后持久化索引的维护和重建（使用 conftest 中的 SQLite 测试库）
+"""
+
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.question_similarity import (
+    BANDS, MinHashLSH, band_keys, batch_duplicates, find_duplicates, from_bytes, question_text, rebuild_index,
+    shingles, signature, to_bytes,
+)
+
+CONTENT = "当团队成员在项目截止前发生激烈冲突时，你会怎么做？"
+OPTIONS = ["立即召开会议", "私下分别沟通", "交给上级处理", "不予理会"]
+
+
+def test_normalize_and_shingles():
+    assert question_text("  Ａ Ｂ，c？ ", ["选项 一", None, ""]) == "abc|选项一"
+    assert shingles("abcd") == {"abc", "bcd"}
+    assert shingles("ab") == {"ab"}
+    assert shingles("") == set()
+
+
+def test_signature_is_stable_and_similar_for_rewrites():
+    sig = signature(CONTENT, OPTIONS)
+    assert sig.dtype.name == "uint32" and len(sig) == 64
+    assert (from_bytes(to_bytes(sig)) == sig).all()
+    # 全角/半角、标点和空白差异不影响签名
+    assert (signature(" 当团队成员在项目截止前发生激烈冲突时,你会怎么做? ", OPTIONS) == sig).all()
+    assert signature("", []) is None
+
+    keys = band_keys(sig)
+    assert len(set(keys)) == BANDS
+    assert all(-2 ** 63 <= key < 2 ** 63 for key in keys)
+
+    index = MinHashLSH()
+    index.add("same", sig)
+    index.add("other", signature("完全不同的一道关于预算编制流程的题目", ["甲", "乙"]))
+    rewritten = signature("当团队成员在项目截止前发生了激烈的冲突时，你会怎么做？", OPTIONS[::-1])
+    matches = index.query(rewritten, 0.6)
+    assert [key for key, _ in matches] == ["same"]
+    assert index.query(signature("毫不相关的内容", ["x"]), 0.6) == []
+
+
+def test_batch_duplicates():
+    questions = [
+        {"content": CONTENT, "options": OPTIONS},
+        {"content": "另外一道题目，讨论预算编制", "options": ["甲", "乙"]},
+        {"content": CONTENT + " ", "options": OPTIONS},
+        {"content": "", "options": []},
+    ]
+    assert batch_duplicates(questions) == [None, None, 0, None]
+
+
+def _index_state(main):
+    """索引中的 {question_id: 签名字节} 和 {(bucket, question_id)}"""
+    db = main.SessionLocal()
+    try:
+        signatures = dict(db.query(main.QuestionSignature.question_id, main.QuestionSignature.signature))
+        buckets = set(db.query(main.QuestionLshBucket.bucket, main.QuestionLshBucket.question_id))
+        return signatures, buckets
+    finally:
+        db.close()
+
+
+def _duplicate_ids(main, content, options):
+    db = main.SessionLocal()
+    try:
+        return [match["id"] for match in find_duplicates(db, [{"content": content, "options": options}])[0]]
+    finally:
+        db.close()
+
+
+def test_index_follows_question_create_update_delete(app_db):
+    from fastapi.testclient import TestClient
+
+    client = TestClient(app_db.app)
+    payload = {"content": CONTENT, "type": "single", "options": OPTIONS, "scores": [10, 7, 4, 1]}
+    question_id = client.post("/questions", json=payload).json()["id"]
+    other_id = client.post("/questions", json={**payload, "content": "另外一道题目，讨论预算编制",
+                                                "options": ["甲", "乙"]}).json()["id"]
+
+    signatures, buckets = _index_state(app_db)
+    assert set(signatures) == {question_id, other_id}
+    assert {bucket for bucket, qid in buckets if qid == question_id} == set(band_keys(signature(CONTENT, OPTIONS)))
+    rewritten = "当团队成员在项目截止前发生了激烈的冲突时，你会怎么做？"
+    assert _duplicate_ids(app_db, rewritten, OPTIONS) == [question_id]
+
+    # 修改题干后旧内容不再命中，新内容命中
+    new_content = "年度预算超支百分之二十时，你会优先削减哪类开支？"
+    new_options = ["差旅", "培训", "设备", "外包"]
+    assert client.put(f"/questions/{question_id}", json={"content": new_content, "options": new_options}).status_code == 200
+    assert _duplicate_ids(app_db, CONTENT, OPTIONS) == []
+    assert _duplicate_ids(app_db, new_content, new_options) == [question_id]
+    signatures, _ = _index_state(app_db)
+    assert from_bytes(signatures[question_id]).tolist() == signature(new_content, new_options).tolist()
+
+    # 删除后签名和桶号都被移除
+    assert client.delete(f"/questions/{question_id}").status_code == 200
+    signatures, buckets = _index_state(app_db)
+    assert set(signatures) == {other_id}
+    assert {qid for _, qid in buckets} == {other_id}
+    assert _duplicate_ids(app_db, new_content, new_options) == []
+
+
+def test_rebuild_index_reproduces_incremental_index(app_db):
+    db = app_db.SessionLocal()
+    try:
+        for i in range(7):
+            db.add(app_db.Question(content=f"{CONTENT}（情形{i}）", type="single", options=OPTIONS,
+                                   scores=[10, 7, 4, 1]))
+        # 题干和选项都为空的题目没有签名
+        db.add(app_db.Question(content="", type="single", options=[], scores=[]))
+        db.commit()
+        ids = [qid for (qid,) in db.query(app_db.Question.id).order_by(app_db.Question.id)]
+    finally:
+        db.close()
+
+    from app.services.question_similarity import refresh_index
+    refresh_index(question_ids=ids)
+    incremental = _index_state(app_db)
+    assert len(incremental[0]) == 7
+
+    calls = []
+    assert rebuild_index(chunk_size=3, progress=calls.append) == 7
+    assert calls == [3, 6, 7]
+    assert _index_state(app_db) == incremental
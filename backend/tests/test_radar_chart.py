@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试雷达图渲染器：内存输出、背景缓存复用与多线程一致性
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# 添加报告生成器目录到Python路径
+generators_dir = Path(__file__).parent.parent / "reports" / "generators"
+sys.path.append(str(generators_dir))
+
+from radar_chart import RadarChartRenderer, generate_radar_chart
+
+
+def _radar_data(offset=0.0):
+    groups = [("自我成长与发展", "#00CC00", [0, 30, 60]), ("管理动力", "#9900FF", [90, 120, 150]),
+              ("管理事务", "#0066FF", [180, 210, 240]), ("管理他人", "#FF3333", [270, 300, 330])]
+    return [
+        {
+            "group": name,
+            "color": color,
+            "dims": [{"name": f"{name}{i}", "score": (i * 3 + offset) % 10, "angle": angle}
+                     for i, angle in enumerate(angles)]
+        }
+        for name, color, angles in groups
+    ]
+
+
+def test_png_in_memory_and_background_reused():
+    renderer = RadarChartRenderer(dpi=40)
+    first = renderer.render_png(_radar_data())
+    assert first.startswith(b"\x89PNG")
+    assert renderer.render_png(_radar_data()) == first
+    assert renderer.render_png(_radar_data(1.5)) != first
+    assert len(renderer._backgrounds) == 1
+
+
+def test_concurrent_rendering_matches_sequential():
+    renderer = RadarChartRenderer(dpi=40)
+    datasets = [_radar_data(i * 0.7) for i in range(8)]
+    expected = [renderer.render_png(d) for d in datasets]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(renderer.render_png, datasets)) == expected
+
+
+def test_svg_and_file_compatibility(tmp_path):
+    renderer = RadarChartRenderer(dpi=40)
+    assert b"<svg" in renderer.render_svg(_radar_data())[:500]
+
+    output = generate_radar_chart(_radar_data(), tmp_path / "chart.png")
+    assert output is not None and output.read_bytes().startswith(b"\x89PNG")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告打包下载：批量下载接口返回带短期Token的 archive_url，浏览器无需请求头即可下载和续传
+（使用 conftest 中的 SQLite 测试库）
+"""
+
+import io
+import sys
+import zipfile
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from fastapi.testclient import TestClient
+
+
+def _seed(main, tmp_path):
+    db = main.SessionLocal()
+    try:
+        user = main.User(username="admin1", password_hash="x", real_name="管理员", role=main.UserRole.admin)
+        paper = main.Paper(name="报告试卷", duration=30, status="published")
+        db.add_all([user, paper])
+        db.flush()
+        report_ids = []
+        for i in range(2):
+            path = tmp_path / f"report_{i}.pdf"
+            path.write_bytes(b"%PDF-1.4 " + bytes([i]) * 2000)
+            report = main.Report(user_id=user.id, paper_id=paper.id, file_path=str(path),
+                                 file_name=f"报告{i}.pdf", file_size=path.stat().st_size, status="completed")
+            db.add(report)
+            db.flush()
+            report_ids.append(report.id)
+        db.commit()
+        return report_ids
+    finally:
+        db.close()
+
+
+def test_archive_url_downloads_without_authorization_header(app_db, tmp_path):
+    report_ids = _seed(app_db, tmp_path)
+    client = TestClient(app_db.app)
+    headers = {"Authorization": "Bearer " + app_db.create_access_token({"sub": "admin1", "role": "admin"})}
+
+    resp = client.post("/reports/batch/download", json=report_ids, headers=headers)
+    assert resp.status_code == 200
+    archive_url = resp.json()["archive_url"]
+    assert archive_url.startswith("/reports/batch/archive?")
+
+    resp = client.get(archive_url)
+    assert resp.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(resp.content)) as archive:
+        assert sorted(archive.namelist()) == ["报告0.pdf", "报告1.pdf"]
+
+    # 断点续传：同一链接带 Range 请求剩余部分
+    resumed = client.get(archive_url, headers={"Range": "bytes=100-"})
+    assert resumed.status_code == 206
+    assert resumed.content == resp.content[100:]
+
+
+def test_archive_requires_matching_download_token(app_db, tmp_path):
+    report_ids = _seed(app_db, tmp_path)
+    client = TestClient(app_db.app)
+    login_token = app_db.create_access_token({"sub": "admin1", "role": "admin"})
+    archive_url = client.post("/reports/batch/download", json=report_ids[:1],
+                              headers={"Authorization": f"Bearer {login_token}"}).json()["archive_url"]
+    token = archive_url.split("token=")[1]
+    ids = ",".join(str(rid) for rid in report_ids)
+
+    assert client.get(f"/reports/batch/archive?ids={ids}").status_code == 401
+    # Token 只能下载签发时指定的报告
+    assert client.get(f"/reports/batch/archive?ids={ids}&token={token}").status_code == 403
+    # 下载 Token 不能当作登录 Token 使用
+    assert client.get("/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    # 能携带请求头的客户端仍可使用登录 Token
+    resp = client.get(f"/reports/batch/archive?ids={ids}", headers={"Authorization": f"Bearer {login_token}"})
+    assert resp.status_code == 200
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告产物的引用计数、删除报告时释放引用以及孤立文件清理
+（使用 conftest 中的 SQLite 测试库，产物写入临时目录）
+"""
+
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.report_artifact_store as store
+
+KEY_A = "a" * 64
+KEY_B = "b" * 64
+HOURS_AGO = time.time() - 7200
+
+
+@pytest.fixture
+def main(app_db, monkeypatch, tmp_path):
+    output_dir = tmp_path / "output"
+    monkeypatch.setattr(store, "OUTPUT_DIR", output_dir)
+    monkeypatch.setattr(store, "ARTIFACT_DIR", output_dir / "artifacts")
+    monkeypatch.setattr(store, "ASSETS_DIR", tmp_path / "assets")
+    (tmp_path / "assets").mkdir()
+    return app_db
+
+
+def _owner(main, db):
+    user = main.User(username="u1", password_hash="x", real_name="张三", role=main.UserRole.participant)
+    paper = main.Paper(name="报告试卷", duration=30, status="published")
+    db.add_all([user, paper])
+    db.flush()
+    return user.id, paper.id
+
+
+def _render(db, key, content=b"%PDF-1.4 report"):
+    """模拟一次渲染并登记产物"""
+    path = store.new_render_path(key)
+    Path(path).write_bytes(content)
+    return store.commit_artifact(db, key, path)[0]
+
+
+def _add_report(main, db, owner, key, path):
+    report = main.Report(user_id=owner[0], paper_id=owner[1], file_path=path, file_name="报告.pdf",
+                         status="completed", content_hash=key)
+    db.add(report)
+    db.flush()
+    return report.id
+
+
+def _ref_count(main, db, key):
+    db.expire_all()
+    return db.query(main.ReportArtifact.ref_count).filter(main.ReportArtifact.content_hash == key).scalar()
+
+
+def _auth_headers(main):
+    return {"Authorization": "Bearer " + main.create_access_token({"sub": "u1", "role": "admin"})}
+
+
+def test_acquire_and_commit_count_references(main):
+    db = main.SessionLocal()
+    try:
+        assert store.acquire_artifact(db, KEY_A) is None
+        path = _render(db, KEY_A)
+        assert path == str(store.artifact_path(KEY_A)) and os.path.exists(path)
+        assert _ref_count(main, db, KEY_A) == 1
+
+        assert store.acquire_artifact(db, KEY_A) == path
+        assert _ref_count(main, db, KEY_A) == 2
+
+        # 相同输入再次渲染（例如并发任务）只增加引用，不新增记录
+        assert _render(db, KEY_A) == path
+        assert _ref_count(main, db, KEY_A) == 3
+        assert db.query(main.ReportArtifact).count() == 1
+
+        # 文件丢失时不引用，由调用方重新渲染
+        os.remove(path)
+        assert store.acquire_artifact(db, KEY_A) is None
+        assert _ref_count(main, db, KEY_A) == 3
+    finally:
+        db.close()
+
+
+def test_single_delete_releases_reference(main):
+    db = main.SessionLocal()
+    try:
+        owner = _owner(main, db)
+        path = _render(db, KEY_A)
+        first = _add_report(main, db, owner, KEY_A, path)
+        second = _add_report(main, db, owner, KEY_A, store.acquire_artifact(db, KEY_A))
+        db.commit()
+    finally:
+        db.close()
+
+    client = TestClient(main.app)
+    assert client.delete(f"/reports/{first}", headers=_auth_headers(main)).status_code == 200
+    db = main.SessionLocal()
+    try:
+        assert _ref_count(main, db, KEY_A) == 1
+        assert os.path.exists(path)
+
+        assert client.delete(f"/reports/{second}", headers=_auth_headers(main)).status_code == 200
+        assert _ref_count(main, db, KEY_A) is None
+        assert not os.path.exists(path)
+    finally:
+        db.close()
+
+
+def test_batch_delete_releases_references(main):
+    db = main.SessionLocal()
+    try:
+        owner = _owner(main, db)
+        path_a = _render(db, KEY_A)
+        path_b = _render(db, KEY_B, b"%PDF-1.4 other")
+        a1 = _add_report(main, db, owner, KEY_A, path_a)
+        a2 = _add_report(main, db, owner, KEY_A, store.acquire_artifact(db, KEY_A))
+        a3 = _add_report(main, db, owner, KEY_A, store.acquire_artifact(db, KEY_A))
+        b1 = _add_report(main, db, owner, KEY_B, path_b)
+        db.commit()
+    finally:
+        db.close()
+
+    client = TestClient(main.app)
+    resp = client.request("DELETE", "/reports/batch", json={"report_ids": [a1, a2, b1]}, headers=_auth_headers(main))
+    assert resp.status_code == 200
+    db = main.SessionLocal()
+    try:
+        assert _ref_count(main, db, KEY_A) == 1
+        assert os.path.exists(path_a)
+        assert _ref_count(main, db, KEY_B) is None
+        assert not os.path.exists(path_b)
+        assert [rid for (rid,) in db.query(main.Report.id)] == [a3]
+    finally:
+        db.close()
+
+
+def _garbage_fixture(main, db):
+    """
+    建立需要清理的状态：
+    - KEY_A 有一条报告记录但计数为 5（需修正）
+    - KEY_B 计数为 2 但没有报告记录，且早已不再使用（需删除记录和文件）
+    - output 目录中一个旧的无主 PDF、一个刚写入的无主 PDF，assets 中一个旧雷达图
+    """
+    owner = _owner(main, db)
+    path_a = _render(db, KEY_A)
+    _add_report(main, db, owner, KEY_A, path_a)
+    path_b = _render(db, KEY_B, b"%PDF-1.4 other")
+    db.query(main.ReportArtifact).filter(main.ReportArtifact.content_hash == KEY_A).update({"ref_count": 5})
+    db.query(main.ReportArtifact).filter(main.ReportArtifact.content_hash == KEY_B).update(
+        {"ref_count": 2, "last_used_at": datetime.utcnow() - timedelta(hours=2)})
+    db.commit()
+
+    stale = store.OUTPUT_DIR / "张三_old.pdf"
+    fresh = store.OUTPUT_DIR / "张三_new.pdf"
+    chart = store.ASSETS_DIR / "radar_chart_1_1.png"
+    for path in (stale, fresh, chart):
+        path.write_bytes(b"x" * 100)
+    for path in (stale, chart, Path(path_a), Path(path_b)):
+        os.utime(path, (HOURS_AGO, HOURS_AGO))
+    return path_a, path_b, stale, fresh, chart
+
+
+def test_collect_garbage_removes_orphans_and_reconciles(main):
+    db = main.SessionLocal()
+    try:
+        path_a, path_b, stale, fresh, chart = _garbage_fixture(main, db)
+
+        stats = store.collect_garbage(db, grace_seconds=3600)
+
+        assert stats == {"recounted": 2, "artifacts_removed": 1, "files_removed": 3, "bytes_freed": 214}
+        assert _ref_count(main, db, KEY_A) == 1
+        assert _ref_count(main, db, KEY_B) is None
+        assert os.path.exists(path_a)
+        assert not os.path.exists(path_b)
+        assert not stale.exists() and not chart.exists()
+        # 宽限期内的文件不清理
+        assert fresh.exists()
+    finally:
+        db.close()
+
+
+def test_collect_garbage_grace_period_keeps_recent_artifacts(main):
+    db = main.SessionLocal()
+    try:
+        _, path_b, _, _, _ = _garbage_fixture(main, db)
+        db.query(main.ReportArtifact).filter(main.ReportArtifact.content_hash == KEY_B).update(
+            {"last_used_at": datetime.utcnow()})
+        db.commit()
+
+        stats = store.collect_garbage(db, grace_seconds=3600)
+
+        assert stats["artifacts_removed"] == 0
+        # 计数修正为 0，但记录和文件保留到宽限期之后
+        assert _ref_count(main, db, KEY_B) == 0
+        assert os.path.exists(path_b)
+    finally:
+        db.close()
+
+
+def test_collect_garbage_dry_run_changes_nothing(main):
+    db = main.SessionLocal()
+    try:
+        path_a, path_b, stale, fresh, chart = _garbage_fixture(main, db)
+
+        stats = store.collect_garbage(db, grace_seconds=3600, dry_run=True)
+
+        assert stats == {"recounted": 2, "artifacts_removed": 1, "files_removed": 3, "bytes_freed": 214}
+        assert _ref_count(main, db, KEY_A) == 5
+        assert _ref_count(main, db, KEY_B) == 2
+        assert all(os.path.exists(p) for p in (path_a, path_b, stale, fresh, chart))
+    finally:
+        db.close()
+
+
+def test_download_uses_report_file_name(main):
+    from urllib.parse import unquote
+    from app.services.report_task_store import get_report_task_store
+
+    db = main.SessionLocal()
+    try:
+        owner = _owner(main, db)
+        path = _render(db, KEY_A)
+        report_id = _add_report(main, db, owner, KEY_A, path)
+        db.commit()
+    finally:
+        db.close()
+
+    task_store = get_report_task_store()
+    task_id = f"{owner[0]}_{owner[1]}_download"
+    task_store.create_many([{"task_id": task_id, "user_id": owner[0], "paper_id": owner[1]}])
+    task_store.update(task_id, status="completed", progress=100, file_path=path, report_id=report_id)
+
+    resp = TestClient(main.app).get(f"/reports/download/{task_id}")
+    assert resp.status_code == 200
+    # 产物按内容哈希命名，下载文件名仍为报告记录中的文件名
+    assert "报告.pdf" in unquote(resp.headers["content-disposition"])
+    assert KEY_A not in resp.headers["content-disposition"]
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告产物内容哈希：输入不变时键不变，报告数据、模板或配置变化时键随之变化（不依赖数据库）
+"""
+
+import copy
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import app.services.report_artifact_store as store
+
+REPORT_DATA = {
+    "user_info": {"id": 1, "name": "张三", "username": "zhangsan", "total_score": 7.5},
+    "paper_info": {"id": 10, "name": "管理潜质测评", "description": None},
+    "dimensions": {"管理动力": {"score": 8.0, "subs": {"领导意愿": 8.5, "追求成就": 7.5}}},
+    "answers": {3: '["A"]', 1: '["B"]'},
+    "question_dim_map": {1: 5, 3: 6},
+}
+
+
+def _use_generators_dir(monkeypatch, tmp_path):
+    (tmp_path / "configs").mkdir()
+    (tmp_path / "templates").mkdir()
+    (tmp_path / "configs" / "10.yaml").write_text("template:\n  name: t.html\n", encoding="utf-8")
+    (tmp_path / "templates" / "t.html").write_text("<p>{{ user_info.name }}</p>", encoding="utf-8")
+    monkeypatch.setattr(store, "GENERATORS_DIR", tmp_path)
+
+
+def test_key_is_stable_for_same_input(monkeypatch, tmp_path):
+    _use_generators_dir(monkeypatch, tmp_path)
+    key = store.compute_report_key(10, REPORT_DATA)
+    reordered = dict(reversed(list(copy.deepcopy(REPORT_DATA).items())))
+    assert store.compute_report_key(10, reordered) == key
+    assert len(key) == 64
+    assert store.artifact_path(key).name == f"{key}.pdf"
+
+
+def test_key_changes_with_report_data(monkeypatch, tmp_path):
+    _use_generators_dir(monkeypatch, tmp_path)
+    renamed = copy.deepcopy(REPORT_DATA)
+    renamed["user_info"]["name"] = "张珊"
+    assert store.compute_report_key(10, renamed) != store.compute_report_key(10, REPORT_DATA)
+
+
+def test_key_changes_with_template_and_config(monkeypatch, tmp_path):
+    _use_generators_dir(monkeypatch, tmp_path)
+    key = store.compute_report_key(10, REPORT_DATA)
+
+    (tmp_path / "templates" / "t.html").write_text("<h1>{{ user_info.name }}</h1>", encoding="utf-8")
+    template_key = store.compute_report_key(10, REPORT_DATA)
+    assert template_key != key
+
+    (tmp_path / "configs" / "10.yaml").write_text("template:\n  name: t.html\nversion: 2\n", encoding="utf-8")
+    assert store.compute_report_key(10, REPORT_DATA) not in (key, template_key)
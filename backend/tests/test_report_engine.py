@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告引擎的优先级、重试、整批取消和准入控制（使用替代的任务执行函数，不启动渲染进程）
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+
+from app.services.report_engine import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, ReportEngine, is_transient_error, retry_delay
+)
+from app.services.report_task_store import CANCELLED_FIELDS, MemoryReportTaskStore, SQLReportTaskStore
+
+
+class FakeRunner:
+    """记录执行顺序；gate 未放行前阻塞，便于先把任务排进队列"""
+
+    def __init__(self, failures=None):
+        self.order = []
+        self.failures = dict(failures or {})
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, job):
+        self.gate.wait(5)
+        with self.lock:
+            self.order.append(job.task_id)
+            error = self.failures.get(job.task_id)
+            if error is not None and error[0] > 0:
+                self.failures[job.task_id] = (error[0] - 1, error[1])
+                raise error[1]
+        job.task_store.update(job.task_id, status="completed", progress=100)
+
+
+def _make_engine(runner, **kwargs):
+    options = dict(workers=1, dispatchers=1, queue_size=10, retry_base_delay=0.01, runner=runner)
+    options.update(kwargs)
+    return ReportEngine(**options)
+
+
+def _submit(engine, store, task_id, priority=PRIORITY_BATCH, batch_id=None):
+    store.create_many([{"task_id": task_id, "user_id": 1, "paper_id": 10, "batch_id": batch_id}])
+    engine.submit(task_id, 1, 10, store, None, priority=priority, batch_id=batch_id)
+
+
+def _wait_for(store, task_ids, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        tasks = store.get_many(task_ids)
+        if all(tasks[t]["status"] in ("completed", "failed", "cancelled") for t in task_ids):
+            return tasks
+        time.sleep(0.01)
+    raise AssertionError(f"任务未在 {timeout} 秒内结束: {store.get_many(task_ids)}")
+
+
+def test_interactive_jobs_run_before_batch_jobs():
+    runner = FakeRunner()
+    engine = _make_engine(runner)
+    store = MemoryReportTaskStore()
+    try:
+        _submit(engine, store, "blocker")
+        time.sleep(0.05)  # 调度线程取走第一个任务后阻塞在 gate 上
+        for i in range(3):
+            _submit(engine, store, f"batch{i}")
+        _submit(engine, store, "single", priority=PRIORITY_INTERACTIVE)
+        runner.gate.set()
+        _wait_for(store, ["blocker", "batch0", "batch1", "batch2", "single"])
+        assert runner.order == ["blocker", "single", "batch0", "batch1", "batch2"]
+    finally:
+        engine.shutdown()
+
+
+def test_transient_errors_are_retried_and_permanent_errors_fail():
+    transient = OperationalError("SELECT 1", {}, Exception("server has gone away"))
+    runner = FakeRunner({"flaky": (2, transient), "broken": (1, ValueError("配置文件不存在"))})
+    runner.gate.set()
+    engine = _make_engine(runner, max_retries=3)
+    store = MemoryReportTaskStore()
+    try:
+        _submit(engine, store, "flaky")
+        _submit(engine, store, "broken")
+        tasks = _wait_for(store, ["flaky", "broken"])
+        assert tasks["flaky"]["status"] == "completed"
+        assert tasks["flaky"]["attempts"] == 2
+        assert tasks["broken"]["status"] == "failed"
+        assert runner.order.count("flaky") == 3
+        assert runner.order.count("broken") == 1
+    finally:
+        engine.shutdown()
+
+
+def test_retries_stop_after_max_attempts():
+    runner = FakeRunner({"flaky": (10, TimeoutError("渲染超时"))})
+    runner.gate.set()
+    engine = _make_engine(runner, max_retries=2)
+    store = MemoryReportTaskStore()
+    try:
+        _submit(engine, store, "flaky")
+        tasks = _wait_for(store, ["flaky"])
+        assert tasks["flaky"]["status"] == "failed"
+        assert runner.order.count("flaky") == 3
+    finally:
+        engine.shutdown()
+
+
+def test_cancel_batch_skips_queued_jobs():
+    runner = FakeRunner()
+    engine = _make_engine(runner)
+    store = MemoryReportTaskStore()
+    try:
+        _submit(engine, store, "blocker")
+        time.sleep(0.05)
+        for i in range(3):
+            _submit(engine, store, f"a{i}", batch_id="A")
+        _submit(engine, store, "b0", batch_id="B")
+        assert sorted(engine.cancel_batch("A", store)) == ["a0", "a1", "a2"]
+        runner.gate.set()
+        tasks = _wait_for(store, ["blocker", "a0", "a1", "a2", "b0"])
+        assert runner.order == ["blocker", "b0"]
+        assert tasks["a0"]["status"] == "cancelled"
+        assert tasks["b0"]["status"] == "completed"
+    finally:
+        engine.shutdown()
+
+
+class CancelOnStartStore(MemoryReportTaskStore):
+    """模拟另一个进程恰好在任务开始执行前取消了整批任务"""
+
+    def mark_started(self, task_id):
+        if task_id.startswith("a"):
+            self.cancel_batch("A")
+        return super().mark_started(task_id)
+
+
+def test_cancel_racing_with_start_is_not_overwritten():
+    runner = FakeRunner()
+    runner.gate.set()
+    engine = _make_engine(runner)
+    store = CancelOnStartStore()
+    try:
+        _submit(engine, store, "a0", batch_id="A")
+        _submit(engine, store, "b0", batch_id="B")
+        tasks = _wait_for(store, ["a0", "b0"])
+        assert runner.order == ["b0"]
+        assert tasks["a0"]["status"] == "cancelled"
+        assert tasks["b0"]["status"] == "completed"
+    finally:
+        engine.shutdown()
+
+
+def test_skipping_job_cancelled_in_other_process_notifies_local_listeners(tmp_path):
+    runner = FakeRunner()
+    engine = _make_engine(runner)
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'report_tasks.db'}", future=True)
+    store = SQLReportTaskStore(db_engine)
+    other = SQLReportTaskStore(db_engine)  # 另一个进程的存储实例
+    events = []
+    store.add_listener(lambda kind, data: events.append((kind, data)))
+    try:
+        _submit(engine, store, "blocker")
+        time.sleep(0.05)
+        _submit(engine, store, "a0", batch_id="A")
+        assert other.cancel_batch("A") == ["a0"]
+        assert not any(kind == "cancelled" for kind, _ in events)
+        runner.gate.set()
+        _wait_for(store, ["blocker", "a0"])
+        engine._queue.join()
+        assert runner.order == ["blocker"]
+        assert ("updated", {"task_id": "a0", "fields": CANCELLED_FIELDS}) in events
+    finally:
+        engine.shutdown()
+
+
+def test_admission_control_reserves_room_for_single_reports():
+    engine = _make_engine(FakeRunner(), queue_size=10, batch_ratio=50)
+    assert engine.admit_batch(5)
+    assert not engine.admit_batch(6)
+
+
+def test_transient_error_detection_follows_exception_chain():
+    try:
+        try:
+            raise OperationalError("SELECT 1", {}, Exception("lost connection"))
+        except Exception as e:
+            raise Exception(f"获取用户信息失败: {str(e)}")
+    except Exception as wrapped:
+        assert is_transient_error(wrapped)
+    assert not is_transient_error(Exception("用户不存在"))
+    assert 0.5 <= retry_delay(0, 1) <= 1
+    assert 4 <= retry_delay(3, 1) <= 8
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告引擎的基本调度：提交执行、队列满时拒绝（接口返回503）、停止（使用替代的任务执行函数，不启动渲染进程）
+"""
+
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import app.api.report_api as report_api
+from app.services.report_engine import ReportEngine
+from app.services.report_task_store import MemoryReportTaskStore
+
+
+def _blocking_runner(gate, done):
+    def run(job):
+        gate.wait(5)
+        job.task_store.update(job.task_id, status="completed", progress=100)
+        done.append(job.task_id)
+    return run
+
+
+def _submit(engine, store, task_id):
+    store.create_many([{"task_id": task_id, "user_id": 1, "paper_id": 10}])
+    engine.submit(task_id, 1, 10, store, None)
+
+
+def test_submitted_jobs_are_executed():
+    gate, done = threading.Event(), []
+    gate.set()
+    engine = ReportEngine(workers=1, dispatchers=2, queue_size=10, runner=_blocking_runner(gate, done))
+    store = MemoryReportTaskStore()
+    try:
+        for i in range(5):
+            _submit(engine, store, f"t{i}")
+        deadline = time.time() + 5
+        while len(done) < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        assert sorted(done) == [f"t{i}" for i in range(5)]
+        assert all(task["status"] == "completed" for task in store.get_many(done).values())
+    finally:
+        engine.shutdown()
+
+
+def test_full_queue_rejects_jobs():
+    gate, done = threading.Event(), []
+    engine = ReportEngine(workers=1, dispatchers=1, queue_size=2, runner=_blocking_runner(gate, done))
+    store = MemoryReportTaskStore()
+    try:
+        _submit(engine, store, "running")
+        time.sleep(0.05)  # 调度线程取走第一个任务后阻塞在 gate 上
+        _submit(engine, store, "q1")
+        _submit(engine, store, "q2")
+        assert engine.free_slots() == 0
+        with pytest.raises(queue.Full):
+            _submit(engine, store, "q3")
+    finally:
+        gate.set()
+        engine.shutdown()
+
+
+def test_generate_endpoint_returns_503_when_queue_is_full(monkeypatch):
+    gate, done = threading.Event(), []
+    engine = ReportEngine(workers=1, dispatchers=1, queue_size=1, runner=_blocking_runner(gate, done))
+    store = MemoryReportTaskStore()
+    monkeypatch.setattr(report_api, "get_report_engine", lambda: engine)
+    monkeypatch.setattr(report_api, "get_report_task_store", lambda: store)
+    app = FastAPI()
+    app.include_router(report_api.router)
+    client = TestClient(app)
+    try:
+        assert client.post("/reports/generate", json={"paper_id": 10, "user_id": 1}).status_code == 200
+        time.sleep(0.05)
+        assert client.post("/reports/generate", json={"paper_id": 10, "user_id": 2}).status_code == 200
+        response = client.post("/reports/generate", json={"paper_id": 10, "user_id": 3})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "10"
+        failed = [t for t in store.find() if t["status"] == "failed"]
+        assert [t["user_id"] for t in failed] == [3]
+    finally:
+        gate.set()
+        engine.shutdown()
+
+
+def test_shutdown_drains_queue_and_stops_threads():
+    gate, done = threading.Event(), []
+    gate.set()
+    engine = ReportEngine(workers=1, dispatchers=2, queue_size=10, runner=_blocking_runner(gate, done))
+    store = MemoryReportTaskStore()
+    for i in range(3):
+        _submit(engine, store, f"t{i}")
+    threads = list(engine._threads)
+    engine.shutdown()
+    assert len(done) == 3
+    assert not any(thread.is_alive() for thread in threads)
+    assert engine.pending() == 0
+    # 停止后再次提交时重新启动
+    _submit(engine, store, "again")
+    engine.shutdown()
+    assert "again" in done
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告批次进度事件总线和 SSE 流（使用内存任务存储，不依赖运行中的后端服务）
+"""
+
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from sqlalchemy import create_engine
+
+import app.services.report_events as report_events
+from app.services.report_events import ReportEventBus, batch_event_stream, summarize
+from app.services.report_task_store import MemoryReportTaskStore, SQLReportTaskStore
+
+
+def _make_batch(size=3, batch_id="B1", buffer_size=100):
+    bus = ReportEventBus(buffer_size=buffer_size)
+    store = MemoryReportTaskStore()
+    store.add_listener(bus.on_store_event)
+    store.create_many([
+        {"task_id": f"t{i}", "user_id": i, "paper_id": 10, "batch_id": batch_id} for i in range(size)
+    ])
+    return bus, store
+
+
+def _parse(chunks):
+    """把 SSE 消息解析为 [(id, event, data)]"""
+    events = []
+    for chunk in chunks:
+        fields = {}
+        for line in chunk.strip().splitlines():
+            key, _, value = line.partition(": ")
+            fields[key] = value
+        if "event" in fields:
+            events.append((int(fields["id"]) if "id" in fields else None, fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def _never_disconnected():
+    return False
+
+
+def _collect(bus, store, batch_id, last_event_id=None):
+    async def run():
+        return [chunk async for chunk in batch_event_stream(batch_id, last_event_id, store,
+                                                            _never_disconnected, bus=bus)]
+    return _parse(asyncio.run(run()))
+
+
+def test_new_connection_gets_snapshot_and_resume_replays_missed_events():
+    bus, store = _make_batch()
+    chunks, first_id, done = bus.read("B1", None)
+    snapshot = _parse(chunks)[0]
+    assert snapshot[1] == "snapshot"
+    assert snapshot[2]["batch"]["total"] == 3
+    assert not done
+
+    store.update("t0", status="generating", progress=40)
+    store.update("t0", progress=40)  # 未变化的更新不产生事件
+    chunks, last_id, _ = bus.read("B1", first_id)
+    events = _parse(chunks)
+    assert [e[1] for e in events] == ["task", "batch"]
+    assert events[0][2]["progress"] == 40
+    assert events[1][2]["progress"] == round(40 / 3, 1)
+    assert bus.read("B1", last_id)[0] == []
+
+
+def test_resume_after_buffer_overflow_falls_back_to_snapshot():
+    bus, store = _make_batch(buffer_size=4)
+    for progress in (10, 20, 30, 40):
+        store.update("t1", status="generating", progress=progress)
+    chunks, _, _ = bus.read("B1", 1)
+    assert _parse(chunks)[0][1] == "snapshot"
+
+
+def test_stream_ends_with_done_after_batch_finishes():
+    bus, store = _make_batch(size=2)
+    store.update("t0", status="completed", progress=100)
+    store.cancel_batch("B1")
+    events = _collect(bus, store, "B1")
+    assert events[0][1] == "snapshot"
+    assert events[-1][1] == "done"
+    assert events[-1][2]["counts"]["completed"] == 1
+    assert events[-1][2]["counts"]["cancelled"] == 1
+
+    # 结束后带着最新编号重连，仍然收到 done 而不是空响应
+    events = _collect(bus, store, "B1", last_event_id=events[0][0])
+    assert events[-1][1] == "done"
+
+
+def test_stream_pushes_updates_from_other_threads():
+    bus, store = _make_batch(size=1)
+
+    async def run():
+        chunks = []
+        async for chunk in batch_event_stream("B1", None, store, _never_disconnected, bus=bus):
+            chunks.append(chunk)
+            if len(chunks) == 2:  # retry 提示和快照之后，在工作线程中完成任务
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, lambda: store.update("t0", status="completed", progress=100))
+        return chunks
+
+    events = _parse(asyncio.run(asyncio.wait_for(run(), 5)))
+    assert [e[1] for e in events] == ["snapshot", "task", "batch", "done"]
+    assert [e[0] for e in events[1:]] == sorted(e[0] for e in events[1:])
+
+
+def test_stream_sees_batch_cancelled_in_other_process(monkeypatch, tmp_path):
+    monkeypatch.setattr(report_events, "HEARTBEAT_INTERVAL", 0.05)
+    engine = create_engine(f"sqlite:///{tmp_path / 'report_tasks.db'}", future=True)
+    bus = ReportEventBus()
+    store = SQLReportTaskStore(engine)
+    store.add_listener(bus.on_store_event)
+    store.create_many([{"task_id": f"t{i}", "user_id": i, "paper_id": 10, "batch_id": "B1"} for i in range(2)])
+    store.update("t0", status="completed", progress=100)
+    # 另一个进程的存储实例：取消写入同一张表，但不会通知本进程的事件总线
+    other = SQLReportTaskStore(engine)
+
+    async def run():
+        chunks = []
+        async for chunk in batch_event_stream("B1", None, store, _never_disconnected, bus=bus):
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                await asyncio.get_running_loop().run_in_executor(None, other.cancel_batch, "B1")
+        return chunks
+
+    events = _parse(asyncio.run(asyncio.wait_for(run(), 5)))
+    assert [e[1] for e in events] == ["snapshot", "task", "batch", "done"]
+    assert events[1][2]["status"] == "cancelled"
+    assert events[-1][2]["counts"]["cancelled"] == 1
+
+
+def test_unknown_batch_falls_back_to_task_store():
+    bus = ReportEventBus()
+    store = MemoryReportTaskStore()
+    store.create_many([{"task_id": "x", "user_id": 1, "paper_id": 10, "batch_id": "OTHER"}])
+    store.update("x", status="failed", progress=100)
+    events = _collect(bus, store, "OTHER")
+    assert [e[1] for e in events] == ["snapshot", "done"]
+    assert events[0][0] is None
+    assert _collect(bus, store, "MISSING")[0][1] == "error"
+
+
+def test_summarize_counts_statuses():
+    summary = summarize("B", [{"status": "completed", "progress": 100}, {"status": "pending", "progress": 0}])
+    assert summary["finished"] == 1
+    assert summary["progress"] == 50
+    assert not summary["done"]
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告任务状态存储（SQLite 与内存实现，不依赖运行中的后端服务）
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.services.report_task_store import MemoryReportTaskStore, ReportTaskStore, SQLReportTaskStore
+
+
+def _make_stores(tmp_path, ttl=3600):
+    engine = create_engine(f"sqlite:///{tmp_path / 'report_tasks.db'}", future=True)
+    return [SQLReportTaskStore(engine, ttl=ttl), MemoryReportTaskStore(ttl=ttl)]
+
+
+def test_create_update_and_batch_get(tmp_path):
+    for store in _make_stores(tmp_path):
+        tasks = [
+            {"task_id": f"{uid}_10_abc", "user_id": uid, "paper_id": 10}
+            for uid in range(1, 1501)
+        ]
+        store.create_many(tasks)
+        store.update("1_10_abc", status="completed", progress=100, file_path="/tmp/a.pdf", report_id=7)
+
+        result = store.get_many([t["task_id"] for t in tasks] + ["missing"])
+        assert len(result) == 1500
+        assert "missing" not in result
+        assert result["1_10_abc"]["status"] == "completed"
+        assert result["1_10_abc"]["report_id"] == 7
+        assert result["2_10_abc"]["status"] == "pending"
+        assert result["2_10_abc"]["progress"] == 0
+
+
+def test_find_by_paper_and_user(tmp_path):
+    for store in _make_stores(tmp_path):
+        store.create("t1", user_id=1, paper_id=10)
+        store.create("t2", user_id=2, paper_id=10)
+        store.create("t3", user_id=1, paper_id=11)
+
+        assert {t["task_id"] for t in store.find(paper_id=10)} == {"t1", "t2"}
+        assert {t["task_id"] for t in store.find(user_id=1)} == {"t1", "t3"}
+        assert [t["task_id"] for t in store.find(paper_id=11, user_id=1)] == ["t3"]
+        # 两种实现都按创建时间倒序返回
+        assert [t["task_id"] for t in store.find()] == ["t3", "t2", "t1"]
+        assert [t["task_id"] for t in store.find(limit=2)] == ["t3", "t2"]
+
+
+def test_expired_tasks_are_hidden_and_purged(tmp_path):
+    for store in _make_stores(tmp_path, ttl=1):
+        store.create("old", user_id=1, paper_id=10)
+        time.sleep(1.1)
+        assert store.get("old") is None
+        assert store.find(paper_id=10) == []
+        assert store.purge_expired() == 1
+
+
+def test_sqlite_store_survives_restart(tmp_path):
+    db_url = f"sqlite:///{tmp_path / 'restart.db'}"
+    store = SQLReportTaskStore(create_engine(db_url, future=True))
+    store.create("persist", user_id=3, paper_id=10)
+    store.update("persist", status="generating", progress=10)
+
+    # 模拟服务重启：重新创建引擎和存储
+    store = SQLReportTaskStore(create_engine(db_url, future=True))
+    task = store.get("persist")
+    assert task["status"] == "generating"
+    assert task["progress"] == 10
+
+
+def test_cancel_batch_only_touches_pending_tasks(tmp_path):
+    for store in _make_stores(tmp_path):
+        store.create_many([
+            {"task_id": f"b{i}", "user_id": i, "paper_id": 10, "batch_id": "batch1"} for i in range(4)
+        ] + [{"task_id": "other", "user_id": 9, "paper_id": 10, "batch_id": "batch2"}])
+        store.update("b0", status="generating", progress=10)
+        store.update("b1", status="retrying", attempts=1)
+
+        cancelled = store.cancel_batch("batch1")
+        assert sorted(cancelled) == ["b1", "b2", "b3"]
+        tasks = store.get_many(["b0", "b1", "b2", "other"])
+        assert tasks["b0"]["status"] == "generating"
+        assert tasks["b1"]["status"] == "cancelled"
+        assert tasks["b1"]["attempts"] == 1
+        assert tasks["b2"]["batch_id"] == "batch1"
+        assert tasks["other"]["status"] == "pending"
+        assert store.cancel_batch("batch1") == []
+
+
+def test_mark_started_is_compare_and_set(tmp_path):
+    for store in _make_stores(tmp_path):
+        store.create_many([
+            {"task_id": f"t{i}", "user_id": i, "paper_id": 10, "batch_id": "batch1"} for i in range(3)
+        ])
+        store.update("t1", status="retrying", attempts=1, error_message="第1次重试: 超时")
+
+        assert store.mark_started("t0")
+        assert store.mark_started("t1")
+        # 已开始的任务不能重复开始，也不能再被取消
+        assert not store.mark_started("t0")
+        assert store.cancel_batch("batch1") == ["t2"]
+        # 已取消的任务不会被改回生成中
+        assert not store.mark_started("t2")
+        assert not store.mark_started("missing")
+
+        tasks = store.get_many(["t0", "t1", "t2"])
+        assert tasks["t0"]["status"] == "generating"
+        assert tasks["t1"]["status"] == "generating"
+        assert tasks["t1"]["error_message"] is None
+        assert tasks["t1"]["attempts"] == 1
+        assert tasks["t2"]["status"] == "cancelled"
+
+
+def test_store_interface_is_abstract():
+    with pytest.raises(TypeError):
+        ReportTaskStore()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试接口响应短时缓存的命中、过期与失效
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.response_cache import ResponseCache
+
+
+def test_hit_expire_and_invalidate():
+    cache = ResponseCache(ttl=1)
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.get_or_set(("dashboard", "a"), loader) == 1
+    assert cache.get_or_set(("dashboard", "a"), loader) == 1
+    assert cache.get_or_set(("other", "a"), loader) == 2
+
+    cache.invalidate("dashboard")
+    assert cache.get_or_set(("dashboard", "a"), loader) == 3
+    assert cache.get_or_set(("other", "a"), loader) == 2
+
+    time.sleep(1.1)
+    assert cache.get_or_set(("other", "a"), loader) == 4
+
+
+def test_invalidate_during_load_is_not_cached():
+    cache = ResponseCache(ttl=60)
+
+    def stale_loader():
+        cache.invalidate("dashboard")
+        return "stale"
+
+    assert cache.get_or_set(("dashboard", "a"), stale_loader) == "stale"
+    assert cache.get_or_set(("dashboard", "a"), lambda: "fresh") == "fresh"
+
+
+def test_disabled_cache():
+    cache = ResponseCache(ttl=0)
+    values = iter([1, 2])
+    assert cache.get_or_set(("dashboard",), lambda: next(values)) == 1
+    assert cache.get_or_set(("dashboard",), lambda: next(values)) == 2
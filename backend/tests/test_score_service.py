@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试批量算分服务与原逐人算分逻辑的结果一致性（不依赖运行中的后端服务）
+"""
+
+import json
+import random
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from app.services.score_service import (
+    DimensionInfo, PaperScoringData, answer_to_index, compute_paper_scores,
+)
+
+
+def legacy_user_score(data, answer_rows, user_id):
+    """原 calculate_user_paper_score 的计算过程（去掉数据库查询和打印）"""
+    answer_map = {qid: ans for uid, qid, ans in answer_rows if uid == user_id}
+    small_dim_scores = defaultdict(list)
+    for qid, dim_id in data.question_dim_map.items():
+        if dim_id is None:
+            continue
+        ans = answer_map.get(qid)
+        if ans is None:
+            continue
+        q_scores = data.question_scores.get(qid, [10, 7, 4, 1])
+        idx = None
+        if isinstance(ans, str):
+            try:
+                parsed_ans = json.loads(ans)
+                if isinstance(parsed_ans, list) and len(parsed_ans) > 0:
+                    if isinstance(parsed_ans[0], int):
+                        idx = parsed_ans[0]
+                    elif isinstance(parsed_ans[0], str):
+                        idx = ord(parsed_ans[0].upper()) - ord('A')
+            except Exception:
+                idx = ord(ans.upper()) - ord('A')
+        if idx is not None and 0 <= idx < len(q_scores):
+            small_dim_scores[dim_id].append(q_scores[idx])
+
+    big_dims = [d for d in data.dimensions if d.parent_id is None]
+    small_dims = [d for d in data.dimensions if d.parent_id is not None]
+    small_dim_avg = {}
+    for dim in small_dims:
+        scores = small_dim_scores.get(dim.id, [])
+        small_dim_avg[dim.id] = round(sum(scores) / len(scores), 2) if scores else 0.0
+
+    big_dim_avg = {}
+    detail = []
+    for big in big_dims:
+        sub_dims = [d for d in small_dims if d.parent_id == big.id]
+        if sub_dims:
+            sub_scores = [small_dim_avg[d.id] for d in sub_dims]
+            avg = round(sum(sub_scores) / len(sub_scores), 2)
+        else:
+            big_scores = small_dim_scores.get(big.id, [])
+            avg = round(sum(big_scores) / len(big_scores), 2) if big_scores else 0.0
+        big_dim_avg[big.id] = avg
+        detail.append({
+            "name": big.name,
+            "score": avg,
+            "sub_dimensions": [{"name": d.name, "score": small_dim_avg[d.id]} for d in sub_dims]
+        })
+
+    total_score = 0
+    if big_dim_avg:
+        total_score = round(sum(big_dim_avg.values()) / len(big_dim_avg), 2)
+    return {"total_score": total_score, "big_dimensions": detail}
+
+
+def _random_paper(rng, float_scores=False):
+    dimensions = []
+    next_id = 1
+    for b in range(rng.randint(1, 4)):
+        big_id = next_id
+        dimensions.append(DimensionInfo(big_id, f"大维度{b}", None))
+        next_id += 1
+        for s in range(rng.choice([0, 2, 3])):
+            dimensions.append(DimensionInfo(next_id, f"小维度{b}-{s}", big_id))
+            next_id += 1
+
+    question_dim_map = {}
+    question_scores = {}
+    dim_ids = [d.id for d in dimensions] + [None, 999]
+    for qid in range(1, rng.randint(5, 40)):
+        question_dim_map[qid] = rng.choice(dim_ids)
+        if rng.random() < 0.9:
+            if float_scores:
+                question_scores[qid] = [round(rng.uniform(0, 10), 1) for _ in range(4)]
+            else:
+                question_scores[qid] = [rng.randint(0, 10) for _ in range(rng.randint(2, 5))]
+    return PaperScoringData(question_dim_map, dimensions, question_scores)
+
+
+def _random_answers(rng, data, user_ids):
+    choices = ['["A"]', '["b"]', '["C"]', '["D"]', '["E"]', '[0]', '[2]', '[]', 'B', 'a', '3', '"A"', None]
+    rows = []
+    for uid in user_ids:
+        for qid in data.question_dim_map:
+            if rng.random() < 0.85:
+                rows.append((uid, qid, rng.choice(choices)))
+        # 偶尔出现重复作答记录，以最后一条为准
+        if rng.random() < 0.2:
+            qid = rng.choice(list(data.question_dim_map))
+            rows.append((uid, qid, rng.choice(choices)))
+    return rows
+
+
+def test_answer_to_index():
+    assert answer_to_index('["A"]') == 0
+    assert answer_to_index('["c"]') == 2
+    assert answer_to_index('[3]') == 3
+    assert answer_to_index('B') == 1
+    assert answer_to_index(["D"]) == 3
+    assert answer_to_index('[]') is None
+    assert answer_to_index('7') is None
+    assert answer_to_index(None) is None
+
+
+def test_batch_scores_match_legacy_per_user():
+    rng = random.Random(2024)
+    for float_scores in (False, True):
+        for _ in range(30):
+            data = _random_paper(rng, float_scores=float_scores)
+            user_ids = list(range(1, rng.randint(2, 25)))
+            rows = _random_answers(rng, data, user_ids)
+
+            batch = compute_paper_scores(data, rows, user_ids)
+            for uid in user_ids:
+                assert batch[uid] == legacy_user_score(data, rows, uid)
+
+
+def test_users_without_answers_get_zero_scores():
+    data = PaperScoringData(
+        {1: 2, 2: 3},
+        [DimensionInfo(1, "大维度", None), DimensionInfo(2, "小维度A", 1), DimensionInfo(3, "小维度B", 1)],
+        {1: [10, 7, 4, 1], 2: [10, 7, 4, 1]},
+    )
+    result = compute_paper_scores(data, [(1, 1, '["A"]')], [1, 2])
+    assert result[1]["total_score"] == 5.0
+    assert result[2] == {
+        "total_score": 0.0,
+        "big_dimensions": [{
+            "name": "大维度",
+            "score": 0.0,
+            "sub_dimensions": [{"name": "小维度A", "score": 0.0}, {"name": "小维度B", "score": 0.0}],
+        }],
+    }
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试无状态题目/选项乱序：可复现、互不影响、提交答案可还原（不依赖数据库）
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from types import MappingProxyType
+
+# 添加backend目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+os.environ.setdefault("SHUFFLE_KEY", "test-shuffle-key")
+
+from app.services.paper_snapshot import PaperSnapshot, QuestionEntry
+from app.services.shuffle_service import (
+    build_layout, option_orders, question_order, restore_answers,
+)
+
+
+def _snapshot(question_ids, option_count=4, is_shuffled=True, shuffle_options=True):
+    questions = tuple(
+        QuestionEntry(qid, f"题目{qid}", "single", tuple("abcdefghijklmnop"[:option_count]),
+                      tuple(range(option_count, 0, -1)), shuffle_options, None, i, None)
+        for i, qid in enumerate(question_ids)
+    )
+    return PaperSnapshot(7, 0, "试卷", None, 30, "published", is_shuffled, tuple(reversed(question_ids)),
+                         questions, MappingProxyType({q.question_id: q for q in questions}), time.time())
+
+
+def test_layout_is_reproducible_and_per_assignment():
+    snapshot = _snapshot(list(range(1, 41)))
+    first = build_layout(snapshot, 100)
+    assert build_layout(snapshot, 100) == first
+    assert sorted(first.question_order) == list(range(1, 41))
+    assert first.question_order != tuple(range(1, 41))
+    assert build_layout(snapshot, 101).question_order != first.question_order
+    for perm in first.option_orders.values():
+        assert sorted(perm) == [0, 1, 2, 3]
+
+
+def test_option_order_does_not_depend_on_other_questions():
+    full = option_orders(7, 100, [1, 2, 3], [4, 4, 4])
+    partial = option_orders(7, 100, [3], [4])
+    assert full[3] == partial[3]
+    assert question_order(7, 100, [3, 1, 2]) == question_order(7, 100, [1, 2, 3])
+
+
+def test_unshuffled_paper_and_preview():
+    snapshot = _snapshot([5, 6, 7], is_shuffled=False, shuffle_options=False)
+    layout = build_layout(snapshot, 1)
+    assert layout.question_order == (5, 6, 7)
+    assert dict(layout.option_orders) == {}
+    assert build_layout(_snapshot([5, 6, 7]), None).question_order == (7, 6, 5)
+
+
+def test_many_options_and_distribution():
+    perms = option_orders(7, 1, [1], [20])
+    assert sorted(perms[1]) == list(range(20))
+
+    firsts = Counter(option_orders(7, aid, [1], [4])[1][0] for aid in range(4000))
+    assert all(800 < firsts[i] < 1200 for i in range(4))
+
+
+def test_restore_answers_maps_displayed_labels_back():
+    snapshot = _snapshot([1, 2])
+    layout = build_layout(snapshot, 55)
+    perm = layout.option_orders[1]
+    shown = "ABCD"[perm.index(0)]  # 原始第一个选项展示时的标签
+    restored = restore_answers(layout, {"1": [shown], "2": [perm.index(0)], "9": ["B"]})
+    assert restored["1"] == ["A"]
+    assert restored["2"] == [layout.option_orders[2][perm.index(0)]]
+    assert restored["9"] == ["B"]
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试报告模板注册表：编译结果复用、内容变化与主动失效、过滤器注册
+"""
+
+import sys
+from pathlib import Path
+
+# 添加backend目录和报告生成器目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+sys.path.append(str(project_root / "reports" / "generators"))
+
+from template_registry import TemplateRegistry, template_registry
+from reports.generators import template_registry as package_module
+
+
+def test_same_content_compiles_once():
+    registry = TemplateRegistry(cache_size=10)
+    first = registry.from_string("你好 {{ name }}", "a.html")
+    assert registry.from_string("你好 {{ name }}", "a.html") is first
+    assert first.render(name="张三") == "你好 张三"
+
+    changed = registry.from_string("再见 {{ name }}", "a.html")
+    assert changed is not first
+    assert changed.render(name="张三") == "再见 张三"
+
+
+def test_invalidate_drops_compiled_templates():
+    registry = TemplateRegistry(cache_size=10)
+    first = registry.from_string("{{ 1 + 1 }}", "b.html")
+    registry.invalidate("b.html")
+    assert registry.from_string("{{ 1 + 1 }}", "b.html") is not first
+    assert registry.stats()["environments"] == 1
+
+
+def test_file_templates_and_filters(tmp_path):
+    (tmp_path / "report.html").write_text(
+        "{% for d in s | get_dim_strengths %}{{ d.name }}{% endfor %}|{{ (s | get_top_strength).name }}",
+        encoding="utf-8")
+    registry = TemplateRegistry(cache_size=10)
+    template = registry.get_template("report.html", tmp_path)
+    assert registry.get_template("report.html", str(tmp_path)) is template
+    strengths = {"维度": [{"name": "沟通", "diff": 1}], "子维度": [{"name": "倾听", "diff": 2}]}
+    assert template.render(s=strengths) == "沟通|倾听"
+
+
+def test_autoescape_uses_separate_environment():
+    registry = TemplateRegistry(cache_size=10)
+    assert registry.from_string("{{ v }}", "c", autoescape=True).render(v="<b>") == "&lt;b&gt;"
+    assert registry.from_string("{{ v }}", "c").render(v="<b>") == "<b>"
+
+
+def test_module_aliases_share_registry():
+    assert package_module.template_registry is template_registry
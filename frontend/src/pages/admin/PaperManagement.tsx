@@ -1231,6 +1231,34 @@ const PaperManagement: React.FC = () => {
         }
     };
 
+    // 轮询题目后台导入任务，完成时返回 true
+    const waitForQuestionImportJob = async (jobId: string): Promise<boolean> => {
+        const key = 'question-import';
+        try {
+            while (true) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const response = await fetch(`http://localhost:8000/questions/import-jobs/${jobId}`);
+                if (!response.ok) {
+                    message.error({ content: '查询导入进度失败', key });
+                    return false;
+                }
+                const job = await response.json();
+                if (job.status === 'completed') {
+                    message.destroy(key);
+                    return true;
+                }
+                if (job.status === 'failed') {
+                    message.error({ content: job.message || '导入题目失败', key });
+                    return false;
+                }
+                message.loading({ content: `正在导入题目 ${job.processed}/${job.total}（${job.progress}%）`, key, duration: 0 });
+            }
+        } catch (error) {
+            message.error({ content: '网络错误', key });
+            return false;
+        }
+    };
+
     // Excel导入确认
     const handleConfirmImportExcel = async () => {
         if (excelImportedQuestions.length === 0) return;
@@ -1245,6 +1273,10 @@ const PaperManagement: React.FC = () => {
                 body: JSON.stringify(excelImportedQuestions),
             });
             if (response.ok) {
+                const result = await response.json();
+                if (result.job_id && !(await waitForQuestionImportJob(result.job_id))) {
+                    return;
+                }
                 message.success('Excel题目导入成功');
                 setExcelImportModalVisible(false);
                 setExcelImportedQuestions([]);
@@ -2826,6 +2858,19 @@ const PaperManagement: React.FC = () => {
                                             </div>
                                         ))}
                                     </div>
+                                    {/* 疑似重复：题库中相似的题目、本文件中重复的前一道题 */}
+                                    {(item.duplicates?.length > 0 || item.duplicate_of != null) && (
+                                        <div style={{ marginTop: 4 }}>
+                                            {item.duplicate_of != null && (
+                                                <Tag color="orange">与本文件题目{item.duplicate_of + 1}重复</Tag>
+                                            )}
+                                            {item.duplicates?.map((dup: any) => (
+                                                <Tag color="red" key={dup.id}>
+                                                    疑似重复 ID:{dup.id}（相似度 {Math.round(dup.similarity * 100)}%）
+                                                </Tag>
+                                            ))}
+                                        </div>
+                                    )}
                                 </div>
                             </List.Item>
                         )}
@@ -14,7 +14,8 @@ import {
     Upload,
     Alert,
     AutoComplete,
-    InputNumber
+    InputNumber,
+    Progress
 } from 'antd';
 import {
     PlusOutlined,
@@ -44,6 +45,7 @@ const ParticipantManagement: React.FC = () => {
     const [form] = Form.useForm();
     const [importLoading, setImportLoading] = useState(false);
     const [importResult, setImportResult] = useState<any>(null);
+    const [importProgress, setImportProgress] = useState<{ processed: number; total: number; percent: number } | null>(null);
 
     // 岗位列表（可根据实际岗位补充）
     const positionOptions = [
@@ -258,9 +260,14 @@ const ParticipantManagement: React.FC = () => {
 
             if (response.ok) {
                 const result = await response.json();
-                setImportResult(result);
-                message.success(result.msg);
-                fetchParticipants();
+                if (result.job_id) {
+                    // 大文件转为后台导入，轮询进度直到完成
+                    await waitForImportJob(result.job_id, result.total);
+                } else {
+                    setImportResult(result);
+                    message.success(result.msg);
+                    fetchParticipants();
+                }
             } else {
                 const errorData = await response.json();
                 message.error(errorData.detail || '导入失败');
@@ -272,6 +279,36 @@ const ParticipantManagement: React.FC = () => {
         }
     };
 
+    // 轮询后台导入任务
+    const waitForImportJob = async (jobId: string, total: number) => {
+        setImportProgress({ processed: 0, total, percent: 0 });
+        try {
+            while (true) {
+                await new Promise(resolve => setTimeout(resolve, 1000));
+                const response = await fetch(`/api/participants/import-jobs/${jobId}`);
+                if (!response.ok) {
+                    const errorData = await response.json();
+                    message.error(errorData.detail || '查询导入进度失败');
+                    return;
+                }
+                const job = await response.json();
+                setImportProgress({ processed: job.processed, total: job.total, percent: job.progress });
+                if (job.status === 'completed') {
+                    setImportResult(job.result);
+                    message.success(job.result.msg);
+                    fetchParticipants();
+                    return;
+                }
+                if (job.status === 'failed') {
+                    message.error(job.message || '导入失败');
+                    return;
+                }
+            }
+        } finally {
+            setImportProgress(null);
+        }
+    };
+
     // 下载Excel模板
     const downloadTemplate = () => {
         const template = [
@@ -465,6 +502,15 @@ const ParticipantManagement: React.FC = () => {
                         <Button onClick={() => { filterForm.resetFields(); fetchParticipants(); }}>重置</Button>
                     </Form.Item>
                 </Form>
+                {/* 后台导入进度 */}
+                {importProgress && (
+                    <Alert
+                        message={`正在导入: ${importProgress.processed} / ${importProgress.total}`}
+                        description={<Progress percent={importProgress.percent} status="active" />}
+                        type="info"
+                        style={{ marginBottom: '16px' }}
+                    />
+                )}
                 {/* 导入结果提示 */}
                 {importResult && (
                     <Alert
@@ -38,7 +38,14 @@ const QuestionManagement = () => {
     const [selectedRowKeys, setSelectedRowKeys] = useState<React.Key[]>([])
     const [importing, setImporting] = useState(false)
     const [batchSubmitting, setBatchSubmitting] = useState(false)
-    const [pagination, setPagination] = useState({ current: 1, pageSize: 10 })
+    // 服务端搜索与游标分页：cursors[i] 为第 i 页的游标（第一页为 null）
+    const [keyword, setKeyword] = useState('')
+    const [typeFilter, setTypeFilter] = useState<string | undefined>(undefined)
+    const [pageSize, setPageSize] = useState(10)
+    const [cursors, setCursors] = useState<(string | null)[]>([null])
+    const [pageIndex, setPageIndex] = useState(0)
+    const [nextCursor, setNextCursor] = useState<string | null>(null)
+    const [total, setTotal] = useState<{ value: number, estimated: boolean } | null>(null)
     const [caseModalVisible, setCaseModalVisible] = useState(false)
     const [caseForm] = Form.useForm()
     const [caseQuestions, setCaseQuestions] = useState<any[]>([])
@@ -47,38 +54,37 @@ const QuestionManagement = () => {
     // 获取token
     const token = localStorage.getItem('token') || ''
 
-    // 拉取题库列表
-    const fetchQuestions = async () => {
+    // 拉取一页题目（默认回到第一页），案例背景题附带子题
+    const fetchQuestions = async (
+        page: number = 0,
+        pageCursors: (string | null)[] = [null],
+        filters: { q?: string, type?: string, limit?: number } = {}
+    ) => {
+        const q = filters.q ?? keyword
+        const type = 'type' in filters ? filters.type : typeFilter
+        const limit = filters.limit ?? pageSize
         setLoading(true)
         try {
-            const res = await apiService.getList('/questions/')
-
-            // 组织案例背景题和子题的关系
-            const allQuestions = res  // apiService.getList 已经返回 data 部分
-            const caseMap = new Map() // 存储案例背景题ID到题目对象的映射
-            const regularQuestions: Question[] = [] // 存储非子题的普通题目
-
-            // 第一遍遍历，找出所有案例背景题和普通题
-            allQuestions.forEach((q: Question) => {
-                if (q.type === 'case') {
-                    q.children = [] // 初始化子题数组
-                    caseMap.set(q.id, q)
-                } else if (!q.parent_case_id) {
-                    regularQuestions.push(q)
-                }
-            })
-
-            // 第二遍遍历，将子题添加到对应的案例背景题中
-            allQuestions.forEach((q: Question) => {
-                if (q.parent_case_id && caseMap.has(q.parent_case_id)) {
-                    const parent = caseMap.get(q.parent_case_id)
-                    parent.children!.push(q)
-                }
+            const res: any = await apiService.getList('/questions/search', {
+                q: q || undefined,
+                type: type || undefined,
+                // 搜索关键词时子题也参与匹配，否则只列出顶层题目
+                top_level: !q,
+                with_children: true,
+                cursor: pageCursors[page] || undefined,
+                limit
             })
-
-            // 合并案例背景题和普通题
-            const result = [...caseMap.values(), ...regularQuestions]
-            setQuestions(result)
+            setQuestions(res.items)
+            setNextCursor(res.next_cursor)
+            if (page === 0) {
+                setTotal({ value: res.total, estimated: res.total_estimated })
+            }
+            const updated = pageCursors.slice(0, page + 1)
+            if (res.next_cursor) {
+                updated.push(res.next_cursor)
+            }
+            setCursors(updated)
+            setPageIndex(page)
         } catch (e) {
             message.error('获取题库失败')
         } finally {
@@ -91,10 +97,6 @@ const QuestionManagement = () => {
         // eslint-disable-next-line
     }, [])
 
-    useEffect(() => {
-        setPagination((p) => ({ ...p, current: 1 }))
-    }, [questions])
-
     const columns = [
         {
             title: '题目内容',
@@ -382,7 +384,9 @@ const QuestionManagement = () => {
             const wordQuestions = res.questions.map((q: any) => ({
                 content: q.content,
                 type: q.type,
-                options: q.options.map((v: string, i: number) => ({ value: v, score: q.scores[i] ?? 0 }))
+                options: q.options.map((v: string, i: number) => ({ value: v, score: q.scores[i] ?? 0 })),
+                duplicates: q.duplicates || [],
+                duplicate_of: q.duplicate_of
             }))
             batchForm.setFieldsValue({ questions: wordQuestions })
             setBatchModalVisible(true)
@@ -394,6 +398,22 @@ const QuestionManagement = () => {
         return false
     }
 
+    // 导入预览中的疑似重复提示
+    const renderDuplicateTags = (name: number) => {
+        const duplicates = batchForm.getFieldValue(['questions', name, 'duplicates']) || []
+        const duplicateOf = batchForm.getFieldValue(['questions', name, 'duplicate_of'])
+        return (
+            <Space size={4} wrap>
+                {duplicateOf != null && <Tag color="orange">与题目{duplicateOf + 1}重复</Tag>}
+                {duplicates.map((dup: any) => (
+                    <Tag color="red" key={dup.id} title={dup.content}>
+                        疑似重复 ID:{dup.id}（{Math.round(dup.similarity * 100)}%）
+                    </Tag>
+                ))}
+            </Space>
+        )
+    }
+
     // 批量提交
     const handleBatchOk = async () => {
         setBatchSubmitting(true)
@@ -456,7 +476,9 @@ const QuestionManagement = () => {
                 content: q.content,
                 type: q.type,
                 options: q.options.map((v: string, i: number) => ({ value: v, score: q.scores[i] ?? 0 })),
-                shuffle_options: q.shuffle_options || false
+                shuffle_options: q.shuffle_options || false,
+                duplicates: q.duplicates || [],
+                duplicate_of: q.duplicate_of
             }));
             batchForm.setFieldsValue({ questions: excelQuestions });
             setBatchModalVisible(true);
@@ -608,23 +630,38 @@ const QuestionManagement = () => {
                     </Space>
                 }
             >
+                <Space style={{ marginBottom: 16 }}>
+                    <Input.Search
+                        allowClear
+                        placeholder="搜索题目内容"
+                        style={{ width: 300 }}
+                        onSearch={(value) => {
+                            setKeyword(value)
+                            fetchQuestions(0, [null], { q: value })
+                        }}
+                    />
+                    <Select
+                        allowClear
+                        placeholder="全部题型"
+                        style={{ width: 140 }}
+                        value={typeFilter}
+                        onChange={(value) => {
+                            setTypeFilter(value)
+                            fetchQuestions(0, [null], { type: value })
+                        }}
+                    >
+                        <Option value="single">单选题</Option>
+                        <Option value="multiple">多选题</Option>
+                        <Option value="indefinite">不定项</Option>
+                        <Option value="case">案例背景题</Option>
+                    </Select>
+                </Space>
                 <Table
                     columns={columns}
-                    dataSource={questions.slice(
-                        (pagination.current - 1) * pagination.pageSize,
-                        pagination.current * pagination.pageSize
-                    )}
+                    dataSource={questions}
                     rowKey="id"
                     loading={loading}
-                    pagination={{
-                        current: pagination.current,
-                        pageSize: pagination.pageSize,
-                        showSizeChanger: true,
-                        pageSizeOptions: ['5', '10', '20', '50'],
-                        showTotal: (total) => `共 ${total} 条`,
-                        total: questions.length,
-                        onChange: (page, pageSize) => setPagination({ current: page, pageSize })
-                    }}
+                    pagination={false}
                     rowSelection={{
                         selectedRowKeys,
                         onChange: setSelectedRowKeys
@@ -634,6 +671,26 @@ const QuestionManagement = () => {
                         rowExpandable: (record: Question) => record.type === 'case' && Array.isArray(record.children) && record.children.length > 0
                     }}
                 />
+                <Space style={{ marginTop: 16, display: 'flex', justifyContent: 'flex-end' }}>
+                    {total && <span>{total.estimated ? `共约 ${total.value} 条` : `共 ${total.value} 条`}</span>}
+                    <span>第 {pageIndex + 1} 页</span>
+                    <Button disabled={pageIndex === 0 || loading} onClick={() => fetchQuestions(pageIndex - 1, cursors)}>
+                        上一页
+                    </Button>
+                    <Button disabled={!nextCursor || loading} onClick={() => fetchQuestions(pageIndex + 1, cursors)}>
+                        下一页
+                    </Button>
+                    <Select
+                        value={pageSize}
+                        style={{ width: 110 }}
+                        onChange={(value) => {
+                            setPageSize(value)
+                            fetchQuestions(0, [null], { limit: value })
+                        }}
+                    >
+                        {[5, 10, 20, 50].map(size => <Option key={size} value={size}>{size} 条/页</Option>)}
+                    </Select>
+                </Space>
 
                 {/* 单题编辑弹窗 */}
                 <Modal
@@ -729,7 +786,7 @@ const QuestionManagement = () => {
                             {(fields) => (
                                 <>
                                     {fields.map((field, qidx) => (
-                                        <Card key={field.key} style={{ marginBottom: 16 }} title={`题目${qidx + 1}`}>
+                                        <Card key={field.key} style={{ marginBottom: 16 }} title={`题目${qidx + 1}`} extra={renderDuplicateTags(field.name)}>
                                             <Form.Item
                                                 key={`${field.key}-content`}
                                                 name={[field.name, 'content']}
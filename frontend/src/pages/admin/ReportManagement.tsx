@@ -30,7 +30,8 @@ import {
     DeleteOutlined,
     SearchOutlined,
     ReloadOutlined,
-    EyeOutlined
+    EyeOutlined,
+    StopOutlined
 } from '@ant-design/icons';
 import axios from 'axios';
 import dayjs from 'dayjs';
@@ -53,7 +54,7 @@ interface ReportTask {
     user_name: string;
     paper_id: number;
     paper_name: string;
-    status: 'pending' | 'generating' | 'completed' | 'failed';
+    status: 'pending' | 'generating' | 'retrying' | 'completed' | 'failed' | 'cancelled';
     progress: number;
     file_path?: string;
     error_message?: string;
@@ -225,6 +226,8 @@ const ReportManagement: React.FC = () => {
     const [loading, setLoading] = useState(false);
     const [generating, setGenerating] = useState(false);
     const [showProgress, setShowProgress] = useState(false);
+    const [batchId, setBatchId] = useState<string | null>(null);
+    const [batchProgress, setBatchProgress] = useState(0);
 
     // 报告存储相关状态
     const [storedReports, setStoredReports] = useState<StoredReport[]>([]);
@@ -389,8 +392,15 @@ const ReportManagement: React.FC = () => {
                 });
 
                 setReportTasks(tasks);
-                // 开始轮询任务状态
-                pollReportStatus(tasks);
+                setBatchId(response.batch_id || null);
+                setBatchProgress(0);
+                if (response.batch_id && typeof EventSource !== 'undefined') {
+                    // 订阅服务端推送的批次进度
+                    watchBatchProgress(tasks, response.batch_id);
+                } else {
+                    // 开始轮询任务状态
+                    pollReportStatus(tasks);
+                }
             } else {
                 message.error(response.message || '报告生成失败');
                 setGenerating(false);
@@ -402,6 +412,77 @@ const ReportManagement: React.FC = () => {
         }
     };
 
+    // 批次全部结束
+    const finishBatch = () => {
+        setGenerating(false);
+        setBatchId(null);
+        message.success('所有报告生成完成');
+        // 刷新报告列表
+        fetchStoredReports();
+    };
+
+    // 订阅批次进度（SSE），断线时浏览器自动带上 Last-Event-ID 重连并补发错过的事件
+    const watchBatchProgress = (tasks: ReportTask[], batch: string) => {
+        const taskMap = new Map(tasks.map(task => [task.id, task]));
+        let flushTimer: ReturnType<typeof setTimeout> | null = null;
+
+        const applyTask = (update: any) => {
+            const task = taskMap.get(update.task_id);
+            if (task) {
+                taskMap.set(task.id, {
+                    ...task,
+                    status: update.status,
+                    progress: update.progress,
+                    file_path: update.file_path,
+                    error_message: update.error_message,
+                    report_id: update.report_id
+                });
+            }
+        };
+        // 大批次时事件很密集，合并后再刷新表格
+        const scheduleFlush = () => {
+            if (flushTimer === null) {
+                flushTimer = setTimeout(() => {
+                    flushTimer = null;
+                    setReportTasks(Array.from(taskMap.values()));
+                }, 200);
+            }
+        };
+
+        const source = new EventSource(`/reports/batches/${batch}/events`);
+        source.addEventListener('snapshot', (event) => {
+            const data = JSON.parse((event as MessageEvent).data);
+            data.tasks.forEach(applyTask);
+            setBatchProgress(data.batch.progress);
+            scheduleFlush();
+        });
+        source.addEventListener('task', (event) => {
+            applyTask(JSON.parse((event as MessageEvent).data));
+            scheduleFlush();
+        });
+        source.addEventListener('batch', (event) => {
+            setBatchProgress(JSON.parse((event as MessageEvent).data).progress);
+        });
+        source.addEventListener('done', () => {
+            source.close();
+            setBatchProgress(100);
+            setReportTasks(Array.from(taskMap.values()));
+            finishBatch();
+        });
+        source.addEventListener('error', (event) => {
+            const data = (event as MessageEvent).data;
+            if (data) {
+                // 服务端通知批次不存在或已过期
+                source.close();
+                setGenerating(false);
+                message.error(JSON.parse(data).message);
+            } else if (source.readyState === EventSource.CLOSED) {
+                // 无法建立推送连接，退回轮询
+                pollReportStatus(Array.from(taskMap.values()));
+            }
+        });
+    };
+
     // 轮询报告状态
     const pollReportStatus = (tasks: ReportTask[]) => {
         const interval = setInterval(async () => {
@@ -425,15 +506,12 @@ const ReportManagement: React.FC = () => {
 
                 // 检查是否所有任务都完成
                 const allCompleted = updatedTasks.every(task =>
-                    task.status === 'completed' || task.status === 'failed'
+                    task.status === 'completed' || task.status === 'failed' || task.status === 'cancelled'
                 );
 
                 if (allCompleted) {
                     clearInterval(interval);
-                    setGenerating(false);
-                    message.success('所有报告生成完成');
-                    // 刷新报告列表
-                    fetchStoredReports();
+                    finishBatch();
                 }
             } catch (error) {
                 console.error('获取报告状态失败:', error);
@@ -441,6 +519,18 @@ const ReportManagement: React.FC = () => {
         }, 2000); // 每2秒轮询一次
     };
 
+    // 取消批次中尚未开始生成的报告
+    const handleCancelBatch = async () => {
+        if (!batchId) return;
+        try {
+            const response = await apiService.create(`/reports/batches/${batchId}/cancel`, {});
+            message.success(`已取消 ${response.cancelled} 个排队中的任务`);
+        } catch (error) {
+            console.error('取消报告生成失败:', error);
+            message.error('取消报告生成失败');
+        }
+    };
+
     // 下载单个报告
     const handleDownloadReport = async (task: ReportTask) => {
         if (task.status !== 'completed' || !task.file_path) {
@@ -552,14 +642,13 @@ const ReportManagement: React.FC = () => {
             // 注意endpoint应该为/reports/batch/download
             const response = await apiService.create('/reports/batch/download', selectedReports);
 
-            // 逐个下载报告
-            if (response && response.download_links) {
-                for (const link of response.download_links) {
-                    const report = storedReports.find(r => r.id === link.report_id);
-                    if (report) {
-                        handleDownloadStoredReport(report);
-                    }
-                }
+            // 打包为一个ZIP下载：archive_url 带短期下载Token，交给浏览器下载（支持断点续传）
+            if (response && response.archive_url) {
+                const link = document.createElement('a');
+                link.href = response.archive_url;
+                document.body.appendChild(link);
+                link.click();
+                link.remove();
                 message.success('批量下载已开始');
             } else {
                 message.warning('未收到下载链接');
@@ -595,8 +684,10 @@ const ReportManagement: React.FC = () => {
                 const statusMap = {
                     pending: { color: 'orange', text: '等待中' },
                     generating: { color: 'blue', text: '生成中' },
+                    retrying: { color: 'gold', text: '等待重试' },
                     completed: { color: 'green', text: '已完成' },
-                    failed: { color: 'red', text: '生成失败' }
+                    failed: { color: 'red', text: '生成失败' },
+                    cancelled: { color: 'default', text: '已取消' }
                 };
                 const { color, text } = statusMap[status as keyof typeof statusMap];
                 return <Tag color={color}>{text}</Tag>;
@@ -800,6 +891,9 @@ const ReportManagement: React.FC = () => {
             {/* 报告生成进度 */}
             {showProgress && (
                 <Card title="报告生成进度" style={{ marginBottom: 16 }}>
+                    {generating && batchId && (
+                        <Progress percent={batchProgress} style={{ marginBottom: 16 }} />
+                    )}
                     <Table
                         columns={taskColumns}
                         dataSource={reportTasks}
@@ -807,6 +901,13 @@ const ReportManagement: React.FC = () => {
                         pagination={false}
                         size="small"
                     />
+                    {generating && batchId && (
+                        <div style={{ marginTop: 16 }}>
+                            <Button danger icon={<StopOutlined />} onClick={handleCancelBatch}>
+                                取消未开始的任务
+                            </Button>
+                        </div>
+                    )}
                     {!generating && reportTasks.length > 0 && (
                         <div style={{ marginTop: 16 }}>
                             <Space>
@@ -101,29 +101,16 @@ const Assessment = () => {
     }
 
     // 获取试卷题目
-    const fetchQuestions = async (paperId: number) => {
+    const fetchQuestions = async (paperId: number, assignmentId: number) => {
         try {
-            // 从token中获取用户ID
             const token = localStorage.getItem('token')
             if (!token) {
                 message.error('未找到登录信息')
                 return
             }
 
-            // 解析JWT token获取用户ID（只用user_id字段，必须为数字）
-            let userId = null
-            try {
-                const payload = JSON.parse(atob(token.split('.')[1]))
-                userId = payload.user_id // 只用user_id字段
-            } catch (e) {
-                console.warn('无法从token中获取用户ID')
-            }
-
-            const url = userId
-                ? `http://localhost:8000/papers/${paperId}/questions-with-options?user_id=${userId}`
-                : `http://localhost:8000/papers/${paperId}/questions-with-options`
-
-            const response = await fetch(url, {
+            // 题目和选项顺序由后端按所选的试卷分配决定，与提交时还原答案使用同一分配
+            const response = await fetch(`http://localhost:8000/papers/${paperId}/questions-with-options?assignment_id=${assignmentId}`, {
                 method: 'GET',
                 headers: {
                     'Content-Type': 'application/json',
@@ -470,7 +457,7 @@ const Assessment = () => {
 
     const handleSelectAssignment = async (assignment: Assignment) => {
         setSelectedAssignment(assignment)
-        await fetchQuestions(assignment.paper_id)
+        await fetchQuestions(assignment.paper_id, assignment.id)
         setShowRules(true)
     }
 